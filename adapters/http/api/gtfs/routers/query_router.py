@@ -4,11 +4,13 @@ from zoneinfo import ZoneInfo
 import math
 import re as regex_module
 import json
+import hmac
 import logging
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, literal
+from sqlalchemy import and_, or_, func, literal, case
 
 from core.rate_limiter import limiter, RateLimits
 from core.config import settings
@@ -63,6 +65,9 @@ from adapters.http.api.gtfs.schemas import (
     JourneyResponse,
     JourneyAlertResponse,
     RoutePlannerResponse,
+    IsochroneStopResponse,
+    IsochroneResponse,
+    TravelTimeMatrixRequest,
 )
 
 from core.database import get_db
@@ -70,7 +75,7 @@ from src.gtfs_bc.route.infrastructure.models import RouteModel, RouteFrequencyMo
 from src.gtfs_bc.stop.infrastructure.models import StopModel
 from src.gtfs_bc.trip.infrastructure.models import TripModel
 from src.gtfs_bc.stop_time.infrastructure.models import StopTimeModel
-from src.gtfs_bc.calendar.infrastructure.models import CalendarModel, CalendarDateModel
+from src.gtfs_bc.calendar.infrastructure.models import CalendarModel
 from src.gtfs_bc.agency.infrastructure.models import AgencyModel
 from src.gtfs_bc.network.infrastructure.models import NetworkModel
 from src.gtfs_bc.realtime.infrastructure.models import TripUpdateModel, StopTimeUpdateModel, VehiclePositionModel, PlatformHistoryModel
@@ -87,7 +92,9 @@ from src.gtfs_bc.stop.infrastructure.models.stop_correspondence_model import Sto
 from src.gtfs_bc.stop.infrastructure.models.stop_access_model import StopAccessModel
 from src.gtfs_bc.stop.infrastructure.models.stop_vestibule_model import StopVestibuleModel
 from src.gtfs_bc.routing import RaptorService
-from src.gtfs_bc.routing.gtfs_store import gtfs_store
+from src.gtfs_bc.routing.raptor_executor import RaptorBusyError, RaptorTimeoutError
+from src.gtfs_bc.routing.gtfs_store import SERVICE_DAY_SECONDS, gtfs_store
+from src.gtfs_bc.routing.service_calendar import get_service_calendar
 
 
 # Load Asturias default platforms for FEVE metric gauge lines (C4-C8)
@@ -1472,46 +1479,40 @@ def get_stop_departures(
     now = datetime.now(MADRID_TZ)
     current_seconds = now.hour * 3600 + now.minute * 60 + now.second
     today = now.date()
-    weekday = today.weekday()  # 0=Monday, 6=Sunday
-
-    # Map weekday to calendar column
-    weekday_columns = {
-        0: CalendarModel.monday,
-        1: CalendarModel.tuesday,
-        2: CalendarModel.wednesday,
-        3: CalendarModel.thursday,
-        4: CalendarModel.friday,
-        5: CalendarModel.saturday,
-        6: CalendarModel.sunday,
-    }
 
-    # Get active service IDs for today
-    # 1. Services from calendar that are active today
-    active_services_query = db.query(CalendarModel.service_id).filter(
-        CalendarModel.start_date <= today,
-        CalendarModel.end_date >= today,
-        weekday_columns[weekday].is_(True),
-    )
+    # Active service IDs for today and yesterday (precompiled calendar, no SQL)
+    # Yesterday's service day still runs after midnight: its trips with times
+    # >= 24:00:00 depart today at (time - 24h)
+    service_calendar = get_service_calendar(db)
+    active_service_ids = service_calendar.active_services(today)
+    previous_service_ids = service_calendar.active_services(today - timedelta(days=1))
 
-    # 2. Add exceptions (type 1 = added)
-    added_services = db.query(CalendarDateModel.service_id).filter(
-        CalendarDateModel.date == today,
-        CalendarDateModel.exception_type == 1,
-    )
+    if not active_service_ids and not previous_service_ids:
+        return []
 
-    # 3. Remove exceptions (type 2 = removed)
-    removed_services = db.query(CalendarDateModel.service_id).filter(
-        CalendarDateModel.date == today,
-        CalendarDateModel.exception_type == 2,
+    # Renfe keeps departures up to 5 min old to match them with delayed RT trains
+    min_departure_seconds = current_seconds - 300 if is_renfe and renfe_rt_data else current_seconds
+
+    # Today's trips from min_departure_seconds, or yesterday's past midnight
+    service_day_filter = or_(
+        and_(
+            TripModel.service_id.in_(active_service_ids),
+            StopTimeModel.departure_seconds >= min_departure_seconds,
+        ),
+        and_(
+            TripModel.service_id.in_(previous_service_ids),
+            StopTimeModel.departure_seconds >= min_departure_seconds + SERVICE_DAY_SECONDS,
+        ),
+    )
+    # Departure in today's clock (same rule as the filter: a row from
+    # yesterday's service day is taken as such when it qualifies)
+    effective_departure = case(
+        (and_(
+            TripModel.service_id.in_(previous_service_ids),
+            StopTimeModel.departure_seconds >= min_departure_seconds + SERVICE_DAY_SECONDS,
+        ), StopTimeModel.departure_seconds - SERVICE_DAY_SECONDS),
+        else_=StopTimeModel.departure_seconds,
     )
-
-    active_service_ids = set(
-        [s.service_id for s in active_services_query.all()] +
-        [s.service_id for s in added_services.all()]
-    ) - set([s.service_id for s in removed_services.all()])
-
-    if not active_service_ids:
-        return []
 
     # Query stop times with upcoming departures
     # Subquery to get the max stop_sequence for each trip (to filter out last stops)
@@ -1564,8 +1565,7 @@ def get_stop_departures(
             )
             .filter(
                 StopTimeModel.stop_id.in_(stop_ids_to_query),
-                StopTimeModel.departure_seconds >= (current_seconds - 300 if renfe_rt_data else current_seconds),
-                TripModel.service_id.in_(active_service_ids),
+                service_day_filter,
                 StopTimeModel.stop_sequence < max_sequence_subquery.c.max_seq,
             )
         )
@@ -1586,8 +1586,7 @@ def get_stop_departures(
             )
             .filter(
                 StopTimeModel.stop_id.in_(stop_ids_to_query),
-                StopTimeModel.departure_seconds >= current_seconds,
-                TripModel.service_id.in_(active_service_ids),
+                service_day_filter,
                 StopTimeModel.stop_sequence < max_sequence_subquery.c.max_seq,
             )
         )
@@ -1601,7 +1600,7 @@ def get_stop_departures(
 
     results = (
         query
-        .order_by(StopTimeModel.departure_seconds)
+        .order_by(effective_departure)
         .limit(query_limit)
         .all()
     )
@@ -1912,13 +1911,25 @@ def get_stop_departures(
 
     departures = []
     for stop_time, trip, route, trip_start_seconds in results:
+        # Departure in today's clock: rows from yesterday's service day
+        # (same rule as effective_departure in the query) go back 24h
+        departure_seconds = stop_time.departure_seconds
+        departure_time = stop_time.departure_time
+        if (trip.service_id in previous_service_ids
+                and departure_seconds >= min_departure_seconds + SERVICE_DAY_SECONDS):
+            departure_seconds -= SERVICE_DAY_SECONDS
+            departure_time = (f"{departure_seconds // 3600:02d}:{(departure_seconds % 3600) // 60:02d}:"
+                              f"{departure_seconds % 60:02d}")
+            if trip_start_seconds is not None:
+                trip_start_seconds -= SERVICE_DAY_SECONDS
+
         # Filter out static GTFS routes outside operating hours
         # Check if the DEPARTURE time is within operating hours (not current time)
         # This allows showing upcoming departures even if service hasn't started yet
-        if is_static_gtfs_route(route.id) and not is_route_operating(db, route.id, stop_time.departure_seconds, day_type):
+        if is_static_gtfs_route(route.id) and not is_route_operating(db, route.id, departure_seconds, day_type):
             continue
 
-        minutes_until = (stop_time.departure_seconds - current_seconds) // 60
+        minutes_until = (departure_seconds - current_seconds) // 60
 
         # Get delay: prefer stop-specific delay, fall back to trip delay
         delay_seconds = stop_delays.get(trip.id) or trip_delays.get(trip.id)
@@ -1937,7 +1948,7 @@ def get_stop_departures(
             static_headsign = trip.headsign or last_stop_names.get(trip.id)
             rt_match = _match_static_to_rt(
                 static_line=route_short,
-                static_departure_seconds=stop_time.departure_seconds,
+                static_departure_seconds=departure_seconds,
                 rt_by_line=renfe_rt_data['rt_by_line'],
                 used_rt_trips=renfe_used_rt_trips,
                 static_headsign=static_headsign,
@@ -1948,7 +1959,7 @@ def get_stop_departures(
                 renfe_used_rt_trips.add(rt_trip_id)  # Mark as used
 
                 # Calculate delay from difference between RT and scheduled time
-                delay_seconds = rt_arrival_seconds - stop_time.departure_seconds
+                delay_seconds = rt_arrival_seconds - departure_seconds
 
                 # Use RT platform if available
                 if rt_plat:
@@ -1965,7 +1976,7 @@ def get_stop_departures(
         # Standard delay handling (for non-Renfe or unmatched Renfe)
         elif delay_seconds is not None and delay_seconds != 0:
             is_delayed = delay_seconds > 60  # More than 1 minute delay
-            realtime_departure_seconds = stop_time.departure_seconds + delay_seconds
+            realtime_departure_seconds = departure_seconds + delay_seconds
             # Convert to HH:MM:SS format
             rt_hours = realtime_departure_seconds // 3600
             rt_minutes = (realtime_departure_seconds % 3600) // 60
@@ -2041,8 +2052,8 @@ def get_stop_departures(
                 route_short_name=route_short,
                 route_color=route.color,
                 headsign=headsign,
-                departure_time=stop_time.departure_time,
-                departure_seconds=stop_time.departure_seconds,
+                departure_time=departure_time,
+                departure_seconds=departure_seconds,
                 minutes_until=minutes_until,
                 stop_sequence=stop_time.stop_sequence,
                 platform=platform,
@@ -3119,17 +3130,33 @@ def get_stop_correspondences(
 @limiter.limit(RateLimits.ROUTE_PLANNER)
 def plan_route(
     request: Request,
-    from_stop: str = Query(..., alias="from", description="Origin stop ID"),
-    to_stop: str = Query(..., alias="to", description="Destination stop ID"),
+    from_stop: Optional[str] = Query(None, alias="from", description="Origin stop ID"),
+    to_stop: Optional[str] = Query(None, alias="to", description="Destination stop ID"),
+    from_lat: Optional[float] = Query(None, ge=-90, le=90, description="Origin latitude (instead of from)"),
+    from_lon: Optional[float] = Query(None, ge=-180, le=180, description="Origin longitude (instead of from)"),
+    to_lat: Optional[float] = Query(None, ge=-90, le=90, description="Destination latitude (instead of to)"),
+    to_lon: Optional[float] = Query(None, ge=-180, le=180, description="Destination longitude (instead of to)"),
     departure_time: Optional[str] = Query(
         None,
         description="Departure time in HH:MM format or ISO8601. Defaults to current time."
     ),
+    arrive_by: Optional[str] = Query(
+        None,
+        description="Arrive by this time (HH:MM or ISO8601) instead of departing at departure_time"
+    ),
     max_transfers: int = Query(3, ge=0, le=5, description="Maximum number of transfers allowed"),
     max_alternatives: int = Query(3, ge=1, le=5, description="Maximum number of alternative journeys to return"),
+    window_minutes: Optional[int] = Query(
+        None, ge=1, le=180,
+        description="Return every Pareto-optimal departure within this many minutes after departure_time"
+    ),
+    minimize_walking: bool = Query(
+        False,
+        description="Also treat walking time as a criterion (McRAPTOR): may add slower alternatives that walk less"
+    ),
     db: Session = Depends(get_db),
 ):
-    """Plan a route between two stops using RAPTOR algorithm.
+    """Plan a route between two stops or points using RAPTOR algorithm.
 
     Returns Pareto-optimal journey alternatives, considering:
     - Direct routes on the same line
@@ -3138,7 +3165,9 @@ def plan_route(
     - Actual departure times from GTFS stop_times
 
     The algorithm returns up to `max_alternatives` Pareto-optimal journeys,
-    where each journey is not dominated by another in all criteria (time, transfers, walking).
+    where each journey is not dominated by another in arrival time and
+    transfers. With `minimize_walking=true` walking time is a third criterion
+    (McRAPTOR), so a journey that arrives later but walks less is also kept.
 
     Each journey includes:
     - Exact departure and arrival timestamps
@@ -3152,8 +3181,34 @@ def plan_route(
     GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004
     GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004&departure_time=08:30
     GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004&departure_time=08:30&max_alternatives=5
+    GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004&departure_time=08:00&window_minutes=60
+    GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004&minimize_walking=true
+    GET /gtfs/route-planner?from_lat=37.3891&from_lon=-5.9845&to=RENFE_43004
+    GET /gtfs/route-planner?from_lat=37.3891&from_lon=-5.9845&to_lat=37.3772&to_lon=-5.9869
+    GET /gtfs/route-planner?from=METRO_SEV_L1_E21&to=RENFE_43004&arrive_by=09:00
     ```
 
+    **Coordinates:** each end is either a stop (`from` / `to`) or a point
+    (`from_lat` + `from_lon` / `to_lat` + `to_lon`). A point starts (or ends)
+    the search at its nearest stops within walking distance, each with its
+    own walk, and the journey gets a walking segment from (or to) the point.
+
+    **Load:** queries run in a dedicated RAPTOR process pool when the GTFS
+    store is attached from a snapshot. When the pool already has its
+    maximum of queries in flight the endpoint answers 503 at once (with
+    Retry-After); a query that takes too long answers 504.
+
+    **Departure window:** with `window_minutes` the planner answers the whole
+    window in one range query (rRAPTOR) and returns, sorted by departure,
+    every journey that no other journey beats by leaving later, arriving
+    earlier and with no more transfers. `max_alternatives` does not apply.
+
+    **Arrive by:** with `arrive_by` the planner searches backwards from the
+    deadline in one pass (reverse RAPTOR) and returns the Pareto-optimal
+    journeys that arrive in time: each leaves as late as possible for its
+    number of transfers, latest departure first. Not combined with
+    `departure_time`, `window_minutes` or `minimize_walking`.
+
     **Use cases:**
     - Journey planning in mobile apps
     - 3D route animations with suggested_heading
@@ -3162,43 +3217,81 @@ def plan_route(
     """
     from datetime import date, time as dt_time
 
-    # Parse departure_time if provided
-    dep_time = None
-    if departure_time:
+    # Parse departure_time / arrive_by if provided
+    parsed_times = {}
+    for name, value in (("departure_time", departure_time), ("arrive_by", arrive_by)):
+        parsed_times[name] = None
+        if not value:
+            continue
         try:
             # Try HH:MM format first
-            if len(departure_time) == 5 and ":" in departure_time:
-                parts = departure_time.split(":")
-                dep_time = dt_time(int(parts[0]), int(parts[1]))
+            if len(value) == 5 and ":" in value:
+                parts = value.split(":")
+                parsed_times[name] = dt_time(int(parts[0]), int(parts[1]))
             else:
                 # Try ISO8601 parsing
                 from datetime import datetime as dt
-                parsed = dt.fromisoformat(departure_time.replace("Z", "+00:00"))
-                dep_time = parsed.time()
+                parsed = dt.fromisoformat(value.replace("Z", "+00:00"))
+                parsed_times[name] = parsed.time()
         except (ValueError, IndexError):
             return RoutePlannerResponse(
                 success=False,
-                message=f"Invalid departure_time format: {departure_time}. Use HH:MM or ISO8601."
+                message=f"Invalid {name} format: {value}. Use HH:MM or ISO8601."
+            )
+    dep_time = parsed_times["departure_time"]
+    arrival_time = parsed_times["arrive_by"]
+
+    if window_minutes and minimize_walking:
+        return RoutePlannerResponse(
+            success=False,
+            message="window_minutes and minimize_walking cannot be combined."
+        )
+    if arrival_time is not None and (dep_time is not None or window_minutes or minimize_walking):
+        return RoutePlannerResponse(
+            success=False,
+            message="arrive_by cannot be combined with departure_time, window_minutes or minimize_walking."
+        )
+
+    # Each end: a stop or a point
+    for name, stop_id, lat, lon in (("from", from_stop, from_lat, from_lon), ("to", to_stop, to_lat, to_lon)):
+        is_stop = stop_id is not None and lat is None and lon is None
+        is_point = stop_id is None and lat is not None and lon is not None
+        if not (is_stop or is_point):
+            return RoutePlannerResponse(
+                success=False,
+                message=f"Give either {name} or both {name}_lat and {name}_lon."
             )
 
     # Resolve station IDs to platform IDs (for networks like Metro Bilbao)
     # This handles cases where users search by station (METRO_BILBAO_7) but
     # stop_times reference platforms (METRO_BILBAO_7.0)
-    real_origins = resolve_stop_to_platforms(from_stop)
-    real_destinations = resolve_stop_to_platforms(to_stop)
+    real_origins = resolve_stop_to_platforms(from_stop) if from_stop is not None else None
+    real_destinations = resolve_stop_to_platforms(to_stop) if to_stop is not None else None
 
     # Initialize RAPTOR service
     raptor_service = RaptorService(db)
 
     # Plan journey (passing lists for multi-platform support)
-    result = raptor_service.plan_journey(
-        origin_stop_id=real_origins,
-        destination_stop_id=real_destinations,
-        departure_time=dep_time,
-        travel_date=date.today(),
-        max_transfers=max_transfers,
-        max_alternatives=max_alternatives
-    )
+    try:
+        result = raptor_service.plan_journey(
+            origin_stop_id=real_origins,
+            destination_stop_id=real_destinations,
+            departure_time=dep_time,
+            travel_date=date.today(),
+            max_transfers=max_transfers,
+            max_alternatives=max_alternatives,
+            window_minutes=window_minutes,
+            minimize_walking=minimize_walking,
+            from_lat=from_lat,
+            from_lon=from_lon,
+            to_lat=to_lat,
+            to_lon=to_lon,
+            arrival_time=arrival_time
+        )
+    except RaptorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except RaptorTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
     # Convert to response schema
     journeys = []
@@ -3251,3 +3344,188 @@ def plan_route(
         journeys=journeys,
         alerts=alerts
     )
+
+
+@router.get("/isochrone", response_model=IsochroneResponse)
+@limiter.limit(RateLimits.ROUTE_PLANNER)
+def get_isochrone(
+    request: Request,
+    from_stop: Optional[str] = Query(None, alias="from", description="Origin stop ID"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Origin latitude (instead of from)"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Origin longitude (instead of from)"),
+    departure_time: Optional[str] = Query(
+        None,
+        description="Departure time in HH:MM format or ISO8601. Defaults to current time."
+    ),
+    max_minutes: int = Query(60, ge=5, le=120, description="Travel time budget in minutes"),
+    max_transfers: int = Query(3, ge=0, le=5, description="Maximum number of transfers allowed"),
+    contours: Optional[str] = Query(
+        None,
+        description="Comma-separated budgets to draw as GeoJSON contours, e.g. 30,45,60"
+    ),
+    db: Session = Depends(get_db),
+):
+    """Every stop reachable from a stop or a point within a time budget.
+
+    Runs a one-to-all RAPTOR (no destination) bounded by `max_minutes` and
+    returns each reachable stop with its earliest arrival and the transfers
+    needed, sorted by arrival. With a coordinate origin, the stops within
+    walking distance of the point are the origins, each with its walk.
+
+    The departure is rounded down to a 5-minute bucket; runs are cached
+    per origin, bucket and date until the GTFS data is reloaded.
+
+    With `contours` the response also carries a GeoJSON FeatureCollection:
+    for each budget, a MultiPolygon with a walking circle around every stop
+    reached in time (radius = time left at walking speed, max 500 m).
+
+    **Example requests:**
+    ```
+    GET /gtfs/isochrone?from=RENFE_18000&max_minutes=45
+    GET /gtfs/isochrone?from=RENFE_18000&departure_time=08:00&contours=30,45,60
+    GET /gtfs/isochrone?lat=40.4168&lon=-3.7038&max_minutes=30
+    ```
+    """
+    from datetime import date, time as dt_time
+
+    if (from_stop is None) == (lat is None or lon is None):
+        return IsochroneResponse(
+            success=False,
+            message="Provide either from or both lat and lon.",
+            max_minutes=max_minutes
+        )
+
+    dep_time = None
+    if departure_time:
+        try:
+            if len(departure_time) == 5 and ":" in departure_time:
+                parts = departure_time.split(":")
+                dep_time = dt_time(int(parts[0]), int(parts[1]))
+            else:
+                from datetime import datetime as dt
+                dep_time = dt.fromisoformat(departure_time.replace("Z", "+00:00")).time()
+        except (ValueError, IndexError):
+            return IsochroneResponse(
+                success=False,
+                message=f"Invalid departure_time format: {departure_time}. Use HH:MM or ISO8601.",
+                max_minutes=max_minutes
+            )
+
+    contour_minutes = None
+    if contours:
+        try:
+            contour_minutes = [int(m) for m in contours.split(",") if m.strip()]
+        except ValueError:
+            return IsochroneResponse(
+                success=False,
+                message=f"Invalid contours: {contours}. Use comma-separated minutes, e.g. 30,45,60.",
+                max_minutes=max_minutes
+            )
+
+    try:
+        result = RaptorService(db).plan_isochrone(
+            origin_stop_id=resolve_stop_to_platforms(from_stop) if from_stop else None,
+            lat=lat,
+            lon=lon,
+            departure_time=dep_time,
+            travel_date=date.today(),
+            max_minutes=max_minutes,
+            max_transfers=max_transfers,
+            contour_minutes=contour_minutes
+        )
+    except RaptorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except RaptorTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    return IsochroneResponse(
+        success=result["success"],
+        message=result.get("message"),
+        departure=result.get("departure"),
+        max_minutes=max_minutes,
+        stops=[IsochroneStopResponse(**stop) for stop in result["stops"]],
+        contours=result.get("contours")
+    )
+
+
+@router.post("/travel-time-matrix")
+@limiter.limit(RateLimits.TRAVEL_MATRIX)
+def get_travel_time_matrix(
+    request: Request,
+    body: TravelTimeMatrixRequest,
+    x_api_key: str = Header(None, alias="X-API-Key"),
+):
+    """Station-to-station travel-time matrix, streamed as CSV or NDJSON.
+
+    Runs one one-to-all RAPTOR per origin (not one query per pair) and
+    streams the rows in origin order as they are computed. The rows are
+    spread across the worker's matrix pool (TRAVEL_MATRIX_WORKERS processes
+    that attach the store's snapshot); without a snapshot
+    (GTFS_STORE_SNAPSHOT_PATH), or with TRAVEL_MATRIX_MAX_CONCURRENT
+    matrices already running, it answers 503.
+
+    Cells are the travel time in minutes from `departure_time` (including
+    the wait for the first train) and the transfers; they are empty/null
+    when the destination is not reachable within `max_minutes`. Up to
+    1,000,000 cells per request. For larger or scheduled matrices use
+    `scripts/travel_time_matrix.py`.
+
+    - **csv**: `origin_id,destination_id,travel_minutes,transfers`, one line per cell
+    - **ndjson**: one object per origin with `travel_minutes` and `transfers` by destination
+
+    Requires an X-API-Key header with one of TRAVEL_MATRIX_API_KEYS.
+    """
+    from datetime import date, datetime as dt
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+    from src.gtfs_bc.routing.travel_matrix import (
+        FORMATTERS, MATRIX_MAX_CELLS, MatrixBusyError, MatrixQuery, travel_matrix_pool,
+    )
+
+    api_keys = [key.strip() for key in settings.TRAVEL_MATRIX_API_KEYS.split(",") if key.strip()]
+    if not x_api_key or not api_keys:
+        raise HTTPException(status_code=401, detail="Unauthorized: Missing API key")
+    if not any(hmac.compare_digest(key, x_api_key) for key in api_keys):
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid API key")
+
+    if len(body.origins) * len(body.destinations) > MATRIX_MAX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Matrix too large: {len(body.origins)} x {len(body.destinations)} (max {MATRIX_MAX_CELLS:,} cells)"
+        )
+    try:
+        departure = dt.strptime(body.departure_time, "%H:%M").time()
+        travel_date = date.fromisoformat(body.date) if body.date else date.today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Use HH:MM for departure_time and YYYY-MM-DD for date")
+
+    store = GTFSStore.get_instance()
+    if not store.is_loaded:
+        raise HTTPException(status_code=503, detail="GTFS data is still loading")
+    # Worker processes need a snapshot to attach (forking a threaded uvicorn
+    # worker is not safe), and a whole matrix in the request threadpool
+    # would starve the other endpoints
+    if not travel_matrix_pool.accepts(store):
+        raise HTTPException(
+            status_code=503,
+            detail="Travel-time matrices need the GTFS store attached from a snapshot"
+        )
+
+    query = MatrixQuery(
+        origins=body.origins,
+        destinations=body.destinations,
+        departure_time=departure,
+        travel_date=travel_date,
+        max_minutes=body.max_minutes,
+        max_transfers=body.max_transfers,
+    )
+    try:
+        rows = travel_matrix_pool.rows(store, query)
+    except MatrixBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    formatter, media_type = FORMATTERS[body.format]
+    return StreamingResponse(
+        formatter(rows, body.destinations),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=travel_time_matrix.{body.format}"},
+    )
@@ -66,6 +66,9 @@ from .routing_schemas import (
     JourneyResponse,
     JourneyAlertResponse,
     RoutePlannerResponse,
+    IsochroneStopResponse,
+    IsochroneResponse,
+    TravelTimeMatrixRequest,
 )
 
 # Re-export JourneyAlertResponse for direct import
@@ -76,6 +79,9 @@ __all_routing__ = [
     "JourneyResponse",
     "JourneyAlertResponse",
     "RoutePlannerResponse",
+    "IsochroneStopResponse",
+    "IsochroneResponse",
+    "TravelTimeMatrixRequest",
 ]
 
 # Required schemas that must exist for the API to function
@@ -133,6 +139,9 @@ REQUIRED_SCHEMAS = [
     "JourneyResponse",
     "JourneyAlertResponse",
     "RoutePlannerResponse",
+    "IsochroneStopResponse",
+    "IsochroneResponse",
+    "TravelTimeMatrixRequest",
 ]
 
 # Export all required schemas
@@ -6,8 +6,8 @@ including multi-segment journeys with transfers.
 Updated: 2026-01-27 - RAPTOR implementation with Pareto-optimal alternatives
 """
 
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Literal, Optional, List
+from pydantic import BaseModel, Field
 
 
 class JourneyStopResponse(BaseModel):
@@ -119,6 +119,43 @@ class RoutePlannerResponse(BaseModel):
     alerts: List[JourneyAlertResponse] = []
 
 
+class IsochroneStopResponse(BaseModel):
+    """A stop reachable within the isochrone budget."""
+    id: str
+    name: str
+    lat: float
+    lon: float
+    arrival: str  # ISO8601 datetime (earliest arrival)
+    duration_minutes: int
+    transfers: int
+
+
+class IsochroneResponse(BaseModel):
+    """Response from the isochrone endpoint.
+
+    `stops` holds every stop reachable within `max_minutes`, sorted by
+    arrival. `contours` is a GeoJSON FeatureCollection (one MultiPolygon
+    per requested budget) when contours were requested.
+    """
+    success: bool
+    message: Optional[str] = None
+    departure: Optional[str] = None  # ISO8601 datetime (start of the time bucket)
+    max_minutes: int
+    stops: List[IsochroneStopResponse] = []
+    contours: Optional[dict] = None
+
+
+class TravelTimeMatrixRequest(BaseModel):
+    """Request body of the travel-time matrix endpoint."""
+    origins: List[str] = Field(..., min_length=1)
+    destinations: List[str] = Field(..., min_length=1)
+    departure_time: str = "08:00"  # HH:MM
+    date: Optional[str] = None  # YYYY-MM-DD, defaults to today
+    max_minutes: int = Field(120, ge=1, le=240)
+    max_transfers: int = Field(3, ge=0, le=5)
+    format: Literal["csv", "ndjson"] = "csv"
+
+
 # =============================================================================
 # LEGACY SCHEMAS - Kept for backwards compatibility during transition
 # =============================================================================
@@ -0,0 +1,27 @@
+"""add schedule relationship to trip updates
+
+Revision ID: 043
+Revises: 042
+Create Date: 2026-02-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '043'
+down_revision = '042'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add schedule_relationship (SCHEDULED, CANCELED...) to gtfs_rt_trip_updates."""
+    op.add_column('gtfs_rt_trip_updates',
+                  sa.Column('schedule_relationship', sa.String(20), nullable=True))
+
+
+def downgrade():
+    """Remove schedule_relationship."""
+    op.drop_column('gtfs_rt_trip_updates', 'schedule_relationship')
@@ -4,7 +4,7 @@ import hmac
 from dotenv import load_dotenv
 load_dotenv()  # Load .env file before importing settings
 
-from fastapi import FastAPI, BackgroundTasks, Header, HTTPException, Request
+from fastapi import FastAPI, BackgroundTasks, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from slowapi import _rate_limit_exceeded_handler
@@ -64,6 +64,11 @@ def create_app() -> FastAPI:
         """
         from fastapi.responses import JSONResponse
         from src.gtfs_bc.routing.gtfs_store import GTFSStore
+        from src.gtfs_bc.routing.journey_cache import journey_cache
+        from src.gtfs_bc.routing.load_profile import rss_mb
+        from src.gtfs_bc.routing.raptor_executor import raptor_executor
+        from src.gtfs_bc.routing.realtime_overlay import realtime_overlay
+        from src.gtfs_bc.routing.travel_matrix import travel_matrix_pool
 
         store = GTFSStore.get_instance()
 
@@ -81,8 +86,57 @@ def create_app() -> FastAPI:
             "gtfs_store": {
                 "loaded": True,
                 "load_time_seconds": round(store.load_time_seconds, 1),
-                "stats": store.stats
-            }
+                "generation": store.generation,
+                "source": "snapshot" if store.snapshot_info else "database",
+                "stats": store.stats,
+                "load_profile": store.load_profile,
+                # Per-structure estimate: walking the store is not free, so it
+                # is computed on the first call per generation and cached
+                "memory": {
+                    "rss_mb": round(rss_mb(), 1),
+                    "estimate": store.memory_report(),
+                },
+            },
+            "raptor_executor": raptor_executor.status(),
+            "travel_matrix_pool": travel_matrix_pool.status(),
+            "journey_cache": journey_cache.status(),
+            "realtime_overlay": realtime_overlay.status(),
+        }
+
+    @app.get("/admin/gtfs-store/profile")
+    @limiter.limit(RateLimits.ADMIN_STATUS)
+    def gtfs_store_profile(
+        request: Request,
+        refresh: bool = Query(False, description="Recompute the memory estimate"),
+        x_admin_token: str = Header(None, alias="X-Admin-Token")
+    ):
+        """Load profile and memory breakdown of the current GTFS store.
+
+        Returns the per-phase timings of the last load (SQL vs Python build
+        time and rows per table) and an estimate of the bytes held by each
+        structure (stop_times, trips, patterns, transfers, ...). The memory
+        walk is computed once per store generation and cached.
+
+        Requires X-Admin-Token header for authentication.
+        """
+        if not x_admin_token or not settings.ADMIN_TOKEN:
+            raise HTTPException(status_code=401, detail="Unauthorized: Missing admin token")
+        if not hmac.compare_digest(settings.ADMIN_TOKEN, x_admin_token):
+            raise HTTPException(status_code=401, detail="Unauthorized: Invalid admin token")
+
+        from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+        store = GTFSStore.get_instance()
+        if not store.is_loaded:
+            raise HTTPException(status_code=503, detail="GTFS data is still loading")
+
+        return {
+            "generation": store.generation,
+            "source": "snapshot" if store.snapshot_info else "database",
+            "load_time_seconds": round(store.load_time_seconds, 3),
+            "load_profile": store.load_profile,
+            "memory": store.memory_report(refresh=refresh),
+            "snapshot": store.snapshot_info,
         }
 
     @app.post("/admin/reload-gtfs")
@@ -98,7 +152,10 @@ def create_app() -> FastAPI:
         The reload is done in a background task to not block the request.
 
         Note: During reload, the old data remains available for requests.
-        Once the new data is loaded, it atomically replaces the old data.
+        Once the new data is loaded, it atomically replaces the old data
+        (blue/green) and the store generation in /health is bumped.
+        With GTFS_STORE_SHARED the other workers pick up the rewritten
+        snapshot on their next snapshot check.
 
         Requires X-Admin-Token header for authentication.
         """
@@ -115,7 +172,11 @@ def create_app() -> FastAPI:
             db = SessionLocal()
             try:
                 store = GTFSStore.get_instance()
-                store.reload_data(db)
+                store.reload_data(
+                    db,
+                    snapshot_path=settings.GTFS_STORE_SNAPSHOT_PATH or None,
+                    shared=settings.GTFS_STORE_SHARED,
+                )
             finally:
                 db.close()
 
@@ -126,6 +187,57 @@ def create_app() -> FastAPI:
             "message": "GTFS data reload started in background"
         }
 
+    @app.post("/admin/refresh-gtfs")
+    @limiter.limit(RateLimits.ADMIN_RELOAD)
+    async def refresh_gtfs_operator(
+        request: Request,
+        background_tasks: BackgroundTasks,
+        prefix: str = Query(..., min_length=3, max_length=50, pattern=r"^[A-Za-z0-9_]+$",
+                            description="Operator ID prefix, e.g. METRO_GRANADA_ or RENFE_"),
+        x_admin_token: str = Header(None, alias="X-Admin-Token")
+    ):
+        """Refresh the in-memory GTFS data of a single operator.
+
+        Use after re-importing one operator: only the stops, routes, trips,
+        stop_times, patterns and transfers whose IDs start with the prefix
+        (trips by their route_id) are reloaded from the database; the rest
+        is copied from the current store. Like /admin/reload-gtfs, the new
+        data is published atomically as a new store generation.
+
+        Requires X-Admin-Token header for authentication.
+        """
+        if not x_admin_token or not settings.ADMIN_TOKEN:
+            raise HTTPException(status_code=401, detail="Unauthorized: Missing admin token")
+        if not hmac.compare_digest(settings.ADMIN_TOKEN, x_admin_token):
+            raise HTTPException(status_code=401, detail="Unauthorized: Invalid admin token")
+
+        from src.gtfs_bc.routing.gtfs_store import GTFSStore
+        from core.database import SessionLocal
+
+        if not GTFSStore.get_instance().is_loaded:
+            raise HTTPException(status_code=503, detail="GTFS data is still loading")
+
+        def do_refresh():
+            db = SessionLocal()
+            try:
+                store = GTFSStore.get_instance()
+                store.refresh_prefix(
+                    db,
+                    prefix,
+                    snapshot_path=settings.GTFS_STORE_SNAPSHOT_PATH or None,
+                    shared=settings.GTFS_STORE_SHARED,
+                )
+            finally:
+                db.close()
+
+        background_tasks.add_task(do_refresh)
+
+        return {
+            "status": "refresh_initiated",
+            "prefix": prefix,
+            "message": f"GTFS refresh for {prefix} started in background"
+        }
+
     return app
 
 
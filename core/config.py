@@ -46,6 +46,43 @@ class Settings(BaseSettings):
     # Groq AI
     GROQ_API_KEY: str = ""
 
+    # GTFSStore: snapshot binario para arranque rápido (vacío = desactivado)
+    GTFS_STORE_SNAPSHOT_PATH: str = "data/cache/gtfs_store.snapshot"
+    # Compartir el store entre workers: uno construye el snapshot y todos lo
+    # adjuntan en solo lectura (la RAM no crece con el número de workers)
+    GTFS_STORE_SHARED: bool = False
+    # Carga desde SQL en paralelo: conexiones simultáneas y rangos de trip_id
+    # en que se parte gtfs_stop_times (1 = carga secuencial)
+    GTFS_STORE_LOAD_WORKERS: int = 4
+    GTFS_STORE_STOP_TIMES_PARTITIONS: int = 4
+    # Prefijos de ruta (separados por comas) que RAPTOR recorre por
+    # frecuencias aunque tengan stop_times sintéticos, ej. "METRO_1,METRO_2"
+    # para los de generate_metro_madrid_trips.py: sus trips no se cargan
+    GTFS_STORE_FREQUENCY_ROUTE_PREFIXES: str = ""
+    # Matrices de tiempos de viaje: pool de procesos por worker de uvicorn,
+    # creados con la primera matriz, que adjuntan el snapshot (0 o sin store
+    # adjuntado = el endpoint responde 503), y matrices a la vez en el pool
+    # antes de responder 503
+    TRAVEL_MATRIX_WORKERS: int = 2
+    TRAVEL_MATRIX_MAX_CONCURRENT: int = 1
+    # Claves de API (separadas por comas, una por cliente) del endpoint de
+    # matrices, cabecera X-API-Key. Vacío = endpoint desactivado
+    TRAVEL_MATRIX_API_KEYS: str = ""
+    # Pool de procesos para RAPTOR (0 = en el propio worker, por defecto).
+    # Cada worker de uvicorn arranca los suyos; adjuntan el snapshot, así
+    # que solo se usa con el store adjuntado
+    RAPTOR_EXECUTOR_WORKERS: int = 0
+    # Consultas en vuelo (en cola o ejecutándose) antes de responder 503
+    RAPTOR_EXECUTOR_MAX_QUEUE: int = 16
+    # Tiempo máximo de espera por consulta antes de responder 504
+    RAPTOR_EXECUTOR_TIMEOUT_SECONDS: float = 10.0
+    # Caché de resultados de RAPTOR por origen/destino, minuto de salida y
+    # versión del store (0 = desactivada). Con URL de Redis la comparten
+    # todos los workers; vacía = en memoria por worker
+    JOURNEY_CACHE_SIZE: int = 2048
+    JOURNEY_CACHE_TTL_SECONDS: int = 60
+    JOURNEY_CACHE_REDIS_URL: str = ""
+
     # Auth settings (nested)
     auth: AuthSettings = AuthSettings()
 
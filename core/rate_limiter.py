@@ -57,8 +57,10 @@ class RateLimits:
 
     # Critical - computationally expensive
     ROUTE_PLANNER = "30/minute"      # RAPTOR algorithm
+    TRAVEL_MATRIX = "5/minute"       # One RAPTOR run per origin
     REALTIME_FETCH = "5/minute"      # External API calls
     ADMIN_RELOAD = "2/minute"        # Heavy operation
+    ADMIN_STATUS = "30/minute"       # Store profile / memory walk
 
     # High - database heavy
     DEPARTURES = "120/minute"        # Multiple JOINs, RT lookups
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark the RAPTOR solvers on the loaded GTFS network.
+
+Runs the same random queries (stop pairs and departure times, fixed seed)
+through the single-criterion RaptorAlgorithm and McRAPTOR and prints the
+latency percentiles, how many queries found a journey and how many
+journeys each solver returns, plus the mean work per query (rounds,
+patterns scanned, stops improved and pruned). RAPTOR is also run without
+target pruning, and McRAPTOR once per bag cap, so their cost can be
+compared. --min-km keeps only stop pairs at least that far apart (long
+cross-city queries, where pruning matters most). One-to-all isochrone
+runs (plan_isochrone) from the same origins are timed for each budget in
+--isochrone-minutes.
+
+Usage:
+    python scripts/benchmark_raptor.py [--queries 200] [--seed 1] [--date 2026-01-27]
+                                       [--max-transfers 3] [--bag-sizes 4,6,8] [--min-km 0]
+                                       [--isochrone-minutes 30,60]
+"""
+
+import sys
+import argparse
+import logging
+import random
+import statistics
+import time
+from datetime import date, time as dt_time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.config import settings
+from core.database import SessionLocal
+from src.gtfs_bc.eta.domain.value_objects.geo import haversine_distance
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_store() -> GTFSStore:
+    """Load the store (attaching the snapshot if one is configured)."""
+    GTFSStore.configure_loading(
+        settings.GTFS_STORE_LOAD_WORKERS, settings.GTFS_STORE_STOP_TIMES_PARTITIONS,
+        settings.GTFS_STORE_FREQUENCY_ROUTE_PREFIXES,
+    )
+    db = SessionLocal()
+    try:
+        store = GTFSStore.get_instance()
+        store.load_data(db, snapshot_path=settings.GTFS_STORE_SNAPSHOT_PATH or None)
+    finally:
+        db.close()
+    return GTFSStore.get_instance()
+
+
+def sample_queries(store: GTFSStore, count: int, seed: int, min_km: float = 0.0):
+    """Random (origin, destination, departure) triples between served stops.
+
+    Pairs closer than min_km are redrawn (bounded, so a small network with
+    no pair that far apart returns fewer queries).
+    """
+    rnd = random.Random(seed)
+    served = sorted(
+        stop_id for stop_id, stop_idx in store.stop_index.items()
+        if store.get_stop_patterns(stop_idx)
+    )
+    queries = []
+    for _ in range(count * 50):
+        if len(queries) == count:
+            break
+        origin, destination = rnd.sample(served, 2)
+        if min_km > 0:
+            _, lat1, lon1 = store.stops_info[origin]
+            _, lat2, lon2 = store.stops_info[destination]
+            if haversine_distance(lat1, lon1, lat2, lon2) < min_km * 1000:
+                continue
+        queries.append((origin, destination, dt_time(rnd.randint(6, 21), rnd.randint(0, 59))))
+    return queries
+
+
+def run(name: str, solver, queries, travel_date: date, max_transfers: int) -> None:
+    """Run every query through solver.plan and log a summary line."""
+    latencies = []
+    found = 0
+    journeys = 0
+    rounds = patterns = improved = pruned = 0
+    for origin, destination, departure in queries:
+        start = time.perf_counter()
+        result = solver.plan(origin, destination, departure, travel_date, max_transfers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += bool(result)
+        journeys += len(result)
+        rounds += solver.stats.rounds
+        patterns += solver.stats.patterns_scanned
+        improved += solver.stats.stops_improved
+        pruned += solver.stats.stops_pruned
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    logger.info(
+        f"{name:<22} mean {statistics.mean(latencies):7.1f} ms  p50 {statistics.median(latencies):7.1f} ms  "
+        f"p95 {p95:7.1f} ms  max {latencies[-1]:7.1f} ms  found {found}/{len(queries)}  "
+        f"journeys/query {journeys / len(queries):.2f}"
+    )
+    logger.info(
+        f"{'':<22} rounds {rounds / len(queries):.1f}  patterns {patterns / len(queries):.0f}  "
+        f"stops improved {improved / len(queries):.0f}  pruned {pruned / len(queries):.0f}"
+    )
+
+
+def run_isochrones(solver: RaptorAlgorithm, queries, travel_date: date, max_transfers: int, minutes: int) -> None:
+    """Run a one-to-all isochrone from every query origin and log a summary line."""
+    latencies = []
+    reached = 0
+    for origin, _, departure in queries:
+        start = time.perf_counter()
+        result = solver.plan_isochrone(origin, departure, travel_date, minutes, max_transfers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        reached += len(result)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    name = f"Isochrone ({minutes} min)"
+    logger.info(
+        f"{name:<22} mean {statistics.mean(latencies):7.1f} ms  p50 {statistics.median(latencies):7.1f} ms  "
+        f"p95 {p95:7.1f} ms  max {latencies[-1]:7.1f} ms  stops/query {reached / len(queries):.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAPTOR vs McRAPTOR")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random queries")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the queries")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="Travel date (YYYY-MM-DD)")
+    parser.add_argument("--max-transfers", type=int, default=3, help="Maximum transfers")
+    parser.add_argument("--bag-sizes", default="4,6,8", help="McRAPTOR bag caps to compare (comma separated)")
+    parser.add_argument("--min-km", type=float, default=0.0, help="Minimum origin-destination distance (km)")
+    parser.add_argument("--isochrone-minutes", default="30,60", help="Isochrone budgets to time (comma separated)")
+    args = parser.parse_args()
+
+    store = load_store()
+    queries = sample_queries(store, args.queries, args.seed, args.min_km)
+    if not queries:
+        logger.error(f"No stop pairs at least {args.min_km} km apart")
+        return
+    logger.info(f"{len(queries)} queries on {args.date} (max {args.max_transfers} transfers)")
+
+    run("RAPTOR", RaptorAlgorithm(store=store), queries, args.date, args.max_transfers)
+    run("RAPTOR (no pruning)", RaptorAlgorithm(store=store, target_pruning=False), queries,
+        args.date, args.max_transfers)
+    for bag_size in (int(size) for size in args.bag_sizes.split(",")):
+        solver = McRaptorAlgorithm(store=store, max_bag_size=bag_size, max_route_bag_size=bag_size)
+        run(f"McRAPTOR (bags {bag_size})", solver, queries, args.date, args.max_transfers)
+    for minutes in (int(m) for m in args.isochrone_minutes.split(",") if m):
+        run_isochrones(RaptorAlgorithm(store=store), queries, args.date, args.max_transfers, minutes)
+
+
+if __name__ == "__main__":
+    main()
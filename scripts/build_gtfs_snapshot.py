@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Build the GTFSStore snapshot outside the API workers.
+
+Loads the GTFS data from the database once and writes the binary snapshot
+that uvicorn workers attach read-only when GTFS_STORE_SHARED is enabled.
+Run it after a GTFS import (before restarting the API) so that no worker
+has to do the SQL load itself.
+
+Usage:
+    python scripts/build_gtfs_snapshot.py [--path data/cache/gtfs_store.snapshot] [--force]
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.config import settings
+from core.database import SessionLocal
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the GTFSStore snapshot")
+    parser.add_argument("--path", default=settings.GTFS_STORE_SNAPSHOT_PATH,
+                        help="Snapshot file (default: GTFS_STORE_SNAPSHOT_PATH)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild even if the snapshot matches the database")
+    args = parser.parse_args()
+
+    if not args.path:
+        logger.error("No snapshot path configured (GTFS_STORE_SNAPSHOT_PATH is empty)")
+        sys.exit(1)
+
+    GTFSStore.configure_loading(
+        settings.GTFS_STORE_LOAD_WORKERS, settings.GTFS_STORE_STOP_TIMES_PARTITIONS,
+        settings.GTFS_STORE_FREQUENCY_ROUTE_PREFIXES,
+    )
+
+    db = SessionLocal()
+    try:
+        store = GTFSStore.get_instance()
+        if args.force:
+            store = store.reload_data(db, snapshot_path=args.path, shared=True)
+        else:
+            store.load_data(db, snapshot_path=args.path, shared=True)
+    finally:
+        db.close()
+
+    if not store.snapshot_info:
+        logger.error(f"Snapshot could not be written to {args.path}")
+        sys.exit(1)
+
+    logger.info(f"Snapshot ready at {args.path} ({store.snapshot_info['size_bytes'] / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
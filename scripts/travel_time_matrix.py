@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Compute a station-to-station travel-time matrix.
+
+One one-to-all RAPTOR run per origin, spread across a process pool, with
+the rows streamed to a CSV or NDJSON file (or stdout) as they are ready.
+Origins and destinations are given as ID lists, files (one ID per line)
+or ID prefixes (every station of an operator).
+
+Usage:
+    python scripts/travel_time_matrix.py --origins-prefix METRO_MADRID_ --destinations-prefix RENFE_ \\
+        --departure 08:00 [--date 2026-01-27] [--max-minutes 120] [--max-transfers 3] \\
+        [--workers 4] [--format csv|ndjson] [--output matrix.csv]
+    python scripts/travel_time_matrix.py --origins METRO_SOL,METRO_ATOCHA --destinations-file stations.txt
+"""
+
+import sys
+import argparse
+import logging
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.config import settings
+from core.database import SessionLocal
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.travel_matrix import (
+    FORMATTERS,
+    MatrixQuery,
+    iter_travel_matrix,
+    stations_with_prefix,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_store() -> GTFSStore:
+    """Load the store (attaching the snapshot if one is configured)."""
+    GTFSStore.configure_loading(
+        settings.GTFS_STORE_LOAD_WORKERS, settings.GTFS_STORE_STOP_TIMES_PARTITIONS,
+        settings.GTFS_STORE_FREQUENCY_ROUTE_PREFIXES,
+    )
+    db = SessionLocal()
+    try:
+        store = GTFSStore.get_instance()
+        store.load_data(db, snapshot_path=settings.GTFS_STORE_SNAPSHOT_PATH or None)
+    finally:
+        db.close()
+    return GTFSStore.get_instance()
+
+
+def select_stops(store: GTFSStore, ids: Optional[str], path: Optional[str], prefix: Optional[str]) -> List[str]:
+    """Stops from a comma-separated list, a file or an ID prefix."""
+    if ids:
+        return [s.strip() for s in ids.split(",") if s.strip()]
+    if path:
+        with open(path, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    if prefix:
+        return stations_with_prefix(store, prefix)
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute a travel-time matrix with RAPTOR")
+    for side in ("origins", "destinations"):
+        parser.add_argument(f"--{side}", help=f"Comma-separated {side} (stop or station IDs)")
+        parser.add_argument(f"--{side}-file", help=f"File with one {side[:-1]} ID per line")
+        parser.add_argument(f"--{side}-prefix", help="Every station whose ID starts with this prefix")
+    parser.add_argument("--departure", default="08:00", help="Departure time (HH:MM)")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="Travel date (YYYY-MM-DD)")
+    parser.add_argument("--max-minutes", type=int, default=120, help="Travel time budget (longer = empty cell)")
+    parser.add_argument("--max-transfers", type=int, default=3, help="Maximum transfers")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--format", choices=sorted(FORMATTERS), default="csv", help="Output format")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    store = load_store()
+    origins = select_stops(store, args.origins, args.origins_file, args.origins_prefix)
+    destinations = select_stops(store, args.destinations, args.destinations_file, args.destinations_prefix)
+    if not origins or not destinations:
+        logger.error("No origins or destinations selected")
+        sys.exit(1)
+
+    query = MatrixQuery(
+        origins=origins,
+        destinations=destinations,
+        departure_time=datetime.strptime(args.departure, "%H:%M").time(),
+        travel_date=args.date,
+        max_minutes=args.max_minutes,
+        max_transfers=args.max_transfers,
+    )
+    snapshot_path = store.snapshot_info["path"] if store.snapshot_info else None
+    logger.info(f"{len(origins)} x {len(destinations)} matrix on {args.date} at {args.departure} "
+                f"({args.workers} workers, {'snapshot' if snapshot_path else 'fork'})")
+
+    formatter, _ = FORMATTERS[args.format]
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        for chunk in formatter(iter_travel_matrix(query, args.workers, snapshot_path), destinations):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    logger.info(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,7 @@ class TripUpdate:
     stop_time_updates: List[StopTimeUpdate] = field(default_factory=list)
     vehicle_id: Optional[str] = None
     wheelchair_accessible: Optional[bool] = None
+    schedule_relationship: Optional[str] = None  # SCHEDULED, CANCELED, ADDED...
 
     @classmethod
     def from_gtfsrt_json(cls, entity: dict) -> "TripUpdate":
@@ -74,6 +75,7 @@ class TripUpdate:
             stop_time_updates=stop_time_updates,
             vehicle_id=vehicle.get("id"),
             wheelchair_accessible=wheelchair_accessible,
+            schedule_relationship=trip.get("scheduleRelationship"),
         )
 
     @property
@@ -85,3 +87,8 @@ class TripUpdate:
     def is_delayed(self) -> bool:
         """Check if trip is delayed (more than 1 minute)."""
         return self.delay > 60
+
+    @property
+    def is_cancelled(self) -> bool:
+        """Check if the trip was cancelled."""
+        return self.schedule_relationship == "CANCELED"
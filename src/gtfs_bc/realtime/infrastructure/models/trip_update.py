@@ -15,6 +15,7 @@ class TripUpdateModel(Base):
     delay = Column(Integer, nullable=False, default=0)  # Delay in seconds
     vehicle_id = Column(String(50), nullable=True)
     wheelchair_accessible = Column(Boolean, nullable=True)
+    schedule_relationship = Column(String(20), nullable=True)  # SCHEDULED, CANCELED, ADDED...
     timestamp = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
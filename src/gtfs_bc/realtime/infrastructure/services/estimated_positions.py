@@ -13,6 +13,8 @@ from zoneinfo import ZoneInfo
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from src.gtfs_bc.routing.service_calendar import get_service_calendar
+
 # Madrid timezone for all time calculations
 MADRID_TZ = ZoneInfo("Europe/Madrid")
 
@@ -51,39 +53,11 @@ class EstimatedPositionsService:
         self.db = db
 
     def get_active_service_ids(self, target_date: date) -> List[str]:
-        """Get service_ids active on the given date."""
-        weekday = target_date.weekday()
-        day_columns = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_column = day_columns[weekday]
-
-        # Get regular calendar services
-        query = text(f"""
-            SELECT service_id FROM gtfs_calendar
-            WHERE {day_column} = true
-            AND start_date <= :target_date
-            AND end_date >= :target_date
-        """)
-        regular_services = [row[0] for row in self.db.execute(query, {"target_date": target_date}).fetchall()]
-
-        # Check for calendar_dates exceptions
-        # exception_type = 1 means service added, 2 means service removed
-        added_query = text("""
-            SELECT service_id FROM gtfs_calendar_dates
-            WHERE date = :target_date AND exception_type = 1
-        """)
-        added_services = [row[0] for row in self.db.execute(added_query, {"target_date": target_date}).fetchall()]
+        """Get service_ids active on the given date.
 
-        removed_query = text("""
-            SELECT service_id FROM gtfs_calendar_dates
-            WHERE date = :target_date AND exception_type = 2
-        """)
-        removed_services = set(row[0] for row in self.db.execute(removed_query, {"target_date": target_date}).fetchall())
-
-        # Combine: regular + added - removed
-        all_services = set(regular_services) | set(added_services)
-        active_services = [s for s in all_services if s not in removed_services]
-
-        return active_services
+        Uses the shared precompiled service calendar (no SQL per request).
+        """
+        return list(get_service_calendar(self.db).active_services(target_date))
 
     def get_estimated_positions(
         self,
@@ -350,6 +350,7 @@ class GTFSRealtimeFetcher:
             delay=tu.delay,
             vehicle_id=vehicle_id,
             wheelchair_accessible=tu.wheelchair_accessible,
+            schedule_relationship=tu.schedule_relationship,
             timestamp=tu.timestamp,
             updated_at=datetime.utcnow(),
         )
@@ -359,6 +360,7 @@ class GTFSRealtimeFetcher:
                 "delay": stmt.excluded.delay,
                 "vehicle_id": stmt.excluded.vehicle_id,
                 "wheelchair_accessible": stmt.excluded.wheelchair_accessible,
+                "schedule_relationship": stmt.excluded.schedule_relationship,
                 "timestamp": stmt.excluded.timestamp,
                 "updated_at": stmt.excluded.updated_at,
             },
@@ -5,7 +5,7 @@ GTFS-RT data at regular intervals.
 """
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 from contextlib import asynccontextmanager
 
@@ -160,6 +160,12 @@ class GTFSRTScheduler:
                 total_updates += op_result.get('trip_updates', 0)
                 total_alerts += op_result.get('alerts', 0)
 
+            # Refresh the delay overlay RAPTOR plans with
+            try:
+                self._refresh_delay_overlay(db)
+            except Exception as e:
+                logger.error(f"Realtime delay overlay refresh failed: {e}")
+
             return {
                 'vehicle_positions': total_positions,
                 'trip_updates': total_updates,
@@ -170,23 +176,108 @@ class GTFSRTScheduler:
         finally:
             db.close()
 
+    @staticmethod
+    def _refresh_delay_overlay(db: Session) -> None:
+        """Publish the trip updates of today's service to RAPTOR.
+
+        Only when they changed (the new version also changes the keys of
+        cached journeys and isochrones). The RAPTOR pool workers get them
+        through a file next to the snapshot.
+        """
+        from src.gtfs_bc.routing.gtfs_store import GTFSStore
+        from src.gtfs_bc.routing.realtime_overlay import load_updates, realtime_overlay, realtime_path
+        from src.gtfs_bc.routing.service_calendar import service_today
+
+        updates = load_updates(db, service_today())
+        if not realtime_overlay.publish(updates):
+            return
+        store = GTFSStore.get_instance()
+        if store.snapshot_info:
+            realtime_overlay.save(realtime_path(store.snapshot_info["path"]))
+        logger.info(f"Realtime delay overlay: {len(updates.trips)} trips (version {realtime_overlay.version})")
+
+
 
 # Global scheduler instance
 gtfs_rt_scheduler = GTFSRTScheduler()
 
 
 def _load_gtfs_store():
-    """Load GTFS data into memory store (synchronous)."""
+    """Load GTFS data into memory store (synchronous).
+
+    Uses the on-disk snapshot when its DB fingerprint still matches,
+    falling back to the full SQL load (which rewrites the snapshot).
+    With GTFS_STORE_SHARED only one worker builds it; the rest attach it.
+    """
+    from core.config import settings
     from src.gtfs_bc.routing.gtfs_store import GTFSStore
 
+    GTFSStore.configure_loading(
+        settings.GTFS_STORE_LOAD_WORKERS, settings.GTFS_STORE_STOP_TIMES_PARTITIONS,
+        settings.GTFS_STORE_FREQUENCY_ROUTE_PREFIXES,
+    )
+
     db = SessionLocal()
     try:
         store = GTFSStore.get_instance()
-        store.load_data(db)
+        store.load_data(
+            db,
+            snapshot_path=settings.GTFS_STORE_SNAPSHOT_PATH or None,
+            shared=settings.GTFS_STORE_SHARED,
+        )
     finally:
         db.close()
 
 
+# Interval for checking whether another worker rewrote the shared snapshot
+SNAPSHOT_SYNC_INTERVAL = 30
+
+
+async def _sync_shared_snapshot_loop(snapshot_path: str):
+    """Adopt snapshots rewritten by other workers (GTFS_STORE_SHARED mode).
+
+    A reload only runs in the worker that received the admin request; the
+    others publish a new store generation when the snapshot file changes.
+    """
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(SNAPSHOT_SYNC_INTERVAL)
+        try:
+            if await loop.run_in_executor(None, GTFSStore.sync_shared_snapshot, snapshot_path):
+                logger.info(f"GTFS store updated from shared snapshot (generation {GTFSStore.current_generation()})")
+        except Exception as e:
+            logger.error(f"GTFS snapshot sync error: {e}")
+
+
+# Seconds before midnight (Madrid) at which the service calendar rolls over
+CALENDAR_ROLLOVER_LEAD = 300
+
+
+async def _calendar_rollover_loop():
+    """Precompute tomorrow's service calendar shortly before midnight.
+
+    Active services for yesterday, today and tomorrow are always ready, so
+    the first requests of the new day never compute calendars.
+    """
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+    from src.gtfs_bc.routing.service_calendar import seconds_until_rollover, service_today
+
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(seconds_until_rollover(CALENDAR_ROLLOVER_LEAD))
+        try:
+            tomorrow = service_today() + timedelta(days=1)
+            store = GTFSStore.get_instance()
+            await loop.run_in_executor(None, store.roll_calendar, tomorrow)
+            logger.info(f"Service calendar rolled over to {tomorrow}")
+        except Exception as e:
+            logger.error(f"Service calendar rollover error: {e}")
+        # Avoid rolling twice if the timer fires slightly early
+        await asyncio.sleep(60)
+
+
 @asynccontextmanager
 async def lifespan_with_scheduler(app):
     """FastAPI lifespan context manager that starts/stops the scheduler.
@@ -199,6 +290,42 @@ async def lifespan_with_scheduler(app):
     await loop.run_in_executor(None, _load_gtfs_store)
     logger.info("GTFS data loaded successfully")
 
+    from core.config import settings
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+    from src.gtfs_bc.routing.journey_cache import journey_cache
+    from src.gtfs_bc.routing.raptor_executor import raptor_executor
+    from src.gtfs_bc.routing.travel_matrix import travel_matrix_pool
+
+    # RAPTOR off the GIL: the pool workers attach the same snapshot
+    store = GTFSStore.get_instance()
+    if settings.RAPTOR_EXECUTOR_WORKERS > 0 and store.snapshot_info:
+        raptor_executor.start(
+            store.snapshot_info["path"],
+            workers=settings.RAPTOR_EXECUTOR_WORKERS,
+            max_queue=settings.RAPTOR_EXECUTOR_MAX_QUEUE,
+            timeout_seconds=settings.RAPTOR_EXECUTOR_TIMEOUT_SECONDS,
+        )
+    if settings.TRAVEL_MATRIX_WORKERS > 0 and store.snapshot_info:
+        travel_matrix_pool.start(
+            store.snapshot_info["path"],
+            workers=settings.TRAVEL_MATRIX_WORKERS,
+            max_matrices=settings.TRAVEL_MATRIX_MAX_CONCURRENT,
+        )
+
+    journey_cache.configure(
+        max_size=settings.JOURNEY_CACHE_SIZE,
+        ttl_seconds=settings.JOURNEY_CACHE_TTL_SECONDS,
+        redis_url=settings.JOURNEY_CACHE_REDIS_URL,
+    )
+
+    snapshot_sync_task = None
+    if settings.GTFS_STORE_SHARED and settings.GTFS_STORE_SNAPSHOT_PATH:
+        snapshot_sync_task = asyncio.create_task(
+            _sync_shared_snapshot_loop(settings.GTFS_STORE_SNAPSHOT_PATH)
+        )
+
+    calendar_rollover_task = asyncio.create_task(_calendar_rollover_loop())
+
     # Start GTFS-RT scheduler
     await gtfs_rt_scheduler.start()
 
@@ -206,3 +333,16 @@ async def lifespan_with_scheduler(app):
 
     # Shutdown
     await gtfs_rt_scheduler.stop()
+    raptor_executor.shutdown()
+    travel_matrix_pool.shutdown()
+    calendar_rollover_task.cancel()
+    try:
+        await calendar_rollover_task
+    except asyncio.CancelledError:
+        pass
+    if snapshot_sync_task:
+        snapshot_sync_task.cancel()
+        try:
+            await snapshot_sync_task
+        except asyncio.CancelledError:
+            pass
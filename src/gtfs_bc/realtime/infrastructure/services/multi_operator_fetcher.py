@@ -544,6 +544,9 @@ class MultiOperatorFetcher:
                     delay=delay,
                     vehicle_id=f"{prefix}{tu.vehicle.id}" if tu.vehicle.id else None,
                     wheelchair_accessible=None,
+                    schedule_relationship=gtfs_realtime_pb2.TripDescriptor.ScheduleRelationship.Name(
+                        tu.trip.schedule_relationship
+                    ),
                     timestamp=datetime.fromtimestamp(tu.timestamp) if tu.timestamp else datetime.utcnow(),
                     updated_at=datetime.utcnow(),
                 )
@@ -552,6 +555,7 @@ class MultiOperatorFetcher:
                     set_={
                         "delay": stmt.excluded.delay,
                         "vehicle_id": stmt.excluded.vehicle_id,
+                        "schedule_relationship": stmt.excluded.schedule_relationship,
                         "timestamp": stmt.excluded.timestamp,
                         "updated_at": stmt.excluded.updated_at,
                     },
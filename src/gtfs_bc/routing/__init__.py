@@ -3,15 +3,19 @@
 Provides route planning between stops in the transit network.
 
 Available algorithms:
-- RaptorAlgorithm: RAPTOR-based (Pareto-optimal multi-criteria routing)
+- RaptorAlgorithm: RAPTOR-based (Pareto-optimal in arrival time and transfers)
+- McRaptorAlgorithm: McRAPTOR, adds walking time as a third criterion
 - RaptorService: High-level service wrapping RAPTOR for API use
+  (journeys and one-to-all isochrones)
+- travel_matrix: many-to-many travel times, one one-to-all run per origin
 
 Data stores:
 - GTFSStore: In-memory singleton for fast RAPTOR access
 """
 
 from .raptor import RaptorAlgorithm, Journey, JourneyLeg
+from .mc_raptor import McRaptorAlgorithm
 from .raptor_service import RaptorService
 from .gtfs_store import GTFSStore, gtfs_store
 
-__all__ = ["RaptorAlgorithm", "Journey", "JourneyLeg", "RaptorService", "GTFSStore", "gtfs_store"]
+__all__ = ["RaptorAlgorithm", "McRaptorAlgorithm", "Journey", "JourneyLeg", "RaptorService", "GTFSStore", "gtfs_store"]
@@ -4,91 +4,739 @@ Este módulo implementa un almacén de datos en RAM que se carga una sola vez
 al iniciar el servidor, eliminando las queries SQL de cada petición.
 
 Optimizaciones implementadas:
-- Tuplas nativas en lugar de objetos (menor memoria)
+- Almacenamiento columnar: stop_times en arrays planos array('i')
+  (stop_idx, arrival, departure) con offsets por trip, sin tuplas por fila
+- IDs enteros densos para paradas, trips, rutas, servicios y patterns
+- Trips de un mismo pattern contiguos y ordenados por salida, de modo que
+  sus stop_times forman una matriz trip x parada (row-major)
+- Patterns FIFO: si un trip adelanta a otro (non-FIFO) el pattern se parte
+  en cadenas FIFO, así las salidas de cada parada quedan ordenadas
+- Vista por fecha (PatternDayView): solo trips con servicio activo y salidas
+  por columnas de parada, para embarcar con búsqueda binaria O(log n)
 - sys.intern() para strings repetidos (20-30% menos RAM)
-- gc.freeze() para evitar overhead del GC
+- gc.freeze() en la primera carga para evitar overhead del GC
 - Raw SQL en lugar de ORM para carga rápida
-
-Uso de memoria estimado: ~300-400 MB para 260k trips / 2M stop_times
+- Snapshot binario en disco (store_snapshot.py): al arrancar se mapea con
+  mmap en vez de repetir las queries si la BD no ha cambiado
+- Modo compartido (shared=True): un solo proceso construye el snapshot y
+  todos los workers lo adjuntan en solo lectura, compartiendo las páginas
+- Calendario de servicios precompilado (service_calendar.py): servicios
+  activos de ayer, hoy y mañana precalculados y desplazados antes de
+  medianoche, sin SQL en las requests
+- Recarga blue/green: reload_data construye una instancia nueva aparte y la
+  publica con un swap atómico; cada instancia tiene un número de generación
+- Footpaths precalculados: cierre transitivo de los transbordos (andén →
+  acceso → andén) en arrays CSR por stop_idx, relajados de una vez en RAPTOR
+- Patterns por frecuencias: las líneas sin stop_times (solo
+  gtfs_route_frequencies) o con trips sintéticos (FREQUENCY_ROUTE_PREFIXES)
+  se guardan como un trip plantilla con los tiempos de recorrido más sus
+  ventanas de headway; RAPTOR calcula la siguiente salida con aritmética
+- Día de servicio anterior: vista de ayer desplazada -24 h
+  (get_previous_day_view) con los trips que siguen pasada la medianoche
+  (horas >= 24:00:00), para que RAPTOR los vea de madrugada sin SQL
+- Índice espacial de paradas (rejilla de STOP_GRID_CELL_DEGREES): paradas
+  cercanas a un punto sin el haversine de Postgres (get_stops_near)
+- Shapes en columnas (microgrados) con la posición de cada parada de los
+  patterns sobre su shape precalculada: la geometría de un tramo es un
+  slice (get_shape_segment), sin SQL ni proyecciones por request
+
+Uso de memoria estimado: ~100 MB para 260k trips / 2M stop_times
+(antes ~300-400 MB con Dict[str, List[Tuple[str, int, int]]])
 
 Author: Claude (Anthropic)
 Date: 2026-01-28
 """
 
+import contextlib
+import functools
 import gc
+import heapq
+import math
 import sys
 import time
 import threading
-from collections import defaultdict
-from datetime import date
-from typing import Dict, List, Set, Tuple, Optional, TYPE_CHECKING
+import uuid
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, List, Set, Tuple, Optional, TYPE_CHECKING
+
+from src.gtfs_bc.routing.load_profile import (
+    LoadProfile,
+    estimate_memory,
+    peak_rss_mb,
+    reset_peak_rss,
+    rss_mb,
+)
+from src.gtfs_bc.routing.service_calendar import (
+    CalendarExceptions,
+    CalendarRows,
+    ServiceCalendar,
+    load_calendar_data,
+)
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
 
+def _intern_id(ids: List[str], index: Dict[str, int], value: str) -> int:
+    """Obtener (o asignar) el índice denso de un ID string."""
+    idx = index.get(value)
+    if idx is None:
+        idx = len(ids)
+        ids.append(value)
+        index[value] = idx
+    return idx
+
+
+def _stream_rows(
+    db_session: 'Session',
+    query: str,
+    params: Dict[str, object],
+    chunk_rows: int,
+    record: Optional[Dict[str, float]] = None
+):
+    """Iterar un SELECT grande por bloques de chunk_rows filas.
+
+    Con psycopg2 stream_results usa un cursor con nombre (server-side):
+    el cliente nunca tiene más de un bloque en memoria, en lugar de todo
+    el resultado que bufferiza el cursor por defecto.
+
+    record: fase del LoadProfile donde sumar el tiempo de espera a la BD
+    (sin contar el tiempo que el consumidor tarda en procesar cada bloque).
+    """
+    from sqlalchemy import text
+
+    start = time.perf_counter()
+    result = db_session.execute(
+        text(query), params,
+        execution_options={'stream_results': True, 'yield_per': chunk_rows},
+    )
+    try:
+        chunks = result.partitions(chunk_rows)
+        while True:
+            rows = next(chunks, None)
+            if record is not None:
+                record['query_seconds'] += time.perf_counter() - start
+            if rows is None:
+                break
+            yield from rows
+            start = time.perf_counter()
+    finally:
+        result.close()
+
+
+def _execute(
+    db_session: 'Session',
+    query: str,
+    params: Dict[str, object],
+    record: Optional[Dict[str, float]] = None
+) -> list:
+    """Ejecutar un SELECT pequeño y devolver todas sus filas."""
+    from sqlalchemy import text
+
+    start = time.perf_counter()
+    rows = db_session.execute(text(query), params).fetchall()
+    if record is not None:
+        record['query_seconds'] += time.perf_counter() - start
+    return rows
+
+
+def _fetch_rows(db_session: 'Session', query: str, params: Dict[str, object], chunk_rows: int) -> List[tuple]:
+    """Leer un SELECT completo como lista de tuplas (para lecturas en paralelo)."""
+    return [tuple(row) for row in _stream_rows(db_session, query, params, chunk_rows)]
+
+
+class _StopTimesPart:
+    """Bloque de stop_times leído en otra conexión (un rango de trip_id).
+
+    Las paradas se numeran localmente (stop_ids[stops[i]]); el hilo
+    principal las traduce a índices globales al unir los bloques.
+    """
+
+    __slots__ = ('trip_ids', 'trip_ends', 'stop_ids', 'stops', 'arrivals', 'departures')
+
+    def __init__(self):
+        self.trip_ids: List[str] = []
+        # Fin (exclusivo) de los stop_times de cada trip dentro del bloque
+        self.trip_ends = array('i')
+        self.stop_ids: List[str] = []
+        self.stops = array('i')
+        self.arrivals = array('i')
+        self.departures = array('i')
+
+
+def _read_stop_times(
+    db_session: 'Session',
+    query: str,
+    params: Dict[str, object],
+    chunk_rows: int
+) -> _StopTimesPart:
+    """Leer un rango de stop_times en columnas compactas (sin filas en memoria)."""
+    part = _StopTimesPart()
+    local_index: Dict[str, int] = {}
+    stops = part.stops
+    current_trip_id = None
+
+    for row in _stream_rows(db_session, query, params, chunk_rows):
+        trip_id = row[0]
+        if trip_id != current_trip_id:
+            if current_trip_id is not None:
+                part.trip_ends.append(len(stops))
+            current_trip_id = trip_id
+            part.trip_ids.append(trip_id)
+        stop_local = local_index.get(row[1])
+        if stop_local is None:
+            stop_local = local_index[row[1]] = len(part.stop_ids)
+            part.stop_ids.append(row[1])
+        stops.append(stop_local)
+        part.arrivals.append(row[2] or 0)
+        part.departures.append(row[3] or 0)
+
+    if current_trip_id is not None:
+        part.trip_ends.append(len(stops))
+    return part
+
+
+class _ParallelFetch:
+    """Lecturas SQL independientes en paralelo, cada una con su conexión.
+
+    Cada tarea abre una Session propia sobre el engine de la sesión
+    principal (conexiones del pool) y devuelve datos ya leídos; el hilo
+    principal los aplica al store en orden fijo, así que el resultado es
+    el mismo que el de la carga secuencial.
+    """
+
+    def __init__(self, db_session: 'Session', workers: int):
+        self._db_session = db_session
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gtfs-load')
+        self._futures: Dict[str, Future] = {}
+        # Segundos que ha tardado cada tarea en su conexión
+        self.task_seconds: Dict[str, float] = {}
+
+    def submit(self, name: str, fn, *args) -> None:
+        """Programar fn(session, *args) bajo el nombre name."""
+        self._futures[name] = self._executor.submit(self._run, name, fn, args)
+
+    def result(self, name: str, record: Optional[Dict[str, float]] = None):
+        """Resultado de la tarea name (espera a que termine).
+
+        record: fase del LoadProfile donde sumar el tiempo de espera.
+        """
+        start = time.perf_counter()
+        value = self._futures.pop(name).result()
+        if record is not None:
+            record['wait_seconds'] += time.perf_counter() - start
+        return value
+
+    def _run(self, name: str, fn, args):
+        from sqlalchemy.orm import Session
+
+        start = time.perf_counter()
+        session = Session(bind=self._db_session.get_bind())
+        try:
+            return fn(session, *args)
+        finally:
+            session.close()
+            self.task_seconds[name] = time.perf_counter() - start
+
+    def __enter__(self) -> '_ParallelFetch':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _load_phase(name: str):
+    """Decorador: medir un método de carga como fase del LoadProfile activo."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Metros por grado de latitud (radio medio de la Tierra)
+METERS_PER_DEGREE = math.pi * 6371000 / 180
+
+
+def _distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia equirectangular: suficiente a distancias a pie."""
+    x = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = lat2 - lat1
+    return math.hypot(x, y) * METERS_PER_DEGREE
+
+
+# Duración de un día de servicio: desplazamiento de los trips del día
+# anterior con horas >= 24:00:00 vistos desde la fecha siguiente
+SERVICE_DAY_SECONDS = 86400
+
+# Días de la semana de cada day_type de gtfs_route_frequencies (bit 0 = lunes)
+FREQUENCY_DAY_TYPES = {
+    'weekday': 0b0001111,
+    'friday': 0b0010000,
+    'saturday': 0b0100000,
+    'sunday': 0b1000000,
+}
+
+
+def _time_seconds(value) -> int:
+    """Segundos desde medianoche de un TIME o de un 'HH:MM:SS' (admite 25:30:00)."""
+    if hasattr(value, 'hour'):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    parts = str(value).split(':')
+    return int(parts[0]) * 3600 + int(parts[1]) * 60 + (int(parts[2]) if len(parts) > 2 else 0)
+
+
+def _like_prefix(prefix: str) -> str:
+    """Patrón LIKE (con ESCAPE '\\') para IDs que empiezan por prefix."""
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class _RawTrips:
+    """Trips y stop_times tal como vienen de SQL, antes de agrupar en patterns."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.route = array('i')
+        self.service = array('i')
+        self.headsigns: List[Optional[str]] = []
+        # shape_id por índice crudo (solo los trips que tienen shape)
+        self.shapes: Dict[int, str] = {}
+        self.st_stop = array('i')
+        self.st_arrival = array('i')
+        self.st_departure = array('i')
+        # Rango [start, end) de cada trip en st_* (-1 si no tiene stop_times)
+        self.start = array('i')
+        self.end = array('i')
+        # 1 si el trip ya se ha añadido al store
+        self.assigned = bytearray()
+
+
+class PatternDayView:
+    """Vista de los patterns para una fecha: solo trips con servicio activo.
+
+    Se construye de forma perezosa pattern a pattern. Para cada pattern
+    guarda los trips activos (en orden FIFO) y sus salidas por columnas:
+
+        deps[p][stop_index * n + j] = salida del trip activo j en la parada
+
+    Como los patterns son FIFO, cada columna está ordenada y el embarque es
+    una búsqueda binaria sobre ella. starts[p][j] es el inicio de la fila
+    del trip activo j en st_arrival.
+
+    Los patterns por frecuencias no tienen trips activos: guardan las
+    ventanas de headway del día y el embarque es aritmético (next_run).
+
+    Para RAPTOR hacia atrás (llegar antes de una hora) se construye aparte,
+    también por pattern, el índice de llegadas por columnas
+    (arrival_columns): el último trip que llega a una parada antes de una
+    hora es una búsqueda binaria por la derecha sobre su columna.
+
+    Con shift > 0 es la vista del día de servicio anterior vista desde la
+    fecha de consulta (shift = SERVICE_DAY_SECONDS): solo los trips que
+    siguen circulando pasada la medianoche (horas >= 24:00:00), con salidas
+    y llegadas restando el shift. Al no poder restar sobre st_arrival, esta
+    vista guarda sus propias llegadas (arrivals) y starts[p][j] es el
+    inicio de la fila j en ellas. Las ventanas de headway (headways,
+    next_run, frequency_departures) van siempre en la hora de su propio día.
+
+    El store se guarda como weakref.proxy: el store cachea sus vistas
+    (_day_views) y una referencia fuerte formaría un ciclo que, con el
+    store congelado por gc.freeze(), no se liberaría nunca al retirar una
+    generación.
+    """
+
+    __slots__ = ('store', 'travel_date', 'service_mask', 'shift',
+                 '_trips', '_deps', '_starts', '_arrs', '_arr_cols', '_headways')
+
+    def __init__(self, store: 'GTFSStore', travel_date: date, service_mask: bytearray, shift: int = 0):
+        self.store = weakref.proxy(store)
+        self.travel_date = travel_date
+        self.service_mask = service_mask
+        self.shift = shift
+        n_patterns = len(store.pattern_ids)
+        self._trips: List[Optional[array]] = [None] * n_patterns
+        self._deps: List[Optional[array]] = [None] * n_patterns
+        self._starts: List[Optional[array]] = [None] * n_patterns
+        self._arrs: List[Optional[array]] = [None] * n_patterns
+        self._arr_cols: List[Optional[array]] = [None] * n_patterns
+        self._headways: Dict[int, Tuple[Tuple[int, int, int], ...]] = {}
+
+    def _build(self, pattern_idx: int) -> array:
+        """Construir la vista de un pattern (idempotente, sin lock)."""
+        store = self.store
+        mask = self.service_mask
+        trip_service = store.trip_service
+        first_trip = store.pattern_trip_offsets[pattern_idx]
+        end_trip = store.pattern_trip_offsets[pattern_idx + 1]
+        n_stops = store.pattern_stop_offsets[pattern_idx + 1] - store.pattern_stop_offsets[pattern_idx]
+        shift = self.shift
+        if store.is_frequency_pattern(pattern_idx):
+            first_trip = end_trip  # La plantilla no se embarca por búsqueda binaria
+        elif shift:
+            # FIFO: los trips que llegan al final después del shift son un sufijo
+            arrivals = store.st_arrival
+            offsets = store.trip_offsets
+            last = end_trip
+            while last > first_trip and arrivals[offsets[last - 1] + n_stops - 1] > shift:
+                last -= 1
+            first_trip = last
+        trips = array('i', [t for t in range(first_trip, end_trip) if mask[trip_service[t]]])
+
+        departures = store.st_departure
+        rows = [store.trip_offsets[t] for t in trips]
+        deps = array('i')
+        for stop_index in range(n_stops):
+            deps.extend([departures[start + stop_index] - shift for start in rows])
+
+        if shift:
+            arrivals = store.st_arrival
+            arrs = array('i')
+            for start in rows:
+                arrs.extend([arrivals[start + stop_index] - shift for stop_index in range(n_stops)])
+            self._arrs[pattern_idx] = arrs
+            starts = array('i', range(0, len(rows) * n_stops, n_stops))
+        else:
+            starts = array('i', rows)
+
+        self._deps[pattern_idx] = deps
+        self._starts[pattern_idx] = starts
+        self._trips[pattern_idx] = trips
+        return trips
+
+    def active_trips(self, pattern_idx: int) -> array:
+        """Índices de los trips activos del pattern, en orden de salida."""
+        trips = self._trips[pattern_idx]
+        return trips if trips is not None else self._build(pattern_idx)
+
+    def departures(self, pattern_idx: int) -> array:
+        """Salidas de los trips activos por columnas de parada (ver clase)."""
+        if self._trips[pattern_idx] is None:
+            self._build(pattern_idx)
+        return self._deps[pattern_idx]
+
+    def trip_starts(self, pattern_idx: int) -> array:
+        """Inicio de la fila de cada trip activo en st_arrival / st_departure."""
+        if self._trips[pattern_idx] is None:
+            self._build(pattern_idx)
+        return self._starts[pattern_idx]
+
+    def arrivals(self, pattern_idx: int) -> array:
+        """Llegadas por filas de los trips activos (st_arrival si no hay shift)."""
+        if not self.shift:
+            return self.store.st_arrival
+        if self._trips[pattern_idx] is None:
+            self._build(pattern_idx)
+        return self._arrs[pattern_idx]
+
+    def arrival_columns(self, pattern_idx: int) -> array:
+        """Llegadas de los trips activos por columnas de parada (como departures).
+
+        Cada columna está ordenada (FIFO): el último trip que llega a la
+        parada como tarde a una hora es bisect_right - 1 sobre ella.
+        """
+        cols = self._arr_cols[pattern_idx]
+        if cols is None:
+            store = self.store
+            n_stops = store.pattern_stop_offsets[pattern_idx + 1] - store.pattern_stop_offsets[pattern_idx]
+            self.active_trips(pattern_idx)
+            cols = self._arr_cols[pattern_idx] = self.by_columns(
+                self.arrivals(pattern_idx), self._starts[pattern_idx], n_stops
+            )
+        return cols
+
+    @staticmethod
+    def by_columns(rows: array, starts: array, n_stops: int) -> array:
+        """Pasar valores por filas de trip (rows[starts[j] + parada]) a columnas de parada."""
+        cols = array('i')
+        for stop_index in range(n_stops):
+            cols.extend([rows[start + stop_index] for start in starts])
+        return cols
+
+    def earliest_trip(self, pattern_idx: int, stop_index: int, min_departure: int) -> int:
+        """Primer trip activo que sale de la parada a partir de min_departure.
+
+        Complejidad: O(log n) con n = trips activos del pattern.
+
+        Returns:
+            Índice del trip, o -1 si no hay ninguno
+        """
+        trips = self._trips[pattern_idx]
+        if trips is None:
+            trips = self._build(pattern_idx)
+        n = len(trips)
+        lo = stop_index * n
+        pos = bisect_left(self._deps[pattern_idx], min_departure, lo, lo + n)
+        return trips[pos - lo] if pos < lo + n else -1
+
+    def headways(self, pattern_idx: int) -> Tuple[Tuple[int, int, int], ...]:
+        """Ventanas (inicio, fin, headway) de un pattern por frecuencias en la fecha."""
+        windows = self._headways.get(pattern_idx)
+        if windows is None:
+            store = self.store
+            day_bit = 1 << self.travel_date.weekday()
+            windows = self._headways[pattern_idx] = tuple(sorted(
+                (store.headway_start[w], store.headway_end[w], store.headway_secs[w])
+                for w in range(store.pattern_headway_offsets[pattern_idx],
+                               store.pattern_headway_offsets[pattern_idx + 1])
+                if store.headway_days[w] & day_bit
+            ))
+        return windows
+
+    def next_run(self, pattern_idx: int, stop_index: int, min_departure: int) -> int:
+        """Primera salida (desde la primera parada) de un pattern por frecuencias
+        que sale de la parada a partir de min_departure.
+
+        Complejidad: O(ventanas del día), sin recorrer salidas.
+
+        Returns:
+            Salida de la primera parada, o -1 si no hay ninguna
+        """
+        store = self.store
+        template_row = store.trip_offsets[store.pattern_trip_offsets[pattern_idx]]
+        earliest = min_departure - store.st_departure[template_row + stop_index]
+        best = -1
+        for start, end, headway in self.headways(pattern_idx):
+            if best >= 0 and start >= best:
+                break
+            if earliest <= start:
+                run = start
+            else:
+                run = start - (start - earliest) // headway * headway
+            if run < end and (best < 0 or run < best):
+                best = run
+        return best
+
+    def previous_run(self, pattern_idx: int, stop_index: int, max_arrival: int) -> int:
+        """Última salida (desde la primera parada) de un pattern por frecuencias
+        que llega a la parada como tarde a max_arrival (simétrico de next_run).
+
+        Returns:
+            Salida de la primera parada, o -1 si no hay ninguna
+        """
+        store = self.store
+        template_row = store.trip_offsets[store.pattern_trip_offsets[pattern_idx]]
+        latest = max_arrival - store.st_arrival[template_row + stop_index]
+        best = -1
+        for start, end, headway in self.headways(pattern_idx):
+            if latest < start:
+                break
+            last = start + (end - 1 - start) // headway * headway  # Última salida < end
+            run = min(last, start + (latest - start) // headway * headway)
+            if run > best:
+                best = run
+        return best
+
+    def frequency_departures(self, pattern_idx: int, stop_index: int, lo: int, hi: int) -> List[int]:
+        """Salidas de un pattern por frecuencias desde la parada en [lo, hi]."""
+        store = self.store
+        template_row = store.trip_offsets[store.pattern_trip_offsets[pattern_idx]]
+        offset = store.st_departure[template_row + stop_index]
+        departures = []
+        run = self.next_run(pattern_idx, stop_index, lo)
+        while 0 <= run and run + offset <= hi:
+            departures.append(run + offset)
+            run = self.next_run(pattern_idx, stop_index, run + offset + 1)
+        return departures
+
 
 class GTFSStore:
     """Singleton que mantiene datos GTFS en memoria para RAPTOR.
 
-    Estructuras optimizadas para acceso O(1) en el algoritmo.
-    Usa tipos nativos Python (dict, list, tuple) para minimizar memoria.
+    Estructuras columnar indexadas por enteros densos. Los IDs string solo
+    se usan en la frontera (API, accesores get_*); RAPTOR trabaja con los
+    índices y los arrays directamente.
 
     Thread-safe para lectura concurrente (múltiples requests).
-    Usa Lock para recargas seguras.
+    Una instancia cargada no se modifica: las recargas crean otra instancia
+    y la publican como GTFSStore._instance (ver reload_data).
     """
 
     _instance: Optional['GTFSStore'] = None
     _lock = threading.Lock()
+    # Serializa cargas y recargas (compartido entre generaciones)
+    _reload_lock = threading.Lock()
+    # Última generación publicada en este proceso
+    _generation = 0
+    # gc.freeze() solo en la primera carga del proceso: congelar cada
+    # recarga haría permanente la generación que sustituye
+    _gc_frozen = False
+    # Vistas por fecha que se mantienen en caché: ayer, hoy y mañana, más
+    # la vista del día anterior de cada una (get_previous_day_view)
+    DAY_VIEW_CACHE_SIZE = 6
+    # Filas por bloque al leer trips y stop_times con cursor server-side
+    LOAD_CHUNK_ROWS = 50_000
+    # Carga completa en paralelo: conexiones simultáneas y rangos de trip_id
+    # en que se parte stop_times (1 = carga secuencial en la sesión dada)
+    LOAD_WORKERS = 1
+    STOP_TIMES_PARTITIONS = 1
+    # Cierre transitivo de transbordos: duración máxima de un camino a pie
+    # de varios tramos (los transbordos directos se conservan siempre)
+    MAX_FOOTPATH_SECONDS = 900
+    # Lado de las celdas del índice espacial de paradas, en grados
+    # (~550 m de latitud, ~420 m de longitud en la península)
+    STOP_GRID_CELL_DEGREES = 0.005
+    # Distancia máxima de una parada a la shape de su pattern; si alguna
+    # queda más lejos la shape no corresponde y el pattern se queda sin ella
+    MAX_SHAPE_SNAP_METERS = 200
+    # Prefijos de ruta que se modelan solo por frecuencias aunque tengan
+    # stop_times (ej. los generados por generate_metro_madrid_trips.py): sus
+    # trips no se cargan. Las rutas sin stop_times se modelan siempre así
+    FREQUENCY_ROUTE_PREFIXES: Tuple[str, ...] = ()
+    # Perfil de las líneas por frecuencias (mismos valores que
+    # generate_metro_madrid_trips.py): recorrido entre paradas y parada
+    FREQUENCY_STATION_SECONDS = 120
+    FREQUENCY_DWELL_SECONDS = 30
+
+    # Campos que se vuelcan al snapshot binario (ver store_snapshot.py)
+    # Columnas: se escriben en crudo y se mapean con mmap al arrancar
+    SNAPSHOT_COLUMNS = (
+        'st_stop', 'st_arrival', 'st_departure', 'trip_offsets',
+        'trip_route', 'trip_service', 'trip_pattern',
+        'pattern_route', 'pattern_stop_offsets', 'pattern_stops', 'pattern_trip_offsets',
+        'pattern_headway_offsets', 'headway_start', 'headway_end', 'headway_secs', 'headway_days',
+        'footpath_offsets', 'footpath_to', 'footpath_seconds',
+        'footpath_in_offsets', 'footpath_from', 'footpath_in_seconds',
+        'shape_point_offsets', 'shape_lat', 'shape_lon', 'pattern_shape', 'pattern_stop_shape_pos',
+    )
+    # Listas de strings por trip: se guardan como tablas mapeadas
+    # {lista: atributo del índice {id: idx} o None si no se indexa}
+    SNAPSHOT_STRINGS = {
+        'trip_ids': 'trip_index',
+        'trip_headsigns': None,
+    }
+    # Objetos Python: van en la sección pickle del snapshot
+    SNAPSHOT_OBJECTS = (
+        'stop_ids', 'route_ids', 'service_ids', 'pattern_ids',
+        'patterns_at_stop', 'transfers', 'stops_info',
+        'routes_info', 'children_by_parent', 'service_calendars',
+        'calendar_exceptions', 'stats', 'load_profile', 'stop_grid', 'shape_ids',
+    )
 
     def __init__(self):
-        # ===== ESTRUCTURAS PARA RAPTOR (PATTERNS) =====
-
-        # 1. Trips agrupados por PATTERN (secuencia unica de paradas)
-        # {pattern_id: [(departure_seconds, trip_id), ...]} ordenado por departure
-        self.trips_by_pattern: Dict[str, List[Tuple[int, str]]] = {}
-
-        # 2. Secuencia de paradas de cada pattern
-        # {pattern_id: [stop_id, stop_id, ...]}
-        self.stops_by_pattern: Dict[str, List[str]] = {}
+        # ===== ÍNDICES DENSOS (ID string <-> int) =====
+        # {lista[idx] = id} y {id: idx}
+        self.stop_ids: List[str] = []
+        self.stop_index: Dict[str, int] = {}
+        self.route_ids: List[str] = []
+        self.route_index: Dict[str, int] = {}
+        self.trip_ids: List[str] = []
+        self.trip_index: Dict[str, int] = {}
+        self.service_ids: List[str] = []
+        self.service_index: Dict[str, int] = {}
+        self.pattern_ids: List[str] = []
+        self.pattern_index: Dict[str, int] = {}
+        self.shape_ids: List[str] = []
+        self.shape_index: Dict[str, int] = {}
+
+        # ===== STOP_TIMES COLUMNARES =====
+
+        # 1. Columnas planas de stop_times, ordenadas por (trip, sequence)
+        # Los trips de un pattern son contiguos, así que para un pattern con
+        # n paradas el stop_time (trip t, parada i) está en
+        # trip_offsets[t] + i
+        self.st_stop = array('i')
+        self.st_arrival = array('i')
+        self.st_departure = array('i')
+
+        # 2. Offsets por trip: stop_times de t en [trip_offsets[t], trip_offsets[t + 1])
+        self.trip_offsets = array('i', [0])
+
+        # 3. Columnas por trip
+        self.trip_route = array('i')
+        self.trip_service = array('i')
+        self.trip_pattern = array('i')  # -1 si el trip no tiene stop_times
+        self.trip_headsigns: List[Optional[str]] = []
 
-        # 3. Indice inverso: que patterns pasan por cada parada
-        # {stop_id: {pattern_id, pattern_id, ...}}
-        self.patterns_by_stop: Dict[str, Set[str]] = defaultdict(set)
-
-        # 4. Stop times por trip (necesario para buscar horarios exactos)
-        # {trip_id: [(stop_id, arrival_sec, departure_sec), ...]} ordenado por sequence
-        self.stop_times_by_trip: Dict[str, List[Tuple[str, int, int]]] = {}
+        # ===== ESTRUCTURAS PARA RAPTOR (PATTERNS) =====
 
-        # 5. Transbordos (footpaths)
+        # 4. Secuencia de paradas de cada pattern (secuencia unica de paradas)
+        # paradas de p en pattern_stops[pattern_stop_offsets[p]:pattern_stop_offsets[p + 1]]
+        self.pattern_route = array('i')
+        self.pattern_stop_offsets = array('i', [0])
+        self.pattern_stops = array('i')
+
+        # 5. Trips de cada pattern: rango contiguo de índices de trip
+        # [pattern_trip_offsets[p], pattern_trip_offsets[p + 1]) ordenado por salida
+        self.pattern_trip_offsets = array('i', [0])
+
+        # 5b. Patterns por frecuencias: un solo trip (la plantilla, con
+        # stop_times relativos a la salida de la primera parada) y ventanas
+        # de headway en [pattern_headway_offsets[p], pattern_headway_offsets[p + 1]).
+        # Cada ventana sale de la primera parada en headway_start,
+        # + headway_secs, ... mientras sea < headway_end, los días de la
+        # semana de headway_days (bit 0 = lunes). Sin ventanas = pattern normal
+        self.pattern_headway_offsets = array('i', [0])
+        self.headway_start = array('i')
+        self.headway_end = array('i')
+        self.headway_secs = array('i')
+        self.headway_days = array('i')
+
+        # 6. Indice inverso: que patterns pasan por cada parada
+        # patterns_at_stop[stop_idx] = (pattern_idx, ...)
+        self.patterns_at_stop: List[Tuple[int, ...]] = []
+
+        # 7. Transbordos (footpaths)
         # {from_stop_id: [(to_stop_id, walk_seconds), ...]}
         self.transfers: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
 
-        # ===== ESTRUCTURAS AUXILIARES =====
+        # 7b. Footpaths para RAPTOR: cierre transitivo de transfers por stop_idx
+        # destinos de s en footpath_to[footpath_offsets[s]:footpath_offsets[s + 1]],
+        # con la duración del camino a pie más corto en footpath_seconds
+        self.footpath_offsets = array('i', [0])
+        self.footpath_to = array('i')
+        self.footpath_seconds = array('i')
+
+        # 7c. Los mismos footpaths por parada de llegada, para RAPTOR hacia
+        # atrás: orígenes de s en footpath_from[footpath_in_offsets[s]:...]
+        self.footpath_in_offsets = array('i', [0])
+        self.footpath_from = array('i')
+        self.footpath_in_seconds = array('i')
+
+        # 7d. Shapes de los patterns (geometría de los tramos en la respuesta)
+        # puntos de la shape h en shape_lat/shape_lon[shape_point_offsets[h]:shape_point_offsets[h + 1]],
+        # en microgrados. pattern_shape[p] = shape del primer trip de p (-1 si
+        # no tiene) y pattern_stop_shape_pos, paralelo a pattern_stops, el
+        # índice del punto donde empieza el tramo de la shape sobre el que se
+        # proyecta cada parada (-1 si el pattern no tiene shape utilizable)
+        self.shape_point_offsets = array('i', [0])
+        self.shape_lat = array('i')
+        self.shape_lon = array('i')
+        self.pattern_shape = array('i')
+        self.pattern_stop_shape_pos = array('i')
 
-        # 6. Info de trips para reconstrucción de ruta
-        # {trip_id: (route_id, headsign, service_id)} - tupla para menor memoria
-        self.trips_info: Dict[str, Tuple[str, Optional[str], str]] = {}
+        # ===== ESTRUCTURAS AUXILIARES =====
 
-        # 7. Info de paradas para respuesta API
+        # 8. Info de paradas para respuesta API
         # {stop_id: (name, lat, lon)} - tupla para menor memoria
         self.stops_info: Dict[str, Tuple[str, float, float]] = {}
 
-        # 8. Info de rutas para respuesta API
+        # 8b. Índice espacial: paradas con patterns o footpaths por celda
+        # {(floor(lat / celda), floor(lon / celda)): array de stop_idx}
+        self.stop_grid: Dict[Tuple[int, int], array] = {}
+
+        # 9. Info de rutas para respuesta API
         # {route_id: (short_name, color, route_type)}
         self.routes_info: Dict[str, Tuple[str, Optional[str], int]] = {}
 
-        # 9. Calendarios activos por día de semana
-        # {'monday': {service_id, ...}, 'tuesday': {...}, ...}
-        self.services_by_weekday: Dict[str, Set[str]] = {
-            'monday': set(), 'tuesday': set(), 'wednesday': set(),
-            'thursday': set(), 'friday': set(), 'saturday': set(), 'sunday': set()
-        }
+        # 10. Calendarios completos (gtfs_calendar)
+        # {service_id: (bits de días de la semana, start_date, end_date)}
+        self.service_calendars: CalendarRows = {}
+
+        # 11. Excepciones de calendario (calendar_dates)
+        # {fecha: (servicios añadidos, servicios eliminados)}
+        self.calendar_exceptions: CalendarExceptions = {}
 
-        # 10. Excepciones de calendario (calendar_dates)
-        # {date_str: {'added': {service_ids}, 'removed': {service_ids}}}
-        self.calendar_exceptions: Dict[str, Dict[str, Set[str]]] = {}
+        # Servicios activos precalculados por fecha (ver service_calendar.py)
+        self.calendar = ServiceCalendar(self.service_calendars, self.calendar_exceptions)
 
-        # 11. Hijos por padre (para resolver estaciones -> andenes)
+        # 12. Hijos por padre (para resolver estaciones -> andenes)
         # {parent_station_id: [child_stop_id, ...]}
         self.children_by_parent: Dict[str, List[str]] = defaultdict(list)
 
@@ -96,8 +744,27 @@ class GTFSStore:
         self.is_loaded = False
         self.load_time_seconds = 0.0
         self.stats: Dict[str, int] = {}
-        self._reload_lock = threading.Lock()
-        self.last_loaded_date: Optional[date] = None  # Para lazy reload de calendarios
+        # Generación de los datos (0 = sin cargar). Cambia en cada recarga,
+        # así que sirve como parte de la clave de cachés derivadas del store
+        self.generation = 0
+        # Identificador único de esta instancia: las generaciones empiezan en
+        # 1 en cada proceso, así que no distinguen stores de distintos hosts
+        self.load_id = uuid.uuid4().hex
+        self.last_loaded_date: Optional[date] = None  # Fecha de la carga (informativo)
+
+        # Perfil de la última carga desde SQL (ver load_profile.py); un
+        # snapshot conserva el del proceso que lo construyó
+        self.load_profile: Optional[Dict[str, object]] = None
+        self._profile: Optional[LoadProfile] = None
+        self._memory_report: Optional[Dict[str, object]] = None
+
+        # Snapshot adjuntado (None si los datos vienen de SQL)
+        self.snapshot_info: Optional[Dict[str, object]] = None
+        self._snapshot_mmap = None
+
+        # Vistas por fecha para RAPTOR {date: PatternDayView}
+        self._day_views: 'OrderedDict[Tuple[date, int], PatternDayView]' = OrderedDict()
+        self._day_views_lock = threading.Lock()
 
     @classmethod
     def get_instance(cls) -> 'GTFSStore':
@@ -115,14 +782,46 @@ class GTFSStore:
         with cls._lock:
             cls._instance = None
 
-    def load_data(self, db_session: 'Session') -> None:
+    @classmethod
+    def current_generation(cls) -> int:
+        """Generación del store publicado actualmente (0 si no hay datos)."""
+        instance = cls._instance
+        return instance.generation if instance is not None else 0
+
+    @classmethod
+    def _publish(cls, store: 'GTFSStore') -> None:
+        """Asignar generación a un store ya cargado y publicarlo.
+
+        El swap de la referencia es atómico: quien ya tenga la instancia
+        anterior sigue usándola intacta hasta soltarla.
+        """
+        with cls._lock:
+            cls._generation += 1
+            store.generation = cls._generation
+            cls._instance = store
+        print(f"🔁 GTFSStore generación {store.generation} publicada")
+
+    def load_data(
+        self,
+        db_session: 'Session',
+        snapshot_path: Optional[str] = None,
+        shared: bool = False
+    ) -> None:
         """Cargar todos los datos GTFS en memoria.
 
         Este método se ejecuta UNA SOLA VEZ al iniciar el servidor.
-        Tiempo estimado: 30-60 segundos para ~260k trips.
+        Tiempo estimado: 30-60 segundos para ~260k trips desde SQL,
+        menos de 1 segundo si hay un snapshot válido.
 
         Args:
             db_session: Sesión de SQLAlchemy
+            snapshot_path: Fichero de snapshot binario. Si existe y su
+                fingerprint coincide con la BD se mapea en lugar de cargar
+                desde SQL; si no, se carga desde SQL, se reescribe y se
+                adjunta.
+            shared: Modo multi-worker (requiere snapshot_path). La carga se
+                serializa con un lock de fichero: solo un proceso construye
+                el snapshot y todos, incluido él, lo usan mapeado.
         """
         if self.is_loaded:
             return
@@ -131,51 +830,525 @@ class GTFSStore:
             if self.is_loaded:  # Double-check
                 return
 
-            self._do_load(db_session)
+            if shared and snapshot_path:
+                self._load_shared(db_session, snapshot_path, reuse_snapshot=True)
+            else:
+                self._load_local(db_session, snapshot_path, reuse_snapshot=True)
 
-    def reload_data(self, db_session: 'Session') -> None:
-        """Recargar datos (para actualización sin reiniciar servidor).
+            if self is GTFSStore._instance:
+                GTFSStore._publish(self)
 
-        Thread-safe: usa lock para evitar corrupción durante recarga.
+    def reload_data(
+        self,
+        db_session: 'Session',
+        snapshot_path: Optional[str] = None,
+        shared: bool = False
+    ) -> 'GTFSStore':
+        """Recargar datos sin reiniciar el servidor (blue/green).
+
+        Construye una instancia nueva completa aparte y la publica con un
+        swap atómico de GTFSStore._instance. Las consultas en curso terminan
+        con la generación anterior, que nunca se vacía; las nuevas usan la
+        nueva. Si la carga falla, la generación anterior sigue publicada.
+        Durante la recarga conviven en memoria ambas versiones.
+
+        Siempre recarga desde SQL; si se indica snapshot_path, reescribe
+        el snapshot con los datos nuevos y el store nuevo lo usa mapeado.
+
+        Returns:
+            El store nuevo, ya publicado
         """
         with self._reload_lock:
-            # Limpiar estructuras
-            self._clear_data()
-            self.is_loaded = False
+            new_store = GTFSStore()
+            if shared and snapshot_path:
+                new_store._load_shared(db_session, snapshot_path, reuse_snapshot=False)
+            else:
+                new_store._load_local(db_session, snapshot_path, reuse_snapshot=False)
+            GTFSStore._publish(new_store)
+        return new_store
+
+    def refresh_prefix(
+        self,
+        db_session: 'Session',
+        prefix: str,
+        snapshot_path: Optional[str] = None,
+        shared: bool = False
+    ) -> 'GTFSStore':
+        """Refrescar solo un operador tras reimportarlo (ej. 'METRO_GRANADA_').
+
+        Parte de la generación publicada: copia lo que no es del operador y
+        recarga desde SQL sus paradas, rutas, trips, stop_times, patterns y
+        transbordos. El tiempo depende del tamaño del operador, no del país.
+        Se publica como una generación nueva, igual que reload_data.
+
+        El prefijo se compara literalmente con los IDs de paradas y rutas
+        ('METRO_' incluiría también 'METRO_BILBAO_', etc.).
+
+        Returns:
+            El store nuevo, ya publicado
+        """
+        if not prefix:
+            raise ValueError("prefix must not be empty")
+
+        with self._reload_lock:
+            base = GTFSStore.get_instance()
+            if not base.is_loaded:
+                raise RuntimeError("GTFSStore is not loaded; use load_data first")
+
+            new_store = GTFSStore()
+            new_store._do_refresh(base, db_session, prefix)
+            if snapshot_path:
+                new_store._persist_snapshot(db_session, snapshot_path, shared)
+            GTFSStore._publish(new_store)
+        return new_store
+
+    def _persist_snapshot(self, db_session: 'Session', snapshot_path: str, shared: bool) -> None:
+        """Escribir el snapshot de un store recién construido y adjuntarlo.
+
+        En modo compartido se hace bajo el lock de fichero, como en
+        _load_shared.
+        """
+        from src.gtfs_bc.routing.store_snapshot import compute_db_fingerprint, snapshot_lock
+
+        fingerprint = compute_db_fingerprint(db_session)
+        if not shared:
+            self._adopt_snapshot(snapshot_path, fingerprint)
+            return
+
+        with snapshot_lock(snapshot_path):
+            self._adopt_snapshot(snapshot_path, fingerprint)
+
+    def _adopt_snapshot(self, snapshot_path: str, fingerprint: Dict[str, object]) -> None:
+        """Escribir el snapshot y sustituir las columnas privadas por las mapeadas.
+
+        Sin snapshot adjunto (snapshot_info None) el pool de RAPTOR no acepta
+        el store. load_time_seconds sigue siendo el de la carga desde SQL.
+        """
+        build_seconds = self.load_time_seconds
+        if self.save_snapshot(snapshot_path, fingerprint) and self.attach_snapshot(snapshot_path):
+            self.load_time_seconds = build_seconds
+
+    @classmethod
+    def sync_shared_snapshot(cls, snapshot_path: str) -> bool:
+        """Adoptar el snapshot si otro proceso lo ha reescrito (modo compartido).
+
+        Cuando un worker recarga, reescribe el snapshot; el resto detecta
+        que el fichero ha cambiado (inode/mtime) y publica una generación
+        nueva adjuntándolo, con el mismo swap atómico que reload_data.
+
+        Returns:
+            True si se ha publicado una generación nueva
+        """
+        from src.gtfs_bc.routing.store_snapshot import snapshot_file_id
+
+        current = cls.get_instance()
+        if not current.is_loaded or not current.snapshot_info:
+            return False
+        file_id = snapshot_file_id(snapshot_path)
+        if file_id is None or file_id == current.snapshot_info.get("file_id"):
+            return False
+
+        with cls._reload_lock:
+            if cls._instance is not current:  # Otra recarga se ha adelantado
+                return False
+            new_store = cls()
+            if not new_store.attach_snapshot(snapshot_path):
+                return False
+            cls._publish(new_store)
+        return True
+
+    def _load_local(self, db_session: 'Session', snapshot_path: Optional[str], reuse_snapshot: bool) -> None:
+        """Cargar este store para un solo proceso (llamar con _reload_lock)."""
+        fingerprint = None
+        if snapshot_path:
+            from src.gtfs_bc.routing.store_snapshot import compute_db_fingerprint
+
+            fingerprint = compute_db_fingerprint(db_session)
+            if reuse_snapshot and self.attach_snapshot(snapshot_path, fingerprint):
+                return
+
+        self._do_load(db_session)
+
+        if snapshot_path:
+            self._adopt_snapshot(snapshot_path, fingerprint)
+
+    def _load_shared(self, db_session: 'Session', snapshot_path: str, reuse_snapshot: bool) -> None:
+        """Cargar en modo compartido entre workers (llamar con _reload_lock).
+
+        Bajo el lock de fichero del snapshot: si ya es válido (lo acaba de
+        escribir otro worker) se adjunta; si no, este proceso carga desde
+        SQL, escribe el snapshot y sustituye su copia privada por la
+        versión mapeada para no duplicar memoria.
+        """
+        from src.gtfs_bc.routing.store_snapshot import compute_db_fingerprint, snapshot_lock
+
+        with snapshot_lock(snapshot_path):
+            fingerprint = compute_db_fingerprint(db_session)
+            if reuse_snapshot and self.attach_snapshot(snapshot_path, fingerprint):
+                return
 
-            # Recargar
             self._do_load(db_session)
+            self._adopt_snapshot(snapshot_path, fingerprint)
+
+    def attach_snapshot(self, path: str, fingerprint: Optional[Dict[str, object]] = None) -> bool:
+        """Adjuntar un snapshot binario (mmap) en lugar de cargar desde SQL.
+
+        Args:
+            path: Fichero de snapshot
+            fingerprint: Fingerprint actual de la BD (None = no validar)
+
+        Returns:
+            True si el snapshot era válido y el store queda cargado
+        """
+        from src.gtfs_bc.routing.store_snapshot import attach_snapshot
+
+        if not attach_snapshot(self, path, fingerprint):
+            return False
+
+        self._rebuild_indexes()
+        self.calendar = ServiceCalendar(self.service_calendars, self.calendar_exceptions)
+        self.is_loaded = True
+        self.load_time_seconds = float(self.snapshot_info["attach_seconds"])
+        print(f"✅ GTFS adjuntado desde snapshot {path} en {self.load_time_seconds:.2f}s")
+        return True
+
+    def save_snapshot(self, path: str, fingerprint: Dict[str, object]) -> bool:
+        """Volcar el store cargado a un snapshot binario.
+
+        Un error al escribir no invalida la carga: solo se registra.
 
-    def _clear_data(self) -> None:
-        """Limpiar todas las estructuras de datos."""
-        self.trips_by_pattern.clear()
-        self.stops_by_pattern.clear()
-        self.patterns_by_stop.clear()
-        self.stop_times_by_trip.clear()
-        self.transfers.clear()
-        self.trips_info.clear()
-        self.stops_info.clear()
-        self.routes_info.clear()
-        self.children_by_parent.clear()
-        for day in self.services_by_weekday:
-            self.services_by_weekday[day].clear()
-        self.calendar_exceptions.clear()
-        self.stats.clear()
+        Returns:
+            True si el snapshot se ha escrito
+        """
+        from src.gtfs_bc.routing.store_snapshot import write_snapshot
+
+        try:
+            size = write_snapshot(self, path, fingerprint)
+            print(f"💾 Snapshot GTFS escrito en {path} ({size / (1024 * 1024):.1f} MB)")
+            return True
+        except OSError as e:
+            print(f"    ⚠️ Error escribiendo snapshot GTFS: {e}")
+            return False
+
+    def _rebuild_indexes(self) -> None:
+        """Reconstruir los índices {id: idx} a partir de las listas de IDs.
+
+        trip_index no se reconstruye: el snapshot lo trae como StringIndex.
+        Los huecos de paradas borradas en un refresh ('') no se indexan.
+        """
+        self.stop_index = {s: i for i, s in enumerate(self.stop_ids) if s}
+        self.route_index = {r: i for i, r in enumerate(self.route_ids)}
+        self.service_index = {s: i for i, s in enumerate(self.service_ids)}
+        self.pattern_index = {p: i for i, p in enumerate(self.pattern_ids)}
+        self.shape_index = {h: i for i, h in enumerate(self.shape_ids)}
+
+    def memory_report(self, refresh: bool = False) -> Dict[str, object]:
+        """Memoria estimada por estructura (se calcula una vez por generación)."""
+        if self._memory_report is None or refresh:
+            self._memory_report = estimate_memory(self)
+        return self._memory_report
+
+    def _phase(self, name: str):
+        """Medir una fase de la carga en curso (no-op fuera de una carga)."""
+        if self._profile is None:
+            return contextlib.nullcontext(self._record(name))
+        return self._profile.phase(name)
+
+    def _record(self, name: str) -> Dict[str, float]:
+        """Registro de una fase de la carga en curso (desechable fuera de una carga)."""
+        if self._profile is None:
+            return {'rows': 0, 'query_seconds': 0.0, 'wait_seconds': 0.0, 'build_seconds': 0.0}
+        return self._profile.record(name)
+
+    @classmethod
+    def configure_loading(cls, workers: int, stop_times_partitions: int, frequency_route_prefixes: str = "") -> None:
+        """Configurar la carga paralela (conexiones y particiones de stop_times)
+        y los prefijos de ruta que se cargan por frecuencias (separados por comas).
+        """
+        cls.LOAD_WORKERS = max(1, workers)
+        cls.STOP_TIMES_PARTITIONS = max(1, stop_times_partitions)
+        cls.FREQUENCY_ROUTE_PREFIXES = tuple(p.strip() for p in frequency_route_prefixes.split(',') if p.strip())
 
     def _do_load(self, db_session: 'Session') -> None:
-        """Implementación interna de carga de datos."""
-        from sqlalchemy import text
+        """Implementación interna de carga de datos.
 
+        Con LOAD_WORKERS > 1 las lecturas de tablas independientes (y los
+        rangos de stop_times) van en paralelo por conexiones del pool; la
+        construcción de patterns se hace al unir los resultados.
+        """
         start = time.time()
-        print("🚀 Iniciando carga de GTFS en memoria...")
+        rss_start = rss_mb()
+        reset_peak_rss()
+        workers = self.LOAD_WORKERS
+        self._profile = LoadProfile('sql-parallel' if workers > 1 else 'sql', workers)
+        print(f"🚀 Iniciando carga de GTFS en memoria ({workers} conexiones)...")
+
+        if workers > 1:
+            with _ParallelFetch(db_session, workers) as fetch:
+                patterns_at_stop = self._load_tables_parallel(db_session, fetch)
+        else:
+            self._load_stops(db_session)
+            self._load_routes(db_session)
+            self._load_calendars(db_session)
+            raw = self._load_raw_trips(db_session)
+            patterns_at_stop = self._build_patterns(raw)
+            del raw
+            self._load_frequencies(db_session, patterns_at_stop)
+            self._load_shapes(db_session)
+            self._load_transfers(db_session)
+            self._load_accesses(db_session)
+
+        self._finish_load(patterns_at_stop, start, rss_start)
+
+    def _load_tables_parallel(self, db_session: 'Session', fetch: '_ParallelFetch') -> List[List[int]]:
+        """Carga completa con lecturas en paralelo (mismo orden de aplicación)."""
+        chunk = self.LOAD_CHUNK_ROWS
+        # Primero las tablas pequeñas: se aplican mientras llegan los stop_times
+        fetch.submit('stops', _fetch_rows, *self._stops_query(), chunk)
+        fetch.submit('routes', _fetch_rows, *self._routes_query(), chunk)
+        fetch.submit('calendars', load_calendar_data)
+        fetch.submit('trips', _fetch_rows, *self._trips_query(), chunk)
+        fetch.submit('transfers', _fetch_rows, *self._transfers_query(), chunk)
+        fetch.submit('accesses', _fetch_rows, *self._accesses_query(), chunk)
+        fetch.submit('frequencies', _fetch_rows, *self._frequencies_query(), chunk)
+        fetch.submit('route_sequences', _fetch_rows, *self._route_sequences_query(), chunk)
+        fetch.submit('shapes', _fetch_rows, *self._shapes_query(), chunk)
+        trip_ranges = self._trip_ranges(db_session, self.STOP_TIMES_PARTITIONS)
+        for i, trip_range in enumerate(trip_ranges):
+            fetch.submit(f'stop_times_{i}', _read_stop_times,
+                         *self._stop_times_query(trip_range=trip_range), chunk)
+        print(f"    ⇉ stop_times en {len(trip_ranges)} rangos de trip_id")
+
+        def result(name: str, phase: str):
+            return fetch.result(name, record=self._record(phase))
+
+        self._load_stops(db_session, rows=result('stops', 'stops'))
+        self._load_routes(db_session, rows=result('routes', 'routes'))
+        self._load_calendars(db_session, data=result('calendars', 'calendars'))
+        raw = self._load_raw_trips(
+            db_session,
+            trip_rows=result('trips', 'trips'),
+            stop_times_parts=(result(f'stop_times_{i}', 'stop_times') for i in range(len(trip_ranges))),
+        )
+        patterns_at_stop = self._build_patterns(raw)
+        del raw
+        self._load_frequencies(
+            db_session, patterns_at_stop,
+            frequency_rows=result('frequencies', 'frequencies'),
+            sequence_rows=result('route_sequences', 'frequencies'),
+        )
+        self._load_shapes(db_session, rows=result('shapes', 'shapes'))
+        self._load_transfers(db_session, rows=result('transfers', 'transfers'))
+        self._load_accesses(db_session, rows=result('accesses', 'accesses'))
+
+        # Tiempo de SQL de cada tabla: el de la conexión que la leyó
+        for name, seconds in fetch.task_seconds.items():
+            phase = 'stop_times' if name.startswith('stop_times_') else name
+            self._record('frequencies' if name == 'route_sequences' else phase)['query_seconds'] += seconds
+        return patterns_at_stop
+
+    def _build_patterns(self, raw: '_RawTrips') -> List[List[int]]:
+        """7. Construir patterns y columnas finales a partir de los trips crudos."""
+        self.stats['trips'] = len(raw.ids)
+        self.stats['stop_times'] = len(raw.st_stop)
+
+        patterns_at_stop: List[List[int]] = []
+        self._append_patterns(raw, patterns_at_stop)
+        # Trips sin stop_times: se conservan para get_trip_info()
+        self._append_unassigned_trips(raw)
+        self.stats['patterns'] = len(self.pattern_ids)
+        print(f"    ✓ {len(self.pattern_ids):,} patterns creados a partir de {len(raw.ids):,} trips")
+        return patterns_at_stop
+
+    def _do_refresh(self, base: 'GTFSStore', db_session: 'Session', prefix: str) -> None:
+        """Construir este store a partir de base recargando solo un operador.
+
+        Lo que no pertenece al operador se copia de base (slices de las
+        columnas, sin SQL); lo del operador se lee de SQL con filtros por
+        prefijo. Los índices de paradas, rutas y servicios de base se
+        mantienen y solo se añaden los nuevos; las paradas que el operador
+        ya no tiene salen de stop_index y dejan su hueco vacío en stop_ids.
+
+        Pertenencia al operador:
+        - paradas y rutas cuyo ID empieza por prefix
+        - trips (y sus stop_times) de rutas del operador
+        - transbordos con algún extremo en una parada del operador
+        - shapes de los trips del operador (el resto se copia de base)
+        """
+        start = time.time()
+        rss_start = rss_mb()
+        reset_peak_rss()
+        self._profile = LoadProfile('refresh')
+        print(f"🚀 Refrescando GTFS para el prefijo {prefix}...")
+
+        # Índices estables: los enteros de base siguen siendo válidos
+        self.stop_ids, self.stop_index = list(base.stop_ids), dict(base.stop_index)
+        self.route_ids, self.route_index = list(base.route_ids), dict(base.route_index)
+        self.service_ids, self.service_index = list(base.service_ids), dict(base.service_index)
+
+        self.stops_info = {s: info for s, info in base.stops_info.items() if not s.startswith(prefix)}
+        self.children_by_parent = defaultdict(list)
+        for parent, children in base.children_by_parent.items():
+            if parent.startswith(prefix):
+                continue
+            kept = [c for c in children if not c.startswith(prefix)]
+            if kept:
+                self.children_by_parent[parent] = kept
+        self.routes_info = {r: info for r, info in base.routes_info.items() if not r.startswith(prefix)}
+
+        self._load_stops(db_session, prefix)
+        self._load_routes(db_session, prefix)
+        # Los calendarios son pequeños y los comparten operadores: se recargan enteros
+        self._load_calendars(db_session)
+
+        # Patterns de otros operadores: copia por bloques de base
+        patterns_at_stop: List[List[int]] = []
+        kept_patterns = 0
+        with self._phase('copy') as record:
+            for pattern_idx in range(len(base.pattern_ids)):
+                if base.route_ids[base.pattern_route[pattern_idx]].startswith(prefix):
+                    continue
+                self._copy_pattern(base, pattern_idx, patterns_at_stop)
+                kept_patterns += 1
+            record['rows'] += len(self.trip_ids)
+
+        raw = self._load_raw_trips(db_session, prefix)
+        self._append_patterns(raw, patterns_at_stop)
+        self._load_frequencies(db_session, patterns_at_stop, prefix)
+        self._load_shapes(db_session, prefix, base=base)
+
+        # Trips sin stop_times: los de base que no son del operador y los nuevos
+        for trip_idx in range(len(base.trip_pattern)):
+            if (base.trip_pattern[trip_idx] < 0
+                    and not base.route_ids[base.trip_route[trip_idx]].startswith(prefix)):
+                self._copy_trips(base, trip_idx, trip_idx + 1, -1)
+        self._append_unassigned_trips(raw)
+
+        # Como en _do_load, sin los trips plantilla de los patterns por frecuencias
+        frequency_patterns = [p for p in range(len(self.pattern_ids)) if self.is_frequency_pattern(p)]
+        self.stats = dict(base.stats)
+        self.stats['trips'] = len(self.trip_ids) - len(frequency_patterns)
+        self.stats['stop_times'] = len(self.st_stop) - sum(
+            self.pattern_stop_offsets[p + 1] - self.pattern_stop_offsets[p] for p in frequency_patterns
+        )
+        self.stats['patterns'] = len(self.pattern_ids)
+        self.stats['frequency_patterns'] = len(frequency_patterns)
+        # Patterns extra por adelantamientos: los que repiten (ruta, paradas)
+        self.stats['non_fifo_splits'] = len(self.pattern_ids) - len({
+            (self.pattern_route[p],
+             self.pattern_stops[self.pattern_stop_offsets[p]:self.pattern_stop_offsets[p + 1]].tobytes())
+            for p in range(len(self.pattern_ids))
+        })
+        print(f"    ✓ {kept_patterns:,} patterns conservados, "
+              f"{len(self.pattern_ids) - kept_patterns:,} recargados ({len(raw.ids):,} trips)")
+        del raw
+
+        # Transbordos: se descartan los que tocan paradas del operador y se
+        # recargan sus correspondencias y accesos
+        self.transfers = defaultdict(list)
+        for from_stop, edges in base.transfers.items():
+            if from_stop.startswith(prefix):
+                continue
+            kept_edges = [e for e in edges if not e[0].startswith(prefix)]
+            if kept_edges:
+                self.transfers[from_stop] = kept_edges
+            elif from_stop.startswith('ACCESS_'):
+                # Acceso de una estación del operador: se recarga abajo si sigue existiendo
+                self.stops_info.pop(from_stop, None)
+        self._load_transfers(db_session, prefix)
+        self._load_accesses(db_session, prefix)
+
+        self.stats['stops'] = sum(1 for s in self.stops_info if not s.startswith('ACCESS_'))
+        self.stats['routes'] = len(self.routes_info)
+        self.stats['accesses'] = len(self.stops_info) - self.stats['stops']
+        self.stats['access_transfers'] = sum(
+            len(edges) for from_stop, edges in self.transfers.items() if from_stop.startswith('ACCESS_')
+        ) * 2
+        self.stats['transfers'] = sum(len(edges) for edges in self.transfers.values()) - self.stats['access_transfers']
+
+        # Paradas borradas (y accesos que ya no existen): sin info ni patterns,
+        # como si no estuvieran, igual que tras una carga completa
+        for stop_idx, stop_id in enumerate(self.stop_ids):
+            if (stop_id and stop_id not in self.stops_info
+                    and not (stop_idx < len(patterns_at_stop) and patterns_at_stop[stop_idx])):
+                del self.stop_index[stop_id]
+                self.stop_ids[stop_idx] = ''
+
+        self._finish_load(patterns_at_stop, start, rss_start)
+
+    def _finish_load(self, patterns_at_stop: List[List[int]], start: float, rss_start: float) -> None:
+        """Cerrar una carga: índice inverso, dicts finales, GC, estado y memoria.
+
+        El pico de memoria se guarda en stats['load_peak_rss_mb'] (RSS del
+        proceso, que en una recarga incluye la generación anterior).
+        """
+        self._build_footpaths()
+        self._build_shape_index()
+
+        with self._phase('finish'):
+            # Indice inverso como tuplas (una por parada, incluidos accesos virtuales)
+            patterns_at_stop.extend([] for _ in range(len(self.stop_ids) - len(patterns_at_stop)))
+            self.patterns_at_stop = [tuple(p) for p in patterns_at_stop]
+            self._build_stop_grid()
+
+            # Convertir defaultdicts a dicts normales
+            self.children_by_parent = dict(self.children_by_parent)
+            self.transfers = dict(self.transfers)
+            self.calendar = ServiceCalendar(self.service_calendars, self.calendar_exceptions)
+
+            # Garbage collection optimization
+            gc.collect()
+            if not GTFSStore._gc_frozen:
+                GTFSStore._gc_frozen = True
+                gc.freeze()  # Mueve objetos a generación permanente
 
-        # 1. Cargar paradas
+        # Finalizar
+        self.is_loaded = True
+        self.last_loaded_date = date.today()
+        self.load_time_seconds = time.time() - start
+        if self._profile is not None:
+            self.load_profile = self._profile.finish()
+            self._profile = None
+
+        columns_mb = sum(
+            len(getattr(self, name)) * getattr(self, name).itemsize
+            for name in self.SNAPSHOT_COLUMNS
+        ) / (1024 * 1024)
+        self.stats['load_rss_start_mb'] = int(rss_start)
+        self.stats['load_peak_rss_mb'] = int(peak_rss_mb())
+        self.stats['load_rss_end_mb'] = int(rss_mb())
+        print(f"✅ GTFS cargado en {self.load_time_seconds:.1f}s ({columns_mb:.1f} MB en columnas)")
+        print(f"   Memoria: {self.stats['load_rss_start_mb']} MB → pico {self.stats['load_peak_rss_mb']} MB"
+              f" → {self.stats['load_rss_end_mb']} MB")
+        if self.load_profile:
+            phases = ', '.join(
+                f"{name} {p['query_seconds'] + p['wait_seconds']:.1f}s sql/{p['build_seconds']:.1f}s py"
+                for name, p in self.load_profile['phases'].items()
+            )
+            print(f"   Fases: {phases}")
+        print(f"   Estadísticas: {self.stats}")
+
+    @staticmethod
+    def _stops_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = "SELECT id, name, lat, lon, parent_station_id FROM gtfs_stops"
+        params = {}
+        if prefix:
+            query += " WHERE id LIKE :prefix ESCAPE '\\'"
+            params['prefix'] = _like_prefix(prefix)
+        return query, params
+
+    @_load_phase('stops')
+    def _load_stops(self, db_session: 'Session', prefix: Optional[str] = None, rows=None) -> None:
+        """1. Cargar paradas (todas o solo las del prefijo).
+
+        rows: filas ya leídas en paralelo (None = leer ahora con db_session).
+        """
         print("  📍 Cargando paradas...")
-        result = db_session.execute(text("""
-            SELECT id, name, lat, lon, parent_station_id FROM gtfs_stops
-        """))
+        if rows is None:
+            rows = _execute(db_session, *self._stops_query(prefix), record=self._record('stops'))
 
-        for row in result:
+        count = 0
+        for row in rows:
             stop_id = sys.intern(row[0])  # Interning para ahorrar RAM
             name = row[1] or ""
             lat = float(row[2]) if row[2] else 0.0
@@ -183,195 +1356,684 @@ class GTFSStore:
             parent_id = sys.intern(row[4]) if row[4] else None
 
             self.stops_info[stop_id] = (name, lat, lon)
+            _intern_id(self.stop_ids, self.stop_index, stop_id)
+            count += 1
 
             # Indexar hijo si tiene padre
             if parent_id:
                 self.children_by_parent[parent_id].append(stop_id)
 
         self.stats['stops'] = len(self.stops_info)
-        print(f"    ✓ {self.stats['stops']:,} paradas")
-
-        # 2. Cargar rutas
+        self._record('stops')['rows'] += count
+        print(f"    ✓ {count:,} paradas")
+
+    @staticmethod
+    def _routes_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = "SELECT id, short_name, color, route_type FROM gtfs_routes"
+        params = {}
+        if prefix:
+            query += " WHERE id LIKE :prefix ESCAPE '\\'"
+            params['prefix'] = _like_prefix(prefix)
+        return query, params
+
+    @_load_phase('routes')
+    def _load_routes(self, db_session: 'Session', prefix: Optional[str] = None, rows=None) -> None:
+        """2. Cargar rutas (todas o solo las del prefijo)."""
         print("  🚇 Cargando rutas...")
-        result = db_session.execute(text("""
-            SELECT id, short_name, color, route_type FROM gtfs_routes
-        """))
+        if rows is None:
+            rows = _execute(db_session, *self._routes_query(prefix), record=self._record('routes'))
 
-        for row in result:
+        count = 0
+        for row in rows:
             route_id = sys.intern(row[0])
             short_name = (row[1] or "").strip()
             color = row[2]
             route_type = row[3] or 0
             self.routes_info[route_id] = (short_name, color, route_type)
+            _intern_id(self.route_ids, self.route_index, route_id)
+            count += 1
 
         self.stats['routes'] = len(self.routes_info)
-        print(f"    ✓ {self.stats['routes']:,} rutas")
+        self._record('routes')['rows'] += count
+        print(f"    ✓ {count:,} rutas")
+
+    @_load_phase('calendars')
+    def _load_calendars(self, db_session: 'Session', data=None) -> None:
+        """3-4. Cargar calendarios completos y excepciones (calendar_dates).
+
+        Se guardan todas las fechas de vigencia, no solo las de hoy: el
+        ServiceCalendar resuelve cualquier fecha sin volver a SQL.
 
-        # 3. Cargar calendarios
+        data: resultado de load_calendar_data ya leído en paralelo.
+        """
         print("  📅 Cargando calendarios...")
-        today = date.today()
+        record = self._record('calendars')
+        if data is None:
+            start = time.perf_counter()
+            data = load_calendar_data(db_session)
+            record['query_seconds'] += time.perf_counter() - start
+        self.service_calendars, self.calendar_exceptions = data
+        record['rows'] += len(self.service_calendars) + len(self.calendar_exceptions)
+
+        for service_id in self.service_calendars:
+            _intern_id(self.service_ids, self.service_index, sys.intern(service_id))
+        for service_id in sorted({s for day in self.calendar_exceptions.values() for s in day[0] | day[1]}):
+            _intern_id(self.service_ids, self.service_index, sys.intern(service_id))
+
+        self.stats['calendars'] = len(self.service_calendars)
+        self.stats['calendar_exceptions'] = sum(
+            len(added) + len(removed) for added, removed in self.calendar_exceptions.values()
+        )
+        print(f"    ✓ {self.stats['calendars']:,} calendarios, "
+              f"{self.stats['calendar_exceptions']:,} excepciones")
 
-        result = db_session.execute(text("""
-            SELECT service_id, monday, tuesday, wednesday, thursday, friday, saturday, sunday
-            FROM gtfs_calendar
-            WHERE start_date <= :today AND end_date >= :today
-        """), {'today': today})
-
-        calendar_count = 0
-        for row in result:
-            service_id = sys.intern(row[0])
-            if row[1]: self.services_by_weekday['monday'].add(service_id)
-            if row[2]: self.services_by_weekday['tuesday'].add(service_id)
-            if row[3]: self.services_by_weekday['wednesday'].add(service_id)
-            if row[4]: self.services_by_weekday['thursday'].add(service_id)
-            if row[5]: self.services_by_weekday['friday'].add(service_id)
-            if row[6]: self.services_by_weekday['saturday'].add(service_id)
-            if row[7]: self.services_by_weekday['sunday'].add(service_id)
-            calendar_count += 1
-
-        self.stats['calendars'] = calendar_count
-        print(f"    ✓ {calendar_count:,} calendarios activos")
-
-        # 4. Cargar excepciones de calendario (calendar_dates)
-        print("  📅 Cargando excepciones de calendario...")
-        result = db_session.execute(text("""
-            SELECT service_id, date, exception_type
-            FROM gtfs_calendar_dates
-        """))
+    @classmethod
+    def _route_conditions(cls, column: str, prefix: Optional[str], params: Dict[str, object]) -> List[str]:
+        """Condiciones SQL sobre la ruta de los trips: la del prefijo (si hay)
+        y excluir las rutas que se cargan por frecuencias.
+        """
+        conditions = []
+        if prefix:
+            conditions.append(f"{column} LIKE :prefix ESCAPE '\\'")
+            params['prefix'] = _like_prefix(prefix)
+        for i, frequency_prefix in enumerate(cls.FREQUENCY_ROUTE_PREFIXES):
+            conditions.append(f"{column} NOT LIKE :frequency_{i} ESCAPE '\\'")
+            params[f'frequency_{i}'] = _like_prefix(frequency_prefix)
+        return conditions
 
-        exception_count = 0
-        for row in result:
-            service_id = sys.intern(row[0])
-            date_str = str(row[1])
-            exception_type = row[2]
+    @classmethod
+    def _trips_query(cls, prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = "SELECT id, route_id, service_id, headsign, shape_id FROM gtfs_trips"
+        params = {}
+        conditions = cls._route_conditions('route_id', prefix, params)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return query, params
 
-            if date_str not in self.calendar_exceptions:
-                self.calendar_exceptions[date_str] = {'added': set(), 'removed': set()}
+    @classmethod
+    def _stop_times_query(
+        cls,
+        prefix: Optional[str] = None,
+        trip_range: Tuple[Optional[str], Optional[str]] = (None, None)
+    ) -> Tuple[str, Dict[str, object]]:
+        """Query de stop_times ordenada por (trip, sequence).
+
+        trip_range: rango [desde, hasta) de trip_id (None = sin límite).
+        """
+        params = {}
+        conditions = cls._route_conditions('t.route_id', prefix, params)
+        if conditions:
+            query = """
+                SELECT st.trip_id, st.stop_id, st.arrival_seconds, st.departure_seconds
+                FROM gtfs_stop_times st
+                JOIN gtfs_trips t ON t.id = st.trip_id
+            """
+        else:
+            query = """
+                SELECT st.trip_id, st.stop_id, st.arrival_seconds, st.departure_seconds
+                FROM gtfs_stop_times st
+            """
+        if trip_range[0] is not None:
+            conditions.append("st.trip_id >= :trip_from")
+            params['trip_from'] = trip_range[0]
+        if trip_range[1] is not None:
+            conditions.append("st.trip_id < :trip_to")
+            params['trip_to'] = trip_range[1]
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY st.trip_id, st.stop_sequence"
+        return query, params
+
+    @staticmethod
+    def _trip_ranges(db_session: 'Session', partitions: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Partir el espacio de trip_id en rangos con un número similar de trips."""
+        from sqlalchemy import text
 
-            if exception_type == 1:
-                self.calendar_exceptions[date_str]['added'].add(service_id)
-            elif exception_type == 2:
-                self.calendar_exceptions[date_str]['removed'].add(service_id)
+        if partitions <= 1:
+            return [(None, None)]
+        result = db_session.execute(text("""
+            SELECT MIN(id) FROM (
+                SELECT id, NTILE(:partitions) OVER (ORDER BY id) AS part
+                FROM gtfs_trips
+            ) trips_by_part
+            GROUP BY part
+            ORDER BY 1
+        """), {'partitions': partitions})
+        bounds = [row[0] for row in result][1:]
+        return list(zip([None] + bounds, bounds + [None]))
+
+    def _load_raw_trips(
+        self,
+        db_session: 'Session',
+        prefix: Optional[str] = None,
+        trip_rows=None,
+        stop_times_parts=None
+    ) -> '_RawTrips':
+        """5-6. Cargar trips y stop_times en orden de BD (sin agrupar aún).
 
-            exception_count += 1
+        Con prefix solo se leen los trips de rutas del operador.
 
-        self.stats['calendar_exceptions'] = exception_count
-        print(f"    ✓ {exception_count:,} excepciones")
+        Args:
+            trip_rows: filas de trips ya leídas en paralelo
+            stop_times_parts: iterable de _StopTimesPart leídas en paralelo
+                (por rangos de trip_id, en orden). None = leer ahora en
+                streaming directamente a las columnas.
+        """
+        raw = self._load_trips(db_session, prefix, trip_rows)
+        self._load_stop_times(raw, db_session, prefix, stop_times_parts)
+        return raw
 
-        # 5. Cargar trips
+    @_load_phase('trips')
+    def _load_trips(self, db_session: 'Session', prefix: Optional[str], trip_rows) -> '_RawTrips':
+        """5. Trips (en orden de BD; se reordenan por pattern en _append_patterns)."""
         print("  🚆 Cargando trips...")
-        result = db_session.execute(text("""
-            SELECT id, route_id, service_id, headsign FROM gtfs_trips
-        """))
+        record = self._record('trips')
+        if trip_rows is None:
+            trip_rows = _stream_rows(db_session, *self._trips_query(prefix), self.LOAD_CHUNK_ROWS, record)
 
-        trip_to_route: Dict[str, str] = {}
-        for row in result:
+        raw = _RawTrips()
+        for row in trip_rows:
             trip_id = sys.intern(row[0])
             route_id = sys.intern(row[1])
             service_id = sys.intern(row[2]) if row[2] else ""
-            headsign = row[3]
 
-            trip_to_route[trip_id] = route_id
-            self.trips_info[trip_id] = (route_id, headsign, service_id)
+            raw.index[trip_id] = len(raw.ids)
+            raw.ids.append(trip_id)
+            raw.route.append(_intern_id(self.route_ids, self.route_index, route_id))
+            raw.service.append(_intern_id(self.service_ids, self.service_index, service_id))
+            raw.headsigns.append(row[3])
+            if row[4]:
+                raw.shapes[len(raw.ids) - 1] = sys.intern(row[4])
 
-        self.stats['trips'] = len(self.trips_info)
-        print(f"    ✓ {self.stats['trips']:,} trips")
+        record['rows'] += len(raw.ids)
+        print(f"    ✓ {len(raw.ids):,} trips")
+        return raw
 
-        # 6. Cargar stop_times (la tabla más grande)
+    @_load_phase('stop_times')
+    def _load_stop_times(
+        self,
+        raw: '_RawTrips',
+        db_session: 'Session',
+        prefix: Optional[str],
+        stop_times_parts
+    ) -> None:
+        """6. Cargar stop_times (la tabla más grande) directamente en columnas."""
         print("  ⏱️  Cargando stop_times (~2M registros)...")
+        record = self._record('stop_times')
+        n_raw_trips = len(raw.ids)
+
+        # Rango [start, end) de cada trip en las columnas crudas
+        raw.start = array('i', [-1]) * n_raw_trips
+        raw.end = array('i', [-1]) * n_raw_trips
+        raw.assigned = bytearray(n_raw_trips)
+
+        if stop_times_parts is not None:
+            for part in stop_times_parts:
+                self._append_stop_times_part(raw, part)
+            record['rows'] += len(raw.st_stop)
+            print(f"    ✓ {len(raw.st_stop):,} stop_times")
+            return
 
-        # Query optimizada: solo campos necesarios, ordenado por trip y sequence
-        result = db_session.execute(text("""
-            SELECT trip_id, stop_id, arrival_seconds, departure_seconds
-            FROM gtfs_stop_times
-            ORDER BY trip_id, stop_sequence
-        """))
-
-        # Procesar y construir estructuras
-        temp_stop_times: Dict[str, List[Tuple[str, int, int]]] = defaultdict(list)
         count = 0
+        current_trip_id = None
+        current_raw_idx = -1
 
-        for row in result:
-            trip_id = sys.intern(row[0])
-            stop_id = sys.intern(row[1])
-            arr_sec = row[2] or 0
-            dep_sec = row[3] or 0
-
-            temp_stop_times[trip_id].append((stop_id, arr_sec, dep_sec))
-
+        # Streaming por bloques: las filas van directas a las columnas
+        query, params = self._stop_times_query(prefix)
+        for row in _stream_rows(db_session, query, params, self.LOAD_CHUNK_ROWS, record):
             count += 1
             if count % 500000 == 0:
                 print(f"      Procesados {count:,} stop_times...")
 
-        self.stop_times_by_trip = dict(temp_stop_times)
-        self.stats['stop_times'] = count
-        print(f"    ✓ {count:,} stop_times")
-
-        # 7. Construir PATTERNS (Rutas unicas por secuencia de paradas)
-        print("  🔄 Construyendo Patterns (Rutas unicas)...")
+            trip_id = row[0]
+            if trip_id != current_trip_id:
+                current_trip_id = trip_id
+                current_raw_idx = raw.index.get(trip_id, -1)
+                if current_raw_idx >= 0:
+                    raw.start[current_raw_idx] = len(raw.st_stop)
 
-        # Diccionario temporal para agrupar:
-        # Clave: (route_id, tupla_de_paradas)
-        # Valor: lista de trip_ids
-        temp_patterns: Dict[Tuple[str, Tuple[str, ...]], List[str]] = defaultdict(list)
-
-        # Iterar todos los trips para sacar su firma (secuencia de paradas)
-        for trip_id, stops_data in self.stop_times_by_trip.items():
-            if not stops_data:
+            # stop_times de trips que no existen en gtfs_trips no son utilizables
+            if current_raw_idx < 0:
                 continue
 
-            # stops_data es lista de (stop_id, arr, dep). Extraemos solo stop_id.
-            stop_sequence = tuple(s[0] for s in stops_data)
+            stop_id = sys.intern(row[1])
+            raw.st_stop.append(_intern_id(self.stop_ids, self.stop_index, stop_id))
+            raw.st_arrival.append(row[2] or 0)
+            raw.st_departure.append(row[3] or 0)
+            raw.end[current_raw_idx] = len(raw.st_stop)
 
-            # Obtener route_id de trips_info (index 0 es route_id)
-            trip_info = self.trips_info.get(trip_id)
-            if not trip_info:
-                continue
-            route_id = trip_info[0]
+        record['rows'] += count
+        print(f"    ✓ {len(raw.st_stop):,} stop_times")
 
-            # Agrupar
-            temp_patterns[(route_id, stop_sequence)].append(trip_id)
+    def _append_stop_times_part(self, raw: '_RawTrips', part: '_StopTimesPart') -> None:
+        """Añadir a las columnas crudas un bloque de stop_times leído aparte.
 
-        # Procesar los grupos para crear los patterns finales
-        for i, ((route_id, stop_seq), trips) in enumerate(temp_patterns.items()):
-            # Crear ID unico para el pattern (ej: METRO_1_0, METRO_1_1)
-            # Usamos sys.intern para ahorrar memoria en keys repetidas
-            pattern_id = sys.intern(f"{route_id}_{i}")
+        Las paradas del bloque se internan aquí, en el hilo principal, en el
+        mismo orden de aparición que la lectura secuencial.
+        """
+        runs = []
+        complete = True
+        begin = 0
+        for trip_id, end in zip(part.trip_ids, part.trip_ends):
+            raw_idx = raw.index.get(trip_id, -1)
+            if raw_idx >= 0:
+                runs.append((raw_idx, begin, end))
+            else:
+                # stop_times de trips que no existen en gtfs_trips no son utilizables
+                complete = False
+            begin = end
+
+        if complete:
+            base = len(raw.st_stop)
+            remap = [_intern_id(self.stop_ids, self.stop_index, sys.intern(s)) for s in part.stop_ids]
+            raw.st_stop.extend([remap[s] for s in part.stops])
+            raw.st_arrival.extend(part.arrivals)
+            raw.st_departure.extend(part.departures)
+            for raw_idx, begin, end in runs:
+                raw.start[raw_idx] = base + begin
+                raw.end[raw_idx] = base + end
+            return
 
-            # 1. Guardar la secuencia de paradas
-            self.stops_by_pattern[pattern_id] = list(stop_seq)
+        remap = [-1] * len(part.stop_ids)
+        for raw_idx, begin, end in runs:
+            raw.start[raw_idx] = len(raw.st_stop)
+            for local in part.stops[begin:end]:
+                idx = remap[local]
+                if idx < 0:
+                    idx = remap[local] = _intern_id(self.stop_ids, self.stop_index, sys.intern(part.stop_ids[local]))
+                raw.st_stop.append(idx)
+            raw.st_arrival.extend(part.arrivals[begin:end])
+            raw.st_departure.extend(part.departures[begin:end])
+            raw.end[raw_idx] = len(raw.st_stop)
+
+    @_load_phase('patterns')
+    def _append_patterns(self, raw: '_RawTrips', patterns_at_stop: List[List[int]]) -> None:
+        """7. Agrupar trips crudos en PATTERNS (rutas únicas por secuencia de paradas).
+
+        Los trips se renumeran: los de un pattern quedan contiguos y
+        ordenados por la salida de la PRIMERA parada (CRITICO para RAPTOR).
+        """
+        print("  🔄 Construyendo Patterns (Rutas unicas)...")
 
-            # 2. Indexar paradas -> patterns
-            for stop_id in stop_seq:
-                self.patterns_by_stop[stop_id].add(pattern_id)
+        # Diccionario temporal para agrupar:
+        # Clave: (route_idx, bytes de la secuencia de stop_idx)
+        # Valor: lista de índices crudos de trip
+        temp_patterns: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
 
-            # 3. Guardar trips del pattern ordenados por hora
-            trip_list = []
-            for t_id in trips:
-                # Obtener hora de salida de la PRIMERA parada
-                first_departure = self.stop_times_by_trip[t_id][0][2]  # index 2 = departure
-                trip_list.append((first_departure, t_id))
+        for raw_idx in range(len(raw.ids)):
+            st_start = raw.start[raw_idx]
+            if st_start < 0:
+                continue
+            signature = raw.st_stop[st_start:raw.end[raw_idx]].tobytes()
+            temp_patterns[(raw.route[raw_idx], signature)].append(raw_idx)
+
+        split_patterns = 0
+        first_pattern = len(self.pattern_ids)
+        for (route_idx, _), raw_trips in temp_patterns.items():
+            first_raw = raw_trips[0]
+            stop_seq = raw.st_stop[raw.start[first_raw]:raw.end[first_raw]]
+
+            # Ordenar por hora de salida y partir en cadenas FIFO si hay adelantamientos
+            raw_trips.sort(key=lambda r: (raw.st_departure[raw.start[r]], raw.st_arrival[raw.end[r] - 1]))
+            chains = self._fifo_chains(raw, raw_trips)
+            split_patterns += len(chains) - 1
+
+            for chain in chains:
+                # Crear ID unico para el pattern (ej: METRO_1_0, METRO_1_1)
+                # Usamos sys.intern para ahorrar memoria en keys repetidas
+                pattern_id = sys.intern(f"{self.route_ids[route_idx]}_{len(self.pattern_ids)}")
+                pattern_idx = _intern_id(self.pattern_ids, self.pattern_index, pattern_id)
+                self.pattern_route.append(route_idx)
+                self._append_pattern_shape(raw.shapes.get(chain[0]))
+
+                # 1. Guardar la secuencia de paradas
+                self._append_pattern_stops(pattern_idx, stop_seq, patterns_at_stop)
+
+                # 2. Guardar trips del pattern ordenados por hora de salida
+                for raw_idx in chain:
+                    self._append_raw_trip(raw, raw_idx, pattern_idx)
+                self.pattern_trip_offsets.append(len(self.trip_ids))
+                self.pattern_headway_offsets.append(len(self.headway_start))
+
+        self._record('patterns')['rows'] += len(self.pattern_ids) - first_pattern
+        self.stats['non_fifo_splits'] = self.stats.get('non_fifo_splits', 0) + split_patterns
+        if split_patterns:
+            print(f"    ✓ {split_patterns:,} patterns extra por adelantamientos (non-FIFO)")
+
+    @staticmethod
+    def _fifo_chains(raw: '_RawTrips', raw_trips: List[int]) -> List[List[int]]:
+        """Partir los trips (ordenados por salida) de un pattern en cadenas FIFO.
+
+        En una cadena cada trip sale y llega en todas las paradas no antes
+        que el anterior, así que ningún trip adelanta a otro. Asignación
+        greedy: cada trip va a la primera cadena cuyo último trip domina.
+        """
+        chains: List[List[int]] = []
+        departures, arrivals = raw.st_departure, raw.st_arrival
+        for raw_idx in raw_trips:
+            start = raw.start[raw_idx]
+            n_stops = raw.end[raw_idx] - start
+            for chain in chains:
+                prev = raw.start[chain[-1]]
+                if all(departures[prev + i] <= departures[start + i] and arrivals[prev + i] <= arrivals[start + i]
+                       for i in range(n_stops)):
+                    chain.append(raw_idx)
+                    break
+            else:
+                chains.append([raw_idx])
+        return chains
+
+    def _append_pattern_stops(self, pattern_idx: int, stop_seq, patterns_at_stop: List[List[int]]) -> None:
+        """Guardar la secuencia de paradas de un pattern e indexar paradas -> patterns."""
+        self.pattern_stops.extend(stop_seq)
+        self.pattern_stop_offsets.append(len(self.pattern_stops))
+
+        for stop_idx in set(stop_seq):
+            while len(patterns_at_stop) <= stop_idx:
+                patterns_at_stop.append([])
+            patterns_at_stop[stop_idx].append(pattern_idx)
+
+    def _append_pattern_shape(self, shape_id: Optional[str]) -> None:
+        """Asignar la shape (del primer trip) al pattern que se está creando."""
+        self.pattern_shape.append(_intern_id(self.shape_ids, self.shape_index, shape_id) if shape_id else -1)
+
+    def _append_raw_trip(self, raw: '_RawTrips', raw_idx: int, pattern_idx: int) -> None:
+        """Añadir un trip crudo (y sus stop_times) a las columnas."""
+        trip_id = raw.ids[raw_idx]
+        self.trip_index[trip_id] = len(self.trip_ids)
+        self.trip_ids.append(trip_id)
+        self.trip_route.append(raw.route[raw_idx])
+        self.trip_service.append(raw.service[raw_idx])
+        self.trip_pattern.append(pattern_idx)
+        self.trip_headsigns.append(raw.headsigns[raw_idx])
+
+        st_start = raw.start[raw_idx]
+        if st_start >= 0:
+            st_end = raw.end[raw_idx]
+            self.st_stop.extend(raw.st_stop[st_start:st_end])
+            self.st_arrival.extend(raw.st_arrival[st_start:st_end])
+            self.st_departure.extend(raw.st_departure[st_start:st_end])
+        self.trip_offsets.append(len(self.st_stop))
+        raw.assigned[raw_idx] = 1
+
+    def _append_unassigned_trips(self, raw: '_RawTrips') -> None:
+        """Añadir al final los trips crudos sin stop_times (pattern -1)."""
+        for raw_idx in range(len(raw.ids)):
+            if not raw.assigned[raw_idx]:
+                self._append_raw_trip(raw, raw_idx, -1)
+
+    def _copy_pattern(self, base: 'GTFSStore', base_pattern: int, patterns_at_stop: List[List[int]]) -> None:
+        """Copiar un pattern de otro store con sus trips y stop_times."""
+        pattern_idx = _intern_id(self.pattern_ids, self.pattern_index, base.pattern_ids[base_pattern])
+        self.pattern_route.append(base.pattern_route[base_pattern])
+        base_shape = base.pattern_shape[base_pattern]
+        self._append_pattern_shape(base.shape_ids[base_shape] if base_shape >= 0 else None)
+        self._append_pattern_stops(
+            pattern_idx,
+            base.pattern_stops[base.pattern_stop_offsets[base_pattern]:base.pattern_stop_offsets[base_pattern + 1]],
+            patterns_at_stop,
+        )
+        self._copy_trips(
+            base,
+            base.pattern_trip_offsets[base_pattern],
+            base.pattern_trip_offsets[base_pattern + 1],
+            pattern_idx,
+        )
+        self.pattern_trip_offsets.append(len(self.trip_ids))
+        first, end = base.pattern_headway_offsets[base_pattern], base.pattern_headway_offsets[base_pattern + 1]
+        for name in ('headway_start', 'headway_end', 'headway_secs', 'headway_days'):
+            getattr(self, name).extend(getattr(base, name)[first:end])
+        self.pattern_headway_offsets.append(len(self.headway_start))
+
+    def _copy_trips(self, base: 'GTFSStore', first_trip: int, end_trip: int, pattern_idx: int) -> None:
+        """Copiar los trips [first_trip, end_trip) de otro store con sus stop_times.
+
+        Mantiene los índices de ruta y servicio (el store nuevo parte de los
+        de base). Los stop_times del rango son contiguos y se copian en bloque.
+        """
+        st_start, st_end = base.trip_offsets[first_trip], base.trip_offsets[end_trip]
+        shift = len(self.st_stop) - st_start
+        # Vista de bytes: vale tanto para arrays como para memoryviews del snapshot
+        for name in ('st_stop', 'st_arrival', 'st_departure'):
+            getattr(self, name).frombytes(memoryview(getattr(base, name))[st_start:st_end].cast('B'))
+
+        for base_trip in range(first_trip, end_trip):
+            trip_id = base.trip_ids[base_trip]
+            self.trip_index[trip_id] = len(self.trip_ids)
+            self.trip_ids.append(trip_id)
+            self.trip_route.append(base.trip_route[base_trip])
+            self.trip_service.append(base.trip_service[base_trip])
+            self.trip_pattern.append(pattern_idx)
+            self.trip_headsigns.append(base.trip_headsigns[base_trip])
+            self.trip_offsets.append(base.trip_offsets[base_trip + 1] + shift)
+
+    @staticmethod
+    def _frequencies_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = """
+            SELECT route_id, day_type, start_time, end_time, headway_secs
+            FROM gtfs_route_frequencies
+            WHERE headway_secs > 0
+        """
+        params = {}
+        if prefix:
+            query += " AND route_id LIKE :prefix ESCAPE '\\'"
+            params['prefix'] = _like_prefix(prefix)
+        return query + " ORDER BY route_id, start_time", params
+
+    @staticmethod
+    def _route_sequences_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = "SELECT route_id, stop_id, sequence FROM gtfs_stop_route_sequence"
+        params = {}
+        if prefix:
+            query += " WHERE route_id LIKE :prefix ESCAPE '\\'"
+            params['prefix'] = _like_prefix(prefix)
+        return query + " ORDER BY route_id, sequence", params
+
+    @_load_phase('frequencies')
+    def _load_frequencies(
+        self,
+        db_session: 'Session',
+        patterns_at_stop: List[List[int]],
+        prefix: Optional[str] = None,
+        frequency_rows=None,
+        sequence_rows=None
+    ) -> None:
+        """7b. Patterns por frecuencias (gtfs_route_frequencies).
+
+        Se crean para las rutas con frecuencias que no tienen ningún pattern
+        (sin stop_times, o excluidas con FREQUENCY_ROUTE_PREFIXES). Las
+        paradas salen de gtfs_stop_route_sequence, en los dos sentidos, y el
+        recorrido del perfil fijo FREQUENCY_STATION_SECONDS +
+        FREQUENCY_DWELL_SECONDS. Como en las salidas por parada, el sentido
+        de vuelta sale medio headway más tarde y 'weekday' cubre el viernes
+        si la ruta no tiene filas 'friday'. Los festivos se tratan como su
+        día de la semana.
+
+        frequency_rows / sequence_rows: filas ya leídas en paralelo.
+        """
+        print("  🔁 Cargando frecuencias...")
+        record = self._record('frequencies')
+        if frequency_rows is None:
+            frequency_rows = _execute(db_session, *self._frequencies_query(prefix), record=record)
+        if sequence_rows is None:
+            sequence_rows = _execute(db_session, *self._route_sequences_query(prefix), record=record)
+
+        windows: Dict[str, List[Tuple[str, int, int, int]]] = defaultdict(list)
+        for route_id, day_type, start_time, end_time, headway in frequency_rows:
+            if day_type not in FREQUENCY_DAY_TYPES:
+                continue
+            start = _time_seconds(start_time)
+            end = _time_seconds(end_time)
+            if end <= start:
+                end += 24 * 3600  # 00:00:00 = hasta medianoche; 01:30 tras 23:00 = día siguiente
+            windows[route_id].append((day_type, start, end, int(headway)))
+
+        stops_by_route: Dict[str, List[int]] = defaultdict(list)
+        for route_id, stop_id, _ in sequence_rows:
+            stop_idx = self.stop_index.get(stop_id)
+            if stop_idx is not None:
+                stops_by_route[route_id].append(stop_idx)
+
+        routes_with_trips = set(self.pattern_route)
+        first_pattern = len(self.pattern_ids)
+        for route_id, route_windows in windows.items():
+            route_idx = self.route_index.get(route_id)
+            stops = stops_by_route.get(route_id, [])
+            if route_idx is None or route_idx in routes_with_trips or len(stops) < 2:
+                continue
+            has_friday = any(w[0] == 'friday' for w in route_windows)
+            for direction, stop_seq in enumerate((stops, stops[::-1])):
+                self._append_frequency_pattern(route_idx, direction, stop_seq, route_windows,
+                                               has_friday, patterns_at_stop)
+
+        added = len(self.pattern_ids) - first_pattern
+        record['rows'] += len(frequency_rows)
+        self.stats['patterns'] = len(self.pattern_ids)
+        self.stats['frequency_patterns'] = sum(
+            1 for p in range(len(self.pattern_ids)) if self.is_frequency_pattern(p)
+        )
+        print(f"    ✓ {added:,} patterns por frecuencias ({added // 2:,} rutas)")
+
+    def _append_frequency_pattern(
+        self,
+        route_idx: int,
+        direction: int,
+        stop_seq: List[int],
+        route_windows: List[Tuple[str, int, int, int]],
+        has_friday: bool,
+        patterns_at_stop: List[List[int]]
+    ) -> None:
+        """Añadir un pattern por frecuencias: trip plantilla y ventanas de headway."""
+        route_id = self.route_ids[route_idx]
+        pattern_id = sys.intern(f"{route_id}_{len(self.pattern_ids)}")
+        pattern_idx = _intern_id(self.pattern_ids, self.pattern_index, pattern_id)
+        self.pattern_route.append(route_idx)
+        self._append_pattern_shape(None)
+        self._append_pattern_stops(pattern_idx, stop_seq, patterns_at_stop)
+
+        # Trip plantilla: stop_times relativos a la salida de la primera parada
+        trip_id = sys.intern(f"{route_id}_FREQ_{direction}")
+        last_stop = self.stops_info.get(self.stop_ids[stop_seq[-1]])
+        self.trip_index[trip_id] = len(self.trip_ids)
+        self.trip_ids.append(trip_id)
+        self.trip_route.append(route_idx)
+        self.trip_service.append(_intern_id(self.service_ids, self.service_index, ""))
+        self.trip_pattern.append(pattern_idx)
+        self.trip_headsigns.append(last_stop[0] if last_stop else None)
+        departure = 0
+        for i, stop_idx in enumerate(stop_seq):
+            arrival = departure + self.FREQUENCY_STATION_SECONDS if i else 0
+            departure = arrival + self.FREQUENCY_DWELL_SECONDS if i else 0
+            self.st_stop.append(stop_idx)
+            self.st_arrival.append(arrival)
+            self.st_departure.append(departure)
+        self.trip_offsets.append(len(self.st_stop))
+        self.pattern_trip_offsets.append(len(self.trip_ids))
+
+        for day_type, start, end, headway in route_windows:
+            days = FREQUENCY_DAY_TYPES[day_type]
+            if day_type == 'weekday' and not has_friday:
+                days |= FREQUENCY_DAY_TYPES['friday']
+            self.headway_start.append(start + (headway // 2 if direction else 0))
+            self.headway_end.append(end + (headway // 2 if direction else 0))
+            self.headway_secs.append(headway)
+            self.headway_days.append(days)
+        self.pattern_headway_offsets.append(len(self.headway_start))
 
-            # Ordenar por tiempo (CRITICO para RAPTOR)
-            trip_list.sort(key=lambda x: x[0])
-            self.trips_by_pattern[pattern_id] = trip_list
+    @classmethod
+    def _shapes_query(cls, prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        """Puntos de las shapes de los trips que se cargan, por (shape, sequence)."""
+        params = {}
+        conditions = ["shape_id IS NOT NULL"] + cls._route_conditions('route_id', prefix, params)
+        query = f"""
+            SELECT shape_id, lat, lon
+            FROM gtfs_shape_points
+            WHERE shape_id IN (SELECT DISTINCT shape_id FROM gtfs_trips WHERE {" AND ".join(conditions)})
+            ORDER BY shape_id, sequence
+        """
+        return query, params
 
-        self.stats['patterns'] = len(self.trips_by_pattern)
-        print(f"    ✓ {len(self.trips_by_pattern):,} patterns creados a partir de {len(self.trips_info):,} trips")
+    @_load_phase('shapes')
+    def _load_shapes(
+        self,
+        db_session: 'Session',
+        prefix: Optional[str] = None,
+        rows=None,
+        base: Optional['GTFSStore'] = None
+    ) -> None:
+        """7c. Puntos de las shapes de los patterns (columnas en microgrados).
 
-        # Limpiar memoria temporal
-        del temp_patterns
+        Solo se guardan las shapes asignadas a algún pattern. Con base
+        (refresco de un operador) las que no vienen de SQL se copian de base.
 
-        # 8. Cargar transbordos (CON EXPANSIÓN INTELIGENTE)
-        print("  🚶 Cargando transbordos y expandiendo a andenes...")
-        result = db_session.execute(text("""
+        rows: filas ya leídas en paralelo.
+        """
+        print("  〰️ Cargando shapes...")
+        record = self._record('shapes')
+        if rows is None:
+            rows = _stream_rows(db_session, *self._shapes_query(prefix), self.LOAD_CHUNK_ROWS, record)
+
+        points: Dict[int, Tuple[array, array]] = {}
+        read = 0
+        for shape_id, lat, lon in rows:
+            read += 1
+            shape_idx = self.shape_index.get(shape_id)
+            if shape_idx is None:
+                continue
+            shape_points = points.get(shape_idx)
+            if shape_points is None:
+                shape_points = points[shape_idx] = (array('i'), array('i'))
+            shape_points[0].append(round(lat * 1e6))
+            shape_points[1].append(round(lon * 1e6))
+
+        # Columnas en el orden de shape_ids (CSR)
+        self.shape_point_offsets = array('i', [0])
+        self.shape_lat = array('i')
+        self.shape_lon = array('i')
+        for shape_idx, shape_id in enumerate(self.shape_ids):
+            if shape_idx in points:
+                self.shape_lat.extend(points[shape_idx][0])
+                self.shape_lon.extend(points[shape_idx][1])
+            elif base is not None and shape_id in base.shape_index:
+                base_shape = base.shape_index[shape_id]
+                first, end = base.shape_point_offsets[base_shape], base.shape_point_offsets[base_shape + 1]
+                # Vista de bytes: vale tanto para arrays como para memoryviews del snapshot
+                for name in ('shape_lat', 'shape_lon'):
+                    getattr(self, name).frombytes(memoryview(getattr(base, name))[first:end].cast('B'))
+            self.shape_point_offsets.append(len(self.shape_lat))
+
+        record['rows'] += read
+        self.stats['shapes'] = sum(
+            1 for h in range(len(self.shape_ids)) if self.shape_point_offsets[h + 1] > self.shape_point_offsets[h]
+        )
+        print(f"    ✓ {self.stats['shapes']:,} shapes ({len(self.shape_lat):,} puntos)")
+
+    @staticmethod
+    def _transfers_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = """
             SELECT from_stop_id, to_stop_id, walk_time_s
             FROM stop_correspondence
             WHERE walk_time_s IS NOT NULL
-        """))
+        """
+        params = {}
+        if prefix:
+            query += " AND (from_stop_id LIKE :prefix ESCAPE '\\' OR to_stop_id LIKE :prefix ESCAPE '\\')"
+            params['prefix'] = _like_prefix(prefix)
+        return query, params
+
+    @_load_phase('transfers')
+    def _load_transfers(self, db_session: 'Session', prefix: Optional[str] = None, rows=None) -> None:
+        """8. Cargar transbordos (CON EXPANSIÓN INTELIGENTE).
+
+        Con prefix solo las correspondencias con algún extremo del operador.
+        """
+        print("  🚶 Cargando transbordos y expandiendo a andenes...")
+        if rows is None:
+            rows = _execute(db_session, *self._transfers_query(prefix), record=self._record('transfers'))
+        self._record('transfers')['rows'] += len(rows)
 
         transfer_count = 0
-        for row in result:
+        for row in rows:
             raw_from = sys.intern(row[0])
             raw_to = sys.intern(row[1])
             walk_secs = row[2]
@@ -400,26 +2062,211 @@ class GTFSStore:
         self.stats['transfers'] = transfer_count
         print(f"    ✓ {transfer_count:,} transbordos (tras expansión)")
 
-        # 9. Cargar accesos de Metro/Tren como puntos de entrada virtuales
-        print("  🚪 Cargando accesos (Metro Madrid, Ligero, Barcelona, Bilbao, Euskotren, FGC)...")
-        from adapters.http.api.gtfs.utils.shape_utils import haversine_distance
+    @_load_phase('footpaths')
+    def _build_footpaths(self) -> None:
+        """10. Cierre transitivo de los transbordos (footpaths CSR).
 
-        access_result = db_session.execute(text("""
+        Dijkstra desde cada parada sobre el grafo de transfers, para que un
+        camino de varios tramos (andén → acceso → andén de la estación de
+        al lado) sea un único footpath y RAPTOR lo relaje de una vez. Los
+        caminos de varios tramos se limitan a MAX_FOOTPATH_SECONDS.
+        """
+        print("  🧭 Calculando footpaths (cierre transitivo de transbordos)...")
+        stop_index = self.stop_index
+        max_seconds = self.MAX_FOOTPATH_SECONDS
+
+        # Grafo por stop_idx con el mínimo por par (la expansión padre/hijos repite aristas)
+        graph: Dict[int, Dict[int, int]] = {}
+        for from_stop, edges in self.transfers.items():
+            from_idx = stop_index.get(from_stop)
+            if from_idx is None:
+                continue
+            out = graph.setdefault(from_idx, {})
+            for to_stop, walk_secs in edges:
+                to_idx = stop_index.get(to_stop)
+                if to_idx is not None and to_idx != from_idx and walk_secs < out.get(to_idx, walk_secs + 1):
+                    out[to_idx] = walk_secs
+
+        offsets = array('i', [0])
+        footpath_to = array('i')
+        footpath_seconds = array('i')
+        for stop_idx in range(len(self.stop_ids)):
+            direct = graph.get(stop_idx)
+            if direct:
+                best = dict(direct)
+                heap = [(walk_secs, to_idx) for to_idx, walk_secs in direct.items()]
+                heapq.heapify(heap)
+                while heap:
+                    walked, current = heapq.heappop(heap)
+                    if walked >= max_seconds:
+                        break  # Ningún tramo más cabe en el máximo
+                    if walked > best[current]:
+                        continue
+                    for to_idx, walk_secs in graph.get(current, {}).items():
+                        total = walked + walk_secs
+                        if to_idx != stop_idx and total <= max_seconds and total < best.get(to_idx, total + 1):
+                            best[to_idx] = total
+                            heapq.heappush(heap, (total, to_idx))
+                for to_idx in sorted(best):
+                    footpath_to.append(to_idx)
+                    footpath_seconds.append(best[to_idx])
+            offsets.append(len(footpath_to))
+
+        self.footpath_offsets = offsets
+        self.footpath_to = footpath_to
+        self.footpath_seconds = footpath_seconds
+        self._build_incoming_footpaths()
+        self._record('footpaths')['rows'] += len(footpath_to)
+        self.stats['footpaths'] = len(footpath_to)
+        print(f"    ✓ {len(footpath_to):,} footpaths (caminos de hasta {max_seconds // 60} min)")
+
+    def _build_incoming_footpaths(self) -> None:
+        """10b. CSR inverso de los footpaths (por parada de llegada)."""
+        n_stops = len(self.stop_ids)
+        counts = [0] * (n_stops + 1)
+        for to_idx in self.footpath_to:
+            counts[to_idx + 1] += 1
+        for stop_idx in range(n_stops):
+            counts[stop_idx + 1] += counts[stop_idx]
+        offsets = array('i', counts)
+
+        fill = counts[:-1]
+        footpath_from = array('i', [0]) * len(self.footpath_to)
+        footpath_in_seconds = array('i', [0]) * len(self.footpath_to)
+        for from_idx in range(n_stops):
+            for j in range(self.footpath_offsets[from_idx], self.footpath_offsets[from_idx + 1]):
+                to_idx = self.footpath_to[j]
+                footpath_from[fill[to_idx]] = from_idx
+                footpath_in_seconds[fill[to_idx]] = self.footpath_seconds[j]
+                fill[to_idx] += 1
+
+        self.footpath_in_offsets = offsets
+        self.footpath_from = footpath_from
+        self.footpath_in_seconds = footpath_in_seconds
+
+    def _build_stop_grid(self) -> None:
+        """11. Índice espacial de paradas (rejilla de STOP_GRID_CELL_DEGREES).
+
+        Solo entran las paradas desde las que se puede salir o a las que se
+        puede llegar: con patterns o con footpaths (andenes y accesos
+        virtuales, no estaciones padre sin transbordos).
+        """
+        cell = self.STOP_GRID_CELL_DEGREES
+        grid: Dict[Tuple[int, int], array] = {}
+        offsets = self.footpath_offsets
+        for stop_idx, stop_id in enumerate(self.stop_ids):
+            info = self.stops_info.get(stop_id)
+            if not info or not info[1]:
+                continue
+            has_footpaths = stop_idx + 1 < len(offsets) and offsets[stop_idx + 1] > offsets[stop_idx]
+            if not (stop_idx < len(self.patterns_at_stop) and self.patterns_at_stop[stop_idx]) and not has_footpaths:
+                continue
+            key = (math.floor(info[1] / cell), math.floor(info[2] / cell))
+            grid.setdefault(key, array('i')).append(stop_idx)
+        self.stop_grid = grid
+        self.stats['stop_grid_cells'] = len(grid)
+
+    @_load_phase('shapes')
+    def _build_shape_index(self) -> None:
+        """12. Posición de las paradas de cada pattern sobre su shape.
+
+        Se calcula una vez por (shape, secuencia de paradas): los patterns
+        partidos por adelantamientos la comparten. Un pattern cuya shape no
+        pasa por alguna de sus paradas se queda sin posiciones (-1).
+        """
+        positions = array('i', [-1]) * len(self.pattern_stops)
+        snapped: Dict[Tuple[int, bytes], Optional[array]] = {}
+        matched = 0
+        for pattern_idx in range(len(self.pattern_ids)):
+            shape_idx = self.pattern_shape[pattern_idx]
+            if shape_idx < 0:
+                continue
+            first, end = self.pattern_stop_offsets[pattern_idx], self.pattern_stop_offsets[pattern_idx + 1]
+            stops = self.pattern_stops[first:end]
+            key = (shape_idx, stops.tobytes())
+            if key not in snapped:
+                snapped[key] = self._snap_to_shape(shape_idx, stops)
+            if snapped[key] is not None:
+                positions[first:end] = snapped[key]
+                matched += 1
+        self.pattern_stop_shape_pos = positions
+        self._record('shapes')['rows'] += len(snapped)
+        self.stats['shape_patterns'] = matched
+
+    def _snap_to_shape(self, shape_idx: int, stops: array) -> Optional[array]:
+        """Tramo de la shape (índice del punto inicial) de cada parada, o None.
+
+        Cada parada se busca hacia delante desde el tramo de la anterior, y
+        la búsqueda para en cuanto la shape se aleja MAX_SHAPE_SNAP_METERS
+        más allá del mejor tramo: así en las líneas circulares o que vuelven
+        por la misma calle no se salta a la pasada equivocada.
+        """
+        first, end = self.shape_point_offsets[shape_idx], self.shape_point_offsets[shape_idx + 1]
+        if end - first < 2:
+            return None
+        lats, lons = self.shape_lat, self.shape_lon
+        limit = self.MAX_SHAPE_SNAP_METERS / METERS_PER_DEGREE * 1e6  # En microgrados
+
+        positions = array('i')
+        segment = first
+        for stop_idx in stops:
+            info = self.stops_info.get(self.stop_ids[stop_idx])
+            if not info or not info[1]:
+                return None
+            # Plano local: longitudes escaladas por el coseno de la latitud
+            scale = math.cos(math.radians(info[1]))
+            px, py = info[2] * 1e6 * scale, info[1] * 1e6
+            best, best_segment = math.inf, segment
+            for k in range(segment, end - 1):
+                ax, ay = lons[k] * scale, lats[k]
+                dx, dy = lons[k + 1] * scale - ax, lats[k + 1] - ay
+                length2 = dx * dx + dy * dy
+                t = ((px - ax) * dx + (py - ay) * dy) / length2 if length2 else 0.0
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                distance = math.hypot(px - ax - t * dx, py - ay - t * dy)
+                if distance < best:
+                    best, best_segment = distance, k
+                elif best <= limit and distance > best + limit:
+                    break
+            if best > limit:
+                return None
+            positions.append(best_segment)
+            segment = best_segment
+        return positions
+
+    @staticmethod
+    def _accesses_query(prefix: Optional[str] = None) -> Tuple[str, Dict[str, object]]:
+        query = """
             SELECT id, stop_id, name, lat, lon
             FROM stop_access
-            WHERE stop_id LIKE 'METRO\\_%'
+            WHERE (stop_id LIKE 'METRO\\_%'
                OR stop_id LIKE 'ML\\_%'
                OR stop_id LIKE 'TMB\\_METRO\\_%'
                OR stop_id LIKE 'METRO\\_BILBAO\\_%'
                OR stop_id LIKE 'EUSKOTREN\\_%'
                OR stop_id LIKE 'FGC\\_%'
-               OR stop_id LIKE 'BCN\\_%'
-        """))
+               OR stop_id LIKE 'BCN\\_%')
+        """
+        params = {}
+        if prefix:
+            query += " AND stop_id LIKE :prefix ESCAPE '\\'"
+            params['prefix'] = _like_prefix(prefix)
+        return query, params
+
+    @_load_phase('accesses')
+    def _load_accesses(self, db_session: 'Session', prefix: Optional[str] = None, rows=None) -> None:
+        """9. Cargar accesos de Metro/Tren como puntos de entrada virtuales."""
+        print("  🚪 Cargando accesos (Metro Madrid, Ligero, Barcelona, Bilbao, Euskotren, FGC)...")
+        from adapters.http.api.gtfs.utils.shape_utils import haversine_distance
+
+        if rows is None:
+            rows = _execute(db_session, *self._accesses_query(prefix), record=self._record('accesses'))
+        self._record('accesses')['rows'] += len(rows)
 
         access_count = 0
         access_transfers = 0
 
-        for row in access_result:
+        for row in rows:
             access_id = row[0]
             station_id = row[1]  # e.g., METRO_SOL
             access_name = row[2]
@@ -431,6 +2278,7 @@ class GTFSStore:
 
             # Añadir a stops_info para que RAPTOR pueda usarlo
             self.stops_info[virtual_access_id] = (access_name, access_lat, access_lon)
+            _intern_id(self.stop_ids, self.stop_index, virtual_access_id)
             access_count += 1
 
             # Buscar plataformas de esta estación
@@ -478,126 +2326,137 @@ class GTFSStore:
         self.stats['access_transfers'] = access_transfers
         print(f"    ✓ {access_count:,} accesos cargados, {access_transfers:,} transfers creados")
 
-        # Limpiar memoria temporal
-        del trip_to_route
-        del temp_stop_times
+    # =========================================================================
+    # MÉTODOS DE ACCESO RÁPIDO PARA RAPTOR
+    # =========================================================================
 
-        # Convertir defaultdicts a dicts normales
-        self.patterns_by_stop = dict(self.patterns_by_stop)
-        self.transfers = dict(self.transfers)
+    def get_active_services(self, travel_date: date) -> FrozenSet[str]:
+        """Obtener service_ids activos para una fecha.
 
-        # Finalizar
-        self.is_loaded = True
-        self.last_loaded_date = date.today()
-        self.load_time_seconds = time.time() - start
+        Lookup en el calendario precompilado (sin SQL ni copias).
 
-        # Garbage collection optimization
-        gc.collect()
-        gc.freeze()  # Mueve objetos a generación permanente
+        Args:
+            travel_date: Fecha de viaje
 
-        print(f"✅ GTFS cargado en {self.load_time_seconds:.1f}s")
-        print(f"   Estadísticas: {self.stats}")
+        Returns:
+            Frozenset de service_ids activos
+        """
+        return self.calendar.active_services(travel_date)
 
-    # =========================================================================
-    # MÉTODOS DE ACCESO RÁPIDO PARA RAPTOR
-    # =========================================================================
+    def get_active_service_mask(self, travel_date: date) -> bytearray:
+        """Obtener máscara de servicios activos indexada por service_idx.
 
-    def _reload_calendars_if_needed(self) -> None:
-        """Recargar calendarios si el día cambió (Lazy Reload).
-
-        Esto soluciona el problema de que los calendarios se cargan con
-        date.today() al iniciar el servidor, y si el servidor se inició
-        ayer, los calendarios de hoy no están disponibles.
-        """
-        today = date.today()
-        if self.last_loaded_date is not None and self.last_loaded_date != today:
-            print(f"📅 Día cambió ({self.last_loaded_date} → {today}), recargando calendarios...")
-
-            try:
-                from core.database import SessionLocal
-                from sqlalchemy import text
-
-                db = SessionLocal()
-                try:
-                    # Limpiar calendarios actuales
-                    for day in self.services_by_weekday:
-                        self.services_by_weekday[day].clear()
-                    self.calendar_exceptions.clear()
-
-                    # Recargar calendarios
-                    result = db.execute(text("""
-                        SELECT service_id, monday, tuesday, wednesday, thursday, friday, saturday, sunday
-                        FROM gtfs_calendar
-                        WHERE start_date <= :today AND end_date >= :today
-                    """), {'today': today})
-
-                    calendar_count = 0
-                    for row in result:
-                        service_id = sys.intern(row[0])
-                        if row[1]: self.services_by_weekday['monday'].add(service_id)
-                        if row[2]: self.services_by_weekday['tuesday'].add(service_id)
-                        if row[3]: self.services_by_weekday['wednesday'].add(service_id)
-                        if row[4]: self.services_by_weekday['thursday'].add(service_id)
-                        if row[5]: self.services_by_weekday['friday'].add(service_id)
-                        if row[6]: self.services_by_weekday['saturday'].add(service_id)
-                        if row[7]: self.services_by_weekday['sunday'].add(service_id)
-                        calendar_count += 1
-
-                    # Recargar excepciones
-                    result = db.execute(text("""
-                        SELECT service_id, date, exception_type
-                        FROM gtfs_calendar_dates
-                    """))
-
-                    for row in result:
-                        service_id = sys.intern(row[0])
-                        date_str = str(row[1])
-                        exception_type = row[2]
-
-                        if date_str not in self.calendar_exceptions:
-                            self.calendar_exceptions[date_str] = {'added': set(), 'removed': set()}
-
-                        if exception_type == 1:
-                            self.calendar_exceptions[date_str]['added'].add(service_id)
-                        elif exception_type == 2:
-                            self.calendar_exceptions[date_str]['removed'].add(service_id)
-
-                    self.last_loaded_date = today
-                    self.stats['calendars'] = calendar_count
-                    print(f"    ✓ Calendarios recargados: {calendar_count} activos para {today}")
-
-                finally:
-                    db.close()
-
-            except Exception as e:
-                print(f"    ⚠️ Error recargando calendarios: {e}")
-
-    def get_active_services(self, travel_date: date) -> Set[str]:
-        """Obtener service_ids activos para una fecha.
+        La máscara se guarda en la vista del día (get_day_view).
+
+        Args:
+            travel_date: Fecha de viaje
+
+        Returns:
+            bytearray donde mask[service_idx] == 1 si el servicio está activo
+        """
+        return self.get_day_view(travel_date).service_mask
+
+    def roll_calendar(self, center: date) -> None:
+        """Desplazar la ventana del calendario y preparar las vistas del día.
+
+        Lo llama el scheduler antes de medianoche, de modo que la primera
+        request del día siguiente ya encuentra todo precalculado.
+        """
+        self.calendar.roll_to(center)
+        for travel_date in self.calendar.window_dates():
+            self.get_day_view(travel_date)
+            self.get_previous_day_view(travel_date)
+
+    def _service_mask(self, active_services: Set[str]) -> bytearray:
+        """Convertir un set de service_ids en máscara por service_idx."""
+        mask = bytearray(len(self.service_ids))
+        service_index = self.service_index
+        for service_id in active_services:
+            idx = service_index.get(service_id)
+            if idx is not None:
+                mask[idx] = 1
+        return mask
+
+    def get_day_view(self, travel_date: date) -> PatternDayView:
+        """Obtener la vista de patterns para una fecha (cacheada).
+
+        Se guardan las DAY_VIEW_CACHE_SIZE fechas usadas más recientemente;
+        cada vista se rellena por pattern según RAPTOR los va escaneando.
 
         Args:
             travel_date: Fecha de viaje
 
         Returns:
-            Set de service_ids activos
+            PatternDayView con los trips activos ese día
         """
-        # Lazy reload: recargar calendarios si el día cambió
-        self._reload_calendars_if_needed()
+        return self._cached_day_view(travel_date, 0)
+
+    def get_previous_day_view(self, travel_date: date) -> PatternDayView:
+        """Vista del día de servicio anterior a travel_date, en la hora de travel_date.
+
+        Solo contiene los trips de ayer que siguen circulando pasada la
+        medianoche (horas >= 24:00:00, ej. metro nocturno o servicios
+        ampliados de fin de semana), con sus horas menos SERVICE_DAY_SECONDS.
+        Cacheada como get_day_view.
+        """
+        return self._cached_day_view(travel_date - timedelta(days=1), SERVICE_DAY_SECONDS)
+
+    def _cached_day_view(self, service_date: date, shift: int) -> PatternDayView:
+        """Vista (service_date, shift) de la caché LRU, creándola si falta."""
+        key = (service_date, shift)
+        view = self._day_views.get(key)
+        if view is not None:
+            return view
+
+        service_mask = self._service_mask(self.calendar.active_services(service_date))
+        with self._day_views_lock:
+            view = self._day_views.get(key)
+            if view is None:
+                view = PatternDayView(self, service_date, service_mask, shift)
+                self._day_views[key] = view
+                while len(self._day_views) > self.DAY_VIEW_CACHE_SIZE:
+                    self._day_views.popitem(last=False)
+            return view
+
+    def get_earliest_trip_index(
+        self,
+        pattern_idx: int,
+        stop_index: int,
+        min_departure: int,
+        service_mask: bytearray
+    ) -> int:
+        """Encontrar el trip mas temprano de un pattern (versión por índices).
 
-        weekday = travel_date.weekday()
-        weekday_names = ['monday', 'tuesday', 'wednesday', 'thursday',
-                         'friday', 'saturday', 'sunday']
+        Recorre la columna de salidas de la parada dentro de la matriz
+        trip x parada del pattern; los trips están ordenados por salida.
+        Complejidad O(n): RAPTOR usa get_day_view().earliest_trip(), que
+        hace búsqueda binaria sobre los trips activos de la fecha.
 
-        active = self.services_by_weekday[weekday_names[weekday]].copy()
+        Args:
+            pattern_idx: Índice del pattern
+            stop_index: Indice de la parada en la secuencia del pattern
+            min_departure: Tiempo minimo de salida desde ESA parada
+            service_mask: Máscara de servicios activos (get_active_service_mask)
+
+        Returns:
+            Índice del primer trip valido, o -1
+        """
+        first_trip = self.pattern_trip_offsets[pattern_idx]
+        last_trip = self.pattern_trip_offsets[pattern_idx + 1]
+        n_stops = self.pattern_stop_offsets[pattern_idx + 1] - self.pattern_stop_offsets[pattern_idx]
+        if stop_index >= n_stops:
+            return -1
 
-        # Aplicar excepciones
-        date_str = travel_date.isoformat()
-        if date_str in self.calendar_exceptions:
-            exc = self.calendar_exceptions[date_str]
-            active.update(exc.get('added', set()))
-            active -= exc.get('removed', set())
+        departures = self.st_departure
+        trip_service = self.trip_service
+        pos = self.trip_offsets[first_trip] + stop_index
 
-        return active
+        for trip_idx in range(first_trip, last_trip):
+            if departures[pos] >= min_departure and service_mask[trip_service[trip_idx]]:
+                return trip_idx
+            pos += n_stops
+
+        return -1
 
     def get_earliest_trip(
         self,
@@ -608,7 +2467,7 @@ class GTFSStore:
     ) -> Optional[str]:
         """Encontrar el trip mas temprano en un PATTERN desde una parada especifica.
 
-        Esta es la operacion mas frecuente en RAPTOR.
+        Compatibilidad: RAPTOR usa get_day_view().earliest_trip().
         Complejidad: O(n) donde n = trips en el pattern.
 
         Args:
@@ -620,30 +2479,28 @@ class GTFSStore:
         Returns:
             trip_id del primer trip valido, o None
         """
-        trips = self.trips_by_pattern.get(pattern_id, [])
+        pattern_idx = self.pattern_index.get(pattern_id)
+        if pattern_idx is None:
+            return None
 
-        for _, trip_id in trips:
-            # Acceso directo por indice O(1)
-            # Todos los trips del pattern tienen la misma secuencia de paradas
-            try:
-                stop_time_data = self.stop_times_by_trip[trip_id][stop_index]
-                # stop_time_data es (stop_id, arrival, departure) -> index 2 es departure
-                real_departure = stop_time_data[2]
-            except (IndexError, KeyError):
-                continue
+        trip_idx = self.get_earliest_trip_index(
+            pattern_idx, stop_index, min_departure, self._service_mask(active_services)
+        )
+        return self.trip_ids[trip_idx] if trip_idx >= 0 else None
 
-            if real_departure >= min_departure:
-                # Verificar que el servicio esta activo
-                trip_info = self.trips_info.get(trip_id)
-                if trip_info and trip_info[2] in active_services:
-                    return trip_id
+    def get_stop_patterns(self, stop_idx: int) -> Tuple[int, ...]:
+        """Obtener índices de patterns que pasan por una parada (por índice).
 
-        return None
+        Complejidad: O(1)
+        """
+        if stop_idx < len(self.patterns_at_stop):
+            return self.patterns_at_stop[stop_idx]
+        return ()
 
     def get_patterns_at_stop(self, stop_id: str) -> Set[str]:
         """Obtener patterns que pasan por una parada.
 
-        Complejidad: O(1)
+        Complejidad: O(p) donde p = patterns en la parada
 
         Args:
             stop_id: ID de la parada
@@ -651,12 +2508,25 @@ class GTFSStore:
         Returns:
             Set de pattern_ids (vacio si no hay patterns)
         """
-        return self.patterns_by_stop.get(stop_id, set())
+        stop_idx = self.stop_index.get(stop_id)
+        if stop_idx is None:
+            return set()
+        return {self.pattern_ids[p] for p in self.get_stop_patterns(stop_idx)}
+
+    def get_pattern_stop_indexes(self, pattern_idx: int) -> array:
+        """Obtener secuencia de stop_idx de un pattern (por índice)."""
+        return self.pattern_stops[
+            self.pattern_stop_offsets[pattern_idx]:self.pattern_stop_offsets[pattern_idx + 1]
+        ]
+
+    def is_frequency_pattern(self, pattern_idx: int) -> bool:
+        """Si el pattern se recorre por frecuencias (trip plantilla + headways)."""
+        return self.pattern_headway_offsets[pattern_idx + 1] > self.pattern_headway_offsets[pattern_idx]
 
     def get_pattern_stops(self, pattern_id: str) -> List[str]:
         """Obtener secuencia de paradas de un pattern.
 
-        Complejidad: O(1)
+        Complejidad: O(n) donde n = paradas del pattern
 
         Args:
             pattern_id: ID del pattern
@@ -664,12 +2534,34 @@ class GTFSStore:
         Returns:
             Lista ordenada de stop_ids
         """
-        return self.stops_by_pattern.get(pattern_id, [])
+        pattern_idx = self.pattern_index.get(pattern_id)
+        if pattern_idx is None:
+            return []
+        stop_ids = self.stop_ids
+        return [stop_ids[s] for s in self.get_pattern_stop_indexes(pattern_idx)]
+
+    def get_pattern_trips(self, pattern_id: str) -> List[Tuple[int, str]]:
+        """Obtener trips de un pattern ordenados por hora de salida.
+
+        Args:
+            pattern_id: ID del pattern
+
+        Returns:
+            Lista de tuplas (departure_seconds, trip_id)
+        """
+        pattern_idx = self.pattern_index.get(pattern_id)
+        if pattern_idx is None:
+            return []
+        return [
+            (self.st_departure[self.trip_offsets[t]], self.trip_ids[t])
+            for t in range(self.pattern_trip_offsets[pattern_idx],
+                           self.pattern_trip_offsets[pattern_idx + 1])
+        ]
 
     def get_stop_times(self, trip_id: str) -> List[Tuple[str, int, int]]:
         """Obtener secuencia de paradas de un trip.
 
-        Complejidad: O(1)
+        Complejidad: O(n) donde n = paradas del trip
 
         Args:
             trip_id: ID del trip
@@ -677,7 +2569,14 @@ class GTFSStore:
         Returns:
             Lista de tuplas (stop_id, arrival_seconds, departure_seconds)
         """
-        return self.stop_times_by_trip.get(trip_id, [])
+        trip_idx = self.trip_index.get(trip_id)
+        if trip_idx is None:
+            return []
+        stop_ids = self.stop_ids
+        return [
+            (stop_ids[self.st_stop[pos]], self.st_arrival[pos], self.st_departure[pos])
+            for pos in range(self.trip_offsets[trip_idx], self.trip_offsets[trip_idx + 1])
+        ]
 
     def get_transfers(self, stop_id: str) -> List[Tuple[str, int]]:
         """Obtener transbordos desde una parada.
@@ -692,6 +2591,15 @@ class GTFSStore:
         """
         return self.transfers.get(stop_id, [])
 
+    def get_footpaths(self, stop_idx: int) -> List[Tuple[int, int]]:
+        """Obtener footpaths (cierre transitivo) desde una parada (por índice).
+
+        Returns:
+            Lista de tuplas (to_stop_idx, walk_seconds)
+        """
+        start, end = self.footpath_offsets[stop_idx], self.footpath_offsets[stop_idx + 1]
+        return list(zip(self.footpath_to[start:end], self.footpath_seconds[start:end]))
+
     def get_trip_info(self, trip_id: str) -> Optional[Tuple[str, Optional[str], str]]:
         """Obtener información de un trip.
 
@@ -701,7 +2609,14 @@ class GTFSStore:
         Returns:
             Tupla (route_id, headsign, service_id) o None
         """
-        return self.trips_info.get(trip_id)
+        trip_idx = self.trip_index.get(trip_id)
+        if trip_idx is None:
+            return None
+        return (
+            self.route_ids[self.trip_route[trip_idx]],
+            self.trip_headsigns[trip_idx],
+            self.service_ids[self.trip_service[trip_idx]],
+        )
 
     def get_stop_info(self, stop_id: str) -> Optional[Tuple[str, float, float]]:
         """Obtener información de una parada.
@@ -714,6 +2629,78 @@ class GTFSStore:
         """
         return self.stops_info.get(stop_id)
 
+    def get_stops_near(
+        self,
+        lat: float,
+        lon: float,
+        radius_meters: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[float, str]]:
+        """Paradas del índice espacial a menos de radius_meters de un punto.
+
+        Solo recorre las celdas que cubren el radio (sin SQL ni recorrer
+        stops_info).
+
+        Args:
+            lat, lon: Punto
+            radius_meters: Distancia máxima
+            limit: Devolver solo las limit más cercanas (None = todas)
+
+        Returns:
+            Lista de (distancia en metros, stop_id) ordenada por distancia
+        """
+        cell = self.STOP_GRID_CELL_DEGREES
+        dlat = radius_meters / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        stop_ids = self.stop_ids
+        stops_info = self.stops_info
+        grid = self.stop_grid
+
+        nearby: List[Tuple[float, str]] = []
+        for row in range(math.floor((lat - dlat) / cell), math.floor((lat + dlat) / cell) + 1):
+            for col in range(math.floor((lon - dlon) / cell), math.floor((lon + dlon) / cell) + 1):
+                for stop_idx in grid.get((row, col), ()):
+                    stop_id = stop_ids[stop_idx]
+                    _, stop_lat, stop_lon = stops_info[stop_id]
+                    distance = _distance_meters(lat, lon, stop_lat, stop_lon)
+                    if distance <= radius_meters:
+                        nearby.append((distance, stop_id))
+        nearby.sort()
+        return nearby if limit is None else nearby[:limit]
+
+    def get_shape_segment(self, trip_id: str, board_pos: int, alight_pos: int) -> List[Tuple[float, float]]:
+        """Puntos de la shape de un trip entre dos de sus paradas.
+
+        Las paradas se dan por su posición en el pattern del trip
+        (JourneyLeg.board_pos / alight_pos) y no por ID: una línea circular
+        pasa dos veces por la misma parada. Las posiciones de las paradas
+        sobre la shape están precalculadas (pattern_stop_shape_pos), así que
+        es un slice de las columnas.
+
+        Args:
+            trip_id: ID del trip
+            board_pos: Posición de la parada de subida en el pattern
+            alight_pos: Posición de la parada de bajada (posterior)
+
+        Returns:
+            Lista de (lat, lon) entre las dos paradas, sin incluirlas (vacía
+            si el pattern no tiene shape o las posiciones no son válidas)
+        """
+        trip_idx = self.trip_index.get(trip_id)
+        pattern_idx = self.trip_pattern[trip_idx] if trip_idx is not None else -1
+        if pattern_idx < 0:
+            return []
+        first, end = self.pattern_stop_offsets[pattern_idx], self.pattern_stop_offsets[pattern_idx + 1]
+        positions = self.pattern_stop_shape_pos
+        if first == end or positions[first] < 0 or not 0 <= board_pos < alight_pos < end - first:
+            return []
+
+        start, stop = positions[first + board_pos] + 1, positions[first + alight_pos] + 1
+        return [
+            (lat / 1e6, lon / 1e6)
+            for lat, lon in zip(self.shape_lat[start:stop], self.shape_lon[start:stop])
+        ]
+
     def get_route_info(self, route_id: str) -> Optional[Tuple[str, Optional[str], int]]:
         """Obtener información de una ruta.
 
@@ -737,5 +2724,19 @@ class GTFSStore:
         return self.children_by_parent.get(stop_id, [])
 
 
-# Singleton global para importación directa
-gtfs_store = GTFSStore.get_instance()
+class _CurrentStore:
+    """Referencia que siempre delega en el store publicado actualmente.
+
+    Útil para accesos puntuales (p.ej. resolver andenes en un router). Para
+    una consulta completa conviene fijar una generación con
+    GTFSStore.get_instance() y usar esa instancia hasta el final.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str):
+        return getattr(GTFSStore.get_instance(), name)
+
+
+# Singleton global para importación directa (sigue las recargas)
+gtfs_store = _CurrentStore()
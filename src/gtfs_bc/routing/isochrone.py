@@ -0,0 +1,182 @@
+"""Isochrones: where can I get in N minutes from a stop or a point.
+
+RaptorAlgorithm.plan_isochrone() gives the earliest arrival at every stop
+within a time budget (one-to-all RAPTOR). This module adds what the
+isochrone endpoint needs around it:
+
+- Departure buckets: departures are rounded down to ISOCHRONE_BUCKET_SECONDS
+  so nearby requests share one run
+- IsochroneCache: LRU of runs keyed by store generation, realtime overlay
+  version, origin, bucket, date and budget (a reload or new delays change
+  the key, so old runs are never served)
+- Coordinate origins: stops within walking distance of a point (from the
+  store's spatial index), with their walking time, as RAPTOR origins
+- Contours: for each requested budget, a GeoJSON MultiPolygon with a
+  walking circle around every stop reached in time (radius = the time
+  left, capped). Built from the stop points only, no street network.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, time
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from src.gtfs_bc.routing.gtfs_store import METERS_PER_DEGREE, GTFSStore
+from src.gtfs_bc.routing.raptor import WALKING_SPEED_KMH
+from src.gtfs_bc.routing.realtime_overlay import realtime_overlay
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+ISOCHRONE_BUCKET_SECONDS = 300  # Departures in the same 5 minutes share a run
+ISOCHRONE_CACHE_SIZE = 256  # Runs kept per process
+ACCESS_RADIUS_METERS = 800  # Stops used as origins around a coordinate
+ACCESS_MAX_STOPS = 8  # Nearest stops used as journey origins/destinations around a coordinate
+CONTOUR_MAX_WALK_METERS = 500  # Walking radius around a stop in a contour
+CONTOUR_CIRCLE_POINTS = 12  # Vertices of each walking circle
+
+WALKING_SPEED_MPS = WALKING_SPEED_KMH / 3.6
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class IsochroneCache:
+    """Thread-safe LRU of isochrone runs.
+
+    Keys must include the store generation: entries of older generations
+    are simply never hit again and age out of the LRU.
+    """
+
+    def __init__(self, max_size: int = ISOCHRONE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by every request of this worker
+isochrone_cache = IsochroneCache()
+
+
+def bucket_departure(departure_time: time) -> time:
+    """Round a departure down to the start of its bucket."""
+    seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+    seconds -= seconds % ISOCHRONE_BUCKET_SECONDS
+    return time(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+
+
+def cache_key(
+    store: GTFSStore,
+    origin: Hashable,
+    departure_time: time,
+    travel_date: date,
+    max_minutes: int,
+    max_transfers: int
+) -> Tuple:
+    """Cache key of a run (departure_time already bucketed)."""
+    return (store.generation, realtime_overlay.version, origin, departure_time, travel_date,
+            max_minutes, max_transfers)
+
+
+# =============================================================================
+# Geometry
+# =============================================================================
+
+def stops_near(
+    store: GTFSStore,
+    lat: float,
+    lon: float,
+    radius_meters: float = ACCESS_RADIUS_METERS,
+    limit: Optional[int] = None
+) -> Dict[str, int]:
+    """Stops within walking distance of a point, with their walking time.
+
+    Looked up in the store's spatial index (no SQL). Virtual access stops
+    are included: their footpaths lead to the platforms.
+
+    Args:
+        limit: Keep only the nearest limit stops (None = every stop in range)
+
+    Returns:
+        {stop_id: walk_seconds}
+    """
+    return {
+        stop_id: int(distance / WALKING_SPEED_MPS)
+        for distance, stop_id in store.get_stops_near(lat, lon, radius_meters, limit)
+    }
+
+
+def walking_circle(lat: float, lon: float, radius_meters: float) -> List[List[float]]:
+    """Closed GeoJSON ring ([lon, lat] pairs) approximating a circle."""
+    dlat = radius_meters / METERS_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    ring = []
+    for i in range(CONTOUR_CIRCLE_POINTS):
+        angle = 2 * math.pi * i / CONTOUR_CIRCLE_POINTS
+        ring.append([round(lon + dlon * math.cos(angle), 6), round(lat + dlat * math.sin(angle), 6)])
+    ring.append(ring[0])
+    return ring
+
+
+def build_contours(
+    points: Iterable[Tuple[float, float, int]],
+    departure_seconds: int,
+    contour_minutes: List[int]
+) -> dict:
+    """GeoJSON FeatureCollection with one MultiPolygon per contour.
+
+    Args:
+        points: (lat, lon, arrival_seconds) of the stops reached
+        departure_seconds: Departure of the run
+        contour_minutes: Budgets to draw, e.g. [30, 45, 60]
+
+    Returns:
+        FeatureCollection, largest contour first so smaller ones render on top
+    """
+    points = list(points)
+    features = []
+    for minutes in sorted(set(contour_minutes), reverse=True):
+        limit = departure_seconds + minutes * 60
+        polygons = []
+        for lat, lon, arrival_time in points:
+            if arrival_time > limit:
+                continue
+            radius = min((limit - arrival_time) * WALKING_SPEED_MPS, CONTOUR_MAX_WALK_METERS)
+            if radius > 0:
+                polygons.append([walking_circle(lat, lon, radius)])
+        features.append({
+            "type": "Feature",
+            "properties": {"minutes": minutes, "stops": len(polygons)},
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+        })
+    return {"type": "FeatureCollection", "features": features}
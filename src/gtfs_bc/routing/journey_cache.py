@@ -0,0 +1,256 @@
+"""Journey result cache.
+
+Popular OD pairs are planned over and over with nearly the same departure.
+JourneyCache keeps the solver result (the Journey list, before formatting:
+alerts stay live) keyed by:
+
+- the store data version: the snapshot file identity when the store is
+  attached from a snapshot (the same in every worker that attached it),
+  otherwise the store's random load_id and generation (PIDs and
+  generations repeat across hosts sharing Redis). A reload changes it,
+  so old results are never served again.
+- the version of the realtime delay overlay, derived from the content of
+  the updates (the same in every worker that published the same updates)
+- an epoch, bumped by invalidate() to drop every result of this process
+- the solver method, expanded origins and destinations (with their
+  access/egress walks in coordinate queries), the departure rounded down
+  to JOURNEY_BUCKET_SECONDS, date, max_transfers and window
+
+Backends:
+
+- Memory (default): LRU with a TTL, per worker.
+- Redis (JOURNEY_CACHE_REDIS_URL): shared by every worker, entries expire
+  with the TTL. The epoch is local to each process, so after an
+  invalidate() other workers may serve an older result for up to the TTL.
+  Redis errors count as misses; the query is solved as usual.
+
+Hits, misses and the solver time saved (the original solve time of every
+hit) are reported by status(), shown in /health.
+"""
+
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from datetime import time as dtime
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.realtime_overlay import realtime_overlay
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+JOURNEY_BUCKET_SECONDS = 60  # Departures in the same minute share a result
+JOURNEY_CACHE_SIZE = 2048  # Entries kept per process (memory backend)
+JOURNEY_CACHE_TTL_SECONDS = 60
+REDIS_KEY_PREFIX = "raptor:journeys:"
+
+# A cached result: (solver result, seconds it took to solve)
+CacheEntry = Tuple[Any, float]
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+class MemoryJourneyBackend:
+    """Thread-safe LRU with a TTL."""
+
+    def __init__(self, max_size: int = JOURNEY_CACHE_SIZE, ttl_seconds: float = JOURNEY_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, Tuple[float, CacheEntry]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisJourneyBackend:
+    """Entries pickled under REDIS_KEY_PREFIX + a hash of the key, with a TTL."""
+
+    def __init__(self, url: str, ttl_seconds: float = JOURNEY_CACHE_TTL_SECONDS):
+        import redis  # Optional: only needed with JOURNEY_CACHE_REDIS_URL
+
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.5)
+
+    @staticmethod
+    def _redis_key(key: Hashable) -> str:
+        return REDIS_KEY_PREFIX + hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        data = self._client.get(self._redis_key(key))
+        return pickle.loads(data) if data is not None else None
+
+    def put(self, key: Hashable, entry: CacheEntry) -> None:
+        self._client.set(
+            self._redis_key(key), pickle.dumps(entry, pickle.HIGHEST_PROTOCOL),
+            ex=max(int(self.ttl_seconds), 1)
+        )
+
+    def clear(self) -> None:
+        # Other processes' entries are left to expire (see module docstring)
+        pass
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+def store_version(store: GTFSStore) -> Tuple:
+    """Identity of the store data, valid across processes when possible."""
+    if store.snapshot_info:
+        return ("snapshot",) + tuple(store.snapshot_info["file_id"])
+    return ("load", store.load_id, store.generation)
+
+
+def bucket_departure(departure_time: dtime) -> dtime:
+    """Round a departure down to the start of its bucket."""
+    seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+    seconds -= seconds % JOURNEY_BUCKET_SECONDS
+    return dtime(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+
+
+class JourneyCache:
+    """Solver results in front of RaptorService.plan_journey."""
+
+    def __init__(self):
+        self._backend = MemoryJourneyBackend()
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.epoch = 0
+        # Counters since start
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def backend(self) -> str:
+        return "redis" if isinstance(self._backend, RedisJourneyBackend) else "memory"
+
+    def configure(
+        self,
+        max_size: int = JOURNEY_CACHE_SIZE,
+        ttl_seconds: float = JOURNEY_CACHE_TTL_SECONDS,
+        redis_url: str = ""
+    ) -> None:
+        """Pick the backend (max_size 0 disables the cache)."""
+        self.enabled = max_size > 0
+        self._backend = MemoryJourneyBackend(max(max_size, 1), ttl_seconds)
+        if self.enabled and redis_url:
+            try:
+                backend = RedisJourneyBackend(redis_url, ttl_seconds)
+                backend._client.ping()
+                self._backend = backend
+            except Exception as e:
+                logger.warning(f"Journey cache: Redis unavailable ({e}), using memory")
+        logger.info(f"Journey cache: {self.backend if self.enabled else 'disabled'}, TTL {ttl_seconds:g}s")
+
+    def key(
+        self,
+        store: GTFSStore,
+        method: str,
+        multi_criteria: bool,
+        origins: Sequence[str],
+        destinations: Sequence[str],
+        departure_time: dtime,
+        travel_date: date,
+        max_transfers: int,
+        window_minutes: Optional[int] = None,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
+    ) -> Tuple:
+        """Cache key of a query (departure_time already bucketed)."""
+        return (
+            store_version(store), realtime_overlay.version, self.epoch, method, multi_criteria,
+            tuple(sorted(origins)), tuple(sorted(destinations)),
+            departure_time.isoformat(), travel_date.isoformat(), max_transfers, window_minutes,
+            tuple(sorted(access_seconds.items())) if access_seconds else None,
+            tuple(sorted(egress_seconds.items())) if egress_seconds else None,
+        )
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Cached solver result, or None."""
+        if not self.enabled:
+            return None
+        try:
+            entry = self._backend.get(key)
+        except Exception as e:
+            logger.warning(f"Journey cache read failed: {e}")
+            entry = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry[1]
+        return entry[0]
+
+    def put(self, key: Tuple, result: Any, solve_seconds: float) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._backend.put(key, (result, solve_seconds))
+        except Exception as e:
+            logger.warning(f"Journey cache write failed: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def invalidate(self) -> None:
+        """Drop every result of this process."""
+        with self._lock:
+            self.epoch += 1
+        self._backend.clear()
+
+    def status(self) -> Dict[str, Any]:
+        """Cache state for /health."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "entries": len(self._backend) if self.backend == "memory" else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "saved_seconds": round(self.saved_seconds, 1),
+            "errors": self.errors,
+        }
+
+
+# Process-wide cache (configured by the app lifespan)
+journey_cache = JourneyCache()
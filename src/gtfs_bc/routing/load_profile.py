@@ -0,0 +1,222 @@
+"""Perfil de carga y memoria estimada del GTFSStore.
+
+LoadProfile mide cada fase de una carga separando el tiempo de SQL (espera
+de filas de la BD) del tiempo de construcción en Python, junto con las
+filas procesadas. estimate_memory() recorre las estructuras de un store
+con sys.getsizeof y reparte los bytes por estructura; los strings se
+cuentan una sola vez (están internados y compartidos entre estructuras).
+
+Ambos se exponen en /health y en GET /admin/gtfs-store/profile para
+dimensionar hosts y detectar regresiones al añadir operadores.
+"""
+
+import os
+import sys
+from array import array
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, Iterator
+
+if TYPE_CHECKING:
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso en MB (0 si no se puede leer)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso en MB (VmHWM)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except (ImportError, OSError):
+        return 0.0
+
+
+def reset_peak_rss() -> bool:
+    """Reiniciar VmHWM para medir el pico de una carga concreta (Linux).
+
+    Si no se puede, el pico medido es el de toda la vida del proceso.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class LoadProfile:
+    """Tiempos y filas por fase de una carga del store.
+
+    Cada fase acumula:
+    - rows: filas leídas de la BD (o elementos procesados)
+    - query_seconds: tiempo esperando a la BD (en carga paralela, el de la
+      conexión que leyó la tabla; se solapa con otras fases)
+    - wait_seconds: carga paralela, tiempo que el hilo principal espera a
+      que otra conexión termine de leer
+    - build_seconds: tiempo de Python construyendo estructuras
+    """
+
+    def __init__(self, mode: str, workers: int = 1):
+        self.mode = mode
+        self.workers = workers
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._start = perf_counter()
+        self.total_seconds = 0.0
+
+    def record(self, name: str) -> Dict[str, float]:
+        """Registro de la fase name (se crea vacío la primera vez)."""
+        record = self.phases.get(name)
+        if record is None:
+            record = self.phases[name] = {
+                'rows': 0, 'query_seconds': 0.0, 'wait_seconds': 0.0, 'build_seconds': 0.0,
+            }
+        return record
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, float]]:
+        """Medir una fase; el tiempo de query y espera registrado dentro se descuenta."""
+        record = self.record(name)
+        outside_before = record['query_seconds'] + record['wait_seconds']
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = perf_counter() - start
+            outside = record['query_seconds'] + record['wait_seconds'] - outside_before
+            record['build_seconds'] += max(0.0, elapsed - outside)
+
+    def finish(self) -> Dict[str, object]:
+        """Cerrar el perfil y devolverlo como dict serializable."""
+        self.total_seconds = perf_counter() - self._start
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'total_seconds': round(self.total_seconds, 3),
+            'query_seconds': round(sum(p['query_seconds'] for p in self.phases.values()), 3),
+            'build_seconds': round(sum(p['build_seconds'] for p in self.phases.values()), 3),
+            'phases': {
+                name: {
+                    'rows': int(p['rows']),
+                    'query_seconds': round(p['query_seconds'], 3),
+                    'wait_seconds': round(p['wait_seconds'], 3),
+                    'build_seconds': round(p['build_seconds'], 3),
+                }
+                for name, p in self.phases.items()
+            },
+        }
+
+
+# Estructuras del store agrupadas por categoría para estimate_memory
+MEMORY_STRUCTURES = {
+    'stop_times': ('st_stop', 'st_arrival', 'st_departure', 'trip_offsets'),
+    'trips': ('trip_route', 'trip_service', 'trip_pattern', 'trip_ids', 'trip_index', 'trip_headsigns'),
+    'patterns': ('pattern_route', 'pattern_stop_offsets', 'pattern_stops', 'pattern_trip_offsets',
+                 'pattern_ids', 'pattern_index', 'patterns_at_stop'),
+    'frequencies': ('pattern_headway_offsets', 'headway_start', 'headway_end', 'headway_secs', 'headway_days'),
+    'shapes': ('shape_ids', 'shape_index', 'shape_point_offsets', 'shape_lat', 'shape_lon',
+               'pattern_shape', 'pattern_stop_shape_pos'),
+    'transfers': ('transfers', 'footpath_offsets', 'footpath_to', 'footpath_seconds',
+                  'footpath_in_offsets', 'footpath_from', 'footpath_in_seconds'),
+    'stops': ('stop_ids', 'stop_index', 'stops_info', 'children_by_parent', 'stop_grid'),
+    'routes': ('route_ids', 'route_index', 'routes_info'),
+    'calendar': ('service_ids', 'service_index', 'service_calendars', 'calendar_exceptions'),
+}
+
+
+class _SizeWalker:
+    """Recorrido sys.getsizeof que cuenta cada objeto una vez.
+
+    Los str se acumulan aparte (strings_bytes); los buffers mapeados del
+    snapshot (memoryview) se cuentan como mapped_bytes, ya que son páginas
+    del fichero compartidas entre procesos y no memoria privada.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.strings_bytes = 0
+        self.mapped_bytes = 0
+
+    def size(self, obj) -> int:
+        total = 0
+        stack = [obj]
+        seen = self.seen
+        while stack:
+            item = stack.pop()
+            if item is None or isinstance(item, (bool, int, float)):
+                continue
+            key = id(item)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if isinstance(item, str):
+                self.strings_bytes += sys.getsizeof(item)
+            elif isinstance(item, memoryview):
+                self.mapped_bytes += item.nbytes
+            elif isinstance(item, (array, bytes, bytearray)):
+                total += sys.getsizeof(item)
+            elif isinstance(item, dict):
+                total += sys.getsizeof(item)
+                stack.extend(item.keys())
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                total += sys.getsizeof(item)
+                stack.extend(item)
+            elif hasattr(item, '__slots__'):
+                total += sys.getsizeof(item)
+                stack.extend(getattr(item, name, None) for name in item.__slots__)
+            else:
+                total += sys.getsizeof(item)
+        return total
+
+
+def estimate_memory(store: 'GTFSStore') -> Dict[str, object]:
+    """Estimar los bytes de cada estructura del store (recorrido sizeof).
+
+    Cuesta del orden de un segundo con el dataset completo: se calcula a
+    demanda y el store lo guarda (GTFSStore.memory_report).
+    """
+    start = perf_counter()
+    walker = _SizeWalker()
+    structures = {}
+    for category, names in MEMORY_STRUCTURES.items():
+        structures[category] = sum(walker.size(getattr(store, name, None)) for name in names)
+
+    with store._day_views_lock:
+        views = list(store._day_views.values())
+    structures['day_views'] = sum(
+        walker.size(view.service_mask) + walker.size(view._trips) + walker.size(view._deps)
+        + walker.size(view._arrs) + walker.size(view._arr_cols)
+        for view in views
+    )
+
+    private_bytes = sum(structures.values()) + walker.strings_bytes
+    return {
+        'structures_bytes': structures,
+        'strings_bytes': walker.strings_bytes,
+        'mapped_bytes': walker.mapped_bytes,
+        'private_bytes': private_bytes,
+        'private_mb': round(private_bytes / (1024 * 1024), 1),
+        'rss_mb': round(rss_mb(), 1),
+        'walk_seconds': round(perf_counter() - start, 3),
+    }
@@ -0,0 +1,462 @@
+"""McRAPTOR: multi-criteria RAPTOR with walking time as a third criterion.
+
+RaptorAlgorithm keeps one label per stop and round, so it optimises
+arrival time and number of transfers only. McRAPTOR keeps a *bag* of
+labels per stop and round: every label that is not dominated in
+(arrival time, walking seconds). The number of transfers is still given
+by the round, so the journeys returned are Pareto-optimal over
+
+- arrival time (minimize)
+- transfers (minimize)
+- walking time (minimize)
+
+Based on the McRAPTOR variant in "Round-Based Public Transit Routing"
+(Delling et al., 2012), section 4.
+
+Pruning:
+- A label is discarded if a label of the same stop from this or an
+  earlier round (fewer or equal transfers) dominates it (best bag).
+- Target pruning: a label is discarded if a journey already found at the
+  destination dominates it.
+- Bags are capped (MC_MAX_BAG_SIZE labels per stop and round and
+  MC_MAX_ROUTE_BAG_SIZE trips while scanning a pattern) so the latency
+  stays bounded on the national network. When a bag overflows, the label
+  closest in arrival time to its neighbour is dropped; the fastest and
+  the least-walking labels are always kept.
+"""
+
+from bisect import bisect_left
+from datetime import date, time
+from typing import Dict, List, Optional, Union
+
+from src.gtfs_bc.routing.raptor import (
+    MAX_ROUNDS,
+    TRANSFER_PENALTY_SECONDS,
+    Journey,
+    JourneyLeg,
+    RaptorAlgorithm,
+    RaptorStats,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+MC_MAX_BAG_SIZE = 6  # Labels kept per stop and round
+MC_MAX_ROUTE_BAG_SIZE = 6  # Boarded trips kept while scanning a pattern
+
+
+# =============================================================================
+# Data Structures
+# =============================================================================
+
+class McLabel:
+    """Label in a McRAPTOR bag.
+
+    Journeys are rebuilt by following `parent`: a transit label points to
+    the label it boarded from, a walking label to the label it walked from,
+    and origin labels have no parent.
+    """
+
+    __slots__ = ('arrival_time', 'walking_seconds', 'stop_id', 'parent',
+                 'trip_idx', 'departure_time', 'is_transfer', 'board_pos', 'alight_pos')
+
+    def __init__(
+        self,
+        arrival_time: int,
+        walking_seconds: int,
+        stop_id: str,
+        parent: Optional['McLabel'] = None,
+        trip_idx: int = -1,
+        departure_time: int = 0,
+        is_transfer: bool = False,
+        board_pos: int = -1,
+        alight_pos: int = -1
+    ):
+        self.arrival_time = arrival_time
+        self.walking_seconds = walking_seconds  # Walking legs (including the transfer penalty)
+        self.stop_id = stop_id
+        self.parent = parent
+        self.trip_idx = trip_idx  # Transit labels: trip ridden to this stop
+        self.departure_time = departure_time  # Transit labels: departure at the boarding stop
+        self.is_transfer = is_transfer
+        # Transit labels: positions of the boarding stop and of this stop in
+        # the trip's pattern (a loop visits a stop more than once)
+        self.board_pos = board_pos
+        self.alight_pos = alight_pos
+
+
+def _dominated(bag: List[McLabel], arrival_time: int, walking_seconds: int) -> bool:
+    """True if a label of the bag is at least as good in both criteria."""
+    for other in bag:
+        if other.arrival_time <= arrival_time and other.walking_seconds <= walking_seconds:
+            return True
+    return False
+
+
+def _merge(bag: List[McLabel], label: McLabel, max_size: int) -> None:
+    """Add a non-dominated label to a bag, dropping what it dominates."""
+    arrival_time = label.arrival_time
+    walking_seconds = label.walking_seconds
+    bag[:] = [
+        other for other in bag
+        if not (arrival_time <= other.arrival_time and walking_seconds <= other.walking_seconds)
+    ]
+    bag.append(label)
+    if len(bag) > max_size:
+        _thin(bag)
+
+
+def _thin(bag: List[McLabel]) -> None:
+    """Drop one label from an overflowing bag.
+
+    A Pareto bag sorted by arrival has walking decreasing; the first
+    (fastest) and last (least walking) labels are kept and the interior
+    label closest in arrival time to the previous one is dropped.
+    """
+    bag.sort(key=lambda label: label.arrival_time)
+    drop = min(
+        range(1, len(bag) - 1),
+        key=lambda i: bag[i].arrival_time - bag[i - 1].arrival_time
+    )
+    del bag[drop]
+
+
+def _add_to_route_bag(route_bag: List[tuple], entry: tuple, max_size: int) -> List[tuple]:
+    """Add a (trip key, walking seconds, ...) entry to a route bag if not dominated.
+
+    The trip key orders the trips of a FIFO pattern (position in the group,
+    or departure of a frequency run): a lower key arrives no later anywhere.
+    Returns the new bag.
+    """
+    if any(other[0] <= entry[0] and other[1] <= entry[1] for other in route_bag):
+        return route_bag
+    route_bag = [
+        other for other in route_bag
+        if not (entry[0] <= other[0] and entry[1] <= other[1])
+    ]
+    route_bag.append(entry)
+    if len(route_bag) > max_size:
+        # Keep the earliest trips
+        route_bag.sort(key=lambda e: (e[0], e[1]))
+        del route_bag[max_size:]
+    return route_bag
+
+
+# =============================================================================
+# McRAPTOR Algorithm
+# =============================================================================
+
+class McRaptorAlgorithm(RaptorAlgorithm):
+    """Multi-criteria RAPTOR journey planner (arrival, transfers, walking).
+
+    Same inputs and outputs as RaptorAlgorithm.plan; the journeys returned
+    may include slower alternatives that walk less.
+    """
+
+    def __init__(self, db=None, store=None, max_bag_size: int = MC_MAX_BAG_SIZE,
+                 max_route_bag_size: int = MC_MAX_ROUTE_BAG_SIZE):
+        super().__init__(db, store=store)
+        self.max_bag_size = max(2, max_bag_size)
+        self.max_route_bag_size = max(1, max_route_bag_size)
+
+    def plan(
+        self,
+        origin_stop_id: Union[str, List[str]],
+        destination_stop_id: Union[str, List[str]],
+        departure_time: time,
+        travel_date: date,
+        max_transfers: int = 3,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
+    ) -> List[Journey]:
+        """Find journeys that are Pareto-optimal in arrival, transfers and walking.
+
+        Args:
+            origin_stop_id: Starting stop ID or list of IDs (for multi-platform stations)
+            destination_stop_id: Destination stop ID or list of IDs
+            departure_time: Earliest departure time
+            travel_date: Date of travel
+            max_transfers: Maximum number of transfers allowed
+            access_seconds, egress_seconds: Walks from/to the query points
+                (coordinate queries, see RaptorAlgorithm.plan); they count
+                as walking
+
+        Returns:
+            Pareto-optimal journeys sorted by arrival time
+        """
+        valid_origins, valid_destinations = self._prepare(
+            origin_stop_id, destination_stop_id, travel_date, access_seconds, egress_seconds
+        )
+        stop_index = self.store.stop_index
+
+        departure_seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        rounds = min(max_transfers + 1, MAX_ROUNDS)
+        self.stats = RaptorStats()
+        bags = self._run_mc_raptor(valid_origins, valid_destinations, departure_seconds, rounds)
+
+        journeys: List[Journey] = []
+        for k, round_bags in enumerate(bags):
+            for dest_id in valid_destinations:
+                egress = self._egress.get(stop_index[dest_id], 0)
+                for label in round_bags.get(dest_id, ()):
+                    legs = self._mc_legs(label)
+                    if legs:
+                        legs = self._add_point_legs(legs, departure_seconds, stop_index[dest_id])
+                        journeys.append(Journey(
+                            departure_time=departure_seconds,
+                            arrival_time=label.arrival_time + egress,
+                            transfers=max(0, k - 1),
+                            legs=legs
+                        ))
+
+        return self._mc_pareto_filter(journeys)
+
+    def _run_mc_raptor(
+        self,
+        origin_stop_ids: List[str],
+        destination_stop_ids: List[str],
+        departure_seconds: int,
+        max_rounds: int
+    ) -> List[Dict[str, List[McLabel]]]:
+        """Run McRAPTOR.
+
+        Args:
+            origin_stop_ids: List of starting stops (multi-origin for platforms)
+            destination_stop_ids: List of destination stops
+            departure_seconds: Departure time in seconds since midnight
+            max_rounds: Maximum number of rounds (transfers + 1)
+
+        Returns:
+            bags[k][stop_id] = labels created in round k at the stop
+        """
+        store = self.store
+        max_bag = self.max_bag_size
+        destinations = set(destination_stop_ids)
+        access_seconds = self._access_seconds or {}
+        egress = self._egress
+
+        bags: List[Dict[str, List[McLabel]]] = [{} for _ in range(max_rounds + 1)]
+        # Best labels per stop over all rounds so far, for pruning
+        best_bags: Dict[str, List[McLabel]] = {}
+        # Labels that reached a destination, for target pruning
+        target_bag: List[McLabel] = []
+
+        def insert(k: int, label: McLabel) -> bool:
+            """Add a label to round k if no better one exists; True if added."""
+            arrival_time = label.arrival_time
+            walking_seconds = label.walking_seconds
+            if _dominated(target_bag, arrival_time, walking_seconds):
+                return False
+            best = best_bags.get(label.stop_id)
+            if best is None:
+                best = best_bags[label.stop_id] = []
+            elif _dominated(best, arrival_time, walking_seconds):
+                return False
+            bag = bags[k].setdefault(label.stop_id, [])
+            if _dominated(bag, arrival_time, walking_seconds):
+                return False  # Thinned out of the best bag but still in this round
+            _merge(best, label, max_bag)
+            _merge(bag, label, max_bag)
+            if label.stop_id in destinations:
+                # Compared with the egress walk to the destination point
+                egress_seconds = egress.get(stop_index[label.stop_id], 0)
+                if egress_seconds:
+                    label = McLabel(arrival_time + egress_seconds, walking_seconds + egress_seconds, label.stop_id)
+                _merge(target_bag, label, max_bag)
+            return True
+
+        # Round 0: origins and initial footpaths (transitively closed in GTFSStore)
+        stop_ids = store.stop_ids
+        stop_index = store.stop_index
+        marked_stops = set()
+        for origin_id in origin_stop_ids:
+            access = access_seconds.get(origin_id, 0)
+            if insert(0, McLabel(departure_seconds + access, access, origin_id)):
+                marked_stops.add(origin_id)
+        for origin_id in origin_stop_ids:
+            for origin_label in list(bags[0].get(origin_id, ())):
+                for to_idx, walk_seconds in store.get_footpaths(stop_index[origin_id]):
+                    cost = walk_seconds + TRANSFER_PENALTY_SECONDS
+                    if insert(0, McLabel(departure_seconds + cost, cost, stop_ids[to_idx],
+                                         parent=origin_label, is_transfer=True)):
+                        marked_stops.add(stop_ids[to_idx])
+
+        for k in range(1, max_rounds + 1):
+            if not marked_stops:
+                break
+
+            # Step 1: scan the patterns that serve marked stops
+            patterns_to_scan = set()
+            for stop_id in marked_stops:
+                stop_idx = stop_index.get(stop_id)
+                if stop_idx is not None:
+                    patterns_to_scan.update(store.get_stop_patterns(stop_idx))
+
+            self.stats.rounds += 1
+            self.stats.patterns_scanned += len(patterns_to_scan)
+            scanned_stops = set()
+            for pattern_idx in patterns_to_scan:
+                self._scan_pattern_mc(pattern_idx, k, bags[k - 1], marked_stops, insert, scanned_stops)
+
+            # Step 2: footpaths from the labels created by riding in this round
+            walked_stops = set()
+            for stop_id in scanned_stops:
+                sources = [label for label in bags[k].get(stop_id, ()) if not label.is_transfer]
+                for to_idx, walk_seconds in store.get_footpaths(stop_index[stop_id]):
+                    cost = walk_seconds + TRANSFER_PENALTY_SECONDS
+                    for label in sources:
+                        if insert(k, McLabel(label.arrival_time + cost, label.walking_seconds + cost,
+                                             stop_ids[to_idx], parent=label, is_transfer=True)):
+                            walked_stops.add(stop_ids[to_idx])
+
+            marked_stops = scanned_stops | walked_stops
+            self.stats.stops_improved += len(marked_stops)
+
+        return bags
+
+    def _scan_pattern_mc(self, pattern_idx: int, k: int, prev_bags: Dict[str, List[McLabel]],
+                         marked_stops: set, insert, improved_stops: set) -> None:
+        """Scan one pattern with a route bag of boarded trips.
+
+        The route bag holds (trip position, walking seconds, boarding label,
+        departure, boarding position) entries. Patterns are FIFO, so an earlier trip arrives
+        no later at every following stop: an entry dominates another if its
+        trip is not later and it has walked no more. A pattern with realtime
+        updates is scanned once per FIFO trip group of the overlay.
+        Frequency-based patterns go to _scan_frequency_pattern_mc.
+        """
+        store = self.store
+        stop_ids = store.stop_ids
+        pattern_stops = store.get_pattern_stop_indexes(pattern_idx)
+
+        first = -1
+        for idx, stop_idx in enumerate(pattern_stops):
+            if stop_ids[stop_idx] in marked_stops:
+                first = idx
+                break
+        if first < 0:
+            return
+        if store.is_frequency_pattern(pattern_idx):
+            self._scan_frequency_pattern_mc(pattern_idx, pattern_stops, first, k, prev_bags,
+                                            marked_stops, insert, improved_stops)
+            return
+
+        max_route_bag = self.max_route_bag_size
+        for active_trips, view_departures, arrivals, trip_starts in self._trip_groups(pattern_idx):
+            n_active = len(active_trips)
+            if not n_active:
+                continue
+
+            route_bag: List[tuple] = []
+            for idx in range(first, len(pattern_stops)):
+                stop_id = stop_ids[pattern_stops[idx]]
+
+                # Arrivals of the boarded trips at this stop
+                for pos, walking_seconds, boarded_from, departure, board_idx in route_bag:
+                    label = McLabel(arrivals[trip_starts[pos] + idx], walking_seconds, stop_id,
+                                    parent=boarded_from, trip_idx=active_trips[pos], departure_time=departure,
+                                    board_pos=board_idx, alight_pos=idx)
+                    if insert(k, label):
+                        improved_stops.add(stop_id)
+
+                # Board from the labels created at this stop in the previous round
+                if stop_id not in marked_stops:
+                    continue
+                column = idx * n_active
+                for boarded_from in prev_bags.get(stop_id, ()):
+                    pos = bisect_left(view_departures, boarded_from.arrival_time, column, column + n_active)
+                    if pos >= column + n_active:
+                        continue
+                    entry = (pos - column, boarded_from.walking_seconds, boarded_from, view_departures[pos], idx)
+                    route_bag = _add_to_route_bag(route_bag, entry, max_route_bag)
+
+    def _scan_frequency_pattern_mc(self, pattern_idx: int, pattern_stops, first: int, k: int,
+                                   prev_bags: Dict[str, List[McLabel]], marked_stops: set, insert,
+                                   improved_stops: set) -> None:
+        """Scan a frequency-based pattern: the route bag holds runs by departure
+        from the first stop, boarded with _next_run.
+        """
+        store = self.store
+        stop_ids = store.stop_ids
+        template_trip_idx = store.pattern_trip_offsets[pattern_idx]
+        template_row = store.trip_offsets[template_trip_idx]
+        st_arrival, st_departure = store.st_arrival, store.st_departure
+
+        route_bag: List[tuple] = []
+        for idx in range(first, len(pattern_stops)):
+            stop_id = stop_ids[pattern_stops[idx]]
+
+            for run, walking_seconds, boarded_from, departure, board_idx in route_bag:
+                label = McLabel(run + st_arrival[template_row + idx], walking_seconds, stop_id,
+                                parent=boarded_from, trip_idx=template_trip_idx, departure_time=departure,
+                                board_pos=board_idx, alight_pos=idx)
+                if insert(k, label):
+                    improved_stops.add(stop_id)
+
+            if stop_id not in marked_stops:
+                continue
+            for boarded_from in prev_bags.get(stop_id, ()):
+                run = self._next_run(pattern_idx, idx, boarded_from.arrival_time)
+                if run is None:
+                    continue
+                entry = (run, boarded_from.walking_seconds, boarded_from, run + st_departure[template_row + idx], idx)
+                route_bag = _add_to_route_bag(route_bag, entry, self.max_route_bag_size)
+
+    def _mc_legs(self, label: McLabel) -> List[JourneyLeg]:
+        """Rebuild the legs of a journey by following the parent labels."""
+        store = self.store
+        legs: List[JourneyLeg] = []
+        while label.parent is not None:
+            parent = label.parent
+            if label.is_transfer:
+                legs.append(JourneyLeg(
+                    type="walking",
+                    from_stop_id=parent.stop_id,
+                    to_stop_id=label.stop_id,
+                    departure_time=parent.arrival_time,
+                    arrival_time=label.arrival_time
+                ))
+            else:
+                trip_idx = label.trip_idx
+                legs.append(JourneyLeg(
+                    type="transit",
+                    from_stop_id=parent.stop_id,
+                    to_stop_id=label.stop_id,
+                    departure_time=label.departure_time,
+                    arrival_time=label.arrival_time,
+                    route_id=store.route_ids[store.trip_route[trip_idx]],
+                    trip_id=store.trip_ids[trip_idx],
+                    headsign=store.trip_headsigns[trip_idx],
+                    board_pos=label.board_pos,
+                    alight_pos=label.alight_pos
+                ))
+            label = parent
+        legs.reverse()
+        return legs
+
+    def _mc_pareto_filter(self, journeys: List[Journey]) -> List[Journey]:
+        """Keep journeys not dominated in (arrival, transfers, walking).
+
+        Args:
+            journeys: Journeys extracted from the bags
+
+        Returns:
+            Pareto-optimal journeys sorted by arrival, transfers and walking
+        """
+        def key(journey: Journey):
+            return (journey.arrival_time, journey.transfers, journey.walking_seconds)
+
+        journeys = sorted(journeys, key=key)
+        pareto_optimal: List[Journey] = []
+        for journey in journeys:
+            arrival_time, transfers, walking_seconds = key(journey)
+            if any(
+                other.arrival_time <= arrival_time and other.transfers <= transfers
+                and other.walking_seconds <= walking_seconds
+                for other in pareto_optimal
+            ):
+                continue
+            pareto_optimal.append(journey)
+        return pareto_optimal
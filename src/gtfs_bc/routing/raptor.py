@@ -12,17 +12,45 @@ Key concepts:
 - Rounds: Each round represents one additional transfer
 - Pareto-optimal: Returns journeys that are optimal in at least one criterion
 - Time-dependent: Considers actual departure times from stop_times
+- Range queries (rRAPTOR): plan_profile() answers a departure window in one
+  pass, running the departures latest-first and reusing labels
+- Labels are flat integer arrays per round indexed by stop_idx (RoundLabels);
+  legs are only rebuilt from their parent pointers for the final journeys
+- Target pruning: nothing arriving after the best arrival found at a
+  destination is labelled, and the rounds stop when no marked stop can
+  still beat it
+- One-to-all queries (plan_isochrone): no destination, the run is bounded
+  by a travel time budget instead of a target
+- Realtime: on the service date of the published GTFS-RT updates, the
+  patterns with delayed or cancelled trips are scanned from the delay
+  overlay (realtime_overlay.py) instead of the day view
+- Frequency-based patterns (lines with headways instead of stop_times):
+  boarding computes the next run from the headway windows, and the run a
+  label rode is recovered from its arrival and the travel-time profile
+- Service days: trips of the previous service day still running after
+  midnight (times >= 24:00:00) are scanned too, from the store's shifted
+  previous-day view, so late-night queries see night and extended services
+- Coordinate queries: origins and destinations may carry a walk from/to a
+  point (access_seconds / egress_seconds); the journeys then start and end
+  with a walking leg from ORIGIN_POINT_ID / to DESTINATION_POINT_ID
+- Arrive-by queries (plan_arrive_by): reverse RAPTOR from the destinations
+  at the arrival deadline, labelling the latest departure from each stop.
+  Patterns are scanned backwards, alighting from the latest trip that
+  arrives in time (the day view's arrival columns) and following the
+  footpaths into each stop
 
 Author: Claude (Anthropic)
 Date: 2026-01-27
 """
 
+from array import array
 from dataclasses import dataclass, field
 from datetime import date, time
-from typing import Dict, List, Optional, Set, Union
-from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from bisect import bisect_left, bisect_right
 
-from src.gtfs_bc.routing.gtfs_store import gtfs_store
+from src.gtfs_bc.routing.gtfs_store import SERVICE_DAY_SECONDS, GTFSStore, PatternDayView
+from src.gtfs_bc.routing.realtime_overlay import DelayOverlay, TripGroup, realtime_overlay
 
 
 # =============================================================================
@@ -31,8 +59,13 @@ from src.gtfs_bc.routing.gtfs_store import gtfs_store
 
 MAX_ROUNDS = 5  # Maximum number of transfers + 1
 INFINITY = float('inf')
+UNREACHED = 2**31 - 1  # Arrival of a stop without label (max of array('i'))
+NO_DEPARTURE = -UNREACHED  # Departure of a stop without label in reverse runs
 WALKING_SPEED_KMH = 4.5
 TRANSFER_PENALTY_SECONDS = 180  # 3 minutes penalty for each transfer
+# Stop IDs of the walking legs from/to the query point in coordinate queries
+ORIGIN_POINT_ID = "ORIGIN_POINT"
+DESTINATION_POINT_ID = "DESTINATION_POINT"
 
 
 # =============================================================================
@@ -43,7 +76,8 @@ TRANSFER_PENALTY_SECONDS = 180  # 3 minutes penalty for each transfer
 class Label:
     """Arrival label at a stop for a specific round.
 
-    Tracks the earliest arrival time and how we got there.
+    Tracks the earliest arrival time and how we got there. The solver
+    stores its labels in RoundLabels; this is the per-stop form.
     """
     arrival_time: int  # Seconds since midnight
     trip_id: Optional[str] = None
@@ -54,6 +88,57 @@ class Label:
     from_stop_id: Optional[str] = None  # For transfers
 
 
+class RoundLabels:
+    """Labels of a RAPTOR run: one set of arrays per round, indexed by stop_idx.
+
+    For round k and stop s:
+    - arrival[k][s]: earliest arrival (UNREACHED if the stop has no label)
+    - trip[k][s]: trip_idx ridden to reach s, -1 for walking and origins
+    - board[k][s]: parent pointer. For a transit label the stop where the
+      trip was boarded (its label is in round k - 1); for a walking label
+      the stop walked from (same round); -1 for origins
+    - board_pos[k][s]: for a transit label, the position of board[k][s] in
+      the trip's pattern (loops visit a stop more than once); not
+      maintained for walking labels and origins
+
+    A new round starts as a copy of the previous one, so the arrays are
+    copied with a memcpy instead of creating a Label per stop.
+
+    Reverse runs (arrive-by) use the same arrays the other way round:
+    arrival[k][s] is the latest departure from s (NO_DEPARTURE without
+    label) and board[k][s] the stop where the trip is left (label in round
+    k - 1) or the stop walked to (same round); -1 for destinations, and
+    board_pos[k][s] the position of the stop where the trip is left.
+    """
+
+    __slots__ = ('arrival', 'trip', 'board', 'board_pos')
+
+    def __init__(self, n_stops: int, rounds: int = 0, unreached: int = UNREACHED):
+        unreached = array('i', [unreached]) * n_stops
+        none = array('i', [-1]) * n_stops
+        self.arrival: List[array] = [unreached[:] for _ in range(rounds + 1)]
+        self.trip: List[array] = [none[:] for _ in range(rounds + 1)]
+        self.board: List[array] = [none[:] for _ in range(rounds + 1)]
+        self.board_pos: List[array] = [none[:] for _ in range(rounds + 1)]
+
+    @property
+    def rounds(self) -> int:
+        return len(self.arrival) - 1
+
+    def add_round(self) -> None:
+        """Start a new round as a copy of the last one."""
+        self.arrival.append(self.arrival[-1][:])
+        self.trip.append(self.trip[-1][:])
+        self.board.append(self.board[-1][:])
+        self.board_pos.append(self.board_pos[-1][:])
+
+    def copied(self, k: int, stop_idx: int) -> bool:
+        """Whether the label of a stop in round k is the one of round k - 1."""
+        return (self.arrival[k][stop_idx] == self.arrival[k - 1][stop_idx]
+                and self.trip[k][stop_idx] == self.trip[k - 1][stop_idx]
+                and self.board[k][stop_idx] == self.board[k - 1][stop_idx])
+
+
 @dataclass
 class Journey:
     """A complete journey from origin to destination."""
@@ -70,6 +155,10 @@ class Journey:
     def duration_minutes(self) -> int:
         return self.duration_seconds // 60
 
+    @property
+    def walking_seconds(self) -> int:
+        return sum(leg.arrival_time - leg.departure_time for leg in self.legs if leg.type == "walking")
+
 
 @dataclass
 class JourneyLeg:
@@ -83,6 +172,19 @@ class JourneyLeg:
     trip_id: Optional[str] = None
     headsign: Optional[str] = None
     intermediate_stops: List[str] = field(default_factory=list)
+    # Transit legs: positions of from_stop_id and to_stop_id in the trip's
+    # pattern (a loop visits a stop more than once); -1 if unknown
+    board_pos: int = -1
+    alight_pos: int = -1
+
+
+@dataclass
+class RaptorStats:
+    """Work done by the last query (summed over the runs of a range query)."""
+    rounds: int = 0  # Rounds that scanned patterns
+    patterns_scanned: int = 0
+    stops_improved: int = 0  # Stops marked at the end of a round
+    stops_pruned: int = 0  # Marked stops dropped because they cannot beat the target
 
 
 # =============================================================================
@@ -99,15 +201,35 @@ class RaptorAlgorithm:
     Uses GTFSStore singleton for in-memory data access (no SQL queries).
     """
 
-    def __init__(self, db=None):
+    def __init__(self, db=None, store: Optional[GTFSStore] = None, target_pruning: bool = True,
+                 realtime: bool = True):
         """Initialize RAPTOR algorithm.
 
         Args:
             db: Deprecated - kept for backwards compatibility. Not used.
+            store: Store generation to use (defaults to the current one)
+            target_pruning: Prune labels that arrive no earlier than the
+                best arrival at a destination (off only to measure its effect)
+            realtime: Apply the realtime delay overlay (off = static timetable)
         """
-        self.store = gtfs_store
+        # Pin the current store generation: a reload publishes a new
+        # instance, but this one stays consistent until we are done
+        self.store = store if store is not None else GTFSStore.get_instance()
         self._travel_date: Optional[date] = None
-        self._active_services: Set[str] = set()
+        self._active_services: FrozenSet[str] = frozenset()
+        self._service_mask: bytearray = bytearray()
+        self._day_view: Optional[PatternDayView] = None
+        self._previous_view: Optional[PatternDayView] = None
+        self._overlay: Optional[DelayOverlay] = None
+        # Coordinate queries: walk from the point to each origin (by stop_id)
+        # and from each destination to the point (by stop_idx)
+        self._access_seconds: Optional[Dict[str, int]] = None
+        self._egress: Dict[int, int] = {}
+        # Arrive-by queries: overlay groups by arrival columns (per query)
+        self._overlay_columns: Dict[int, Tuple[Tuple[array, array, array], ...]] = {}
+        self.target_pruning = target_pruning
+        self.realtime = realtime
+        self.stats = RaptorStats()
 
     def plan(
         self,
@@ -115,7 +237,9 @@ class RaptorAlgorithm:
         destination_stop_id: Union[str, List[str]],
         departure_time: time,
         travel_date: date,
-        max_transfers: int = 3
+        max_transfers: int = 3,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
     ) -> List[Journey]:
         """Find optimal journeys from origin to destination.
 
@@ -125,17 +249,337 @@ class RaptorAlgorithm:
             departure_time: Earliest departure time
             travel_date: Date of travel
             max_transfers: Maximum number of transfers allowed
+            access_seconds: Walk from the query point to each origin
+                (coordinate origin); origins without an entry start at
+                departure_time
+            egress_seconds: Walk from each destination to the query point
+                (coordinate destination), added to the arrival
 
         Returns:
             List of Pareto-optimal journeys
         """
+        valid_origins, valid_destinations = self._prepare(
+            origin_stop_id, destination_stop_id, travel_date, access_seconds, egress_seconds
+        )
+
+        # Convert departure time to seconds since midnight
+        departure_seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+
+        # Run RAPTOR algorithm
+        rounds = min(max_transfers + 1, MAX_ROUNDS)
+        self.stats = RaptorStats()
+        labels = self._run_raptor(
+            valid_origins, valid_destinations, departure_seconds, rounds, access_seconds=access_seconds
+        )
+
+        # Extract journeys from labels
+        journeys = self._extract_journeys(
+            labels, valid_origins, valid_destinations, departure_seconds
+        )
+
+        # Apply Pareto filter
+        journeys = self._pareto_filter(journeys)
+
+        return journeys
+
+    def plan_profile(
+        self,
+        origin_stop_id: Union[str, List[str]],
+        destination_stop_id: Union[str, List[str]],
+        departure_time: time,
+        window_minutes: int,
+        travel_date: date,
+        max_transfers: int = 3,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
+    ) -> List[Journey]:
+        """Find every Pareto-optimal journey departing within a time window.
+
+        Range RAPTOR (rRAPTOR): the candidate departures are the trip
+        departures from the origins (or from stops within walking distance
+        of them) inside [departure_time, departure_time + window_minutes].
+        They are run latest-first over the same labels, so each run starts
+        from the arrivals found for later departures and only explores what
+        an earlier departure improves. A journey is kept when it reaches the
+        destination earlier (for its number of transfers) than any later
+        departure.
+
+        Args:
+            origin_stop_id: Starting stop ID or list of IDs (for multi-platform stations)
+            destination_stop_id: Destination stop ID or list of IDs
+            departure_time: Start of the departure window
+            window_minutes: Length of the departure window
+            travel_date: Date of travel
+            max_transfers: Maximum number of transfers allowed
+            access_seconds, egress_seconds: Walks from/to the query points
+                (coordinate queries, see plan)
+
+        Returns:
+            Journeys sorted by departure time; none of them leaves earlier
+            and arrives later (or with more transfers) than another
+        """
+        valid_origins, valid_destinations = self._prepare(
+            origin_stop_id, destination_stop_id, travel_date, access_seconds, egress_seconds
+        )
+
+        window_start = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        window_end = window_start + window_minutes * 60
+        rounds = min(max_transfers + 1, MAX_ROUNDS)
+
+        # Labels per round are shared by all the departures. The best
+        # arrival across rounds is not: a later departure with more
+        # transfers must not prune an earlier one with fewer
+        stop_index = self.store.stop_index
+        destination_idxs = [stop_index[d] for d in valid_destinations]
+        labels = RoundLabels(len(self.store.stop_ids), rounds)
+        self.stats = RaptorStats()
+        journeys: List[Journey] = []
+        walk_journey: Optional[Journey] = None
+
+        for departure_seconds in self._window_departures(valid_origins, window_start, window_end):
+            # Destination arrival per round before this departure
+            previous = [
+                self._destination_arrival(labels.arrival[k], destination_idxs)[0]
+                for k in range(rounds + 1)
+            ]
+            self._run_raptor(valid_origins, valid_destinations, departure_seconds, rounds, labels=labels,
+                             access_seconds=access_seconds)
+
+            # Walking only: the same whatever the departure, reported once
+            # as leaving at the start of the window
+            if walk_journey is None and previous[0] == UNREACHED:
+                arrival, dest_idx = self._destination_arrival(labels.arrival[0], destination_idxs)
+                if arrival < UNREACHED:
+                    legs = self._reconstruct_legs(labels, self.store.stop_ids[dest_idx], 0, valid_origins)
+                    legs = self._add_point_legs(legs, departure_seconds, dest_idx)
+                    shift = departure_seconds - window_start
+                    for leg in legs:
+                        leg.departure_time -= shift
+                        leg.arrival_time -= shift
+                    walk_journey = Journey(
+                        departure_time=window_start,
+                        arrival_time=arrival - shift,
+                        transfers=0,
+                        legs=legs
+                    )
+                    journeys.append(walk_journey)
+
+            for k in range(1, rounds + 1):
+                arrival, dest_idx = self._destination_arrival(labels.arrival[k], destination_idxs)
+                if arrival >= previous[k]:
+                    continue  # A later departure already arrives as early
+                # Same label as the round before: same journey, fewer transfers
+                if labels.copied(k, dest_idx):
+                    continue
+
+                legs = self._reconstruct_legs(labels, self.store.stop_ids[dest_idx], k, valid_origins)
+                if legs:
+                    legs = self._add_point_legs(legs, departure_seconds, dest_idx)
+                    journeys.append(Journey(
+                        departure_time=departure_seconds,
+                        arrival_time=arrival,
+                        transfers=max(0, k - 1),
+                        legs=legs
+                    ))
+
+        return self._profile_pareto_filter(journeys)
+
+    def plan_isochrone(
+        self,
+        origin_stop_id: Union[str, List[str]],
+        departure_time: time,
+        travel_date: date,
+        max_minutes: int,
+        max_transfers: int = 3,
+        access_seconds: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Tuple[int, int]]:
+        """Find the earliest arrival at every stop reachable within a time budget.
+
+        One-to-all RAPTOR: there is no destination, so instead of a target
+        the run is bounded by departure_time + max_minutes. Nothing arriving
+        at or after that limit is labelled and the rounds end as soon as no
+        marked stop is still under it.
+
+        Args:
+            origin_stop_id: Starting stop ID or list of IDs (for multi-platform stations)
+            departure_time: Departure time
+            travel_date: Date of travel
+            max_minutes: Travel time budget
+            max_transfers: Maximum number of transfers allowed
+            access_seconds: Walk from the query point to each origin
+                (coordinate queries); origins without an entry start at
+                departure_time
+
+        Returns:
+            {stop_id: (arrival_seconds, transfers)} for every reachable stop,
+            with the fewest transfers that achieve its earliest arrival
+        """
+        valid_origins, _ = self._prepare(origin_stop_id, None, travel_date)
+
+        departure_seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        rounds = min(max_transfers + 1, MAX_ROUNDS)
+        self.stats = RaptorStats()
+        labels = self._run_raptor(
+            valid_origins, [], departure_seconds, rounds,
+            arrival_limit=departure_seconds + max_minutes * 60 + 1,
+            access_seconds=access_seconds
+        )
+
+        # Every round starts as a copy of the previous one, so the last
+        # round holds the earliest arrival at each stop
+        best = labels.arrival[-1]
+        stop_ids = self.store.stop_ids
+        reached: Dict[str, Tuple[int, int]] = {}
+        for stop_idx, arrival_time in enumerate(best):
+            if arrival_time == UNREACHED:
+                continue
+            k = 0
+            while labels.arrival[k][stop_idx] != arrival_time:
+                k += 1
+            reached[stop_ids[stop_idx]] = (arrival_time, max(0, k - 1))
+        return reached
+
+    def plan_arrive_by(
+        self,
+        origin_stop_id: Union[str, List[str]],
+        destination_stop_id: Union[str, List[str]],
+        arrival_time: time,
+        travel_date: date,
+        max_transfers: int = 3,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
+    ) -> List[Journey]:
+        """Find the latest journeys that reach the destination by arrival_time.
+
+        Reverse RAPTOR: one search backwards from the destinations instead
+        of trying departures until one arrives in time. Round k labels each
+        stop with the latest departure from it that still reaches a
+        destination by arrival_time with k trips. Target pruning mirrors
+        the forward search: nothing departing no later than the best
+        departure found at an origin is labelled.
+
+        Args:
+            origin_stop_id: Starting stop ID or list of IDs (for multi-platform stations)
+            destination_stop_id: Destination stop ID or list of IDs
+            arrival_time: Latest arrival at the destination
+            travel_date: Date of travel
+            max_transfers: Maximum number of transfers allowed
+            access_seconds, egress_seconds: Walks from/to the query points
+                (coordinate queries, see plan)
+
+        Returns:
+            Pareto-optimal journeys (later departure, fewer transfers),
+            latest departure first
+        """
+        valid_origins, valid_destinations = self._prepare(
+            origin_stop_id, destination_stop_id, travel_date, access_seconds, egress_seconds
+        )
+        self._overlay_columns = {}
+
+        arrival_seconds = arrival_time.hour * 3600 + arrival_time.minute * 60 + arrival_time.second
+        rounds = min(max_transfers + 1, MAX_ROUNDS)
+        self.stats = RaptorStats()
+        labels = self._run_reverse_raptor(valid_origins, valid_destinations, arrival_seconds, rounds)
+
+        journeys = self._extract_reverse_journeys(labels, valid_origins)
+        return self._arrive_by_pareto_filter(journeys)
+
+    def _window_departures(self, origin_stop_ids: List[str], window_start: int, window_end: int) -> List[int]:
+        """Candidate departures of a range query, latest first.
+
+        Every trip departure inside the window from an origin, plus those
+        from stops reachable on foot from an origin (shifted back by the
+        walk, as in the initial footpaths of _run_raptor). Coordinate
+        origins are shifted back by their access walk as well.
+        """
+        store = self.store
+        access_seconds = self._access_seconds or {}
+        origin_access = {origin_id: access_seconds.get(origin_id, 0) for origin_id in origin_stop_ids}
+        access: Dict[int, int] = {}
+        for origin_id, origin_offset in origin_access.items():
+            origin_idx = store.stop_index[origin_id]
+            if origin_offset < access.get(origin_idx, INFINITY):
+                access[origin_idx] = origin_offset
+        for origin_id, origin_offset in origin_access.items():
+            for to_idx, walk_seconds in store.get_footpaths(store.stop_index[origin_id]):
+                offset = origin_offset + walk_seconds + TRANSFER_PENALTY_SECONDS
+                if offset < access.get(to_idx, INFINITY):
+                    access[to_idx] = offset
+
+        departures: Set[int] = set()
+        for stop_idx, offset in access.items():
+            for pattern_idx in store.get_stop_patterns(stop_idx):
+                if store.is_frequency_pattern(pattern_idx):
+                    for idx, s in enumerate(store.get_pattern_stop_indexes(pattern_idx)):
+                        if s != stop_idx:
+                            continue
+                        for view in (self._day_view, self._previous_view):
+                            shift = view.shift
+                            departures.update(d - shift - offset for d in view.frequency_departures(
+                                pattern_idx, idx, window_start + offset + shift, window_end + offset + shift))
+                    continue
+                for active_trips, view_departures, _, _ in self._trip_groups(pattern_idx):
+                    n_active = len(active_trips)
+                    if not n_active:
+                        continue
+                    # The stop may appear more than once in a pattern (loops)
+                    for idx, s in enumerate(store.get_pattern_stop_indexes(pattern_idx)):
+                        if s != stop_idx:
+                            continue
+                        column = idx * n_active
+                        pos = bisect_left(view_departures, window_start + offset, column, column + n_active)
+                        while pos < column + n_active and view_departures[pos] <= window_end + offset:
+                            departures.add(view_departures[pos] - offset)
+                            pos += 1
+
+        return sorted(departures, reverse=True)
+
+    def _destination_arrival(self, arrival: array, destination_idxs: List[int]) -> Tuple[int, int]:
+        """Earliest arrival at any destination in one round (egress walk included).
+
+        Returns:
+            (arrival, stop_idx); (UNREACHED, -1) if no destination has a label
+        """
+        egress = self._egress
+        best = (UNREACHED, -1)
+        for stop_idx in destination_idxs:
+            if arrival[stop_idx] != UNREACHED and arrival[stop_idx] + egress.get(stop_idx, 0) < best[0]:
+                best = (arrival[stop_idx] + egress.get(stop_idx, 0), stop_idx)
+        return best
+
+    def _prepare(
+        self,
+        origin_stop_id: Union[str, List[str]],
+        destination_stop_id: Union[str, List[str], None],
+        travel_date: date,
+        access_seconds: Optional[Dict[str, int]] = None,
+        egress_seconds: Optional[Dict[str, int]] = None
+    ) -> Tuple[List[str], List[str]]:
+        """Select the day's services and validate the origin and destination stops.
+
+        A destination of None (one-to-all queries) is not validated. The
+        access and egress walks of coordinate queries are kept for the
+        whole query.
+
+        Returns:
+            (valid origin stop IDs, valid destination stop IDs)
+        """
         # Get active services for this date from GTFSStore
         self._travel_date = travel_date
         self._active_services = self.store.get_active_services(travel_date)
+        self._service_mask = self.store.get_active_service_mask(travel_date)
+        self._day_view = self.store.get_day_view(travel_date)
+        self._previous_view = self.store.get_previous_day_view(travel_date)
+        self._overlay = realtime_overlay.overlay_for(self.store, travel_date) if self.realtime else None
 
         # Normalize inputs to lists
         origins = origin_stop_id if isinstance(origin_stop_id, list) else [origin_stop_id]
-        destinations = destination_stop_id if isinstance(destination_stop_id, list) else [destination_stop_id]
+        if destination_stop_id is None:
+            destinations = []
+        elif isinstance(destination_stop_id, list):
+            destinations = destination_stop_id
+        else:
+            destinations = [destination_stop_id]
 
         # Validate - keep only valid stops
         valid_origins = [oid for oid in origins if oid in self.store.stops_info]
@@ -143,58 +587,140 @@ class RaptorAlgorithm:
 
         if not valid_origins:
             raise ValueError(f"No valid origin stops found: {origins}")
-        if not valid_destinations:
+        if destination_stop_id is not None and not valid_destinations:
             raise ValueError(f"No valid destination stops found: {destinations}")
 
-        # Convert departure time to seconds since midnight
-        departure_seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        self._access_seconds = access_seconds
+        stop_index = self.store.stop_index
+        self._egress = {
+            stop_index[did]: egress_seconds[did] for did in valid_destinations if did in egress_seconds
+        } if egress_seconds else {}
 
-        # Run RAPTOR algorithm
-        rounds = min(max_transfers + 1, MAX_ROUNDS)
-        labels = self._run_raptor(valid_origins, valid_destinations, departure_seconds, rounds)
+        return valid_origins, valid_destinations
 
-        # Extract journeys from labels
-        journeys = self._extract_journeys(
-            labels, valid_origins, valid_destinations, departure_seconds
-        )
+    def _trip_groups(self, pattern_idx: int) -> Tuple[TripGroup, ...]:
+        """Trips of a pattern to scan on the query date.
 
-        # Apply Pareto filter
-        journeys = self._pareto_filter(journeys)
+        Normally the day view's active trips; for a pattern with realtime
+        updates, the overlay's groups (delays applied, cancelled trips
+        removed, one group per FIFO chain). The previous service day's
+        trips still running after midnight follow as one more group, with
+        their times shifted back a day and no realtime delays (see
+        realtime_overlay).
 
-        return journeys
+        Returns:
+            (trips, departures by stop column, arrivals, row start of each trip)
+        """
+        groups = None
+        overlay = self._overlay
+        if overlay is not None:
+            groups = overlay.groups.get(pattern_idx)
+        if groups is None:
+            day_view = self._day_view
+            groups = ((day_view.active_trips(pattern_idx), day_view.departures(pattern_idx),
+                       self.store.st_arrival, day_view.trip_starts(pattern_idx)),)
+        previous = self._previous_view
+        if len(previous.active_trips(pattern_idx)):
+            groups = tuple(groups) + ((previous.active_trips(pattern_idx), previous.departures(pattern_idx),
+                                       previous.arrivals(pattern_idx), previous.trip_starts(pattern_idx)),)
+        return groups
+
+    def _next_run(self, pattern_idx: int, stop_index: int, min_departure: int) -> Optional[int]:
+        """Next run of a frequency-based pattern leaving the stop from min_departure.
+
+        Looks at the query date's headway windows and at the previous
+        service day's (runs after midnight), whichever leaves first.
+
+        Returns:
+            Departure of the run from the first stop (negative for a run
+            that started the previous day), or None if there is none
+        """
+        run = self._day_view.next_run(pattern_idx, stop_index, min_departure)
+        best = run if run >= 0 else None
+        previous = self._previous_view
+        run = previous.next_run(pattern_idx, stop_index, min_departure + previous.shift)
+        if run >= 0 and (best is None or run - previous.shift < best):
+            best = run - previous.shift
+        return best
 
     def _run_raptor(
         self,
         origin_stop_ids: List[str],
         destination_stop_ids: List[str],
         departure_seconds: int,
-        max_rounds: int
-    ) -> Dict[int, Dict[str, Label]]:
+        max_rounds: int,
+        labels: Optional[RoundLabels] = None,
+        arrival_limit: int = UNREACHED,
+        access_seconds: Optional[Dict[str, int]] = None
+    ) -> RoundLabels:
         """Run the RAPTOR algorithm.
 
+        Works on integer stop indexes only: labels are the per-round arrays
+        of RoundLabels and the marked stops a bitset (bytearray) plus the
+        list of its members, so a round allocates nothing per stop.
+
+        With target pruning a stop is only labelled if it arrives before
+        the best arrival found so far at any destination (the target): a
+        journey through it could not arrive earlier. Marked stops that
+        cannot beat the target are not scanned, and the rounds end when
+        none is left. Counters are added to self.stats.
+
         Args:
             origin_stop_ids: List of starting stops (multi-origin for platforms)
             destination_stop_ids: List of destination stops
             departure_seconds: Departure time in seconds since midnight
             max_rounds: Maximum number of rounds (transfers + 1)
+            labels: Labels of a previous run with a later departure (rRAPTOR);
+                they are still valid upper bounds and are updated in place
+            arrival_limit: Nothing arriving at or after this time is labelled
+                (time budget of one-to-all queries); acts as the initial target
+            access_seconds: Walk from the query point to each origin; origins
+                without an entry start at departure_seconds
 
         Returns:
-            Dictionary of round -> stop_id -> Label
+            Labels of every round reached
         """
+        store = self.store
+        stop_ids = store.stop_ids
+        stop_index = store.stop_index
+        n_stops = len(stop_ids)
+
         # Initialize labels for each round
-        # labels[k][stop_id] = earliest arrival at stop in round k
-        labels: Dict[int, Dict[str, Label]] = {k: {} for k in range(max_rounds + 1)}
+        # labels.arrival[k][stop_idx] = earliest arrival at stop in round k
+        reuse_labels = labels is not None
+        if labels is None:
+            labels = RoundLabels(n_stops)
+
+        # Best overall arrival time at each stop (across all rounds of this run)
+        best_arrival = array('i', [UNREACHED]) * n_stops
+
+        # Destinations (flags only with target pruning) and best arrival at any of them
+        is_target = bytearray(n_stops)
+        if self.target_pruning:
+            for destination_id in destination_stop_ids:
+                is_target[stop_index[destination_id]] = 1
+        target = arrival_limit
+        stats = self.stats
 
-        # Best overall arrival time at each stop (across all rounds)
-        best_arrival: Dict[str, int] = defaultdict(lambda: INFINITY)
+        # Marked stops (stops improved in previous round)
+        marked = bytearray(n_stops)
+        marked_stops: List[int] = []
 
         # Initialize round 0 with ALL origins (coste 0 para llegar a cualquier andén)
-        for origin_id in origin_stop_ids:
-            labels[0][origin_id] = Label(arrival_time=departure_seconds)
-            best_arrival[origin_id] = departure_seconds
-
-        # Marked stops (stops improved in previous round)
-        marked_stops: Set[str] = set(origin_stop_ids)
+        arrival, trip, board = labels.arrival[0], labels.trip[0], labels.board[0]
+        origin_idxs = [stop_index[origin_id] for origin_id in origin_stop_ids]
+        for origin_id, origin_idx in zip(origin_stop_ids, origin_idxs):
+            origin_arrival = departure_seconds + (access_seconds.get(origin_id, 0) if access_seconds else 0)
+            if origin_arrival >= target or origin_arrival >= best_arrival[origin_idx]:
+                continue
+            arrival[origin_idx] = origin_arrival
+            trip[origin_idx] = board[origin_idx] = -1
+            best_arrival[origin_idx] = origin_arrival
+            if is_target[origin_idx]:
+                target = min(target, origin_arrival + self._egress.get(origin_idx, 0))
+            if not marked[origin_idx]:
+                marked[origin_idx] = 1
+                marked_stops.append(origin_idx)
 
         # =========================================================================
         # FASE DE CAMINATA INICIAL (INITIAL FOOTPATHS)
@@ -202,208 +728,800 @@ class RaptorAlgorithm:
         # Si empezamos en Renfe Abando, esto nos "teletransporta" (caminando)
         # a los andenes de Metro Abando ANTES de buscar el primer tren.
         # =========================================================================
-        initial_origins = list(marked_stops)
-
-        for stop_id in initial_origins:
-            for to_stop_id, walk_seconds in self.store.get_transfers(stop_id):
-                arrival_after_walk = departure_seconds + walk_seconds + TRANSFER_PENALTY_SECONDS
-
-                if arrival_after_walk < best_arrival[to_stop_id]:
-                    labels[0][to_stop_id] = Label(
-                        arrival_time=arrival_after_walk,
-                        is_transfer=True,
-                        from_stop_id=stop_id
-                    )
-                    best_arrival[to_stop_id] = arrival_after_walk
-                    marked_stops.add(to_stop_id)
+        footpath_offsets = store.footpath_offsets
+        footpath_to = store.footpath_to
+        footpath_seconds = store.footpath_seconds
+        for origin_idx in origin_idxs:
+            if not marked[origin_idx] or board[origin_idx] >= 0:
+                continue  # Over the limit, or reached on foot from another origin
+            for j in range(footpath_offsets[origin_idx], footpath_offsets[origin_idx + 1]):
+                to_idx = footpath_to[j]
+                arrival_after_walk = arrival[origin_idx] + footpath_seconds[j] + TRANSFER_PENALTY_SECONDS
+
+                if arrival_after_walk < best_arrival[to_idx] and arrival_after_walk < target:
+                    arrival[to_idx] = arrival_after_walk
+                    trip[to_idx] = -1
+                    board[to_idx] = origin_idx
+                    best_arrival[to_idx] = arrival_after_walk
+                    if is_target[to_idx]:
+                        target = min(target, arrival_after_walk + self._egress.get(to_idx, 0))
+                    if not marked[to_idx]:
+                        marked[to_idx] = 1
+                        marked_stops.append(to_idx)
         # =========================================================================
 
+        # Stops whose label changed in this run: with reused labels the only
+        # ones the next round has to copy (the rest are already copied)
+        changed = bytearray(marked) if reuse_labels else None
+        changed_stops: List[int] = list(marked_stops)
+
         # Run rounds
         for k in range(1, max_rounds + 1):
-            if not marked_stops:
+            # Reused labels must stay consistent in every round, so the
+            # copy still runs for the rounds left after convergence
+            if not marked_stops and not reuse_labels:
                 break
 
-            # Copy previous round's labels (referencia directa, no crear objeto nuevo)
-            for stop_id, label in labels[k - 1].items():
-                if stop_id not in labels[k] or label.arrival_time < labels[k][stop_id].arrival_time:
-                    labels[k][stop_id] = label
-
-            new_marked_stops: Set[str] = set()
-
-            # Step 1: Scan PATTERNS that serve marked stops (using GTFSStore)
-            patterns_to_scan: Set[str] = set()
-            for stop_id in marked_stops:
-                patterns_to_scan.update(self.store.get_patterns_at_stop(stop_id))
-
-            for pattern_id in patterns_to_scan:
-                # Get stops sequence from store
-                pattern_stops = self.store.get_pattern_stops(pattern_id)
-                if not pattern_stops:
-                    continue
-
-                # Check if any marked stop is in this pattern
-                if not any(s in marked_stops for s in pattern_stops):
-                    continue
-
-                # Skip if pattern has no trips
-                if not self.store.trips_by_pattern.get(pattern_id):
-                    continue
+            # Copy previous round's labels: a fresh round is a memcpy of the
+            # previous arrays, a reused one only takes the changed stops
+            if k > labels.rounds:
+                labels.add_round()
+            else:
+                prev_arrival, prev_trip, prev_board = labels.arrival[k - 1], labels.trip[k - 1], labels.board[k - 1]
+                arrival, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+                prev_board_pos, board_pos = labels.board_pos[k - 1], labels.board_pos[k]
+                for stop_idx in changed_stops:
+                    if prev_arrival[stop_idx] < arrival[stop_idx]:
+                        arrival[stop_idx] = prev_arrival[stop_idx]
+                        trip[stop_idx] = prev_trip[stop_idx]
+                        board[stop_idx] = prev_board[stop_idx]
+                        board_pos[stop_idx] = prev_board_pos[stop_idx]
 
-                # Scan this pattern
-                improved = self._scan_pattern(
-                    pattern_id, pattern_stops,
-                    labels[k - 1], labels[k], best_arrival, marked_stops
+            if not marked_stops:
+                continue
+
+            # Step 1: Scan PATTERNS that serve marked stops (using GTFSStore indexes)
+            patterns_to_scan: Set[int] = set()
+            for stop_idx in marked_stops:
+                patterns_to_scan.update(store.get_stop_patterns(stop_idx))
+
+            improved = bytearray(n_stops)
+            new_marked_stops: List[int] = []
+            for pattern_idx in patterns_to_scan:
+                target = self._scan_pattern(
+                    pattern_idx, labels, k, best_arrival, marked, improved, new_marked_stops,
+                    is_target, target
                 )
-                new_marked_stops.update(improved)
-
-            # Step 2: Process transfers (walking) - using GTFSStore tuples
-            # Solo procesamos new_marked_stops (paradas mejoradas en ESTA ronda)
-            # Las marked_stops ya tuvieron su fase de transbordos en la ronda anterior
-            # IMPORTANTE: Copiamos el set porque lo modificamos durante la iteración
-            transfer_improved: Set[str] = set()
-            for stop_id in list(new_marked_stops):
-                if stop_id not in labels[k]:
+            stats.rounds += 1
+            stats.patterns_scanned += len(patterns_to_scan)
+
+            # Step 2: Process footpaths (walking) - transitively closed in GTFSStore
+            # Solo procesamos las paradas mejoradas en ESTA ronda por un trip;
+            # las marked_stops ya tuvieron su fase de transbordos en la ronda anterior.
+            # Como los footpaths están cerrados basta una relajación: una parada
+            # alcanzada a pie ya tiene sus destinos cubiertos desde su origen
+            arrival, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+            for stop_idx in new_marked_stops[:]:
+                if trip[stop_idx] < 0:
                     continue
-
-                arrival_at_stop = labels[k][stop_id].arrival_time
-
-                # transfers is List[Tuple[to_stop_id, walk_seconds]]
-                for to_stop_id, walk_seconds in self.store.get_transfers(stop_id):
-                    arrival_after_walk = arrival_at_stop + walk_seconds + TRANSFER_PENALTY_SECONDS
-
-                    if arrival_after_walk < best_arrival[to_stop_id]:
-                        if to_stop_id not in labels[k] or arrival_after_walk < labels[k][to_stop_id].arrival_time:
-                            labels[k][to_stop_id] = Label(
-                                arrival_time=arrival_after_walk,
-                                is_transfer=True,
-                                from_stop_id=stop_id
-                            )
-                            best_arrival[to_stop_id] = arrival_after_walk
-                            transfer_improved.add(to_stop_id)
-
-            new_marked_stops.update(transfer_improved)
-            marked_stops = new_marked_stops
+                arrival_at_stop = arrival[stop_idx]
+
+                for j in range(footpath_offsets[stop_idx], footpath_offsets[stop_idx + 1]):
+                    to_idx = footpath_to[j]
+                    arrival_after_walk = arrival_at_stop + footpath_seconds[j] + TRANSFER_PENALTY_SECONDS
+
+                    if (arrival_after_walk < best_arrival[to_idx] and arrival_after_walk < arrival[to_idx]
+                            and arrival_after_walk < target):
+                        arrival[to_idx] = arrival_after_walk
+                        trip[to_idx] = -1
+                        board[to_idx] = stop_idx
+                        best_arrival[to_idx] = arrival_after_walk
+                        if is_target[to_idx]:
+                            target = min(target, arrival_after_walk + self._egress.get(to_idx, 0))
+                        if not improved[to_idx]:
+                            improved[to_idx] = 1
+                            new_marked_stops.append(to_idx)
+
+            stats.stops_improved += len(new_marked_stops)
+            if reuse_labels:
+                for stop_idx in new_marked_stops:
+                    if not changed[stop_idx]:
+                        changed[stop_idx] = 1
+                        changed_stops.append(stop_idx)
+
+            # Early termination: a stop reached no earlier than the target
+            # cannot lead to a better arrival, so it is not scanned again
+            marked = improved
+            marked_stops = []
+            for stop_idx in new_marked_stops:
+                if arrival[stop_idx] < target:
+                    marked_stops.append(stop_idx)
+                else:
+                    marked[stop_idx] = 0
+            stats.stops_pruned += len(new_marked_stops) - len(marked_stops)
 
         return labels
 
     def _scan_pattern(
         self,
-        pattern_id: str,
-        pattern_stops: List[str],
-        prev_labels: Dict[str, Label],
-        curr_labels: Dict[str, Label],
-        best_arrival: Dict[str, int],
-        marked_stops: Set[str]
-    ) -> Set[str]:
+        pattern_idx: int,
+        labels: RoundLabels,
+        k: int,
+        best_arrival: array,
+        marked: bytearray,
+        improved: bytearray,
+        improved_stops: List[int],
+        is_target: bytearray,
+        target: int
+    ) -> int:
         """Scan a single pattern for improvements.
 
+        Works directly on the GTFSStore columns: the pattern's stop sequence
+        is a slice of integer stop indexes and arrivals are read from the
+        trip x stop matrix with plain offset arithmetic. Boarding uses the
+        date's PatternDayView: only active trips, with sorted departure
+        columns per stop, searched with bisect. A pattern with realtime
+        updates is scanned once per trip group of the overlay instead, and
+        a frequency-based one by _scan_frequency_pattern.
+
         Args:
-            pattern_id: The pattern ID (e.g., "METRO_1_0")
-            pattern_stops: List of stop_ids in order
-            prev_labels: Labels from previous round
-            curr_labels: Labels for current round (to update)
+            pattern_idx: The pattern index in GTFSStore
+            labels: Labels of the run (round k - 1 is read, round k updated)
+            k: Current round
             best_arrival: Best arrival times across all rounds
-            marked_stops: Stops that were improved in previous round
+            marked: Bitset of the stops improved in the previous round
+            improved: Bitset of the stops improved in this round (updated)
+            improved_stops: Members of improved, in order (appended to)
+            is_target: Bitset of the destinations used for target pruning
+            target: Best arrival at any destination so far
 
         Returns:
-            Set of stop_ids that were improved
+            The best arrival at any destination after the scan
         """
-        improved_stops: Set[str] = set()
+        store = self.store
+        pattern_stops = store.get_pattern_stop_indexes(pattern_idx)
+        prev_arrival = labels.arrival[k - 1]
 
         # Find first marked stop in this pattern
         board_stop_idx = None
-        for idx, stop_id in enumerate(pattern_stops):
-            if stop_id in marked_stops and stop_id in prev_labels:
+        for idx, stop_idx in enumerate(pattern_stops):
+            if marked[stop_idx] and prev_arrival[stop_idx] != UNREACHED:
                 board_stop_idx = idx
                 break
 
         if board_stop_idx is None:
-            return improved_stops
-
-        # Try to board at each marked stop and ride
-        current_trip_id: Optional[str] = None
-        boarding_time: Optional[int] = None
-        boarding_stop_id: Optional[str] = None
-        boarding_stop_idx: Optional[int] = None
+            return target
+        if store.is_frequency_pattern(pattern_idx):
+            return self._scan_frequency_pattern(
+                pattern_idx, pattern_stops, board_stop_idx, labels, k, best_arrival,
+                improved, improved_stops, is_target, target
+            )
+
+        arrival, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+        board_pos = labels.board_pos[k]
+        n_pattern_stops = len(pattern_stops)
+
+        # Active trips of the day: departures by stop column, arrivals by row
+        for active_trips, view_departures, arrivals, trip_starts in self._trip_groups(pattern_idx):
+            n_active = len(active_trips)
+            if not n_active:
+                continue
+
+            # Try to board at each marked stop and ride
+            current_pos = -1  # Position of the current trip in active_trips
+            current_trip_idx = -1
+            trip_offset = 0
+            boarding_stop = -1
+            boarding_idx = -1
+
+            for idx in range(board_stop_idx, n_pattern_stops):
+                stop_idx = pattern_stops[idx]
+
+                # Can we board here?
+                # Los patterns son FIFO: el trip actual es mejor que cualquiera que
+                # salga más tarde, así que solo buscamos si no vamos en ninguno o si
+                # alcanzamos aquí el trip activo anterior al actual
+                arrival_at_stop = prev_arrival[stop_idx]
+                if arrival_at_stop != UNREACHED:
+                    column = idx * n_active
+
+                    if current_pos < 0:
+                        hi = column + n_active
+                    elif current_pos > 0 and view_departures[column + current_pos - 1] >= arrival_at_stop:
+                        hi = column + current_pos
+                    else:
+                        hi = -1
+
+                    # Find earliest trip we can board at this stop (binary search)
+                    pos = bisect_left(view_departures, arrival_at_stop, column, hi) if hi >= 0 else hi
+                    if 0 <= pos < hi:
+                        current_pos = pos - column
+                        current_trip_idx = active_trips[current_pos]
+                        trip_offset = trip_starts[current_pos]
+                        boarding_stop = stop_idx
+                        boarding_idx = idx
+
+                # If we're on a trip, check if we improve arrival at this stop
+                if current_trip_idx >= 0 and idx > boarding_idx:
+                    arrival_time = arrivals[trip_offset + idx]
+
+                    if arrival_time < best_arrival[stop_idx] and arrival_time < arrival[stop_idx] and arrival_time < target:
+                        arrival[stop_idx] = arrival_time
+                        trip[stop_idx] = current_trip_idx
+                        board[stop_idx] = boarding_stop
+                        board_pos[stop_idx] = boarding_idx
+                        best_arrival[stop_idx] = arrival_time
+                        if is_target[stop_idx]:
+                            target = min(target, arrival_time + self._egress.get(stop_idx, 0))
+                        if not improved[stop_idx]:
+                            improved[stop_idx] = 1
+                            improved_stops.append(stop_idx)
+
+        return target
+
+    def _scan_frequency_pattern(
+        self,
+        pattern_idx: int,
+        pattern_stops: array,
+        board_stop_idx: int,
+        labels: RoundLabels,
+        k: int,
+        best_arrival: array,
+        improved: bytearray,
+        improved_stops: List[int],
+        is_target: bytearray,
+        target: int
+    ) -> int:
+        """Scan a frequency-based pattern (see _scan_pattern).
+
+        Every run follows the template trip's profile, shifted by its
+        departure from the first stop. Boarding takes the next run of the
+        headway windows (_next_run); a run boarded
+        further along replaces the current one if it leaves earlier. Labels
+        keep the template trip_idx.
+        """
+        store = self.store
+        prev_arrival = labels.arrival[k - 1]
+        arrival, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+        board_pos = labels.board_pos[k]
+        template_trip_idx = store.pattern_trip_offsets[pattern_idx]
+        template_row = store.trip_offsets[template_trip_idx]
+        st_arrival = store.st_arrival
+
+        current_run = None  # Departure of the boarded run from the first stop
+        boarding_stop = -1
+        boarding_idx = -1
 
         for idx in range(board_stop_idx, len(pattern_stops)):
-            stop_id = pattern_stops[idx]
+            stop_idx = pattern_stops[idx]
+
+            arrival_at_stop = prev_arrival[stop_idx]
+            if arrival_at_stop != UNREACHED:
+                run = self._next_run(pattern_idx, idx, arrival_at_stop)
+                if run is not None and (current_run is None or run < current_run):
+                    current_run = run
+                    boarding_stop = stop_idx
+                    boarding_idx = idx
+
+            if current_run is not None and idx > boarding_idx:
+                arrival_time = current_run + st_arrival[template_row + idx]
+
+                if arrival_time < best_arrival[stop_idx] and arrival_time < arrival[stop_idx] and arrival_time < target:
+                    arrival[stop_idx] = arrival_time
+                    trip[stop_idx] = template_trip_idx
+                    board[stop_idx] = boarding_stop
+                    board_pos[stop_idx] = boarding_idx
+                    best_arrival[stop_idx] = arrival_time
+                    if is_target[stop_idx]:
+                        target = min(target, arrival_time + self._egress.get(stop_idx, 0))
+                    if not improved[stop_idx]:
+                        improved[stop_idx] = 1
+                        improved_stops.append(stop_idx)
+
+        return target
+
+    def _alight_position(self, trip_idx: int, board_idx: int, alight_stop: int) -> int:
+        """Position where a trip boarded at board_idx is left at alight_stop.
+
+        Stops may repeat (loops): it is the next occurrence of alight_stop
+        after board_idx, the first one the scan labelled (-1 if none).
+        """
+        pattern_stops = self.store.get_pattern_stop_indexes(self.store.trip_pattern[trip_idx])
+        return next((i for i in range(board_idx + 1, len(pattern_stops)) if pattern_stops[i] == alight_stop), -1)
 
-            # Can we board here?
-            if stop_id in prev_labels:
-                arrival_at_stop = prev_labels[stop_id].arrival_time
+    def _board_position(self, trip_idx: int, board_stop: int, alight_idx: int) -> int:
+        """Position where a trip left at alight_idx was boarded at board_stop.
 
-                # Find earliest trip we can board at this stop (usando Store)
-                new_trip_id = self.store.get_earliest_trip(
-                    pattern_id, idx, arrival_at_stop, self._active_services
+        The last occurrence of board_stop before alight_idx, the first one
+        the backward scan labelled (-1 if none).
+        """
+        pattern_stops = self.store.get_pattern_stop_indexes(self.store.trip_pattern[trip_idx])
+        return next((i for i in range(alight_idx - 1, -1, -1) if pattern_stops[i] == board_stop), -1)
+
+    def _frequency_departure(self, trip_idx: int, board_idx: int, alight_idx: int, arrival_time: int) -> int:
+        """Departure from position board_idx of the frequency run arriving at position alight_idx at arrival_time."""
+        store = self.store
+        row = store.trip_offsets[trip_idx]
+        run = arrival_time - store.st_arrival[row + alight_idx]
+        return run + store.st_departure[row + board_idx]
+
+    def _reverse_trip_groups(self, pattern_idx: int) -> Tuple[Tuple[array, array, array], ...]:
+        """Trips of a pattern for the reverse scan (see _trip_groups).
+
+        Returns:
+            (trips, departures by stop column, arrivals by stop column) per group
+        """
+        groups = None
+        overlay = self._overlay
+        if overlay is not None:
+            realtime_groups = overlay.groups.get(pattern_idx)
+            if realtime_groups is not None:
+                groups = self._overlay_columns.get(pattern_idx)
+                if groups is None:
+                    n_stops = len(self.store.get_pattern_stop_indexes(pattern_idx))
+                    groups = self._overlay_columns[pattern_idx] = tuple(
+                        (trips, departures, PatternDayView.by_columns(arrivals, starts, n_stops))
+                        for trips, departures, arrivals, starts in realtime_groups
+                    )
+        if groups is None:
+            day_view = self._day_view
+            groups = ((day_view.active_trips(pattern_idx), day_view.departures(pattern_idx),
+                       day_view.arrival_columns(pattern_idx)),)
+        previous = self._previous_view
+        if len(previous.active_trips(pattern_idx)):
+            groups = groups + ((previous.active_trips(pattern_idx), previous.departures(pattern_idx),
+                                previous.arrival_columns(pattern_idx)),)
+        return groups
+
+    def _previous_run(self, pattern_idx: int, stop_index: int, max_arrival: int) -> Optional[int]:
+        """Latest run of a frequency-based pattern reaching the stop by max_arrival.
+
+        The reverse of _next_run, over the query date's and the previous
+        service day's headway windows.
+
+        Returns:
+            Departure of the run from the first stop, or None if there is none
+        """
+        run = self._day_view.previous_run(pattern_idx, stop_index, max_arrival)
+        best = run if run >= 0 else None
+        previous = self._previous_view
+        run = previous.previous_run(pattern_idx, stop_index, max_arrival + previous.shift)
+        if run >= 0 and (best is None or run - previous.shift > best):
+            best = run - previous.shift
+        return best
+
+    def _run_reverse_raptor(
+        self,
+        origin_stop_ids: List[str],
+        destination_stop_ids: List[str],
+        arrival_seconds: int,
+        max_rounds: int
+    ) -> RoundLabels:
+        """Run RAPTOR backwards from the destinations (see _run_raptor).
+
+        Destinations start at arrival_seconds minus their egress walk. Each
+        round scans the patterns serving the marked stops from their last
+        marked stop towards the first one, then walks back along the
+        footpaths that lead into the improved stops. With target pruning
+        the target is the latest departure found at an origin (minus its
+        access walk), and stops departing no later are dropped.
+
+        Returns:
+            Reverse labels of every round reached (see RoundLabels)
+        """
+        store = self.store
+        stop_index = store.stop_index
+        n_stops = len(store.stop_ids)
+        labels = RoundLabels(n_stops, unreached=NO_DEPARTURE)
+        best_departure = array('i', [NO_DEPARTURE]) * n_stops
+
+        access_seconds = self._access_seconds or {}
+        origin_access: Dict[int, int] = {}
+        for origin_id in origin_stop_ids:
+            origin_idx = stop_index[origin_id]
+            origin_access[origin_idx] = min(access_seconds.get(origin_id, 0), origin_access.get(origin_idx, INFINITY))
+        is_target = bytearray(n_stops)
+        if self.target_pruning:
+            for origin_idx in origin_access:
+                is_target[origin_idx] = 1
+        target = NO_DEPARTURE
+        stats = self.stats
+
+        marked = bytearray(n_stops)
+        marked_stops: List[int] = []
+
+        # Round 0: every destination, as late as its egress walk allows
+        departure, trip, board = labels.arrival[0], labels.trip[0], labels.board[0]
+        destination_idxs = [stop_index[destination_id] for destination_id in destination_stop_ids]
+        for destination_idx in destination_idxs:
+            latest = arrival_seconds - self._egress.get(destination_idx, 0)
+            if latest <= target or latest <= best_departure[destination_idx]:
+                continue
+            departure[destination_idx] = latest
+            trip[destination_idx] = board[destination_idx] = -1
+            best_departure[destination_idx] = latest
+            if is_target[destination_idx]:
+                target = max(target, latest - origin_access[destination_idx])
+            if not marked[destination_idx]:
+                marked[destination_idx] = 1
+                marked_stops.append(destination_idx)
+
+        # Final footpaths: stops from which a destination is reached on foot
+        footpath_in_offsets = store.footpath_in_offsets
+        footpath_from = store.footpath_from
+        footpath_in_seconds = store.footpath_in_seconds
+        for destination_idx in destination_idxs:
+            if not marked[destination_idx] or board[destination_idx] >= 0:
+                continue
+            for j in range(footpath_in_offsets[destination_idx], footpath_in_offsets[destination_idx + 1]):
+                from_idx = footpath_from[j]
+                departure_before_walk = departure[destination_idx] - footpath_in_seconds[j] - TRANSFER_PENALTY_SECONDS
+                if departure_before_walk > best_departure[from_idx] and departure_before_walk > target:
+                    departure[from_idx] = departure_before_walk
+                    trip[from_idx] = -1
+                    board[from_idx] = destination_idx
+                    best_departure[from_idx] = departure_before_walk
+                    if is_target[from_idx]:
+                        target = max(target, departure_before_walk - origin_access[from_idx])
+                    if not marked[from_idx]:
+                        marked[from_idx] = 1
+                        marked_stops.append(from_idx)
+
+        for k in range(1, max_rounds + 1):
+            if not marked_stops:
+                break
+            labels.add_round()
+
+            patterns_to_scan: Set[int] = set()
+            for stop_idx in marked_stops:
+                patterns_to_scan.update(store.get_stop_patterns(stop_idx))
+
+            improved = bytearray(n_stops)
+            new_marked_stops: List[int] = []
+            for pattern_idx in patterns_to_scan:
+                target = self._scan_pattern_reverse(
+                    pattern_idx, labels, k, best_departure, marked, improved, new_marked_stops,
+                    is_target, origin_access, target
                 )
+            stats.rounds += 1
+            stats.patterns_scanned += len(patterns_to_scan)
 
-                # Solo montarnos si no estamos ya en un trip
-                # En sistemas FIFO (Metro/Cercanías), el trip actual siempre es mejor
-                # que cualquier otro que salga más tarde de la misma línea
-                if new_trip_id and current_trip_id is None:
-                    current_trip_id = new_trip_id
-                    boarding_stop_id = stop_id
-                    boarding_stop_idx = idx
-                    boarding_time = arrival_at_stop
-
-            # If we're on a trip, check if we improve arrival at this stop
-            if current_trip_id and boarding_stop_idx is not None and idx > boarding_stop_idx:
-                arrival_time = self._get_trip_arrival(current_trip_id, idx)
-
-                if arrival_time is not None and arrival_time < best_arrival[stop_id]:
-                    # Found improvement - get route_id from trip_info
-                    trip_info = self.store.get_trip_info(current_trip_id)
-                    route_id = trip_info[0] if trip_info else None
-
-                    if stop_id not in curr_labels or arrival_time < curr_labels[stop_id].arrival_time:
-                        curr_labels[stop_id] = Label(
-                            arrival_time=arrival_time,
-                            trip_id=current_trip_id,
-                            boarding_stop_id=boarding_stop_id,
-                            boarding_time=boarding_time,
-                            route_id=route_id
-                        )
-                        best_arrival[stop_id] = arrival_time
-                        improved_stops.add(stop_id)
-
-        return improved_stops
-
-    def _get_trip_arrival(self, trip_id: str, stop_index: int) -> Optional[int]:
-        """Get arrival time at a stop for a trip using O(1) index access.
+            # Footpaths into the stops reached by a trip in this round
+            departure, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+            for stop_idx in new_marked_stops[:]:
+                if trip[stop_idx] < 0:
+                    continue
+                departure_at_stop = departure[stop_idx]
+
+                for j in range(footpath_in_offsets[stop_idx], footpath_in_offsets[stop_idx + 1]):
+                    from_idx = footpath_from[j]
+                    departure_before_walk = departure_at_stop - footpath_in_seconds[j] - TRANSFER_PENALTY_SECONDS
+
+                    if (departure_before_walk > best_departure[from_idx] and departure_before_walk > departure[from_idx]
+                            and departure_before_walk > target):
+                        departure[from_idx] = departure_before_walk
+                        trip[from_idx] = -1
+                        board[from_idx] = stop_idx
+                        best_departure[from_idx] = departure_before_walk
+                        if is_target[from_idx]:
+                            target = max(target, departure_before_walk - origin_access[from_idx])
+                        if not improved[from_idx]:
+                            improved[from_idx] = 1
+                            new_marked_stops.append(from_idx)
+
+            stats.stops_improved += len(new_marked_stops)
+
+            # Early termination: a stop left no later than the target cannot
+            # lead to a later departure from an origin
+            marked = improved
+            marked_stops = []
+            for stop_idx in new_marked_stops:
+                if departure[stop_idx] > target:
+                    marked_stops.append(stop_idx)
+                else:
+                    marked[stop_idx] = 0
+            stats.stops_pruned += len(new_marked_stops) - len(marked_stops)
 
-        Args:
-            trip_id: The trip ID
-            stop_index: Index of the stop in the pattern sequence
+        return labels
+
+    def _scan_pattern_reverse(
+        self,
+        pattern_idx: int,
+        labels: RoundLabels,
+        k: int,
+        best_departure: array,
+        marked: bytearray,
+        improved: bytearray,
+        improved_stops: List[int],
+        is_target: bytearray,
+        origin_access: Dict[int, int],
+        target: int
+    ) -> int:
+        """Scan a single pattern backwards (see _scan_pattern).
+
+        From the last marked stop towards the first: at each labelled stop
+        the latest trip arriving no later than its label is found with a
+        binary search on the arrival column (a later trip arrives no
+        earlier anywhere, so it only replaces the current one if it still
+        arrives in time), and the stops before it are labelled with the
+        trip's departures.
 
         Returns:
-            Arrival time in seconds, or None if index out of bounds
+            The latest departure from any origin after the scan
         """
-        try:
-            # O(1) access: stop_times_by_trip[trip_id][stop_index] = (stop_id, arrival, departure)
-            return self.store.stop_times_by_trip[trip_id][stop_index][1]
-        except (KeyError, IndexError):
-            return None
+        store = self.store
+        pattern_stops = store.get_pattern_stop_indexes(pattern_idx)
+        prev_departure = labels.arrival[k - 1]
+
+        # Find last marked stop in this pattern
+        alight_stop_idx = None
+        for idx in range(len(pattern_stops) - 1, -1, -1):
+            stop_idx = pattern_stops[idx]
+            if marked[stop_idx] and prev_departure[stop_idx] != NO_DEPARTURE:
+                alight_stop_idx = idx
+                break
 
-    def _get_trip_departure(self, trip_id: str, stop_id: str) -> Optional[int]:
+        if alight_stop_idx is None:
+            return target
+        if store.is_frequency_pattern(pattern_idx):
+            return self._scan_frequency_pattern_reverse(
+                pattern_idx, pattern_stops, alight_stop_idx, labels, k, best_departure,
+                improved, improved_stops, is_target, origin_access, target
+            )
+
+        departure, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+        board_pos = labels.board_pos[k]
+
+        for active_trips, view_departures, view_arrivals in self._reverse_trip_groups(pattern_idx):
+            n_active = len(active_trips)
+            if not n_active:
+                continue
+
+            current_pos = -1  # Position of the current trip in active_trips
+            current_trip_idx = -1
+            alight_stop = -1
+            alight_idx = -1
+
+            for idx in range(alight_stop_idx, -1, -1):
+                stop_idx = pattern_stops[idx]
+
+                # Can we alight here? Only a later trip than the current one
+                # can improve, and only if it still arrives in time
+                latest = prev_departure[stop_idx]
+                if latest != NO_DEPARTURE:
+                    column = idx * n_active
+                    if current_pos < 0:
+                        lo = column
+                    elif current_pos < n_active - 1 and view_arrivals[column + current_pos + 1] <= latest:
+                        lo = column + current_pos + 1
+                    else:
+                        lo = -1
+
+                    # Latest trip arriving by the label (binary search from the right)
+                    pos = bisect_right(view_arrivals, latest, lo, column + n_active) - 1 if lo >= 0 else -1
+                    if lo >= 0 and pos >= lo:
+                        current_pos = pos - column
+                        current_trip_idx = active_trips[current_pos]
+                        alight_stop = stop_idx
+                        alight_idx = idx
+
+                # If we're on a trip, check if we improve the departure from this stop
+                if current_trip_idx >= 0 and idx < alight_idx:
+                    departure_time = view_departures[idx * n_active + current_pos]
+
+                    if (departure_time > best_departure[stop_idx] and departure_time > departure[stop_idx]
+                            and departure_time > target):
+                        departure[stop_idx] = departure_time
+                        trip[stop_idx] = current_trip_idx
+                        board[stop_idx] = alight_stop
+                        board_pos[stop_idx] = alight_idx
+                        best_departure[stop_idx] = departure_time
+                        if is_target[stop_idx]:
+                            target = max(target, departure_time - origin_access[stop_idx])
+                        if not improved[stop_idx]:
+                            improved[stop_idx] = 1
+                            improved_stops.append(stop_idx)
+
+        return target
+
+    def _scan_frequency_pattern_reverse(
+        self,
+        pattern_idx: int,
+        pattern_stops: array,
+        alight_stop_idx: int,
+        labels: RoundLabels,
+        k: int,
+        best_departure: array,
+        improved: bytearray,
+        improved_stops: List[int],
+        is_target: bytearray,
+        origin_access: Dict[int, int],
+        target: int
+    ) -> int:
+        """Scan a frequency-based pattern backwards (see _scan_frequency_pattern).
+
+        Alighting takes the latest run of the headway windows that arrives
+        in time (_previous_run); a run alighted from further back replaces
+        the current one if it leaves later.
+        """
+        store = self.store
+        prev_departure = labels.arrival[k - 1]
+        departure, trip, board = labels.arrival[k], labels.trip[k], labels.board[k]
+        board_pos = labels.board_pos[k]
+        template_trip_idx = store.pattern_trip_offsets[pattern_idx]
+        template_row = store.trip_offsets[template_trip_idx]
+        st_departure = store.st_departure
+
+        current_run = None  # Departure of the run from the first stop
+        alight_stop = -1
+        alight_idx = -1
+
+        for idx in range(alight_stop_idx, -1, -1):
+            stop_idx = pattern_stops[idx]
+
+            latest = prev_departure[stop_idx]
+            if latest != NO_DEPARTURE:
+                run = self._previous_run(pattern_idx, idx, latest)
+                if run is not None and (current_run is None or run > current_run):
+                    current_run = run
+                    alight_stop = stop_idx
+                    alight_idx = idx
+
+            if current_run is not None and idx < alight_idx:
+                departure_time = current_run + st_departure[template_row + idx]
+
+                if (departure_time > best_departure[stop_idx] and departure_time > departure[stop_idx]
+                        and departure_time > target):
+                    departure[stop_idx] = departure_time
+                    trip[stop_idx] = template_trip_idx
+                    board[stop_idx] = alight_stop
+                    board_pos[stop_idx] = alight_idx
+                    best_departure[stop_idx] = departure_time
+                    if is_target[stop_idx]:
+                        target = max(target, departure_time - origin_access[stop_idx])
+                    if not improved[stop_idx]:
+                        improved[stop_idx] = 1
+                        improved_stops.append(stop_idx)
+
+        return target
+
+    def _trip_arrival(self, trip_idx: int, board_idx: int, alight_idx: int, departure_time: int) -> Optional[int]:
+        """Arrival at position alight_idx of the trip (or frequency run) leaving position board_idx at departure_time.
+
+        Read from the same trip groups the search scanned, so realtime
+        delays and previous-day trips are taken into account.
+        """
+        store = self.store
+        pattern_idx = store.trip_pattern[trip_idx]
+        if store.is_frequency_pattern(pattern_idx):
+            row = store.trip_offsets[trip_idx]
+            return departure_time - store.st_departure[row + board_idx] + store.st_arrival[row + alight_idx]
+        for active_trips, view_departures, arrivals, trip_starts in self._trip_groups(pattern_idx):
+            column = board_idx * len(active_trips)
+            for pos, active_trip_idx in enumerate(active_trips):
+                if active_trip_idx == trip_idx and view_departures[column + pos] == departure_time:
+                    return arrivals[trip_starts[pos] + alight_idx]
+        return None
+
+    def _extract_reverse_journeys(self, labels: RoundLabels, origin_stop_ids: List[str]) -> List[Journey]:
+        """Extract the journeys of a reverse run (one per round and origin reached).
+
+        Each journey leaves its origin at the latest labelled departure
+        (minus the access walk of coordinate origins).
+        """
+        journeys: List[Journey] = []
+        stop_index = self.store.stop_index
+        access_seconds = self._access_seconds or {}
+
+        for round_num, departure in enumerate(labels.arrival):
+            for origin_id in origin_stop_ids:
+                origin_idx = stop_index[origin_id]
+                if departure[origin_idx] == NO_DEPARTURE:
+                    continue
+                # Same label as the round before: same journey, fewer transfers
+                if round_num > 0 and labels.copied(round_num, origin_idx):
+                    continue
+
+                legs = self._reconstruct_reverse_legs(labels, origin_idx, round_num)
+                if not legs:
+                    continue
+                departure_seconds = legs[0].departure_time - access_seconds.get(origin_id, 0)
+                legs = self._add_point_legs(legs, departure_seconds, stop_index[legs[-1].to_stop_id])
+                journeys.append(Journey(
+                    departure_time=departure_seconds,
+                    arrival_time=legs[-1].arrival_time,
+                    transfers=max(0, round_num - 1),
+                    legs=legs
+                ))
+
+        return journeys
+
+    def _reconstruct_reverse_legs(self, labels: RoundLabels, origin_idx: int, round_num: int) -> List[JourneyLeg]:
+        """Reconstruct the legs of a reverse run, from the origin forwards.
+
+        The labels hold the latest departures; walks after a trip start on
+        its arrival instead, so the legs are contiguous.
+        """
+        legs: List[JourneyLeg] = []
+        store = self.store
+        stop_ids = store.stop_ids
+
+        current_stop = origin_idx
+        current_round = round_num
+        for _ in range(2 * MAX_ROUNDS + 2):
+            departure = labels.arrival[current_round]
+            if departure[current_stop] == NO_DEPARTURE:
+                return []  # Inconsistent labels
+            trip_idx = labels.trip[current_round][current_stop]
+            parent = labels.board[current_round][current_stop]
+
+            if parent < 0:
+                # Destination
+                return legs
+
+            if trip_idx < 0:
+                start = legs[-1].arrival_time if legs else departure[current_stop]
+                legs.append(JourneyLeg(
+                    type="walking",
+                    from_stop_id=stop_ids[current_stop],
+                    to_stop_id=stop_ids[parent],
+                    departure_time=start,
+                    arrival_time=start + departure[parent] - departure[current_stop]
+                ))
+                current_stop = parent
+            else:
+                departure_time = departure[current_stop]
+                alight_idx = labels.board_pos[current_round][current_stop]
+                board_idx = self._board_position(trip_idx, current_stop, alight_idx)
+                arrival_time = (self._trip_arrival(trip_idx, board_idx, alight_idx, departure_time)
+                                if board_idx >= 0 else None)
+                if arrival_time is None:
+                    # Fallback: latest arrival the alighting stop allows
+                    arrival_time = labels.arrival[current_round - 1][parent]
+                legs.append(JourneyLeg(
+                    type="transit",
+                    from_stop_id=stop_ids[current_stop],
+                    to_stop_id=stop_ids[parent],
+                    departure_time=departure_time,
+                    arrival_time=arrival_time,
+                    route_id=store.route_ids[store.trip_route[trip_idx]],
+                    trip_id=store.trip_ids[trip_idx],
+                    headsign=store.trip_headsigns[trip_idx],
+                    board_pos=board_idx,
+                    alight_pos=alight_idx
+                ))
+                current_stop = parent
+                current_round -= 1
+
+        return []  # Corrupt parent pointers
+
+    def _get_trip_departure(
+        self, trip_id: str, stop_id: str, realtime: bool = True, position: Optional[int] = None
+    ) -> Optional[int]:
         """Get departure time at a stop for a trip.
 
         Args:
             trip_id: The trip ID
             stop_id: The stop to get departure time for
+            realtime: Apply the delay overlay of the query date, if any
+            position: Position of the stop in the trip, for loops that
+                visit it more than once (default: its first occurrence)
 
         Returns:
             Departure time in seconds, or None if stop not found
         """
         stop_times = self.store.get_stop_times(trip_id)
-        for st_stop_id, _, departure_sec in stop_times:
-            if st_stop_id == stop_id:
-                return departure_sec
+        realtime_departures = None
+        if realtime and self._overlay is not None:
+            realtime_departures = self._overlay.trip_departures.get(self.store.trip_index.get(trip_id, -1))
+        for idx, (st_stop_id, _, departure_sec) in enumerate(stop_times):
+            if st_stop_id == stop_id and (position is None or idx == position):
+                return realtime_departures[idx] if realtime_departures is not None else departure_sec
         return None
 
     def _extract_journeys(
         self,
-        labels: Dict[int, Dict[str, Label]],
+        labels: RoundLabels,
         origin_stop_ids: List[str],
         destination_stop_ids: List[str],
         departure_seconds: int
@@ -420,24 +1538,23 @@ class RaptorAlgorithm:
             List of journeys (one per round that reached destination)
         """
         journeys: List[Journey] = []
+        stop_index = self.store.stop_index
 
-        for round_num, round_labels in labels.items():
+        for round_num, arrival in enumerate(labels.arrival):
             # Check if ANY destination was reached in this round
             for dest_id in destination_stop_ids:
-                if dest_id not in round_labels:
-                    continue
-
-                label = round_labels[dest_id]
-                if label.arrival_time >= INFINITY:
+                arrival_time = arrival[stop_index[dest_id]]
+                if arrival_time == UNREACHED:
                     continue
 
                 # Reconstruct journey by backtracking
                 legs = self._reconstruct_legs(labels, dest_id, round_num, origin_stop_ids)
 
                 if legs:
+                    legs = self._add_point_legs(legs, departure_seconds, stop_index[dest_id])
                     journey = Journey(
                         departure_time=departure_seconds,
-                        arrival_time=label.arrival_time,
+                        arrival_time=arrival_time + self._egress.get(stop_index[dest_id], 0),
                         transfers=max(0, round_num - 1),
                         legs=legs
                     )
@@ -445,17 +1562,46 @@ class RaptorAlgorithm:
 
         return journeys
 
+    def _add_point_legs(self, legs: List[JourneyLeg], departure_seconds: int, dest_idx: int) -> List[JourneyLeg]:
+        """Add the walks from/to the query points of a coordinate query.
+
+        The access leg leaves the origin point at departure_seconds; the
+        egress leg starts on arrival at the destination stop.
+        """
+        access_seconds = self._access_seconds
+        if access_seconds and legs[0].from_stop_id in access_seconds:
+            legs.insert(0, JourneyLeg(
+                type="walking",
+                from_stop_id=ORIGIN_POINT_ID,
+                to_stop_id=legs[0].from_stop_id,
+                departure_time=departure_seconds,
+                arrival_time=departure_seconds + access_seconds[legs[0].from_stop_id]
+            ))
+        egress = self._egress.get(dest_idx)
+        if egress is not None:
+            legs.append(JourneyLeg(
+                type="walking",
+                from_stop_id=legs[-1].to_stop_id,
+                to_stop_id=DESTINATION_POINT_ID,
+                departure_time=legs[-1].arrival_time,
+                arrival_time=legs[-1].arrival_time + egress
+            ))
+        return legs
+
     def _reconstruct_legs(
         self,
-        labels: Dict[int, Dict[str, Label]],
+        labels: RoundLabels,
         destination_stop_id: str,
         round_num: int,
         origin_stop_ids: List[str]
     ) -> List[JourneyLeg]:
-        """Reconstruct the journey legs by backtracking through labels."""
+        """Reconstruct the journey legs by following the parent pointers."""
         legs: List[JourneyLeg] = []
+        store = self.store
+        stop_ids = store.stop_ids
+        origin_idxs = {store.stop_index[origin_id] for origin_id in origin_stop_ids}
 
-        current_stop = destination_stop_id
+        current_stop = store.stop_index[destination_stop_id]
         current_round = round_num
 
         # Safety counter para evitar infinite loops con datos corruptos
@@ -463,78 +1609,79 @@ class RaptorAlgorithm:
         MAX_STEPS = 20  # 5 rondas * 2 tramos + margen
 
         # Stop when we reach ANY of the origin stops
-        while current_stop not in origin_stop_ids and current_round >= 0:
+        while current_stop not in origin_idxs and current_round >= 0:
             safety_counter += 1
             if safety_counter > MAX_STEPS:
                 print(f"⚠️ Infinite loop detected reconstructing journey to {destination_stop_id}")
                 return []  # Abortar ruta corrupta
 
-            if current_stop not in labels[current_round]:
+            arrival = labels.arrival[current_round]
+            if arrival[current_stop] == UNREACHED:
                 break
 
-            label = labels[current_round][current_stop]
-
-            if label.is_transfer:
-                # Walking leg
-                from_stop = label.from_stop_id
-                if from_stop:
-                    # Get arrival time at from_stop (validar existencia, no inventar 0)
-                    from_label = labels[current_round].get(from_stop)
-                    if not from_label:
-                        # Datos inconsistentes - saltar este leg
-                        current_stop = from_stop
-                        continue
-                    from_arrival = from_label.arrival_time
-
-                    legs.append(JourneyLeg(
-                        type="walking",
-                        from_stop_id=from_stop,
-                        to_stop_id=current_stop,
-                        departure_time=from_arrival,
-                        arrival_time=label.arrival_time
-                    ))
-                    current_stop = from_stop
-            elif label.boarding_stop_id:
-                # Transit leg - use GTFSStore to get departure time
-                actual_departure = None
-                headsign = None
-
-                if label.trip_id:
-                    # Get actual departure time from stop_times (fuente de verdad)
-                    dep_time = self._get_trip_departure(label.trip_id, label.boarding_stop_id)
-                    if dep_time is not None:
-                        actual_departure = dep_time
-
-                    # Get headsign from trip_info
-                    trip_info = self.store.get_trip_info(label.trip_id)
-                    if trip_info:
-                        headsign = trip_info[1]  # index 1 is headsign
-
-                # Fallback a boarding_time del label si store no tiene dato
-                if actual_departure is None:
-                    actual_departure = label.boarding_time
+            trip_idx = labels.trip[current_round][current_stop]
+            parent = labels.board[current_round][current_stop]
+
+            if parent < 0:
+                # Origin
+                break
+
+            if trip_idx < 0:
+                # Walking leg (validar que la parada de origen tiene label, no inventar 0)
+                if arrival[parent] == UNREACHED:
+                    # Datos inconsistentes - saltar este leg
+                    current_stop = parent
+                    continue
+
+                legs.append(JourneyLeg(
+                    type="walking",
+                    from_stop_id=stop_ids[parent],
+                    to_stop_id=stop_ids[current_stop],
+                    departure_time=arrival[parent],
+                    arrival_time=arrival[current_stop]
+                ))
+                current_stop = parent
+            else:
+                # Transit leg - actual departure from stop_times (fuente de verdad)
+                trip_id = store.trip_ids[trip_idx]
+                board_idx = labels.board_pos[current_round][current_stop]
+                alight_idx = self._alight_position(trip_idx, board_idx, current_stop)
+                if store.is_frequency_pattern(store.trip_pattern[trip_idx]):
+                    actual_departure = self._frequency_departure(
+                        trip_idx, board_idx, alight_idx, arrival[current_stop])
+                else:
+                    actual_departure = self._get_trip_departure(trip_id, stop_ids[parent], position=board_idx)
+                    if actual_departure is not None and actual_departure > arrival[current_stop]:
+                        # Ridden on the previous service day (see _trip_groups)
+                        actual_departure = self._get_trip_departure(
+                            trip_id, stop_ids[parent], realtime=False, position=board_idx) - SERVICE_DAY_SECONDS
+
+                # Fallback a la llegada a la parada de subida si store no tiene dato
+                if actual_departure is None and current_round > 0:
+                    boarding_time = labels.arrival[current_round - 1][parent]
+                    if boarding_time != UNREACHED:
+                        actual_departure = boarding_time
 
                 # Si aún no tenemos tiempo, datos corruptos - skip leg
                 if actual_departure is None:
-                    current_stop = label.boarding_stop_id
+                    current_stop = parent
                     current_round -= 1
                     continue
 
                 legs.append(JourneyLeg(
                     type="transit",
-                    from_stop_id=label.boarding_stop_id,
-                    to_stop_id=current_stop,
+                    from_stop_id=stop_ids[parent],
+                    to_stop_id=stop_ids[current_stop],
                     departure_time=actual_departure,
-                    arrival_time=label.arrival_time,
-                    route_id=label.route_id,
-                    trip_id=label.trip_id,
-                    headsign=headsign
+                    arrival_time=arrival[current_stop],
+                    route_id=store.route_ids[store.trip_route[trip_idx]],
+                    trip_id=trip_id,
+                    headsign=store.trip_headsigns[trip_idx],
+                    board_pos=board_idx,
+                    alight_pos=alight_idx
                 ))
-                current_stop = label.boarding_stop_id
+                current_stop = parent
                 current_round -= 1
-            else:
-                # Origin
-                break
 
         # Reverse to get legs in order
         legs.reverse()
@@ -583,3 +1730,50 @@ class RaptorAlgorithm:
 
         # Limit to 3 journeys
         return pareto_optimal[:3]
+
+    def _arrive_by_pareto_filter(self, journeys: List[Journey]) -> List[Journey]:
+        """Filter arrive-by journeys to keep only Pareto-optimal ones.
+
+        The mirror of _pareto_filter: a journey is dropped if another one
+        departs no earlier with no more transfers. Among equal ones the
+        earliest arrival is kept.
+
+        Args:
+            journeys: Journeys found by plan_arrive_by
+
+        Returns:
+            Pareto-optimal journeys, latest departure first
+        """
+        pareto_optimal: List[Journey] = []
+        for journey in sorted(journeys, key=lambda j: (-j.departure_time, j.transfers, j.arrival_time)):
+            # Sorted by departure: only the transfers can make it non-dominated
+            if not any(other.transfers <= journey.transfers for other in pareto_optimal):
+                pareto_optimal.append(journey)
+
+        # Limit to 3 journeys
+        return pareto_optimal[:3]
+
+    def _profile_pareto_filter(self, journeys: List[Journey]) -> List[Journey]:
+        """Filter range-query journeys by departure, arrival and transfers.
+
+        A journey is dropped if another one departs no earlier, arrives no
+        later and has no more transfers (and is strictly better in one).
+        Unlike _pareto_filter there is no limit: the window decides how
+        many departures are returned.
+
+        Args:
+            journeys: Journeys found by plan_profile
+
+        Returns:
+            Non-dominated journeys sorted by departure time
+        """
+        def dominates(a: Journey, b: Journey) -> bool:
+            return (a.departure_time >= b.departure_time and
+                    a.arrival_time <= b.arrival_time and
+                    a.transfers <= b.transfers and
+                    (a.departure_time, -a.arrival_time, -a.transfers) !=
+                    (b.departure_time, -b.arrival_time, -b.transfers))
+
+        kept = [j for j in journeys if not any(dominates(other, j) for other in journeys)]
+        kept.sort(key=lambda j: (j.departure_time, j.arrival_time, j.transfers))
+        return kept
@@ -0,0 +1,252 @@
+"""Dedicated process pool for RAPTOR queries.
+
+RAPTOR is pure Python: run in the API worker (the default threadpool of a
+sync handler) it holds the GIL, so one long query stalls every other
+request of that worker. RaptorExecutor runs the solver in separate
+processes instead; the API thread only waits on a future (GIL released)
+and formats the result.
+
+- Workers are spawned and attach the store snapshot (mmap), so the data
+  is shared through the page cache and only the query and its journeys
+  cross the process boundary. Each task carries the snapshot file identity
+  of the caller's store generation; a worker that is behind re-attaches
+  before solving, so results always come from the caller's generation.
+  If the caller's file has already been replaced (another uvicorn worker
+  rewrote the path), the worker answers with the file at the path and
+  remembers that it did, instead of re-attaching on every task.
+- Back-pressure: at most max_queue queries in flight (queued or running).
+  Beyond that submit fails at once with RaptorBusyError (HTTP 503) instead
+  of piling up requests behind a saturated pool.
+- Realtime: each task carries the version of the caller's delay overlay;
+  a worker with another version reloads the published updates from the
+  file next to the snapshot (see realtime_overlay.py).
+- Timeouts: the caller stops waiting after timeout_seconds
+  (RaptorTimeoutError). A query already running cannot be interrupted, so
+  it keeps its slot until it finishes.
+
+Stores that are not attached from a snapshot (plain SQL load) have nothing
+for the workers to attach; their queries run in-process as before.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.realtime_overlay import realtime_overlay, realtime_path
+
+logger = logging.getLogger(__name__)
+
+
+class RaptorBusyError(RuntimeError):
+    """The pool already has max_queue queries in flight."""
+
+
+class RaptorTimeoutError(RuntimeError):
+    """The query did not finish within the timeout."""
+
+
+# Solver methods a task may call
+_METHODS = ('plan', 'plan_profile', 'plan_arrive_by', 'plan_isochrone')
+
+
+def solve(store: GTFSStore, method: str, multi_criteria: bool, kwargs: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Run one query on a store.
+
+    Returns:
+        (result of the solver method, solver stats)
+    """
+    from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+    from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+
+    if method not in _METHODS:
+        raise ValueError(f"Unknown RAPTOR method: {method}")
+    solver = McRaptorAlgorithm(store=store) if multi_criteria else RaptorAlgorithm(store=store)
+    return getattr(solver, method)(**kwargs), solver.stats
+
+
+def _init_worker(snapshot_path: str) -> None:
+    """Attach the snapshot in a new worker process."""
+    GTFSStore.reset_instance()
+    if not GTFSStore.get_instance().attach_snapshot(snapshot_path):
+        raise RuntimeError(f"Cannot attach GTFS snapshot {snapshot_path}")
+
+
+# Caller file_id the worker's store was adopted for when that file was no
+# longer at the path (see worker_store)
+_adopted_file_id: Optional[List[int]] = None
+
+
+def worker_store(snapshot_path: str, file_id: List[int]) -> GTFSStore:
+    """The store a pool worker answers a task of the caller's generation with.
+
+    Re-attaches the snapshot when the caller's file_id is newer than the
+    worker's. If the caller's file has been replaced meanwhile, the file
+    at the path is used instead and kept for later tasks with the same
+    caller file_id, so the worker does not re-attach on every task.
+    """
+    global _adopted_file_id
+    store = GTFSStore.get_instance()
+    current = store.snapshot_info.get("file_id") if store.snapshot_info else None
+    if file_id == current or file_id == _adopted_file_id:
+        return store
+
+    try:
+        st = os.stat(snapshot_path)
+        on_disk = [st.st_ino, st.st_mtime_ns]
+    except OSError:
+        on_disk = None
+    if on_disk is None or on_disk != current:
+        fresh = GTFSStore()
+        if not fresh.attach_snapshot(snapshot_path):
+            raise RuntimeError(f"Cannot attach GTFS snapshot {snapshot_path}")
+        GTFSStore._instance = store = fresh
+        current = fresh.snapshot_info.get("file_id")
+    if current != file_id:
+        # The caller's file is gone from the path: answer with the one there
+        logger.warning("GTFS snapshot replaced since the caller attached it, using the current file")
+        _adopted_file_id = file_id
+    return store
+
+
+def _worker_solve(
+    snapshot_path: str,
+    file_id: List[int],
+    realtime_version: str,
+    method: str,
+    multi_criteria: bool,
+    kwargs: Dict[str, Any]
+) -> Tuple[Any, Any]:
+    """Task body: make sure this worker has the caller's data, then solve."""
+    store = worker_store(snapshot_path, file_id)
+    realtime_overlay.sync(realtime_path(snapshot_path), realtime_version)
+    return solve(store, method, multi_criteria, kwargs)
+
+
+class RaptorExecutor:
+    """Process pool for RAPTOR with a bounded number of queries in flight."""
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._snapshot_path: Optional[str] = None
+        self.workers = 0
+        self.max_queue = 0
+        self.timeout_seconds = 0.0
+        self.in_flight = 0
+        # Counters since start
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    @property
+    def active(self) -> bool:
+        return self._pool is not None
+
+    def start(self, snapshot_path: str, workers: int, max_queue: int, timeout_seconds: float) -> None:
+        """Spawn the workers; each attaches snapshot_path."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._snapshot_path = snapshot_path
+            self.workers = workers
+            self.max_queue = max(max_queue, workers)
+            self.timeout_seconds = timeout_seconds
+            self._pool = self._new_pool()
+        logger.info(f"RAPTOR executor started: {workers} workers, max {self.max_queue} queries in flight")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self._snapshot_path,),
+        )
+
+    def shutdown(self) -> None:
+        """Stop the workers: queued queries are cancelled, running ones finish."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def accepts(self, store: GTFSStore) -> bool:
+        """Whether queries on this store can run in the pool (same snapshot file)."""
+        return (self._pool is not None and store.snapshot_info is not None
+                and store.snapshot_info.get("path") == self._snapshot_path)
+
+    def run(self, store: GTFSStore, method: str, multi_criteria: bool, kwargs: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Run a query in the pool and wait for it.
+
+        Raises:
+            RaptorBusyError: max_queue queries already in flight (or the pool broke)
+            RaptorTimeoutError: no result within timeout_seconds
+            ValueError: raised by the solver (invalid stops), as in-process
+        """
+        with self._lock:
+            pool = self._pool
+            if pool is None or self.in_flight >= self.max_queue:
+                self.rejected += 1
+                raise RaptorBusyError(f"RAPTOR executor saturated ({self.in_flight} queries in flight)")
+            self.in_flight += 1
+
+        try:
+            future = pool.submit(
+                _worker_solve, self._snapshot_path, store.snapshot_info["file_id"],
+                realtime_overlay.version, method, multi_criteria, kwargs
+            )
+        except BrokenProcessPool:
+            self._release(None)
+            self._restart(pool)
+            raise RaptorBusyError("RAPTOR executor restarting")
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            future.cancel()  # Only possible while still queued
+            with self._lock:
+                self.timeouts += 1
+            raise RaptorTimeoutError(f"RAPTOR query took more than {self.timeout_seconds:g}s")
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise RaptorBusyError("RAPTOR executor restarting")
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a pool whose worker died (only once per broken pool)."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = self._new_pool()
+            self.restarts += 1
+        logger.error("RAPTOR executor pool broken, restarted")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        """Pool state for /health."""
+        return {
+            "active": self.active,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout_seconds,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+
+# Process-wide executor (started by the app lifespan)
+raptor_executor = RaptorExecutor()
@@ -2,15 +2,23 @@
 
 This service wraps the RAPTOR algorithm and provides:
 - Formatted responses with full stop/route details
-- Coordinate arrays for map display
+- Coordinate arrays for map display (transit legs follow the trip's shape)
 - Suggested heading for 3D animations
 - Active alerts for routes used in journeys
+- Journey cache: results reused per OD pair, minute and store data version
+- Isochrones: reachable stops within a time budget (cached per bucket)
+- Coordinate origins/destinations: the nearest stops from the store's
+  spatial index, with their walk, seed RAPTOR (no nearest-stop SQL)
+- Arrive-by: one reverse RAPTOR search from the arrival deadline
+- Off-GIL solving: queries run in the RAPTOR process pool when the store
+  is attached from a snapshot (see raptor_executor.py)
 
 Author: Claude (Anthropic)
 Date: 2026-01-27
 """
 
 import math
+import time as _time
 
 # =============================================================================
 # Station Aliases for Interchange Stations
@@ -30,8 +38,28 @@ from typing import Dict, List, Optional, Tuple, Union
 
 from sqlalchemy.orm import Session
 
-from src.gtfs_bc.routing.raptor import RaptorAlgorithm, Journey, JourneyLeg
-from src.gtfs_bc.routing.gtfs_store import gtfs_store
+from src.gtfs_bc.routing.raptor import (
+    DESTINATION_POINT_ID,
+    ORIGIN_POINT_ID,
+    RaptorAlgorithm,
+    Journey,
+    JourneyLeg,
+)
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor_executor import raptor_executor
+from src.gtfs_bc.routing.journey_cache import (
+    bucket_departure as bucket_journey_departure,
+    journey_cache,
+)
+from src.gtfs_bc.routing.isochrone import (
+    ACCESS_MAX_STOPS,
+    ACCESS_RADIUS_METERS,
+    bucket_departure,
+    build_contours,
+    cache_key,
+    isochrone_cache,
+    stops_near,
+)
 from src.gtfs_bc.realtime.infrastructure.models.alert import AlertModel
 from adapters.http.api.gtfs.utils.shape_utils import normalize_shape
 from adapters.http.api.gtfs.utils.text_utils import normalize_headsign
@@ -83,7 +111,26 @@ class RaptorService:
     def __init__(self, db: Session):
         self.db = db  # Solo para alertas
         self._raptor = RaptorAlgorithm()
-        self._store = gtfs_store
+        # Same store generation as the algorithm (stable during reloads)
+        self._store = self._raptor.store
+        # Query points of a coordinate journey {ORIGIN_POINT_ID: (name, lat, lon)}
+        self._points: Dict[str, Tuple[str, float, float]] = {}
+
+    def _solve(self, method: str, multi_criteria: bool = False, **kwargs):
+        """Run a solver method in the RAPTOR process pool, or in-process.
+
+        The pool is used when it serves this store's snapshot; otherwise
+        (pool disabled, store loaded from SQL) the query runs here.
+
+        Raises:
+            RaptorBusyError, RaptorTimeoutError: from the pool
+            ValueError: invalid origin or destination stops
+        """
+        if raptor_executor.accepts(self._store):
+            result, _ = raptor_executor.run(self._store, method, multi_criteria, kwargs)
+            return result
+        solver = McRaptorAlgorithm(store=self._store) if multi_criteria else self._raptor
+        return getattr(solver, method)(**kwargs)
 
     def _resolve_station_alias(self, stop_id: Union[str, List[str]]) -> Union[str, List[str]]:
         """Resolve station aliases for interchange stations.
@@ -132,8 +179,9 @@ class RaptorService:
             return platforms if platforms else [stop_id]
 
     def _get_stop_info(self, stop_id: str) -> Optional[Tuple[str, float, float]]:
-        """Get stop info from GTFSStore (name, lat, lon)."""
-        return self._store.get_stop_info(stop_id)
+        """Get stop info from GTFSStore (name, lat, lon), or of a query point."""
+        point = self._points.get(stop_id)
+        return point if point is not None else self._store.get_stop_info(stop_id)
 
     def _get_route_info(self, route_id: str) -> Optional[Tuple[str, Optional[str], int]]:
         """Get route info from GTFSStore (short_name, color, route_type)."""
@@ -175,36 +223,41 @@ class RaptorService:
 
     def _get_shape_coordinates(
         self,
-        route_id: str,
+        trip_id: Optional[str],
         from_stop_id: str,
         to_stop_id: str,
-        max_gap: float = 50.0
+        board_pos: int = -1,
+        alight_pos: int = -1
     ) -> List[dict]:
-        """Get shape coordinates for a route segment.
+        """Get shape coordinates for a transit leg.
+
+        The stops' positions along the trip's shape are precomputed by the
+        store, so the geometry is a slice of its shape columns, taken by the
+        leg's positions in the trip (loop lines visit a stop twice). Without
+        a usable shape it is a straight line between the stops.
 
         Args:
-            route_id: Route ID
+            trip_id: Trip of the leg
             from_stop_id: Starting stop
             to_stop_id: Ending stop
-            max_gap: Maximum gap for normalization (meters)
+            board_pos: Position of from_stop_id in the trip's pattern
+            alight_pos: Position of to_stop_id in the trip's pattern
 
         Returns:
             List of coordinate dicts with lat/lon
         """
-        # For now, return straight line between stops
-        # TODO: Implement actual shape segment extraction
         from_info = self._get_stop_info(from_stop_id)
         to_info = self._get_stop_info(to_stop_id)
 
         if not from_info or not to_info:
             return []
 
-        coords = [
-            {"lat": float(from_info[1]), "lon": float(from_info[2])},
-            {"lat": float(to_info[1]), "lon": float(to_info[2])}
-        ]
-
-        return coords
+        segment = self._store.get_shape_segment(trip_id, board_pos, alight_pos) if trip_id else []
+        return (
+            [{"lat": float(from_info[1]), "lon": float(from_info[2])}]
+            + [{"lat": lat, "lon": lon} for lat, lon in segment]
+            + [{"lat": float(to_info[1]), "lon": float(to_info[2])}]
+        )
 
     def _get_walking_coordinates(
         self,
@@ -214,14 +267,16 @@ class RaptorService:
         """Get coordinates for walking segment.
 
         First tries to get the actual pedestrian route from stop_correspondence.
-        Falls back to straight line if no walking_shape is available.
+        Falls back to straight line if no walking_shape is available (always
+        for the walks from/to the query points of a coordinate journey).
         """
         # Try to get walking_shape from database
+        is_point = from_stop_id in self._points or to_stop_id in self._points
         try:
             from sqlalchemy import text
             import json
 
-            result = self.db.execute(text("""
+            result = None if is_point else self.db.execute(text("""
                 SELECT walking_shape FROM stop_correspondence
                 WHERE from_stop_id = :from_id AND to_stop_id = :to_id
                 AND walking_shape IS NOT NULL
@@ -335,7 +390,7 @@ class RaptorService:
 
             # Get coordinates
             coordinates = self._get_shape_coordinates(
-                leg.route_id, leg.from_stop_id, leg.to_stop_id
+                leg.trip_id, leg.from_stop_id, leg.to_stop_id, leg.board_pos, leg.alight_pos
             )
             result["coordinates"] = coordinates
             result["suggested_heading"] = self._calculate_segment_heading(coordinates)
@@ -366,40 +421,55 @@ class RaptorService:
 
     def _format_journey(self, journey: Journey, travel_date: date) -> dict:
         """Format a journey for API response."""
-        # Calculate walking time
-        walking_seconds = sum(
-            leg.arrival_time - leg.departure_time
-            for leg in journey.legs
-            if leg.type == "walking"
-        )
-
         return {
             "departure": seconds_to_iso(journey.departure_time, travel_date),
             "arrival": seconds_to_iso(journey.arrival_time, travel_date),
             "duration_minutes": journey.duration_minutes,
             "transfers": journey.transfers,
-            "walking_minutes": walking_seconds // 60,
+            "walking_minutes": journey.walking_seconds // 60,
             "segments": [self._format_leg(leg, travel_date) for leg in journey.legs]
         }
 
     def plan_journey(
         self,
-        origin_stop_id: Union[str, List[str]],
-        destination_stop_id: Union[str, List[str]],
+        origin_stop_id: Union[str, List[str], None],
+        destination_stop_id: Union[str, List[str], None],
         departure_time: Optional[time] = None,
         travel_date: Optional[date] = None,
         max_transfers: int = 3,
-        max_alternatives: int = 3
+        max_alternatives: int = 3,
+        window_minutes: Optional[int] = None,
+        minimize_walking: bool = False,
+        from_lat: Optional[float] = None,
+        from_lon: Optional[float] = None,
+        to_lat: Optional[float] = None,
+        to_lon: Optional[float] = None,
+        arrival_time: Optional[time] = None
     ) -> dict:
-        """Plan journeys between two stops.
+        """Plan journeys between two stops or points.
 
         Args:
-            origin_stop_id: Starting stop ID or list of IDs (for multi-platform stations)
-            destination_stop_id: Destination stop ID or list of IDs
+            origin_stop_id: Starting stop ID or list of IDs (for multi-platform
+                stations), or None with from_lat/from_lon
+            destination_stop_id: Destination stop ID or list of IDs, or None
+                with to_lat/to_lon
             departure_time: Departure time (defaults to now)
             travel_date: Travel date (defaults to today)
             max_transfers: Maximum transfers allowed
-            max_alternatives: Maximum alternatives to return
+            max_alternatives: Maximum alternatives to return (ignored with window_minutes)
+            window_minutes: Departure window: return every Pareto-optimal
+                departure between departure_time and departure_time + window
+                (range RAPTOR) instead of the journeys of a single instant
+            minimize_walking: Use McRAPTOR, which also keeps alternatives that
+                arrive later but walk less (not combined with window_minutes)
+            from_lat, from_lon: Starting point; the ACCESS_MAX_STOPS nearest
+                stops within ACCESS_RADIUS_METERS are the origins, each with
+                its walk, and journeys start with a walking segment
+            to_lat, to_lon: Destination point, the same way
+            arrival_time: Arrive by this time instead of departing at
+                departure_time: the latest journeys that arrive in time
+                (reverse RAPTOR; not combined with window_minutes or
+                minimize_walking)
 
         Returns:
             API response dict with journeys and alerts
@@ -410,24 +480,72 @@ class RaptorService:
         if departure_time is None:
             departure_time = datetime.now().time()
 
-        # Resolve station aliases (legacy, now empty)
-        resolved_origin = self._resolve_station_alias(origin_stop_id)
-        resolved_destination = self._resolve_station_alias(destination_stop_id)
-
-        # Expand stations to platforms (FGC_GR → [FGC_GR1, FGC_GR2])
-        # RAPTOR needs platform IDs because trips stop at platforms, not stations
-        expanded_origin = self._expand_to_platforms(resolved_origin)
-        expanded_destination = self._expand_to_platforms(resolved_destination)
+        # Coordinates: nearest stops from the spatial index, with their walk
+        self._points = {}
+        access_seconds = egress_seconds = None
+        if origin_stop_id is None:
+            access_seconds = stops_near(self._store, from_lat, from_lon, limit=ACCESS_MAX_STOPS)
+            self._points[ORIGIN_POINT_ID] = (f"{from_lat:.5f}, {from_lon:.5f}", from_lat, from_lon)
+        if destination_stop_id is None:
+            egress_seconds = stops_near(self._store, to_lat, to_lon, limit=ACCESS_MAX_STOPS)
+            self._points[DESTINATION_POINT_ID] = (f"{to_lat:.5f}, {to_lon:.5f}", to_lat, to_lon)
+        for stops, lat, lon in ((access_seconds, from_lat, from_lon), (egress_seconds, to_lat, to_lon)):
+            if stops is not None and not stops:
+                return {
+                    "success": False,
+                    "message": f"No stops within {ACCESS_RADIUS_METERS} m of {lat}, {lon}",
+                    "journeys": [],
+                    "alerts": []
+                }
+
+        # Resolve station aliases (legacy, now empty) and expand stations to
+        # platforms (FGC_GR → [FGC_GR1, FGC_GR2]): RAPTOR needs platform IDs
+        # because trips stop at platforms, not stations
+        if access_seconds is None:
+            expanded_origin = self._expand_to_platforms(self._resolve_station_alias(origin_stop_id))
+        else:
+            expanded_origin = list(access_seconds)
+        if egress_seconds is None:
+            expanded_destination = self._expand_to_platforms(self._resolve_station_alias(destination_stop_id))
+        else:
+            expanded_destination = list(egress_seconds)
+
+        # Run RAPTOR (or reuse the result of the same query this minute).
+        # An arrive-by deadline is rounded down too: arriving earlier is fine
+        departure_time = bucket_journey_departure(arrival_time if arrival_time is not None else departure_time)
+        query = dict(
+            origin_stop_id=expanded_origin,
+            destination_stop_id=expanded_destination,
+            travel_date=travel_date,
+            max_transfers=max_transfers
+        )
+        if access_seconds is not None:
+            query['access_seconds'] = access_seconds
+        if egress_seconds is not None:
+            query['egress_seconds'] = egress_seconds
+        multi_criteria = bool(minimize_walking and not window_minutes and arrival_time is None)
+        if arrival_time is not None:
+            method = 'plan_arrive_by'
+            query['arrival_time'] = departure_time
+        elif window_minutes:
+            method = 'plan_profile'
+            query['departure_time'] = departure_time
+            query['window_minutes'] = window_minutes
+        else:
+            method = 'plan'
+            query['departure_time'] = departure_time
 
-        # Run RAPTOR
+        key = journey_cache.key(
+            self._store, method, multi_criteria, expanded_origin, expanded_destination,
+            departure_time, travel_date, max_transfers, window_minutes,
+            access_seconds, egress_seconds
+        )
+        journeys = journey_cache.get(key)
         try:
-            journeys = self._raptor.plan(
-                origin_stop_id=expanded_origin,
-                destination_stop_id=expanded_destination,
-                departure_time=departure_time,
-                travel_date=travel_date,
-                max_transfers=max_transfers
-            )
+            if journeys is None:
+                start = _time.perf_counter()
+                journeys = self._solve(method, multi_criteria=multi_criteria, **query)
+                journey_cache.put(key, journeys, _time.perf_counter() - start)
         except ValueError as e:
             return {
                 "success": False,
@@ -437,15 +555,19 @@ class RaptorService:
             }
 
         if not journeys:
+            origin_label = origin_stop_id if origin_stop_id is not None else self._points[ORIGIN_POINT_ID][0]
+            destination_label = (destination_stop_id if destination_stop_id is not None
+                                 else self._points[DESTINATION_POINT_ID][0])
             return {
                 "success": False,
-                "message": f"No route found from {origin_stop_id} to {destination_stop_id}",
+                "message": f"No route found from {origin_label} to {destination_label}",
                 "journeys": [],
                 "alerts": []
             }
 
-        # Limit alternatives
-        journeys = journeys[:max_alternatives]
+        # Limit alternatives (a window returns all of its departures)
+        if not window_minutes:
+            journeys = journeys[:max_alternatives]
 
         # Format journeys
         formatted_journeys = [
@@ -468,3 +590,109 @@ class RaptorService:
             "journeys": formatted_journeys,
             "alerts": alerts
         }
+
+    def plan_isochrone(
+        self,
+        origin_stop_id: Union[str, List[str], None] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        departure_time: Optional[time] = None,
+        travel_date: Optional[date] = None,
+        max_minutes: int = 60,
+        max_transfers: int = 3,
+        contour_minutes: Optional[List[int]] = None
+    ) -> dict:
+        """Every stop reachable within max_minutes from a stop or a point.
+
+        The departure is rounded down to its ISOCHRONE_BUCKET_SECONDS bucket
+        and the one-to-all run is cached per (store generation, origin,
+        bucket, date, max_minutes, max_transfers).
+
+        Args:
+            origin_stop_id: Starting stop ID or list of IDs (or None with lat/lon)
+            lat, lon: Starting point; stops within ACCESS_RADIUS_METERS are
+                used as origins with their walking time
+            departure_time: Departure time (defaults to now)
+            travel_date: Travel date (defaults to today)
+            max_minutes: Travel time budget
+            max_transfers: Maximum transfers allowed
+            contour_minutes: Budgets (<= max_minutes) to draw as GeoJSON contours
+
+        Returns:
+            API response dict with the reachable stops sorted by arrival
+        """
+        if travel_date is None:
+            travel_date = date.today()
+        if departure_time is None:
+            departure_time = datetime.now().time()
+        departure_time = bucket_departure(departure_time)
+
+        access_seconds = None
+        if origin_stop_id is not None:
+            origins = self._expand_to_platforms(self._resolve_station_alias(origin_stop_id))
+            origin_key = tuple(sorted(origins))
+        else:
+            access_seconds = stops_near(self._store, lat, lon)
+            origins = list(access_seconds)
+            origin_key = (round(lat, 4), round(lon, 4))
+            if not origins:
+                return {
+                    "success": False,
+                    "message": f"No stops within {ACCESS_RADIUS_METERS} m of {lat}, {lon}",
+                    "departure": None,
+                    "stops": [],
+                    "contours": None
+                }
+
+        key = cache_key(self._store, origin_key, departure_time, travel_date, max_minutes, max_transfers)
+        reached = isochrone_cache.get(key)
+        if reached is None:
+            try:
+                reached = self._solve(
+                    'plan_isochrone',
+                    origin_stop_id=origins,
+                    departure_time=departure_time,
+                    travel_date=travel_date,
+                    max_minutes=max_minutes,
+                    max_transfers=max_transfers,
+                    access_seconds=access_seconds
+                )
+            except ValueError as e:
+                return {
+                    "success": False,
+                    "message": str(e),
+                    "departure": None,
+                    "stops": [],
+                    "contours": None
+                }
+            isochrone_cache.put(key, reached)
+
+        departure_seconds = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        stops = []
+        points = []
+        for stop_id, (arrival_time, transfers) in sorted(reached.items(), key=lambda item: item[1]):
+            if stop_id.startswith('ACCESS_'):
+                continue  # Virtual entrances, not stops
+            stop = self._format_stop(stop_id)
+            stop.update({
+                "arrival": seconds_to_iso(arrival_time, travel_date),
+                "duration_minutes": (arrival_time - departure_seconds) // 60,
+                "transfers": transfers
+            })
+            stops.append(stop)
+            if stop["lat"] or stop["lon"]:
+                points.append((stop["lat"], stop["lon"], arrival_time))
+
+        contours = None
+        if contour_minutes:
+            contours = build_contours(
+                points, departure_seconds, [m for m in contour_minutes if 0 < m <= max_minutes]
+            )
+
+        return {
+            "success": True,
+            "message": None,
+            "departure": seconds_to_iso(departure_seconds, travel_date),
+            "stops": stops,
+            "contours": contours
+        }
@@ -0,0 +1,315 @@
+"""Realtime delay overlay for RAPTOR.
+
+RAPTOR plans on the static stop_times, while the GTFS-RT ingestion stores
+per-trip delays (gtfs_rt_trip_updates) and per-stop delays
+(gtfs_rt_stop_time_updates). The overlay applies them without touching
+the store or rebuilding patterns:
+
+- RealtimeUpdates: the recent updates of the current service date, read
+  from the DB after every ingestion cycle (load_updates). Compact: trip
+  delay, cancelled flag and the per-stop delays as published.
+- DelayOverlay: for one store, the patterns with a delayed or cancelled
+  active trip get replacement trip groups (the trips without the cancelled
+  ones, with their realtime departures by stop column and arrivals by
+  row, the same layout as PatternDayView). Every other pattern is read
+  from the day view as before, so a query only pays a dict lookup per
+  scanned pattern.
+
+Delays propagate as in GTFS-RT: the trip delay applies until the first
+stop with an update, and each stop update holds for the following stops
+until the next one. A delayed trip may overtake another one of the same
+pattern; the pattern is then split into FIFO groups, each scanned as its
+own pattern, so boarding stays a binary search.
+
+The overlay is only applied to queries on the service date of the
+updates, and only to that day's trips. The previous service day's trips
+still running after midnight (GTFSStore.get_previous_day_view) are
+scanned on their timetable: the updates are keyed by trip_id alone, so a
+delay cannot be told apart between yesterday's and today's run of the
+same trip. In the RAPTOR process pool the workers read the published
+updates from a file next to the snapshot (realtime_path), reloading it
+when the version of the caller changes.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import weakref
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+REALTIME_MAX_AGE_SECONDS = 600  # Updates not refreshed for this long are ignored
+CANCELED = "CANCELED"  # GTFS-RT TripDescriptor.ScheduleRelationship
+
+
+# =============================================================================
+# Data Structures
+# =============================================================================
+
+@dataclass
+class TripDelay:
+    """Realtime state of one trip."""
+    delay: int = 0  # Trip delay in seconds (until the first stop update)
+    cancelled: bool = False
+    # (stop_id, arrival_delay, departure_delay) in the order of the trip
+    stop_delays: List[Tuple[str, Optional[int], Optional[int]]] = field(default_factory=list)
+
+
+@dataclass
+class RealtimeUpdates:
+    """Updates of one service date, with a version that changes with their content."""
+    service_date: date
+    trips: Dict[str, TripDelay]
+    version: str = ""
+
+    def __post_init__(self):
+        if not self.version:
+            content = repr((self.service_date, sorted(
+                (trip_id, t.delay, t.cancelled, t.stop_delays) for trip_id, t in self.trips.items()
+            )))
+            self.version = hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+# One trip group of a pattern: (trips, departures by stop column,
+# arrivals by trip row, start of each trip's row in arrivals)
+TripGroup = Tuple[array, array, array, array]
+
+
+def load_updates(db, service_date: date, max_age_seconds: int = REALTIME_MAX_AGE_SECONDS) -> RealtimeUpdates:
+    """Read the trip updates refreshed in the last max_age_seconds."""
+    from src.gtfs_bc.realtime.infrastructure.models.trip_update import (
+        StopTimeUpdateModel,
+        TripUpdateModel,
+    )
+
+    since = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    trips: Dict[str, TripDelay] = {}
+    rows = (
+        db.query(TripUpdateModel.trip_id, TripUpdateModel.delay, TripUpdateModel.schedule_relationship)
+        .filter(TripUpdateModel.updated_at >= since)
+        .all()
+    )
+    for trip_id, delay, schedule_relationship in rows:
+        trips[trip_id] = TripDelay(delay=delay or 0, cancelled=schedule_relationship == CANCELED)
+
+    stop_rows = (
+        db.query(StopTimeUpdateModel.trip_id, StopTimeUpdateModel.stop_id,
+                 StopTimeUpdateModel.arrival_delay, StopTimeUpdateModel.departure_delay)
+        .join(TripUpdateModel, TripUpdateModel.trip_id == StopTimeUpdateModel.trip_id)
+        .filter(TripUpdateModel.updated_at >= since)
+        .order_by(StopTimeUpdateModel.id)
+        .all()
+    )
+    for trip_id, stop_id, arrival_delay, departure_delay in stop_rows:
+        if stop_id and (arrival_delay is not None or departure_delay is not None):
+            trips[trip_id].stop_delays.append((stop_id, arrival_delay, departure_delay))
+
+    return RealtimeUpdates(service_date, trips)
+
+
+def realtime_path(snapshot_path: str) -> str:
+    """File the pool workers read the published updates from."""
+    return snapshot_path + ".realtime"
+
+
+# =============================================================================
+# Overlay
+# =============================================================================
+
+def _stop_delays(store: GTFSStore, pattern_stops, update: TripDelay) -> Tuple[List[int], List[int]]:
+    """Arrival and departure delay at each stop of a trip (propagated)."""
+    n_stops = len(pattern_stops)
+    arrival_delays = [update.delay] * n_stops
+    departure_delays = [update.delay] * n_stops
+    pos = 0
+    current = update.delay
+    for stop_id, arrival_delay, departure_delay in update.stop_delays:
+        stop_idx = store.stop_index.get(stop_id)
+        if stop_idx is None:
+            continue
+        # Stops may repeat (loops): take the next occurrence
+        idx = next((i for i in range(pos, n_stops) if pattern_stops[i] == stop_idx), -1)
+        if idx < 0:
+            continue
+        for i in range(pos, idx):
+            arrival_delays[i] = departure_delays[i] = current
+        arrival_delays[idx] = arrival_delay if arrival_delay is not None else departure_delay
+        current = departure_delays[idx] = departure_delay if departure_delay is not None else arrival_delay
+        pos = idx + 1
+    for i in range(pos, n_stops):
+        arrival_delays[i] = departure_delays[i] = current
+    return arrival_delays, departure_delays
+
+
+class DelayOverlay:
+    """Realtime trip groups of the patterns affected by the updates (one store)."""
+
+    def __init__(self, store: GTFSStore, updates: RealtimeUpdates):
+        self.service_date = updates.service_date
+        self.version = updates.version
+        # pattern_idx -> trip groups replacing the day view
+        self.groups: Dict[int, List[TripGroup]] = {}
+        # trip_idx -> realtime departure at each stop of its pattern
+        self.trip_departures: Dict[int, array] = {}
+        self.trips_delayed = 0
+        self.trips_cancelled = 0
+
+        # pattern_idx -> {trip_idx: (departures, arrivals), or None if cancelled}
+        affected: Dict[int, Dict[int, Optional[Tuple[List[int], List[int]]]]] = {}
+        for trip_id, update in updates.trips.items():
+            trip_idx = store.trip_index.get(trip_id)
+            if trip_idx is None or store.trip_pattern[trip_idx] < 0:
+                continue
+            pattern_idx = store.trip_pattern[trip_idx]
+            if update.cancelled:
+                affected.setdefault(pattern_idx, {})[trip_idx] = None
+                self.trips_cancelled += 1
+                continue
+            pattern_stops = store.get_pattern_stop_indexes(pattern_idx)
+            arrival_delays, departure_delays = _stop_delays(store, pattern_stops, update)
+            if not any(arrival_delays) and not any(departure_delays):
+                continue
+            start = store.trip_offsets[trip_idx]
+            arrivals = [store.st_arrival[start + i] + arrival_delays[i] for i in range(len(pattern_stops))]
+            # Never leave before arriving
+            departures = [max(store.st_departure[start + i] + departure_delays[i], arrivals[i])
+                          for i in range(len(pattern_stops))]
+            affected.setdefault(pattern_idx, {})[trip_idx] = (departures, arrivals)
+            self.trip_departures[trip_idx] = array('i', departures)
+            self.trips_delayed += 1
+
+        view = store.get_day_view(updates.service_date)
+        for pattern_idx, realtime_rows in affected.items():
+            active = view.active_trips(pattern_idx)
+            if any(trip_idx in realtime_rows for trip_idx in active):
+                self.groups[pattern_idx] = self._build_groups(store, pattern_idx, active, realtime_rows)
+
+    @staticmethod
+    def _build_groups(store: GTFSStore, pattern_idx: int, active: array, realtime_rows) -> List[TripGroup]:
+        """Rows of the active trips (realtime where updated), split into FIFO groups."""
+        n_stops = store.pattern_stop_offsets[pattern_idx + 1] - store.pattern_stop_offsets[pattern_idx]
+
+        rows = []
+        for trip_idx in active:
+            if trip_idx in realtime_rows:
+                row = realtime_rows[trip_idx]
+                if row is None:
+                    continue  # Cancelled
+                departures, arrivals = row
+            else:
+                start = store.trip_offsets[trip_idx]
+                departures = store.st_departure[start:start + n_stops].tolist()
+                arrivals = store.st_arrival[start:start + n_stops].tolist()
+            rows.append((departures, arrivals, trip_idx))
+        rows.sort()
+
+        # Greedy FIFO chains: a trip joins the first group it does not overtake
+        chains: List[list] = []
+        for row in rows:
+            for chain in chains:
+                last = chain[-1]
+                if all(a <= b for a, b in zip(last[0], row[0])) and all(a <= b for a, b in zip(last[1], row[1])):
+                    chain.append(row)
+                    break
+            else:
+                chains.append([row])
+
+        groups: List[TripGroup] = []
+        for chain in chains:
+            departures = array('i')
+            for i in range(n_stops):
+                departures.extend([row[0][i] for row in chain])
+            arrivals = array('i')
+            for row in chain:
+                arrivals.extend(row[1])
+            groups.append((
+                array('i', [row[2] for row in chain]),
+                departures,
+                arrivals,
+                array('i', range(0, len(chain) * n_stops, n_stops)),
+            ))
+        return groups
+
+
+class RealtimeOverlayState:
+    """The published updates and their overlay per store (process-wide)."""
+
+    def __init__(self):
+        self._updates: Optional[RealtimeUpdates] = None
+        self._overlays: 'weakref.WeakKeyDictionary[GTFSStore, DelayOverlay]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        updates = self._updates
+        return updates.version if updates is not None else ""
+
+    def publish(self, updates: Optional[RealtimeUpdates]) -> bool:
+        """Replace the updates; True if their content changed."""
+        with self._lock:
+            if updates is not None and not updates.trips:
+                updates = None
+            if (updates.version if updates else "") == self.version:
+                return False
+            self._updates = updates
+            self._overlays = weakref.WeakKeyDictionary()
+            return True
+
+    def overlay_for(self, store: GTFSStore, travel_date: date) -> Optional[DelayOverlay]:
+        """Overlay of a store for queries on travel_date (None if nothing applies)."""
+        updates = self._updates
+        if updates is None or updates.service_date != travel_date:
+            return None
+        overlay = self._overlays.get(store)
+        if overlay is not None and overlay.version == updates.version:
+            return overlay
+        with self._lock:
+            overlay = self._overlays.get(store)
+            if overlay is None or overlay.version != updates.version:
+                overlay = DelayOverlay(store, updates)
+                self._overlays[store] = overlay
+            return overlay
+
+    def save(self, path: str) -> None:
+        """Write the published updates for the pool workers (atomic)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self._updates, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def sync(self, path: str, version: str) -> None:
+        """Pool worker: load the updates from path if the caller has another version."""
+        if version == self.version:
+            return
+        try:
+            with open(path, "rb") as f:
+                updates = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Cannot read realtime updates {path}: {e}")
+            updates = None
+        self.publish(updates if version else None)
+
+    def status(self) -> Dict:
+        updates = self._updates
+        return {
+            "version": self.version or None,
+            "service_date": updates.service_date.isoformat() if updates else None,
+            "trips": len(updates.trips) if updates else 0,
+        }
+
+
+# Process-wide state (published by the GTFS-RT scheduler)
+realtime_overlay = RealtimeOverlayState()
@@ -0,0 +1,204 @@
+"""Calendario de servicios GTFS precompilado por fecha.
+
+Un ServiceCalendar guarda gtfs_calendar y gtfs_calendar_dates completos en
+memoria (son tablas pequeñas) y mantiene precalculados los service_ids
+activos de ayer, hoy y mañana como frozensets. Consultar los servicios de
+una fecha es un lookup en un dict, sin SQL ni copias.
+
+El calendario vive en el GTFSStore publicado y es el que usan RAPTOR, las
+salidas por parada y las posiciones estimadas (ver get_service_calendar).
+Antes de medianoche el scheduler lo desplaza al día siguiente
+(GTFSStore.roll_calendar), así que el cambio de día nunca cae en una request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+# Las fechas de servicio se cuentan en hora de Madrid
+MADRID_TZ = ZoneInfo("Europe/Madrid")
+
+# {service_id: (bits de días de la semana, start_date, end_date)}; bit 0 = lunes
+CalendarRows = Dict[str, Tuple[int, date, date]]
+# {fecha: (servicios añadidos, servicios eliminados)}
+CalendarExceptions = Dict[date, Tuple[FrozenSet[str], FrozenSet[str]]]
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def service_today() -> date:
+    """Fecha de servicio actual (Europe/Madrid)."""
+    return datetime.now(MADRID_TZ).date()
+
+
+def seconds_until_rollover(lead_seconds: int) -> float:
+    """Segundos hasta lead_seconds antes de la próxima medianoche de Madrid."""
+    now = datetime.now(MADRID_TZ)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), MADRID_TZ)
+    target = midnight - timedelta(seconds=lead_seconds)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def _as_date(value) -> date:
+    """Normalizar fechas de la BD (date en PostgreSQL, str en otros drivers)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def load_calendar_data(db_session: 'Session') -> Tuple[CalendarRows, CalendarExceptions]:
+    """Leer gtfs_calendar y gtfs_calendar_dates completos.
+
+    Returns:
+        (calendarios, excepciones) en el formato de ServiceCalendar
+    """
+    from sqlalchemy import text
+
+    calendars: CalendarRows = {}
+    result = db_session.execute(text("""
+        SELECT service_id, monday, tuesday, wednesday, thursday, friday, saturday, sunday,
+               start_date, end_date
+        FROM gtfs_calendar
+    """))
+    for row in result:
+        days = 0
+        for bit, flag in enumerate(row[1:8]):
+            if flag:
+                days |= 1 << bit
+        calendars[row[0]] = (days, _as_date(row[8]), _as_date(row[9]))
+
+    added: Dict[date, set] = {}
+    removed: Dict[date, set] = {}
+    result = db_session.execute(text("""
+        SELECT service_id, date, exception_type
+        FROM gtfs_calendar_dates
+    """))
+    for row in result:
+        if row[2] == 1:
+            added.setdefault(_as_date(row[1]), set()).add(row[0])
+        elif row[2] == 2:
+            removed.setdefault(_as_date(row[1]), set()).add(row[0])
+
+    exceptions: CalendarExceptions = {
+        day: (frozenset(added.get(day, ())), frozenset(removed.get(day, ())))
+        for day in added.keys() | removed.keys()
+    }
+    return calendars, exceptions
+
+
+class ServiceCalendar:
+    """Servicios activos por fecha, precalculados para ayer, hoy y mañana.
+
+    Los datos de calendario no cambian tras construirlo; solo cambia qué
+    fechas están precalculadas. La ventana se sustituye entera (swap de un
+    dict), así que las lecturas concurrentes no necesitan lock.
+    """
+
+    # Desplazamientos respecto al centro de la ventana precalculada
+    WINDOW_DAYS = (-1, 0, 1)
+    # Fechas fuera de la ventana que se guardan tras calcularlas
+    EXTRA_CACHE_SIZE = 16
+
+    def __init__(
+        self,
+        calendars: CalendarRows,
+        exceptions: CalendarExceptions,
+        center: Optional[date] = None
+    ):
+        self.calendars = calendars
+        self.exceptions = exceptions
+        self.window_center: Optional[date] = None
+        self._window: Dict[date, FrozenSet[str]] = {}
+        self._extra: 'OrderedDict[date, FrozenSet[str]]' = OrderedDict()
+        self._extra_lock = threading.Lock()
+        self.roll_to(center or service_today())
+
+    def compute(self, travel_date: date) -> FrozenSet[str]:
+        """Calcular los servicios activos de una fecha (sin caché)."""
+        bit = 1 << travel_date.weekday()
+        active = {
+            service_id
+            for service_id, (days, start_date, end_date) in self.calendars.items()
+            if days & bit and start_date <= travel_date <= end_date
+        }
+        added, removed = self.exceptions.get(travel_date, (_EMPTY, _EMPTY))
+        active.update(added)
+        active.difference_update(removed)
+        return frozenset(active)
+
+    def active_services(self, travel_date: date) -> FrozenSet[str]:
+        """Servicios activos en una fecha.
+
+        Dentro de la ventana es un lookup; fuera se calcula en memoria y
+        se guarda en una caché LRU pequeña.
+        """
+        active = self._window.get(travel_date)
+        if active is not None:
+            return active
+
+        with self._extra_lock:
+            active = self._extra.get(travel_date)
+            if active is not None:
+                self._extra.move_to_end(travel_date)
+                return active
+        active = self.compute(travel_date)
+        with self._extra_lock:
+            self._extra[travel_date] = active
+            while len(self._extra) > self.EXTRA_CACHE_SIZE:
+                self._extra.popitem(last=False)
+        return active
+
+    def window_dates(self) -> Tuple[date, ...]:
+        """Fechas precalculadas actualmente."""
+        return tuple(self._window)
+
+    def roll_to(self, center: date) -> None:
+        """Precalcular la ventana alrededor de center y publicarla."""
+        self._window = {
+            center + timedelta(days=offset): self.compute(center + timedelta(days=offset))
+            for offset in self.WINDOW_DAYS
+        }
+        self.window_center = center
+
+    def service_ids(self) -> Iterable[str]:
+        """Todos los service_ids conocidos (calendarios y excepciones)."""
+        seen = set(self.calendars)
+        for added, removed in self.exceptions.values():
+            seen.update(added)
+            seen.update(removed)
+        return seen
+
+
+# Calendario cargado de SQL cuando no hay GTFSStore (scripts, tests)
+FALLBACK_TTL_SECONDS = 3600
+_fallback: Optional[Tuple[float, ServiceCalendar]] = None
+_fallback_lock = threading.Lock()
+
+
+def get_service_calendar(db_session: 'Session') -> ServiceCalendar:
+    """Calendario compartido del proceso.
+
+    Es el del GTFSStore publicado; si el store no está cargado se lee de
+    SQL una vez y se reutiliza durante FALLBACK_TTL_SECONDS.
+    """
+    global _fallback
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+    store = GTFSStore.get_instance()
+    if store.is_loaded:
+        return store.calendar
+
+    with _fallback_lock:
+        if _fallback is None or time.time() - _fallback[0] > FALLBACK_TTL_SECONDS:
+            _fallback = (time.time(), ServiceCalendar(*load_calendar_data(db_session)))
+        return _fallback[1]
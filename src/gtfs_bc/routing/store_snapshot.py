@@ -0,0 +1,445 @@
+"""Snapshot binario versionado de GTFSStore.
+
+Tras una carga desde SQL, el store construido se vuelca a un fichero:
+
+    MAGIC (8 bytes) | header_len (uint32) | header JSON | padding | secciones
+
+- Las columnas array('i') se escriben en crudo, alineadas a 8 bytes, y al
+  arrancar se mapean con mmap sin copiarlas (memoryview.cast('i')).
+- Las listas grandes de strings (IDs y headsigns de trips) se guardan como
+  tablas de strings (offsets + bytes UTF-8) también mapeadas, con un orden
+  ordenado para buscar por ID sin reconstruir un dict en cada proceso.
+- El resto de estructuras (IDs pequeños, info de paradas/rutas,
+  transbordos, calendarios) van en una sección pickle.
+
+Con varios workers de uvicorn, las páginas mapeadas las comparte el page
+cache del sistema: la RAM de los arrays no crece con el número de workers.
+snapshot_lock() serializa la construcción para que solo un proceso cargue
+desde SQL mientras el resto espera y adjunta el fichero resultante.
+- El header guarda la versión de formato y el fingerprint de la BD
+  (recuentos de filas + último feed import). Si no coincide con el de la
+  BD actual, el snapshot se ignora y se carga desde SQL.
+"""
+
+import json
+import mmap
+import os
+import pickle
+import sys
+import time
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+
+MAGIC = b"GTFSSNAP"
+# Incrementar al cambiar el layout del store o de este fichero
+FORMAT_VERSION = 9
+_ALIGN = 8
+_ITEMSIZE = array('i').itemsize
+
+# Tablas cuyo recuento forma parte del fingerprint
+FINGERPRINT_TABLES = (
+    "gtfs_stops",
+    "gtfs_routes",
+    "gtfs_calendar",
+    "gtfs_calendar_dates",
+    "gtfs_trips",
+    "gtfs_stop_times",
+    "gtfs_shape_points",
+    "gtfs_route_frequencies",
+    "gtfs_stop_route_sequence",
+    "stop_correspondence",
+    "stop_access",
+)
+
+
+def compute_db_fingerprint(db_session: 'Session') -> Dict[str, Any]:
+    """Calcular el fingerprint de los datos GTFS en la BD.
+
+    Combina recuentos de filas de las tablas que carga el store con el
+    último feed import registrado y los prefijos de ruta que se cargan por
+    frecuencias (GTFSStore.FREQUENCY_ROUTE_PREFIXES).
+
+    Args:
+        db_session: Sesión de SQLAlchemy
+
+    Returns:
+        Dict serializable a JSON
+    """
+    from sqlalchemy import text
+
+    fingerprint: Dict[str, Any] = {}
+    for table in FINGERPRINT_TABLES:
+        fingerprint[table] = db_session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+    row = db_session.execute(text("""
+        SELECT COUNT(*), MAX(id), MAX(completed_at) FROM gtfs_feed_imports
+    """)).fetchone()
+    fingerprint["feed_imports"] = [
+        row[0],
+        row[1],
+        str(row[2]) if row[2] is not None else None,
+    ]
+    # Configuración que cambia el contenido del store
+    from src.gtfs_bc.routing.gtfs_store import GTFSStore
+
+    fingerprint["frequency_route_prefixes"] = list(GTFSStore.FREQUENCY_ROUTE_PREFIXES)
+    return fingerprint
+
+
+def _pad(offset: int) -> int:
+    return (-offset) % _ALIGN
+
+
+class StringTable(Sequence):
+    """Lista de strings de solo lectura sobre offsets + bytes UTF-8.
+
+    Equivale a una List[str] (o List[Optional[str]] si nullable, donde el
+    string vacío se lee como None) pero sin un objeto str por elemento:
+    cada acceso decodifica el trozo correspondiente del bloque mapeado.
+    """
+
+    __slots__ = ('_offsets', '_blob', '_nullable')
+
+    def __init__(self, offsets, blob, nullable: bool = False):
+        self._offsets = offsets
+        self._blob = blob
+        self._nullable = nullable
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        """Bytes UTF-8 del elemento i."""
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("StringTable index out of range")
+        start, end = self._offsets[i], self._offsets[i + 1]
+        if self._nullable and start == end:
+            return None
+        return str(self._blob[start:end], 'utf-8')
+
+
+class StringIndex:
+    """Índice {string: idx} de solo lectura sobre una StringTable.
+
+    Búsqueda binaria sobre una permutación de los índices ordenada por los
+    bytes de cada string. Sustituye a un dict con un entry por trip.
+    """
+
+    __slots__ = ('_table', '_order')
+
+    def __init__(self, table: StringTable, order):
+        self._table = table
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        target = key.encode('utf-8')
+        order, table = self._order, self._table
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if table.raw(order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and table.raw(order[lo]) == target:
+            return order[lo]
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> int:
+        idx = self.get(key)
+        if idx is None:
+            raise KeyError(key)
+        return idx
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+
+
+def encode_strings(values: Iterable[Optional[str]]) -> Tuple[array, bytes, List[bytes]]:
+    """Codificar una lista de strings como (offsets, blob, lista de bytes)."""
+    encoded = [(v or '').encode('utf-8') for v in values]
+    offsets = array('i', [0])
+    total = 0
+    for item in encoded:
+        total += len(item)
+        offsets.append(total)
+    return offsets, b''.join(encoded), encoded
+
+
+@contextmanager
+def snapshot_lock(path: str):
+    """Lock exclusivo entre procesos asociado a un snapshot.
+
+    Lo toma el proceso que valida/construye el snapshot; los demás workers
+    esperan aquí y, al entrar, encuentran el fichero ya escrito.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_snapshot(store: 'GTFSStore', path: str, fingerprint: Dict[str, Any]) -> int:
+    """Escribir el snapshot del store de forma atómica (tmp + rename).
+
+    Args:
+        store: Store ya cargado
+        path: Ruta del fichero de snapshot
+        fingerprint: Fingerprint de la BD con la que se cargó el store
+
+    Returns:
+        Tamaño del fichero en bytes
+    """
+    objects = pickle.dumps(
+        {name: getattr(store, name) for name in store.SNAPSHOT_OBJECTS},
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+    # Calcular offsets relativos al inicio de la zona de datos
+    sections: Dict[str, list] = {}
+    offset = 0
+    for name in store.SNAPSHOT_COLUMNS:
+        column = getattr(store, name)
+        nbytes = len(column) * column.itemsize
+        sections[name] = [offset, len(column), column.format if isinstance(column, memoryview) else column.typecode]
+        offset += nbytes + _pad(nbytes)
+
+    # Tablas de strings: offsets, blob y (opcional) orden para StringIndex
+    strings: Dict[str, Dict[str, Any]] = {}
+    string_data: List[bytes] = []
+    for name, index_name in store.SNAPSHOT_STRINGS.items():
+        offsets, blob, encoded = encode_strings(getattr(store, name))
+        parts = [('offsets', offsets.tobytes(), len(offsets)), ('blob', blob, len(blob))]
+        if index_name:
+            order = array('i', sorted(range(len(encoded)), key=encoded.__getitem__))
+            parts.append(('order', order.tobytes(), len(order)))
+        # Las listas sin índice son Optional[str] (headsigns): '' se lee como None
+        entry: Dict[str, Any] = {"index": index_name, "nullable": index_name is None}
+        for part, data, length in parts:
+            entry[part] = [offset, length]
+            string_data.append(data)
+            offset += len(data) + _pad(len(data))
+        strings[name] = entry
+    objects_offset = offset
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": _ITEMSIZE,
+        "created_at": datetime.now().isoformat(),
+        "loaded_date": store.last_loaded_date.isoformat() if store.last_loaded_date else None,
+        "fingerprint": fingerprint,
+        "columns": sections,
+        "strings": strings,
+        "objects": [objects_offset, len(objects)],
+    }).encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+
+    prefix_len = len(MAGIC) + 4 + len(header)
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        f.write(b"\0" * _pad(prefix_len))
+        for name in store.SNAPSHOT_COLUMNS:
+            column = getattr(store, name)
+            data = column.tobytes()
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+        for data in string_data:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+        f.write(objects)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+
+    os.replace(tmp_path, path)
+    return size
+
+
+def snapshot_file_id(path: str) -> Optional[List[int]]:
+    """Identidad del fichero de snapshot (inode, mtime), None si no existe.
+
+    Cambia cada vez que se reescribe (tmp + rename crea un inode nuevo).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns]
+
+
+def _read_header(f) -> Optional[Dict[str, Any]]:
+    """Leer el header desde un fichero abierto al inicio (None si es inválido)."""
+    try:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        header_len = int.from_bytes(f.read(4), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    header["_data_start"] = len(MAGIC) + 4 + header_len + _pad(len(MAGIC) + 4 + header_len)
+    return header
+
+
+def read_snapshot_header(path: str) -> Optional[Dict[str, Any]]:
+    """Leer solo el header de un snapshot (None si no existe o es inválido)."""
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f)
+    except OSError:
+        return None
+
+
+def _header_usable(
+    store: 'GTFSStore',
+    path: str,
+    header: Dict[str, Any],
+    expected_fingerprint: Optional[Dict[str, Any]]
+) -> bool:
+    """Comprobar versión, arquitectura, fingerprint y layout del snapshot."""
+    if header.get("version") != FORMAT_VERSION:
+        print(f"    ⚠️ Snapshot {path} con versión {header.get('version')} (esperada {FORMAT_VERSION})")
+        return False
+    if header.get("byteorder") != sys.byteorder or header.get("itemsize") != _ITEMSIZE:
+        print(f"    ⚠️ Snapshot {path} generado en otra arquitectura")
+        return False
+    if expected_fingerprint is not None and header.get("fingerprint") != expected_fingerprint:
+        print("    ⚠️ Snapshot desactualizado (fingerprint de BD distinto)")
+        return False
+    return (set(header["columns"]) == set(store.SNAPSHOT_COLUMNS)
+            and set(header.get("strings", {})) == set(store.SNAPSHOT_STRINGS))
+
+
+def _section(view: memoryview, begin: int, nbytes: int) -> memoryview:
+    """Slice del mapping, comprobando que el fichero no está truncado."""
+    section = view[begin:begin + nbytes]
+    if len(section) != nbytes:
+        raise ValueError(f"sección truncada ({len(section)} de {nbytes} bytes)")
+    return section
+
+
+def _map_sections(mm: mmap.mmap, header: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Columnas, tablas de strings y objetos del cuerpo del snapshot.
+
+    Raises:
+        Exception: si el cuerpo no corresponde al header (truncado, corrupto)
+    """
+    data_start = header["_data_start"]
+    view = memoryview(mm)
+    columns = {}
+    for name, (offset, length, typecode) in header["columns"].items():
+        columns[name] = _section(view, data_start + offset, length * array(typecode).itemsize).cast(typecode)
+
+    strings = {}
+    for name, entry in header["strings"].items():
+        offsets = _section(view, data_start + entry["offsets"][0], entry["offsets"][1] * _ITEMSIZE).cast('i')
+        table = StringTable(offsets, _section(view, data_start + entry["blob"][0], entry["blob"][1]),
+                            nullable=entry["nullable"])
+        strings[name] = table
+        if entry["index"]:
+            order = _section(view, data_start + entry["order"][0], entry["order"][1] * _ITEMSIZE).cast('i')
+            strings[entry["index"]] = StringIndex(table, order)
+
+    objects_offset, objects_len = header["objects"]
+    objects = pickle.loads(_section(view, data_start + objects_offset, objects_len))
+    return columns, strings, objects
+
+
+def attach_snapshot(
+    store: 'GTFSStore',
+    path: str,
+    expected_fingerprint: Optional[Dict[str, Any]] = None
+) -> bool:
+    """Mapear un snapshot en el store (sin copiar las columnas).
+
+    Args:
+        store: Store vacío a rellenar
+        path: Ruta del fichero de snapshot
+        expected_fingerprint: Fingerprint actual de la BD. Si es None no se
+            valida (p.ej. workers que adjuntan el snapshot recién escrito).
+
+    Returns:
+        True si el snapshot se ha adjuntado, False si no es utilizable
+    """
+    start = time.time()
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return False
+    # Header y datos del mismo fichero abierto, aunque otro proceso lo
+    # sustituya mientras tanto
+    with f:
+        header = _read_header(f)
+        if header is None or not _header_usable(store, path, header, expected_fingerprint):
+            return False
+        st = os.fstat(f.fileno())
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Un cuerpo truncado o corrupto (con header válido) no debe tumbar el
+    # arranque: se descarta y se vuelve a cargar desde SQL
+    try:
+        columns, strings, objects = _map_sections(mm, header)
+    except Exception as e:
+        print(f"    ⚠️ Snapshot {path} corrupto: {type(e).__name__}: {e}")
+        columns = None
+    if columns is None:
+        mm.close()
+        return False
+
+    for name, column in columns.items():
+        setattr(store, name, column)
+    for name, value in strings.items():
+        setattr(store, name, value)
+    for name, value in objects.items():
+        setattr(store, name, value)
+
+    store._snapshot_mmap = mm
+    store.last_loaded_date = (
+        date.fromisoformat(header["loaded_date"]) if header.get("loaded_date") else None
+    )
+    store.snapshot_info = {
+        "path": path,
+        "created_at": header.get("created_at"),
+        "size_bytes": len(mm),
+        "file_id": [st.st_ino, st.st_mtime_ns],
+        "attach_seconds": round(time.time() - start, 3),
+    }
+    return True
@@ -0,0 +1,358 @@
+"""Many-to-many travel-time matrices.
+
+A matrix of O origins x D destinations is O one-to-all RAPTOR runs
+(RaptorAlgorithm.plan_isochrone) instead of O x D journey queries: each
+run gives the earliest arrival at every stop within the time budget, and
+the row is read off it for all the destinations at once.
+
+Rows are independent, so they are spread across a process pool (RAPTOR is
+pure Python and holds the GIL). Workers get the store in one of two ways:
+
+- Snapshot (spawn): each worker attaches the mmap'd snapshot, so the
+  arrays are shared through the page cache and nothing is pickled.
+- Fork: workers inherit the loaded store copy-on-write. Only safe from a
+  single-threaded process such as the CLI (scripts/travel_time_matrix.py).
+
+The CLI starts a pool per matrix (iter_travel_matrix). The API uses one
+long-lived pool per uvicorn worker (travel_matrix_pool, started by the app
+lifespan like raptor_executor) that runs at most max_matrices matrices at
+a time and rejects the rest with MatrixBusyError (HTTP 503). Its workers
+answer each chunk with the caller's snapshot generation (worker_store).
+
+Rows are yielded in origin order as soon as they are ready, so callers can
+stream them (format_csv / format_ndjson).
+"""
+
+import json
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from src.gtfs_bc.routing.raptor_executor import worker_store
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+MATRIX_MAX_CELLS = 1_000_000  # Largest matrix accepted (1000 x 1000)
+MATRIX_CHUNK_ORIGINS = 4  # Origins sent to a worker at a time
+MATRIX_CHUNKS_AHEAD = 2  # Chunks queued per pool worker for one matrix
+
+
+# =============================================================================
+# Data Structures
+# =============================================================================
+
+@dataclass
+class MatrixQuery:
+    """A travel-time matrix request (stop or station IDs)."""
+    origins: List[str]
+    destinations: List[str]
+    departure_time: time
+    travel_date: date
+    max_minutes: int = 120
+    max_transfers: int = 3
+
+
+# One row: (origin_id, [(minutes, transfers) or None per destination])
+MatrixRow = Tuple[str, List[Optional[Tuple[int, int]]]]
+
+
+class MatrixBusyError(RuntimeError):
+    """The matrix pool already runs max_matrices matrices."""
+
+
+def check_size(query: MatrixQuery) -> None:
+    """Raise ValueError if the matrix has more than MATRIX_MAX_CELLS cells."""
+    if len(query.origins) * len(query.destinations) > MATRIX_MAX_CELLS:
+        raise ValueError(f"Matrix too large: {len(query.origins)} x {len(query.destinations)} "
+                         f"(max {MATRIX_MAX_CELLS:,} cells)")
+
+
+def expand_stop(store: GTFSStore, stop_id: str) -> List[str]:
+    """A station and its platforms (some feeds use the parent in stop_times)."""
+    return [stop_id] + store.get_children_stops(stop_id)
+
+
+def stations_with_prefix(store: GTFSStore, prefix: str) -> List[str]:
+    """Stations whose ID starts with prefix, e.g. all of 'METRO_MADRID_'.
+
+    A station is a parent stop, or a served stop that has no parent.
+    """
+    children = {child for kids in store.children_by_parent.values() for child in kids}
+    stations = {stop_id for stop_id in store.children_by_parent if stop_id.startswith(prefix)}
+    stations.update(
+        stop_id for stop_id, stop_idx in store.stop_index.items()
+        if stop_id.startswith(prefix) and stop_id not in children and store.get_stop_patterns(stop_idx)
+    )
+    return sorted(stations)
+
+
+def travel_row(
+    raptor: RaptorAlgorithm,
+    origin_id: str,
+    destinations: List[List[str]],
+    query: MatrixQuery
+) -> MatrixRow:
+    """Travel times from one origin to every destination (one RAPTOR run).
+
+    Args:
+        raptor: Solver bound to the store
+        origin_id: Origin stop or station
+        destinations: Platforms of each destination (expand_stop)
+        query: The matrix request
+
+    Returns:
+        (origin_id, [(minutes, transfers) or None if not reachable in time])
+    """
+    departure_seconds = (query.departure_time.hour * 3600 + query.departure_time.minute * 60
+                         + query.departure_time.second)
+    try:
+        reached = raptor.plan_isochrone(
+            expand_stop(raptor.store, origin_id), query.departure_time, query.travel_date,
+            query.max_minutes, query.max_transfers
+        )
+    except ValueError:
+        return origin_id, [None] * len(destinations)
+
+    row: List[Optional[Tuple[int, int]]] = []
+    for platforms in destinations:
+        best = min((reached[p] for p in platforms if p in reached), default=None)
+        row.append(None if best is None else ((best[0] - departure_seconds) // 60, best[1]))
+    return origin_id, row
+
+
+# =============================================================================
+# Process pool
+# =============================================================================
+
+# Worker state, set by _init_worker
+_worker_query: Optional[MatrixQuery] = None
+_worker_destinations: List[List[str]] = []
+_worker_raptor: Optional[RaptorAlgorithm] = None
+
+
+def _init_worker(query: MatrixQuery, snapshot_path: Optional[str]) -> None:
+    """Prepare a pool worker: attach the snapshot (spawn) or use the inherited store (fork)."""
+    global _worker_query, _worker_destinations, _worker_raptor
+
+    if snapshot_path:
+        GTFSStore.reset_instance()
+        if not GTFSStore.get_instance().attach_snapshot(snapshot_path):
+            raise RuntimeError(f"Cannot attach GTFS snapshot {snapshot_path}")
+    store = GTFSStore.get_instance()
+    _worker_query = query
+    _worker_destinations = [expand_stop(store, d) for d in query.destinations]
+    _worker_raptor = RaptorAlgorithm(store=store)
+
+
+def _worker_row(origin_id: str) -> MatrixRow:
+    return travel_row(_worker_raptor, origin_id, _worker_destinations, _worker_query)
+
+
+def iter_travel_matrix(
+    query: MatrixQuery,
+    workers: int = 1,
+    snapshot_path: Optional[str] = None
+) -> Iterator[MatrixRow]:
+    """Compute a matrix row by row, in origin order.
+
+    Args:
+        query: The matrix request
+        workers: Processes to use (1 = in this process, with the current store)
+        snapshot_path: Snapshot the workers attach (spawn). Without it the
+            workers are forked and inherit the store (single-threaded callers only)
+
+    Yields:
+        One MatrixRow per origin
+    """
+    check_size(query)
+
+    if workers <= 1:
+        store = GTFSStore.get_instance()
+        raptor = RaptorAlgorithm(store=store)
+        destinations = [expand_stop(store, d) for d in query.destinations]
+        for origin_id in query.origins:
+            yield travel_row(raptor, origin_id, destinations, query)
+        return
+
+    context = multiprocessing.get_context('spawn' if snapshot_path else 'fork')
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(query, snapshot_path),
+    )
+    try:
+        yield from executor.map(_worker_row, query.origins, chunksize=MATRIX_CHUNK_ORIGINS)
+    finally:
+        # Client gone (generator closed) or error: drop the pending rows
+        # instead of computing the rest of the matrix
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_rows(snapshot_path: str, file_id: List[int], query: MatrixQuery, origins: List[str]) -> List[MatrixRow]:
+    """Task of the long-lived pool: the rows of a chunk of origins."""
+    store = worker_store(snapshot_path, file_id)
+    raptor = RaptorAlgorithm(store=store)
+    destinations = [expand_stop(store, d) for d in query.destinations]
+    return [travel_row(raptor, origin_id, destinations, query) for origin_id in origins]
+
+
+class TravelMatrixPool:
+    """Long-lived process pool for the matrix endpoint, bounded in matrices."""
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._snapshot_path: Optional[str] = None
+        self.workers = 0
+        self.max_matrices = 0
+        self.in_flight = 0
+        # Counters since start
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def active(self) -> bool:
+        return self._pool is not None
+
+    def start(self, snapshot_path: str, workers: int, max_matrices: int) -> None:
+        """Create the pool; its workers are spawned on the first matrix and attach snapshot_path."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._snapshot_path = snapshot_path
+            self.workers = workers
+            self.max_matrices = max(max_matrices, 1)
+            self._pool = self._new_pool()
+        logger.info(f"Travel matrix pool started: {workers} workers, max {self.max_matrices} matrices at a time")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def shutdown(self) -> None:
+        """Stop the workers: queued chunks are cancelled, running ones finish."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def accepts(self, store: GTFSStore) -> bool:
+        """Whether matrices on this store can run in the pool (same snapshot file)."""
+        return (self._pool is not None and store.snapshot_info is not None
+                and store.snapshot_info.get("path") == self._snapshot_path)
+
+    def rows(self, store: GTFSStore, query: MatrixQuery) -> Iterator[MatrixRow]:
+        """Reserve a slot for a matrix and stream its rows in origin order.
+
+        The slot is released when the stream ends or is closed (client
+        gone); closing it cancels the chunks not started yet.
+
+        Raises:
+            ValueError: matrix larger than MATRIX_MAX_CELLS
+            MatrixBusyError: max_matrices matrices already running
+        """
+        check_size(query)
+        with self._lock:
+            pool = self._pool
+            if pool is None or self.in_flight >= self.max_matrices:
+                self.rejected += 1
+                raise MatrixBusyError(f"Travel matrix pool busy ({self.in_flight} matrices running)")
+            self.in_flight += 1
+        return self._stream(pool, store.snapshot_info["file_id"], query)
+
+    def _stream(self, pool: ProcessPoolExecutor, file_id: List[int], query: MatrixQuery) -> Iterator[MatrixRow]:
+        chunks = [query.origins[i:i + MATRIX_CHUNK_ORIGINS] for i in range(0, len(query.origins), MATRIX_CHUNK_ORIGINS)]
+        pending = deque()
+        finished = False
+        try:
+            # A bounded window of chunks in the queue, so concurrent
+            # matrices share the workers and a closed stream leaves little
+            # to cancel
+            next_chunk = 0
+            while next_chunk < len(chunks) or pending:
+                while next_chunk < len(chunks) and len(pending) < self.workers * MATRIX_CHUNKS_AHEAD:
+                    pending.append(pool.submit(_pool_rows, self._snapshot_path, file_id, query, chunks[next_chunk]))
+                    next_chunk += 1
+                yield from pending.popleft().result()
+            finished = True
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+            with self._lock:
+                self.in_flight -= 1
+                if finished:
+                    self.completed += 1
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a pool whose worker died (only once per broken pool)."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = self._new_pool()
+            self.restarts += 1
+        logger.error("Travel matrix pool broken, restarted")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        """Pool state for /health."""
+        return {
+            "active": self.active,
+            "workers": self.workers,
+            "max_matrices": self.max_matrices,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+# Process-wide matrix pool (started by the app lifespan)
+travel_matrix_pool = TravelMatrixPool()
+
+
+# =============================================================================
+# Output formats
+# =============================================================================
+
+def format_csv(rows: Iterator[MatrixRow], destinations: List[str]) -> Iterator[str]:
+    """CSV lines: origin_id,destination_id,travel_minutes,transfers (empty if unreachable)."""
+    yield "origin_id,destination_id,travel_minutes,transfers\n"
+    for origin_id, cells in rows:
+        yield "".join(
+            f"{origin_id},{destination_id},{cell[0]},{cell[1]}\n" if cell is not None
+            else f"{origin_id},{destination_id},,\n"
+            for destination_id, cell in zip(destinations, cells)
+        )
+
+
+def format_ndjson(rows: Iterator[MatrixRow], destinations: List[str]) -> Iterator[str]:
+    """One JSON object per origin: {"origin", "travel_minutes": {dest: m|null}, "transfers": {...}}."""
+    for origin_id, cells in rows:
+        yield json.dumps({
+            "origin": origin_id,
+            "travel_minutes": {d: (cell[0] if cell else None) for d, cell in zip(destinations, cells)},
+            "transfers": {d: (cell[1] if cell else None) for d, cell in zip(destinations, cells)},
+        }) + "\n"
+
+
+FORMATTERS = {
+    "csv": (format_csv, "text/csv"),
+    "ndjson": (format_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,83 @@
+"""SQLite GTFS database for the GTFSStore load tests.
+
+Creates the tables and columns the store reads (same names as in
+PostgreSQL, without types) so _do_load, _do_refresh and the snapshot
+fingerprint run their real SQL. Rows are given as in store_builder.
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+TABLES = {
+    "gtfs_stops": ("id", "name", "lat", "lon", "parent_station_id"),
+    "gtfs_routes": ("id", "short_name", "color", "route_type"),
+    "gtfs_calendar": ("service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday",
+                      "sunday", "start_date", "end_date"),
+    "gtfs_calendar_dates": ("service_id", "date", "exception_type"),
+    "gtfs_trips": ("id", "route_id", "service_id", "headsign", "shape_id"),
+    "gtfs_stop_times": ("trip_id", "stop_id", "stop_sequence", "arrival_seconds", "departure_seconds"),
+    "gtfs_shape_points": ("shape_id", "sequence", "lat", "lon"),
+    "gtfs_route_frequencies": ("route_id", "day_type", "start_time", "end_time", "headway_secs"),
+    "gtfs_stop_route_sequence": ("route_id", "stop_id", "sequence"),
+    "stop_correspondence": ("from_stop_id", "to_stop_id", "walk_time_s"),
+    "stop_access": ("id", "stop_id", "name", "lat", "lon"),
+    "gtfs_feed_imports": ("id", "completed_at"),
+}
+
+
+def create_gtfs_db(path, trips, transfers=(), frequencies=(), sequences=(), stops=None, shapes=None):
+    """Engine over a new SQLite file with the rows of build_store.
+
+    trips: (trip_id, route_id, stop_times[, service_id[, shape_id]])
+    stops: {stop_id: (lat, lon)}; any other stop in the trips or
+        sequences is at (0, 0). Every stop is named "Stop <id>".
+    shapes: {shape_id: [(lat, lon), ...]}
+
+    Every route is a bus (3) and service "WK" runs every day of 2026.
+    """
+    stops = dict(stops or {})
+    for trip in trips:
+        for stop_id, *_ in trip[2]:
+            stops.setdefault(stop_id, (0.0, 0.0))
+    for row in sequences:
+        stops.setdefault(row[1], (0.0, 0.0))
+
+    rows = {
+        "gtfs_stops": [(stop_id, f"Stop {stop_id}", lat, lon, None) for stop_id, (lat, lon) in stops.items()],
+        "gtfs_routes": [(route_id, route_id, None, 3)
+                        for route_id in sorted({t[1] for t in trips} | {f[0] for f in frequencies})],
+        "gtfs_calendar": [("WK", 1, 1, 1, 1, 1, 1, 1, "2026-01-01", "2026-12-31")],
+        "gtfs_trips": [],
+        "gtfs_stop_times": [],
+        "gtfs_shape_points": [(shape_id, seq, lat, lon)
+                              for shape_id, points in (shapes or {}).items()
+                              for seq, (lat, lon) in enumerate(points)],
+        "gtfs_route_frequencies": [tuple(str(v) if hasattr(v, "hour") else v for v in row) for row in frequencies],
+        "gtfs_stop_route_sequence": list(sequences),
+        "stop_correspondence": list(transfers),
+        "gtfs_feed_imports": [(1, "2026-01-05 03:00:00")],
+    }
+    for trip_id, route_id, stop_times, *extra in trips:
+        service_id = extra[0] if extra else "WK"
+        shape_id = extra[1] if len(extra) > 1 else None
+        rows["gtfs_trips"].append((trip_id, route_id, service_id, None, shape_id))
+        for sequence, (stop_id, arrival, *departure) in enumerate(stop_times, 1):
+            rows["gtfs_stop_times"].append(
+                (trip_id, stop_id, sequence, arrival, departure[0] if departure else arrival)
+            )
+
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        for table, columns in TABLES.items():
+            conn.execute(text(f"CREATE TABLE {table} ({', '.join(columns)})"))
+            if rows.get(table):
+                conn.execute(
+                    text(f"INSERT INTO {table} VALUES ({', '.join(':' + c for c in columns)})"),
+                    [dict(zip(columns, row)) for row in rows[table]],
+                )
+    return engine
+
+
+def gtfs_session(engine) -> Session:
+    """Session on the test database (the parallel load opens its own per table)."""
+    return Session(engine)
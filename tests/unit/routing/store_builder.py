@@ -0,0 +1,86 @@
+"""In-memory GTFSStore builder shared by the routing unit tests.
+
+Runs the same build steps as a load from SQL (patterns, frequency
+patterns, shapes, footpaths, stop grid, shape index) over rows given by
+the test instead of read from the database.
+"""
+
+from datetime import date
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore, _RawTrips, _intern_id
+from src.gtfs_bc.routing.service_calendar import ServiceCalendar
+
+MONDAY = date(2026, 1, 5)
+
+# Service of the trips that do not name one: every day of 2026
+EVERY_DAY = {"WK": (0b1111111, date(2026, 1, 1), date(2026, 12, 31))}
+
+
+def build_store(
+    trips,
+    transfers=(),
+    frequencies=(),
+    sequences=(),
+    stops=None,
+    shapes=None,
+    calendars=None,
+    center=MONDAY
+):
+    """Loaded store from trips (trip_id, route_id, stop_times[, service_id[, shape_id]]).
+
+    stop_times: [(stop_id, seconds), ...] or [(stop_id, arrival, departure), ...]
+    transfers: (from_stop, to_stop, walk_seconds)
+    frequencies / sequences: rows of gtfs_route_frequencies and
+        gtfs_stop_route_sequence for frequency-based routes
+    stops: {stop_id: (lat, lon)}; any other stop is at (0, 0)
+    shapes: {shape_id: [(lat, lon), ...]} as rows of gtfs_shape_points
+    calendars: service_calendars (default EVERY_DAY, service "WK")
+
+    Stops are numbered in ID order; every stop is named "Stop <id>".
+    """
+    store = GTFSStore()
+    stops = dict(stops or {})
+    stop_ids = set(stops) | {stop[0] for trip in trips for stop in trip[2]}
+    stop_ids |= {row[1] for row in sequences} | {t[0] for t in transfers} | {t[1] for t in transfers}
+    for stop_id in sorted(stop_ids):
+        _intern_id(store.stop_ids, store.stop_index, stop_id)
+        lat, lon = stops.get(stop_id, (0.0, 0.0))
+        store.stops_info[stop_id] = (f"Stop {stop_id}", lat, lon)
+    for route_id in sorted({trip[1] for trip in trips} | {row[0] for row in frequencies}):
+        _intern_id(store.route_ids, store.route_index, route_id)
+
+    raw = _RawTrips()
+    for trip_id, route_id, stop_times, *extra in trips:
+        service_id = extra[0] if extra else "WK"
+        if len(extra) > 1 and extra[1]:
+            raw.shapes[len(raw.ids)] = extra[1]
+        raw.index[trip_id] = len(raw.ids)
+        raw.ids.append(trip_id)
+        raw.route.append(store.route_index[route_id])
+        raw.service.append(_intern_id(store.service_ids, store.service_index, service_id))
+        raw.headsigns.append(None)
+        raw.start.append(len(raw.st_stop))
+        for stop_id, arrival, *departure in stop_times:
+            raw.st_stop.append(store.stop_index[stop_id])
+            raw.st_arrival.append(arrival)
+            raw.st_departure.append(departure[0] if departure else arrival)
+        raw.end.append(len(raw.st_stop))
+    raw.assigned = bytearray(len(raw.ids))
+
+    patterns_at_stop = []
+    store._append_patterns(raw, patterns_at_stop)
+    store._load_frequencies(None, patterns_at_stop, frequency_rows=list(frequencies), sequence_rows=list(sequences))
+    store._load_shapes(None, rows=[
+        (shape_id, lat, lon) for shape_id, points in sorted((shapes or {}).items()) for lat, lon in points
+    ])
+    patterns_at_stop.extend([] for _ in range(len(store.stop_ids) - len(patterns_at_stop)))
+    store.patterns_at_stop = [tuple(p) for p in patterns_at_stop]
+    for from_stop, to_stop, seconds in transfers:
+        store.transfers.setdefault(from_stop, []).append((to_stop, seconds))
+    store.service_calendars = dict(EVERY_DAY if calendars is None else calendars)
+    store.calendar = ServiceCalendar(store.service_calendars, {}, center=center)
+    store._build_footpaths()
+    store._build_stop_grid()
+    store._build_shape_index()
+    store.is_loaded = True
+    return store
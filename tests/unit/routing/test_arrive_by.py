@@ -0,0 +1,169 @@
+"""Unit tests for arrive-by planning (reverse RAPTOR)."""
+
+from datetime import date, time
+
+import pytest
+
+from src.gtfs_bc.routing.raptor import DESTINATION_POINT_ID, ORIGIN_POINT_ID, RaptorAlgorithm
+from src.gtfs_bc.routing.realtime_overlay import RealtimeUpdates, TripDelay, realtime_overlay
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+# Half-hourly trains A -> B, 20 min ride
+HALF_HOURLY = [
+    (f"T{i}", "R1", [("A", EIGHT + i * 1800), ("B", EIGHT + i * 1800 + 1200)])
+    for i in range(4)
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_updates():
+    realtime_overlay.publish(None)
+    yield
+    realtime_overlay.publish(None)
+
+
+def _rides(journey):
+    return [(leg.trip_id, leg.departure_time, leg.arrival_time) for leg in journey.legs if leg.type == "transit"]
+
+
+class TestReverseIndexes:
+    """Tests for the store indexes used by the reverse search."""
+
+    def test_arrival_columns_follow_the_departure_layout(self):
+        store = build_store(HALF_HOURLY)
+        view = store.get_day_view(MONDAY)
+        pattern_idx = store.trip_pattern[store.trip_index["T0"]]
+
+        assert list(view.arrival_columns(pattern_idx)) == [
+            EIGHT, EIGHT + 1800, EIGHT + 3600, EIGHT + 5400,
+            EIGHT + 1200, EIGHT + 3000, EIGHT + 4800, EIGHT + 6600,
+        ]
+
+    def test_incoming_footpaths(self):
+        store = build_store(HALF_HOURLY, transfers=[("A", "X", 120), ("B", "X", 60), ("X", "B", 90)])
+        x_idx = store.stop_index["X"]
+
+        incoming = store.footpath_from[store.footpath_in_offsets[x_idx]:store.footpath_in_offsets[x_idx + 1]]
+
+        assert sorted(store.stop_ids[i] for i in incoming) == ["A", "B"]
+
+    def test_previous_run_is_the_latest_arriving_in_time(self):
+        frequencies = [("M1", "weekday", time(7, 0), "10:00:00", 600)]
+        sequences = [("M1", "A", 1), ("M1", "B", 2), ("M1", "C", 3)]
+        store = build_store([], frequencies=frequencies, sequences=sequences)
+        view = store.get_day_view(MONDAY)
+        pattern_idx = store.trip_pattern[store.trip_index["M1_FREQ_0"]]
+
+        # C is reached 270 s after the first stop
+        assert view.previous_run(pattern_idx, 2, EIGHT + 270) == EIGHT
+        assert view.previous_run(pattern_idx, 2, EIGHT + 269) == EIGHT - 600
+        assert view.previous_run(pattern_idx, 2, 12 * 3600) == 10 * 3600 - 600
+        assert view.previous_run(pattern_idx, 2, 7 * 3600) == -1
+
+
+class TestArriveBy:
+    """Tests for RaptorAlgorithm.plan_arrive_by."""
+
+    def test_latest_train_arriving_in_time(self):
+        store = build_store(HALF_HOURLY)
+
+        journeys = RaptorAlgorithm(store=store).plan_arrive_by("A", "B", time(9, 25), MONDAY)
+
+        assert _rides(journeys[0]) == [("T2", EIGHT + 3600, EIGHT + 4800)]
+        assert journeys[0].departure_time == EIGHT + 3600
+        assert journeys[0].arrival_time == EIGHT + 4800
+
+    def test_no_train_arrives_in_time(self):
+        store = build_store(HALF_HOURLY)
+
+        assert RaptorAlgorithm(store=store).plan_arrive_by("A", "B", time(8, 15), MONDAY) == []
+
+    def test_pareto_over_departure_and_transfers(self):
+        trips = [
+            ("D1", "DIRECT", [("A", EIGHT), ("C", EIGHT + 3300)]),
+            ("F1", "FAST", [("A", EIGHT + 1200), ("B", EIGHT + 2400)]),
+            ("F2", "LINK", [("B", EIGHT + 2700), ("C", EIGHT + 3480)]),
+        ]
+        store = build_store(trips)
+
+        journeys = RaptorAlgorithm(store=store).plan_arrive_by("A", "C", time(9, 0), MONDAY)
+
+        assert [(j.departure_time, j.transfers) for j in journeys] == [(EIGHT + 1200, 1), (EIGHT, 0)]
+        assert _rides(journeys[0]) == [("F1", EIGHT + 1200, EIGHT + 2400), ("F2", EIGHT + 2700, EIGHT + 3480)]
+
+    def test_walk_after_the_trip_starts_on_arrival(self):
+        store = build_store(HALF_HOURLY, transfers=[("B", "D", 300)])
+
+        journey = RaptorAlgorithm(store=store).plan_arrive_by("A", "D", time(9, 30), MONDAY)[0]
+
+        assert _rides(journey) == [("T2", EIGHT + 3600, EIGHT + 4800)]
+        walk = journey.legs[-1]
+        assert (walk.type, walk.from_stop_id, walk.to_stop_id) == ("walking", "B", "D")
+        assert walk.departure_time == EIGHT + 4800
+        assert journey.arrival_time <= EIGHT + 5400
+
+    def test_agrees_with_the_forward_search(self):
+        trips = HALF_HOURLY + [
+            (f"U{i}", "R2", [("B", EIGHT + i * 900 + 600), ("C", EIGHT + i * 900 + 1500)]) for i in range(8)
+        ]
+        store = build_store(trips)
+        raptor = RaptorAlgorithm(store=store)
+
+        journey = raptor.plan_arrive_by("A", "C", time(9, 45), MONDAY)[0]
+        departure = journey.departure_time
+        forward = raptor.plan("A", "C", time(departure // 3600, departure % 3600 // 60), MONDAY)[0]
+
+        assert journey.arrival_time <= 9 * 3600 + 45 * 60
+        assert forward.arrival_time == journey.arrival_time
+
+    def test_delayed_train_is_not_taken(self):
+        store = build_store(HALF_HOURLY)
+        realtime_overlay.publish(RealtimeUpdates(MONDAY, {"T2": TripDelay(delay=900)}))
+
+        journeys = RaptorAlgorithm(store=store).plan_arrive_by("A", "B", time(9, 25), MONDAY)
+
+        assert _rides(journeys[0]) == [("T1", EIGHT + 1800, EIGHT + 3000)]
+
+    def test_frequency_line(self):
+        frequencies = [("M1", "weekday", time(7, 0), "10:00:00", 600)]
+        sequences = [("M1", "A", 1), ("M1", "B", 2), ("M1", "C", 3)]
+        store = build_store([], frequencies=frequencies, sequences=sequences)
+
+        journey = RaptorAlgorithm(store=store).plan_arrive_by("A", "C", time(8, 30), MONDAY)[0]
+
+        assert _rides(journey) == [("M1_FREQ_0", EIGHT + 1200, EIGHT + 1470)]
+
+    def test_loop_line_leaves_at_the_second_visit(self):
+        # Circular line A - B - C - A - B every 10 min: the 08:00 trip passes A again at 08:06
+        loop = [(f"T{i}", "C1", [(s, EIGHT + i * 600 + n * 120) for n, s in enumerate("ABCAB")]) for i in range(3)]
+        store = build_store(loop)
+
+        journeys = RaptorAlgorithm(store=store).plan_arrive_by("A", "B", time(8, 9), MONDAY)
+
+        assert _rides(journeys[0]) == [("T0", EIGHT + 360, EIGHT + 480)]
+
+    def test_frequency_loop_line(self):
+        frequencies = [("C1", "weekday", time(7, 0), "10:00:00", 600)]
+        sequences = [("C1", "A", 1), ("C1", "B", 2), ("C1", "C", 3), ("C1", "A", 4), ("C1", "D", 5)]
+        store = build_store([], frequencies=frequencies, sequences=sequences)
+
+        journey = RaptorAlgorithm(store=store).plan_arrive_by("A", "D", time(8, 10), MONDAY)[0]
+
+        # The 08:00 run is back at A at 08:07:30 and reaches D at 08:09:30
+        assert _rides(journey) == [("C1_FREQ_0", EIGHT + 450, EIGHT + 570)]
+
+    def test_coordinate_ends_add_the_walks(self):
+        store = build_store(HALF_HOURLY)
+
+        journey = RaptorAlgorithm(store=store).plan_arrive_by(
+            ["A"], ["B"], time(9, 25), MONDAY, access_seconds={"A": 240}, egress_seconds={"B": 120}
+        )[0]
+
+        assert [leg.from_stop_id for leg in journey.legs] == [ORIGIN_POINT_ID, "A", "B"]
+        assert journey.legs[-1].to_stop_id == DESTINATION_POINT_ID
+        assert journey.departure_time == EIGHT + 3600 - 240
+        assert journey.arrival_time == EIGHT + 4800 + 120
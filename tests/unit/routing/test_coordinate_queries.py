@@ -0,0 +1,104 @@
+"""Unit tests for coordinate origins/destinations (stop grid, access and egress walks)."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.isochrone import stops_near
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import DESTINATION_POINT_ID, ORIGIN_POINT_ID, RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+# About 111 m per 0.001 degrees of latitude
+STOPS = {
+    "A": (37.001, -6.0),
+    "A2": (37.004, -6.0),
+    "B": (37.100, -6.0),
+    "C": (37.101, -6.0),
+    "FAR": (37.050, -6.0),
+}
+
+
+# T1 leaves from A (next to the origin point), T2 from A2 (a longer walk)
+# and arrives earlier; both serve B and then C
+TRAINS = [
+    ("T1", "R1", [("A", EIGHT + 600), ("B", EIGHT + 1800), ("C", EIGHT + 1860)]),
+    ("T2", "R2", [("A2", EIGHT + 420), ("B", EIGHT + 1200), ("C", EIGHT + 1260)]),
+]
+
+
+class TestStopGrid:
+    """Tests for the spatial index of stops."""
+
+    def test_nearest_first_within_radius(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        nearby = store.get_stops_near(37.0, -6.0, 800)
+
+        assert [stop_id for _, stop_id in nearby] == ["A", "A2"]
+        assert 100 < nearby[0][0] < 120
+
+    def test_limit_keeps_the_nearest(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        assert [stop_id for _, stop_id in store.get_stops_near(37.0, -6.0, 800, limit=1)] == ["A"]
+
+    def test_stops_without_service_are_not_indexed(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        assert store.get_stops_near(37.050, -6.0, 800) == []
+
+    def test_stops_near_gives_walking_seconds(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        access = stops_near(store, 37.0, -6.0)
+
+        assert list(access) == ["A", "A2"]
+        assert 60 < access["A"] < access["A2"]
+
+
+class TestAccessEgress:
+    """Tests for RAPTOR and McRAPTOR seeded with walking access and egress."""
+
+    def _plan(self, algorithm, access, egress):
+        return algorithm.plan(list(access), list(egress), time(8, 0), MONDAY,
+                              access_seconds=access, egress_seconds=egress)
+
+    def test_access_walk_delays_the_origin(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        # A2 at 300 s catches T2 (08:07); at 480 s it is missed
+        reachable = self._plan(RaptorAlgorithm(store=store), {"A": 60, "A2": 300}, {"B": 0})
+        missed = self._plan(RaptorAlgorithm(store=store), {"A": 60, "A2": 480}, {"B": 0})
+
+        assert reachable[0].legs[1].trip_id == "T2"
+        assert missed[0].legs[1].trip_id == "T1"
+
+    def test_point_legs_and_arrival_include_the_walks(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        journey = self._plan(RaptorAlgorithm(store=store), {"A2": 300}, {"B": 120})[0]
+
+        assert [(leg.type, leg.from_stop_id, leg.to_stop_id) for leg in journey.legs] == [
+            ("walking", ORIGIN_POINT_ID, "A2"), ("transit", "A2", "B"), ("walking", "B", DESTINATION_POINT_ID)
+        ]
+        assert journey.legs[0].arrival_time == EIGHT + 300
+        assert journey.arrival_time == EIGHT + 1200 + 120
+
+    def test_destination_with_shorter_egress_wins(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        journey = self._plan(RaptorAlgorithm(store=store), {"A2": 300}, {"B": 600, "C": 60})[0]
+
+        assert journey.legs[-1].from_stop_id == "C"
+        assert journey.arrival_time == EIGHT + 1260 + 60
+
+    def test_mc_raptor_adds_the_walks(self):
+        store = build_store(TRAINS, stops=STOPS)
+
+        journey = self._plan(McRaptorAlgorithm(store=store), {"A2": 300}, {"B": 600, "C": 60})[0]
+
+        assert journey.legs[0].from_stop_id == ORIGIN_POINT_ID
+        assert journey.legs[-1].to_stop_id == DESTINATION_POINT_ID
+        assert journey.arrival_time == EIGHT + 1260 + 60
@@ -0,0 +1,114 @@
+"""Unit tests for frequency-based patterns (headway windows in GTFSStore)."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+FRIDAY = date(2026, 1, 9)
+SUNDAY = date(2026, 1, 11)
+EIGHT = 8 * 3600
+
+
+# Metro line M1: A - B - C, every 10 min 07:00-10:00 on weekdays, 20 min on Sundays
+METRO = [
+    ("M1", "weekday", time(7, 0), "10:00:00", 600),
+    ("M1", "sunday", time(7, 0), "00:00:00", 1200),
+]
+METRO_STOPS = [("M1", "A", 1), ("M1", "B", 2), ("M1", "C", 3)]
+
+
+class TestFrequencyLoading:
+    """Tests for building frequency patterns from the frequency tables."""
+
+    def test_both_directions_with_template_profile(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+
+        assert store.stats['frequency_patterns'] == 2
+        assert store.get_stop_times("M1_FREQ_0") == [("A", 0, 0), ("B", 120, 150), ("C", 270, 300)]
+        assert [s for s, _, _ in store.get_stop_times("M1_FREQ_1")] == ["C", "B", "A"]
+        assert store.get_trip_info("M1_FREQ_1")[1] == "Stop A"
+
+    def test_routes_with_stop_times_are_not_duplicated(self):
+        trips = [("T1", "M1", [("A", EIGHT), ("B", EIGHT + 300)])]
+        store = build_store(trips, frequencies=METRO, sequences=METRO_STOPS)
+
+        assert store.stats['frequency_patterns'] == 0
+        assert not any(store.is_frequency_pattern(p) for p in range(len(store.pattern_ids)))
+
+    def test_day_types_and_friday_fallback(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+        pattern_idx = store.trip_pattern[store.trip_index["M1_FREQ_0"]]
+
+        assert store.get_day_view(FRIDAY).headways(pattern_idx) == ((7 * 3600, 10 * 3600, 600),)
+        assert store.get_day_view(SUNDAY).headways(pattern_idx) == ((7 * 3600, 24 * 3600, 1200),)
+        assert store.get_day_view(date(2026, 1, 10)).headways(pattern_idx) == ()
+
+    def test_next_run_is_arithmetic(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+        view = store.get_day_view(MONDAY)
+        pattern_idx = store.trip_pattern[store.trip_index["M1_FREQ_0"]]
+
+        # At B (departs 150 s after the first stop): 08:01 -> run leaving A at 08:00
+        assert view.next_run(pattern_idx, 1, EIGHT + 60) == EIGHT
+        assert view.next_run(pattern_idx, 1, EIGHT + 151) == EIGHT + 600
+        assert view.next_run(pattern_idx, 0, 6 * 3600) == 7 * 3600
+        assert view.next_run(pattern_idx, 0, 10 * 3600) == -1
+        assert view.frequency_departures(pattern_idx, 0, EIGHT, EIGHT + 1200) == [EIGHT, EIGHT + 600, EIGHT + 1200]
+
+
+class TestFrequencyRouting:
+    """Tests for RAPTOR and McRAPTOR over frequency patterns."""
+
+    def test_boards_the_next_run(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+
+        journeys = RaptorAlgorithm(store=store).plan("A", "C", time(8, 3), MONDAY)
+        leg = journeys[0].legs[0]
+
+        assert (leg.trip_id, leg.departure_time, leg.arrival_time) == ("M1_FREQ_0", EIGHT + 600, EIGHT + 870)
+
+    def test_departure_is_recovered_at_an_intermediate_stop(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+
+        leg = RaptorAlgorithm(store=store).plan("B", "C", time(8, 0), MONDAY)[0].legs[0]
+
+        assert (leg.departure_time, leg.arrival_time) == (EIGHT + 150, EIGHT + 270)
+
+    def test_loop_line_boards_the_second_visit(self):
+        # Line A - B - C - A - D: at 08:03 the run back at A at 08:07:30
+        # beats waiting for the 08:10 run from the first stop
+        sequences = [("C1", "A", 1), ("C1", "B", 2), ("C1", "C", 3), ("C1", "A", 4), ("C1", "D", 5)]
+        store = build_store([], frequencies=[("C1", "weekday", time(7, 0), "10:00:00", 600)], sequences=sequences)
+
+        leg = RaptorAlgorithm(store=store).plan("A", "D", time(8, 3), MONDAY)[0].legs[0]
+
+        assert (leg.departure_time, leg.arrival_time) == (EIGHT + 450, EIGHT + 570)
+
+    def test_transfer_from_timetable_to_frequency_line(self):
+        trips = [("R1", "RENFE", [("X", EIGHT), ("A", EIGHT + 600)])]
+        store = build_store(trips, frequencies=METRO, sequences=METRO_STOPS)
+
+        journeys = RaptorAlgorithm(store=store).plan("X", "C", time(8, 0), MONDAY)
+        metro = journeys[-1].legs[-1]
+
+        assert metro.trip_id == "M1_FREQ_0"
+        assert metro.departure_time == EIGHT + 600
+        assert journeys[-1].arrival_time == EIGHT + 600 + 270
+
+    def test_mc_raptor_rides_frequency_runs(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+
+        leg = McRaptorAlgorithm(store=store).plan("C", "A", time(8, 0), SUNDAY)[0].legs[0]
+
+        # Return direction leaves half a headway later: 08:10 on Sundays
+        assert (leg.trip_id, leg.departure_time, leg.arrival_time) == ("M1_FREQ_1", EIGHT + 600, EIGHT + 870)
+
+    def test_range_query_enumerates_runs(self):
+        store = build_store([], frequencies=METRO, sequences=METRO_STOPS)
+
+        journeys = RaptorAlgorithm(store=store).plan_profile("A", "C", time(8, 0), 20, MONDAY)
+
+        assert sorted(j.legs[0].departure_time for j in journeys) == [EIGHT, EIGHT + 600, EIGHT + 1200]
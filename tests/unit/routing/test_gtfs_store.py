@@ -0,0 +1,95 @@
+"""Unit tests for GTFSStore pattern building and per-date trip views."""
+
+from datetime import date
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore, PatternDayView, _intern_id
+from tests.unit.routing.store_builder import build_store
+
+
+def _trip(trip_id, start, hop=100, service_id="WK"):
+    """Trip over stops A, B, C leaving A at `start` with `hop` seconds per segment."""
+    return (trip_id, "R1", [
+        (stop_id, start + i * hop, start + i * hop + 20)
+        for i, stop_id in enumerate(("A", "B", "C"))
+    ], service_id)
+
+
+class TestPatternBuilding:
+    """Tests for grouping trips into FIFO patterns."""
+
+    def test_fifo_trips_share_one_pattern(self):
+        """Trips with the same stops and no overtaking form a single pattern."""
+        store = build_store([_trip("T2", 1000), _trip("T1", 500)])
+
+        assert len(store.pattern_ids) == 1
+        assert [trip for _, trip in store.get_pattern_trips(store.pattern_ids[0])] == ["T1", "T2"]
+        assert store.stats["non_fifo_splits"] == 0
+
+    def test_overtaking_trip_is_split_into_own_pattern(self):
+        """An express trip that overtakes a slower one goes to another FIFO pattern."""
+        store = build_store([
+            _trip("SLOW", 500, hop=300),
+            _trip("EXPRESS", 600, hop=60),
+            _trip("NEXT", 1200, hop=300),
+        ])
+
+        assert len(store.pattern_ids) == 2
+        assert store.stats["non_fifo_splits"] == 1
+        patterns = sorted(
+            [trip for _, trip in store.get_pattern_trips(pattern_id)]
+            for pattern_id in store.pattern_ids
+        )
+        assert patterns == [["EXPRESS"], ["SLOW", "NEXT"]]
+        assert all(store.get_pattern_stops(p) == ["A", "B", "C"] for p in store.pattern_ids)
+
+
+class TestPatternDayView:
+    """Tests for per-date boarding with binary search."""
+
+    def test_earliest_trip_uses_active_services_only(self):
+        """Boarding skips trips whose service is not active on the date."""
+        store = build_store([
+            _trip("T1", 500),
+            _trip("T2", 1000, service_id="WE"),
+            _trip("T3", 1500),
+        ])
+        mask = store._service_mask({"WK"})
+        view = PatternDayView(store, date(2026, 1, 5), mask)
+        pattern_idx = 0
+
+        def earliest(stop_index, min_departure):
+            trip_idx = view.earliest_trip(pattern_idx, stop_index, min_departure)
+            return store.trip_ids[trip_idx] if trip_idx >= 0 else None
+
+        assert earliest(0, 0) == "T1"
+        assert earliest(0, 521) == "T3"  # T2 is a weekend trip
+        assert earliest(1, 620) == "T1"  # departure from B at 620
+        assert earliest(2, 1721) is None
+        assert list(view.active_trips(pattern_idx)) == [store.trip_index["T1"], store.trip_index["T3"]]
+
+
+class TestFootpaths:
+    """Tests for the transitive closure of transfers."""
+
+    def test_multi_hop_walks_are_closed_up_to_the_limit(self):
+        """Platform -> access -> platform becomes one footpath; too long chains do not."""
+        store = GTFSStore()
+        for stop_id in ("P1", "ACCESS_1", "P2", "FAR"):
+            _intern_id(store.stop_ids, store.stop_index, stop_id)
+        store.transfers = {
+            "P1": [("ACCESS_1", 120)],
+            "ACCESS_1": [("P1", 120), ("P2", 200)],
+            "P2": [("ACCESS_1", 200), ("FAR", 700), ("FAR", 650)],
+        }
+        store.MAX_FOOTPATH_SECONDS = 900
+
+        store._build_footpaths()
+        idx = store.stop_index
+
+        assert store.get_footpaths(idx["P1"]) == [(idx["ACCESS_1"], 120), (idx["P2"], 320)]
+        # Direct edges are kept whatever their length (minimum of duplicates)
+        assert store.get_footpaths(idx["P2"]) == [(idx["P1"], 320), (idx["ACCESS_1"], 200), (idx["FAR"], 650)]
+        assert store.get_footpaths(idx["FAR"]) == []
+        # ACCESS_1 -> P2 -> FAR (850) fits, P1 -> ... -> FAR (970) does not
+        assert (idx["FAR"], 850) in store.get_footpaths(idx["ACCESS_1"])
+        assert idx["FAR"] not in dict(store.get_footpaths(idx["P1"]))
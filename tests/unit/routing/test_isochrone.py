@@ -0,0 +1,78 @@
+"""Unit tests for one-to-all RAPTOR isochrones."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.isochrone import IsochroneCache, build_contours
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+class TestIsochrone:
+    """Tests for RaptorAlgorithm.plan_isochrone."""
+
+    def test_reaches_every_stop_within_the_budget(self):
+        """Earliest arrival and transfers per stop; nothing past the budget."""
+        store = build_store([
+            ("L1", "R1", [("A", EIGHT + 300), ("B", EIGHT + 900), ("C", EIGHT + 1500)]),
+            ("L2", "R2", [("B", EIGHT + 1200), ("D", EIGHT + 2100)]),
+            ("L3", "R3", [("C", EIGHT + 1800), ("E", EIGHT + 4200)]),
+        ])
+
+        raptor = RaptorAlgorithm(store=store)
+        reached = raptor.plan_isochrone("A", time(8, 0), MONDAY, max_minutes=45)
+
+        assert reached == {
+            "A": (EIGHT, 0),
+            "B": (EIGHT + 900, 0),
+            "C": (EIGHT + 1500, 0),
+            "D": (EIGHT + 2100, 1),
+        }
+        # E (70 min) is over the budget: never labelled nor scanned from
+        assert raptor.stats.stops_improved == 3
+
+    def test_access_seconds_delay_each_origin(self):
+        """Coordinate origins: a long walk to a stop misses its train."""
+        store = build_store([
+            ("L1", "R1", [("A", EIGHT + 300), ("B", EIGHT + 900)]),
+            ("L2", "R2", [("C", EIGHT + 300), ("D", EIGHT + 900)]),
+        ])
+
+        reached = RaptorAlgorithm(store=store).plan_isochrone(
+            ["A", "C"], time(8, 0), MONDAY, max_minutes=30,
+            access_seconds={"A": 120, "C": 600}
+        )
+
+        assert reached["A"] == (EIGHT + 120, 0)
+        assert reached["B"] == (EIGHT + 900, 0)
+        assert reached["C"] == (EIGHT + 600, 0)
+        assert "D" not in reached
+
+
+class TestIsochroneHelpers:
+    """Tests for the isochrone cache and contours."""
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = IsochroneCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    def test_contours_only_include_stops_reached_in_time(self):
+        contours = build_contours(
+            [(40.0, -3.0, EIGHT + 600), (40.1, -3.1, EIGHT + 2400)], EIGHT, [30, 45]
+        )
+
+        assert [f["properties"] for f in contours["features"]] == [
+            {"minutes": 45, "stops": 2},
+            {"minutes": 30, "stops": 1},
+        ]
+        ring = contours["features"][1]["geometry"]["coordinates"][0][0]
+        assert ring[0] == ring[-1]
@@ -0,0 +1,114 @@
+"""Unit tests for the journey result cache."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing import journey_cache as journey_cache_module
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.journey_cache import (
+    JourneyCache,
+    MemoryJourneyBackend,
+    bucket_departure,
+    store_version,
+)
+
+MONDAY = date(2026, 1, 5)
+
+
+def _key(cache, store, departure=time(8, 0), origins=("A1", "A2")):
+    return cache.key(store, "plan", False, list(origins), ["B"], departure, MONDAY, 3)
+
+
+class TestMemoryBackend:
+    """Tests for the LRU/TTL memory backend."""
+
+    def test_entries_expire_after_the_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(journey_cache_module.time, "monotonic", lambda: now[0])
+        backend = MemoryJourneyBackend(max_size=4, ttl_seconds=60)
+        backend.put("k", (["journey"], 0.5))
+
+        now[0] += 59
+        assert backend.get("k") == (["journey"], 0.5)
+        now[0] += 2
+        assert backend.get("k") is None
+        assert len(backend) == 0
+
+    def test_evicts_least_recently_used(self):
+        backend = MemoryJourneyBackend(max_size=2)
+        backend.put("a", (1, 0.0))
+        backend.put("b", (2, 0.0))
+        backend.get("a")
+        backend.put("c", (3, 0.0))
+
+        assert backend.get("b") is None
+        assert backend.get("a") == (1, 0.0)
+
+
+class TestJourneyCache:
+    """Tests for keys, invalidation and stats."""
+
+    def test_key_shares_the_minute_and_ignores_origin_order(self):
+        cache = JourneyCache()
+        store = GTFSStore()
+
+        assert bucket_departure(time(8, 0, 42)) == time(8, 0)
+        assert _key(cache, store, bucket_departure(time(8, 0, 42)), ("A2", "A1")) == _key(cache, store)
+        assert _key(cache, store, time(8, 1)) != _key(cache, store)
+
+    def test_new_store_generation_misses(self):
+        cache = JourneyCache()
+        store = GTFSStore()
+        cache.put(_key(cache, store), ["old"], 0.2)
+
+        store.generation += 1
+        assert cache.get(_key(cache, store)) is None
+
+    def test_stores_of_other_hosts_do_not_share_keys(self):
+        """Without a snapshot, same PID and generation on two hosts are different data."""
+        cache = JourneyCache()
+        here, there = GTFSStore(), GTFSStore()
+        here.generation = there.generation = 1
+
+        assert store_version(here) != store_version(there)
+        assert _key(cache, here) != _key(cache, there)
+
+    def test_invalidate_drops_results(self):
+        cache = JourneyCache()
+        store = GTFSStore()
+        key = _key(cache, store)
+        cache.put(key, ["journey"], 0.2)
+
+        cache.invalidate()
+        assert cache.get(key) is None
+        assert cache.get(_key(cache, store)) is None
+
+    def test_status_reports_hit_rate_and_time_saved(self):
+        cache = JourneyCache()
+        store = GTFSStore()
+        key = _key(cache, store)
+
+        assert cache.get(key) is None
+        cache.put(key, [], 0.25)  # "No route" is cached too
+        assert cache.get(key) == []
+        assert cache.get(key) == []
+
+        status = cache.status()
+        assert (status["hits"], status["misses"]) == (2, 1)
+        assert status["hit_rate"] == 0.667
+        assert status["saved_seconds"] == 0.5
+
+    def test_unreachable_redis_falls_back_to_memory(self):
+        cache = JourneyCache()
+        cache.configure(max_size=8, ttl_seconds=30, redis_url="redis://127.0.0.1:1/0")
+
+        assert cache.backend == "memory"
+        assert cache.enabled
+
+    def test_size_zero_disables_the_cache(self):
+        cache = JourneyCache()
+        cache.configure(max_size=0)
+        store = GTFSStore()
+        cache.put(_key(cache, store), ["journey"], 0.2)
+
+        assert cache.get(_key(cache, store)) is None
+        assert cache.status()["hits"] == 0
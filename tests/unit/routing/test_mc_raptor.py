@@ -0,0 +1,48 @@
+"""Unit tests for McRAPTOR (walking time as a third criterion)."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm, TRANSFER_PENALTY_SECONDS
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+class TestMcRaptor:
+    """Tests for McRAPTOR bags."""
+
+    def test_keeps_slower_journey_that_walks_less(self):
+        """A direct slow ride survives next to a faster one that needs a walk."""
+        store = build_store(
+            trips=[
+                ("SLOW", "R1", [("A", EIGHT + 300), ("C", EIGHT + 3600)]),
+                ("FAST", "R2", [("B", EIGHT + 900), ("C", EIGHT + 2400)]),
+            ],
+            transfers=[("A", "B", 300)],
+        )
+
+        single = RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+        multi = McRaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+
+        assert [j.legs[-1].trip_id for j in single] == ["FAST"]
+        assert [(j.legs[-1].trip_id, j.walking_seconds) for j in multi] == [
+            ("FAST", 300 + TRANSFER_PENALTY_SECONDS),
+            ("SLOW", 0),
+        ]
+        assert multi[0].arrival_time == single[0].arrival_time
+
+    def test_dominated_walking_journey_is_dropped(self):
+        """A journey that walks more and arrives later is not returned."""
+        store = build_store(
+            trips=[
+                ("DIRECT", "R1", [("A", EIGHT + 300), ("C", EIGHT + 1200)]),
+                ("OTHER", "R2", [("B", EIGHT + 900), ("C", EIGHT + 2400)]),
+            ],
+            transfers=[("A", "B", 300)],
+        )
+
+        multi = McRaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+
+        assert [j.legs[-1].trip_id for j in multi] == ["DIRECT"]
@@ -1,118 +1,24 @@
 """Unit tests for RAPTOR algorithm data structures and helpers."""
 
-import pytest
-from datetime import datetime, time
+from datetime import time
 
 from src.gtfs_bc.routing.raptor import (
-    StopTime,
-    Trip,
-    Transfer,
-    RoutePattern,
     Label,
+    RoundLabels,
+    RaptorAlgorithm,
+    RaptorStats,
     Journey,
     JourneyLeg,
     INFINITY,
     MAX_ROUNDS,
+    NO_DEPARTURE,
+    UNREACHED,
     WALKING_SPEED_KMH,
     TRANSFER_PENALTY_SECONDS,
 )
+from tests.unit.routing.store_builder import MONDAY, build_store
 
-
-class TestStopTime:
-    """Tests for StopTime data structure."""
-
-    def test_create_stop_time(self):
-        """StopTime should store arrival/departure times in seconds."""
-        st = StopTime(
-            trip_id="TRIP_001",
-            stop_id="STOP_A",
-            stop_sequence=1,
-            arrival_seconds=28800,  # 08:00:00
-            departure_seconds=28860,  # 08:01:00
-        )
-        assert st.trip_id == "TRIP_001"
-        assert st.stop_id == "STOP_A"
-        assert st.arrival_seconds == 28800
-        assert st.departure_seconds == 28860
-
-    def test_stop_time_sequence(self):
-        """stop_sequence should indicate order within a trip."""
-        st1 = StopTime("T1", "A", 1, 0, 60)
-        st2 = StopTime("T1", "B", 2, 120, 180)
-        assert st1.stop_sequence < st2.stop_sequence
-
-
-class TestTrip:
-    """Tests for Trip data structure."""
-
-    def test_create_trip(self):
-        """Trip should contain route info and stop times."""
-        trip = Trip(
-            trip_id="TRIP_001",
-            route_id="ROUTE_L1",
-            service_id="SERVICE_WEEKDAY",
-            headsign="Terminus",
-        )
-        assert trip.trip_id == "TRIP_001"
-        assert trip.route_id == "ROUTE_L1"
-        assert trip.stop_times == []
-
-    def test_trip_with_stop_times(self):
-        """Trip can have multiple stop times."""
-        trip = Trip("T1", "R1", "S1", "Destination")
-        trip.stop_times = [
-            StopTime("T1", "A", 1, 0, 60),
-            StopTime("T1", "B", 2, 300, 360),
-            StopTime("T1", "C", 3, 600, 660),
-        ]
-        assert len(trip.stop_times) == 3
-        assert trip.stop_times[0].stop_id == "A"
-        assert trip.stop_times[-1].stop_id == "C"
-
-
-class TestTransfer:
-    """Tests for Transfer (walking connection) data structure."""
-
-    def test_create_transfer(self):
-        """Transfer should represent walking between stops."""
-        transfer = Transfer(
-            from_stop_id="METRO_A",
-            to_stop_id="RENFE_A",
-            walk_seconds=180,  # 3 minutes
-        )
-        assert transfer.from_stop_id == "METRO_A"
-        assert transfer.to_stop_id == "RENFE_A"
-        assert transfer.walk_seconds == 180
-
-    def test_transfer_time_calculation(self):
-        """Walking time should be reasonable for short distances."""
-        # 300m at 4.5 km/h = 300 / (4500/3600) = 240 seconds
-        transfer = Transfer("A", "B", 240)
-        assert transfer.walk_seconds == 240
-
-
-class TestRoutePattern:
-    """Tests for RoutePattern data structure."""
-
-    def test_create_pattern(self):
-        """RoutePattern defines stop sequence for a route."""
-        pattern = RoutePattern(
-            route_id="L1",
-            stops=["A", "B", "C", "D"],
-        )
-        assert pattern.route_id == "L1"
-        assert len(pattern.stops) == 4
-        assert pattern.stops[0] == "A"
-        assert pattern.stops[-1] == "D"
-
-    def test_pattern_with_trips(self):
-        """RoutePattern can contain multiple trips."""
-        pattern = RoutePattern("L1", ["A", "B", "C"])
-        pattern.trips = [
-            Trip("T1", "L1", "S1", "C"),
-            Trip("T2", "L1", "S1", "C"),
-        ]
-        assert len(pattern.trips) == 2
+EIGHT = 8 * 3600
 
 
 class TestLabel:
@@ -224,3 +130,127 @@ class TestConstants:
         """INFINITY should be larger than any time value."""
         max_seconds_in_day = 24 * 60 * 60
         assert INFINITY > max_seconds_in_day * 2
+
+
+class TestRoundLabels:
+    """Tests for the per-round label arrays."""
+
+    def test_initial_arrays(self):
+        labels = RoundLabels(3, rounds=1)
+
+        assert labels.rounds == 1
+        assert list(labels.arrival[1]) == [UNREACHED] * 3
+        assert list(labels.trip[0]) == [-1] * 3
+        assert list(labels.board[1]) == [-1] * 3
+
+    def test_reverse_runs_start_without_departure(self):
+        labels = RoundLabels(2, unreached=NO_DEPARTURE)
+
+        assert list(labels.arrival[0]) == [NO_DEPARTURE] * 2
+
+    def test_new_round_is_a_copy(self):
+        labels = RoundLabels(2)
+        labels.arrival[0][1], labels.trip[0][1], labels.board[0][1] = 100, 7, 0
+
+        labels.add_round()
+        assert labels.rounds == 1
+        assert labels.copied(1, 1)
+
+        labels.arrival[1][1] = 90
+        assert not labels.copied(1, 1)
+        assert labels.arrival[0][1] == 100
+
+
+class TestLabelReconstruction:
+    """Label arrays and parent pointers of a run, and the legs rebuilt from them.
+
+    X -walk-> A -L1-> B, C -walk-> D -L2-> E -L3-> F
+    """
+
+    @staticmethod
+    def _store():
+        return build_store([
+            ("L1_T1", "L1", [("A", EIGHT + 600), ("B", EIGHT + 900), ("C", EIGHT + 1200)]),
+            ("L2_T1", "L2", [("D", EIGHT + 1500), ("E", EIGHT + 1800)]),
+            ("L3_T1", "L3", [("E", EIGHT + 2400), ("F", EIGHT + 2700)]),
+        ], transfers=[("X", "A", 180), ("C", "D", 120)])
+
+    def _run(self, store, origin, destination, rounds):
+        raptor = RaptorAlgorithm(store=store)
+        raptor.stats = RaptorStats()
+        origins, destinations = raptor._prepare(origin, destination, MONDAY)
+        return raptor, raptor._run_raptor(origins, destinations, EIGHT, rounds)
+
+    def test_label_arrays_per_round(self):
+        store = self._store()
+        _, labels = self._run(store, "X", "F", 4)
+        idx, trip = store.stop_index, store.trip_index
+
+        def label(k, stop_id):
+            s = idx[stop_id]
+            return labels.arrival[k][s], labels.trip[k][s], labels.board[k][s]
+
+        # Round 0: the origin and the stops walked to from it
+        assert label(0, "X") == (EIGHT, -1, -1)
+        assert label(0, "A") == (EIGHT + 180 + TRANSFER_PENALTY_SECONDS, -1, idx["X"])
+        assert label(0, "B")[0] == UNREACHED
+        # Round 1: L1 boarded at A, then the walk from C
+        assert label(1, "C") == (EIGHT + 1200, trip["L1_T1"], idx["A"])
+        assert label(1, "D") == (EIGHT + 1200 + 120 + TRANSFER_PENALTY_SECONDS, -1, idx["C"])
+        assert label(1, "E")[0] == UNREACHED
+        # Rounds 2 and 3: one more trip each; earlier labels are carried over
+        assert label(2, "E") == (EIGHT + 1800, trip["L2_T1"], idx["D"])
+        assert label(3, "F") == (EIGHT + 2700, trip["L3_T1"], idx["E"])
+        assert labels.copied(3, idx["E"])
+
+    def test_legs_follow_the_parent_pointers(self):
+        store = self._store()
+        raptor, labels = self._run(store, "X", "F", 4)
+
+        legs = raptor._reconstruct_legs(labels, "F", 3, ["X"])
+
+        assert [(leg.type, leg.from_stop_id, leg.to_stop_id, leg.trip_id) for leg in legs] == [
+            ("walking", "X", "A", None),
+            ("transit", "A", "C", "L1_T1"),
+            ("walking", "C", "D", None),
+            ("transit", "D", "E", "L2_T1"),
+            ("transit", "E", "F", "L3_T1"),
+        ]
+        assert [(leg.departure_time, leg.arrival_time) for leg in legs[1:]] == [
+            (EIGHT + 600, EIGHT + 1200),
+            (EIGHT + 1200, EIGHT + 1500),
+            (EIGHT + 1500, EIGHT + 1800),
+            (EIGHT + 2400, EIGHT + 2700),
+        ]
+
+    def test_loop_line_keeps_the_boarding_position(self):
+        # Circular line A - B - C - A - B every 10 min: at 08:03 the 08:00 trip
+        # passes A again at 08:06, before the 08:10 trip leaves
+        store = build_store([
+            (f"C1_T{i}", "C1", [(s, EIGHT + i * 600 + n * 120) for n, s in enumerate("ABCAB")]) for i in range(3)
+        ])
+        raptor = RaptorAlgorithm(store=store)
+        raptor.stats = RaptorStats()
+        origins, destinations = raptor._prepare("A", "B", MONDAY)
+        labels = raptor._run_raptor(origins, destinations, EIGHT + 180, 2)
+        b = store.stop_index["B"]
+
+        assert labels.board[1][b] == store.stop_index["A"]
+        assert labels.board_pos[1][b] == 3
+        leg = raptor._reconstruct_legs(labels, "B", 1, ["A"])[0]
+        assert (leg.trip_id, leg.departure_time, leg.arrival_time) == ("C1_T0", EIGHT + 360, EIGHT + 480)
+
+    def test_too_few_rounds(self):
+        store = self._store()
+        raptor, labels = self._run(store, "X", "F", 2)
+
+        assert labels.rounds == 2
+        assert labels.arrival[2][store.stop_index["F"]] == UNREACHED
+        assert raptor.plan("X", "F", time(8, 0), MONDAY, max_transfers=1) == []
+
+    def test_plan_counts_the_transfers(self):
+        journeys = RaptorAlgorithm(store=self._store()).plan("X", "F", time(8, 0), MONDAY)
+
+        assert len(journeys) == 1
+        assert journeys[0].transfers == 2
+        assert journeys[0].arrival_time == EIGHT + 2700
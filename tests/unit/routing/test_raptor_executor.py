@@ -0,0 +1,116 @@
+"""Unit tests for the RAPTOR process pool."""
+
+from datetime import date, time
+
+import pytest
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from src.gtfs_bc.routing import raptor_executor
+from src.gtfs_bc.routing.raptor_executor import RaptorBusyError, RaptorExecutor, worker_store
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+def _built_store():
+    return build_store([
+        ("L1", "R1", [("A", EIGHT + 300), ("B", EIGHT + 900)]),
+        ("L2", "R2", [("B", EIGHT + 1200), ("C", EIGHT + 1800)]),
+    ])
+
+
+@pytest.fixture
+def attached_store(tmp_path):
+    """A snapshot-attached store, as the pool workers see it."""
+    path = str(tmp_path / "gtfs.snapshot")
+    assert _built_store().save_snapshot(path, {})
+    store = GTFSStore()
+    assert store.attach_snapshot(path)
+    return store
+
+
+class TestRaptorExecutor:
+    """Tests for RaptorExecutor."""
+
+    def test_pool_returns_the_in_process_journeys(self, attached_store):
+        executor = RaptorExecutor()
+        executor.start(attached_store.snapshot_info["path"], workers=1, max_queue=2, timeout_seconds=30)
+        try:
+            assert executor.accepts(attached_store)
+            kwargs = dict(origin_stop_id="A", destination_stop_id="C",
+                          departure_time=time(8, 0), travel_date=MONDAY)
+            journeys, stats = executor.run(attached_store, 'plan', False, kwargs)
+        finally:
+            executor.shutdown()
+
+        expected = RaptorAlgorithm(store=attached_store).plan(**kwargs)
+        assert [(j.arrival_time, j.transfers, [leg.trip_id for leg in j.legs]) for j in journeys] == \
+            [(j.arrival_time, j.transfers, [leg.trip_id for leg in j.legs]) for j in expected]
+        assert stats.rounds == 2
+        assert executor.completed == 1 and executor.in_flight == 0
+
+    def test_saturated_pool_rejects_at_once(self, attached_store):
+        executor = RaptorExecutor()
+        executor.start(attached_store.snapshot_info["path"], workers=1, max_queue=1, timeout_seconds=30)
+        try:
+            executor.in_flight = executor.max_queue  # A query already in flight
+            with pytest.raises(RaptorBusyError):
+                executor.run(attached_store, 'plan', False, {})
+        finally:
+            executor.shutdown()
+
+        assert executor.rejected == 1
+        assert not executor.accepts(attached_store)  # Shut down: queries run in-process
+
+
+class TestWorkerStore:
+    """Tests for the store a pool worker answers a task with."""
+
+    @pytest.fixture(autouse=True)
+    def _worker_state(self, monkeypatch):
+        monkeypatch.setattr(raptor_executor, "_adopted_file_id", None)
+        yield
+        GTFSStore.reset_instance()
+
+    @pytest.fixture
+    def attaches(self, monkeypatch):
+        calls = []
+        attach = GTFSStore.attach_snapshot
+
+        def counting_attach(store, path, fingerprint=None):
+            calls.append(path)
+            return attach(store, path, fingerprint)
+
+        monkeypatch.setattr(GTFSStore, "attach_snapshot", counting_attach)
+        return calls
+
+    def test_newer_caller_generation_is_attached_once(self, attached_store, attaches):
+        path = attached_store.snapshot_info["path"]
+        GTFSStore._instance = attached_store
+        # The caller reloads and rewrites the snapshot
+        assert _built_store().save_snapshot(path, {})
+        caller = GTFSStore()
+        assert caller.attach_snapshot(path)
+        attaches.clear()
+
+        stores = [worker_store(path, caller.snapshot_info["file_id"]) for _ in range(5)]
+
+        assert len(attaches) == 1
+        assert all(store is stores[0] for store in stores)
+        assert stores[0].snapshot_info["file_id"] == caller.snapshot_info["file_id"]
+
+    def test_replaced_caller_file_is_not_reattached_per_task(self, attached_store, attaches):
+        """Another uvicorn worker rewrote the path before this pool worker spawned."""
+        path = attached_store.snapshot_info["path"]
+        assert _built_store().save_snapshot(path, {})
+        worker = GTFSStore()
+        assert worker.attach_snapshot(path)
+        GTFSStore._instance = worker
+        attaches.clear()
+
+        stores = [worker_store(path, attached_store.snapshot_info["file_id"]) for _ in range(5)]
+
+        assert attaches == []
+        assert all(store is worker for store in stores)
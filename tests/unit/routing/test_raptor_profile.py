@@ -0,0 +1,53 @@
+"""Unit tests for RAPTOR range (profile) queries."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+
+
+def _trip(trip_id, start, hop):
+    return (trip_id, "R1", [(stop_id, start + i * hop, start + i * hop) for i, stop_id in enumerate("ABC")])
+
+
+class TestPlanProfile:
+    """Tests for rRAPTOR over a departure window."""
+
+    def _raptor(self, store):
+        raptor = RaptorAlgorithm()
+        raptor.store = store
+        return raptor
+
+    def test_window_returns_non_dominated_departures(self):
+        """Each departure in the window is kept unless a later one arrives as early."""
+        store = build_store([
+            _trip("T1", 8 * 3600, 600),
+            _trip("T2", 8 * 3600 + 900, 300),   # Leaves after T1, arrives 5 minutes later
+            _trip("T3", 8 * 3600 + 1200, 600),  # Leaves last, slowest
+            _trip("T4", 9 * 3600 + 600, 600),   # Outside the window
+        ])
+        raptor = self._raptor(store)
+
+        journeys = raptor.plan_profile("A", "C", time(8, 0), 60, MONDAY)
+
+        assert [(j.departure_time, j.arrival_time) for j in journeys] == [
+            (8 * 3600, 8 * 3600 + 1200),
+            (8 * 3600 + 900, 8 * 3600 + 1500),
+            (8 * 3600 + 1200, 8 * 3600 + 2400),
+        ]
+        assert [j.legs[0].trip_id for j in journeys] == ["T1", "T2", "T3"]
+
+    def test_each_window_departure_matches_a_single_plan(self):
+        """The journey found for a departure is the one plan() finds for it."""
+        store = build_store([_trip(f"T{i}", 8 * 3600 + i * 600, 300) for i in range(6)])
+        raptor = self._raptor(store)
+
+        journeys = raptor.plan_profile("A", "C", time(8, 5), 30, MONDAY)
+
+        assert [j.legs[0].trip_id for j in journeys] == ["T1", "T2", "T3"]
+        for journey in journeys:
+            departure = time(journey.departure_time // 3600, journey.departure_time % 3600 // 60)
+            single = raptor.plan("A", "C", departure, MONDAY)
+            assert single[0].arrival_time == journey.arrival_time
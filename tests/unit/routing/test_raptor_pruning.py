@@ -0,0 +1,32 @@
+"""Unit tests for RAPTOR target pruning."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+class TestTargetPruning:
+    """Tests for target pruning and early termination."""
+
+    def test_pruning_skips_rounds_that_cannot_beat_the_target(self):
+        """Same journeys, but the branch reached after the destination is not explored."""
+        store = build_store([
+            ("DIRECT", "R1", [("A", EIGHT + 300), ("D", EIGHT + 1200)]),
+            ("FEEDER", "R2", [("A", EIGHT + 300), ("B", EIGHT + 1500)]),
+            ("BRANCH", "R3", [("B", EIGHT + 1800), ("X", EIGHT + 2400), ("D", EIGHT + 3000)]),
+        ])
+
+        pruned = RaptorAlgorithm(store=store)
+        full = RaptorAlgorithm(store=store, target_pruning=False)
+        journeys = pruned.plan("A", "D", time(8, 0), MONDAY)
+        reference = full.plan("A", "D", time(8, 0), MONDAY)
+
+        assert [(j.arrival_time, j.transfers) for j in journeys] == [(EIGHT + 1200, 0)]
+        assert [(j.arrival_time, j.transfers) for j in reference] == [(EIGHT + 1200, 0)]
+        assert pruned.stats.rounds == 1
+        assert full.stats.rounds == 3  # B, then X, then nothing left to improve
+        assert pruned.stats.patterns_scanned < full.stats.patterns_scanned
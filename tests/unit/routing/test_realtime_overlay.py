@@ -0,0 +1,121 @@
+"""Unit tests for the realtime delay overlay."""
+
+from datetime import date, time
+
+import pytest
+
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from src.gtfs_bc.routing.realtime_overlay import (
+    DelayOverlay,
+    RealtimeUpdates,
+    TripDelay,
+    _stop_delays,
+    realtime_overlay,
+)
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+def _two_trains():
+    return build_store([
+        ("T1", "R1", [("A", EIGHT + 300), ("B", EIGHT + 900), ("C", EIGHT + 1500)]),
+        ("T2", "R1", [("A", EIGHT + 1200), ("B", EIGHT + 1800), ("C", EIGHT + 2400)]),
+    ])
+
+
+@pytest.fixture(autouse=True)
+def _no_updates():
+    realtime_overlay.publish(None)
+    yield
+    realtime_overlay.publish(None)
+
+
+def _ride(journeys):
+    leg = journeys[0].legs[0]
+    return leg.trip_id, leg.departure_time, leg.arrival_time
+
+
+class TestDelayOverlay:
+    """Tests for RAPTOR planning with published trip updates."""
+
+    def test_delayed_train_departs_and_arrives_later(self):
+        store = _two_trains()
+        realtime_overlay.publish(RealtimeUpdates(MONDAY, {"T1": TripDelay(delay=600)}))
+
+        journeys = RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+
+        assert _ride(journeys) == ("T1", EIGHT + 900, EIGHT + 2100)
+
+    def test_train_overtaken_by_the_next_one_is_not_taken(self):
+        """T1 held 25 min before C: T2 overtakes it, so the pattern is split."""
+        store = _two_trains()
+        updates = RealtimeUpdates(MONDAY, {"T1": TripDelay(stop_delays=[("C", 1500, 1500)])})
+        realtime_overlay.publish(updates)
+
+        assert len(DelayOverlay(store, updates).groups[store.trip_pattern[store.trip_index["T1"]]]) == 2
+        journeys = RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+
+        assert _ride(journeys) == ("T2", EIGHT + 1200, EIGHT + 2400)
+
+    def test_cancelled_train_is_skipped(self):
+        store = _two_trains()
+        realtime_overlay.publish(RealtimeUpdates(MONDAY, {"T1": TripDelay(cancelled=True)}))
+
+        assert _ride(RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY))[0] == "T2"
+        assert _ride(McRaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY))[0] == "T2"
+
+    def test_only_applies_on_the_service_date(self):
+        store = _two_trains()
+        realtime_overlay.publish(RealtimeUpdates(MONDAY, {"T1": TripDelay(cancelled=True)}))
+
+        tuesday = RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), date(2026, 1, 6))
+        static = RaptorAlgorithm(store=store, realtime=False).plan("A", "C", time(8, 0), MONDAY)
+
+        assert _ride(tuesday)[0] == "T1"
+        assert _ride(static)[0] == "T1"
+
+    def test_previous_day_runs_after_midnight_keep_their_timetable(self):
+        """Updates only name the trip: yesterday's run past midnight is not delayed."""
+        store = build_store([("N1", "N1", [("A", 25 * 3600), ("B", 25 * 3600 + 1200)])])
+        tuesday = date(2026, 1, 6)
+
+        for service_date in (MONDAY, tuesday):
+            realtime_overlay.publish(RealtimeUpdates(service_date, {"N1": TripDelay(delay=600)}))
+            journeys = RaptorAlgorithm(store=store).plan("A", "B", time(0, 30), tuesday)
+
+            assert _ride(journeys) == ("N1", 3600, 3600 + 1200)
+
+    def test_stop_updates_propagate_downstream(self):
+        store = _two_trains()
+        pattern_stops = store.get_pattern_stop_indexes(store.trip_pattern[store.trip_index["T1"]])
+        update = TripDelay(delay=60, stop_delays=[("B", 120, 300)])
+
+        assert _stop_delays(store, pattern_stops, update) == ([60, 120, 300], [60, 300, 300])
+
+
+class TestRealtimeOverlayState:
+    """Tests for publishing and versions."""
+
+    def test_version_follows_the_content(self):
+        first = RealtimeUpdates(MONDAY, {"T1": TripDelay(delay=60)})
+        same = RealtimeUpdates(MONDAY, {"T1": TripDelay(delay=60)})
+
+        assert first.version == same.version
+        assert realtime_overlay.publish(first)
+        assert not realtime_overlay.publish(same)
+        assert realtime_overlay.publish(RealtimeUpdates(MONDAY, {"T1": TripDelay(delay=120)}))
+
+    def test_workers_load_published_updates_from_file(self, tmp_path):
+        path = str(tmp_path / "gtfs_store.snapshot.realtime")
+        updates = RealtimeUpdates(MONDAY, {"T1": TripDelay(cancelled=True)})
+        realtime_overlay.publish(updates)
+        realtime_overlay.save(path)
+        realtime_overlay.publish(None)
+
+        realtime_overlay.sync(path, updates.version)
+
+        assert realtime_overlay.version == updates.version
+        assert realtime_overlay.overlay_for(_two_trains(), MONDAY).trips_cancelled == 1
@@ -0,0 +1,47 @@
+"""Unit tests for the precompiled service calendar."""
+
+from datetime import date, timedelta
+
+from src.gtfs_bc.routing.service_calendar import ServiceCalendar
+
+MONDAY = date(2026, 1, 5)
+WEEKDAYS = 0b0011111
+WEEKEND = 0b1100000
+
+
+def _calendar(center=MONDAY):
+    calendars = {
+        "WK": (WEEKDAYS, date(2026, 1, 1), date(2026, 12, 31)),
+        "WE": (WEEKEND, date(2026, 1, 1), date(2026, 12, 31)),
+        "WINTER": (WEEKDAYS | WEEKEND, date(2026, 1, 1), date(2026, 1, 6)),
+    }
+    exceptions = {
+        MONDAY + timedelta(days=1): (frozenset({"WE"}), frozenset({"WK"})),
+    }
+    return ServiceCalendar(calendars, exceptions, center=center)
+
+
+class TestServiceCalendar:
+    """Tests for ServiceCalendar lookups."""
+
+    def test_weekdays_date_ranges_and_exceptions(self):
+        """Active services honour weekday bits, validity range and calendar_dates."""
+        calendar = _calendar()
+
+        assert calendar.active_services(MONDAY) == {"WK", "WINTER"}
+        assert calendar.active_services(MONDAY + timedelta(days=1)) == {"WE", "WINTER"}
+        assert calendar.active_services(MONDAY + timedelta(days=2)) == {"WK"}
+        assert calendar.active_services(MONDAY - timedelta(days=1)) == {"WE", "WINTER"}
+
+    def test_window_is_precomputed_and_rolls(self):
+        """The window holds yesterday, today and tomorrow and moves with roll_to."""
+        calendar = _calendar()
+        assert calendar.window_dates() == (
+            MONDAY - timedelta(days=1), MONDAY, MONDAY + timedelta(days=1)
+        )
+
+        calendar.roll_to(MONDAY + timedelta(days=1))
+        assert calendar.window_center == MONDAY + timedelta(days=1)
+        assert MONDAY + timedelta(days=2) in calendar.window_dates()
+        # Dates outside the window are computed on demand
+        assert calendar.active_services(date(2026, 3, 7)) == {"WE"}
@@ -0,0 +1,109 @@
+"""Unit tests for trips of the previous service day running after midnight."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.gtfs_store import SERVICE_DAY_SECONDS
+from src.gtfs_bc.routing.mc_raptor import McRaptorAlgorithm
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+FRIDAY = date(2026, 1, 9)
+SATURDAY = date(2026, 1, 10)
+SUNDAY = date(2026, 1, 11)
+HOUR = 3600
+
+# Service day of each service (bit 0 = Monday)
+CALENDARS = {
+    "FRI": (0b0010000, date(2026, 1, 1), date(2026, 12, 31)),
+    "SAT": (0b0100000, date(2026, 1, 1), date(2026, 12, 31)),
+}
+
+
+# Friday evening and night buses on the same pattern: the night one runs
+# past midnight, at 25:00 (01:00 on Saturday)
+NIGHT_BUSES = [
+    ("E1", "N1", [("A", 23 * HOUR), ("B", 23 * HOUR + 1200)], "FRI"),
+    ("N1", "N1", [("A", 25 * HOUR), ("B", 25 * HOUR + 1200)], "FRI"),
+]
+
+
+def _build_store(trips, frequencies=(), sequences=()):
+    """Store with the FRI/SAT calendars, centred on Saturday."""
+    return build_store(trips, frequencies=frequencies, sequences=sequences, calendars=CALENDARS, center=SATURDAY)
+
+
+def _ride(journeys):
+    leg = journeys[0].legs[0]
+    return leg.trip_id, leg.departure_time, leg.arrival_time
+
+
+class TestPreviousDayView:
+    """Tests for the shifted view of the previous service day."""
+
+    def test_only_trips_past_midnight_shifted_back_a_day(self):
+        store = _build_store(NIGHT_BUSES)
+        pattern_idx = store.trip_pattern[store.trip_index["N1"]]
+        view = store.get_previous_day_view(SATURDAY)
+
+        assert view.travel_date == FRIDAY
+        assert view.shift == SERVICE_DAY_SECONDS
+        assert [store.trip_ids[t] for t in view.active_trips(pattern_idx)] == ["N1"]
+        assert list(view.departures(pattern_idx)) == [HOUR, HOUR + 1200]
+        starts = view.trip_starts(pattern_idx)
+        assert view.arrivals(pattern_idx)[starts[0] + 1] == HOUR + 1200
+
+    def test_inactive_previous_day_has_no_trips(self):
+        store = _build_store(NIGHT_BUSES)
+        pattern_idx = store.trip_pattern[store.trip_index["N1"]]
+
+        assert len(store.get_previous_day_view(SUNDAY).active_trips(pattern_idx)) == 0
+
+    def test_views_are_cached(self):
+        store = _build_store(NIGHT_BUSES)
+
+        assert store.get_previous_day_view(SATURDAY) is store.get_previous_day_view(SATURDAY)
+        assert store.get_previous_day_view(SATURDAY) is not store.get_day_view(FRIDAY)
+
+
+class TestPastMidnightRouting:
+    """Tests for RAPTOR and McRAPTOR after midnight."""
+
+    def test_boards_previous_day_trip_after_midnight(self):
+        store = _build_store(NIGHT_BUSES)
+
+        journeys = RaptorAlgorithm(store=store).plan("A", "B", time(0, 30), SATURDAY)
+
+        assert _ride(journeys) == ("N1", HOUR, HOUR + 1200)
+
+    def test_previous_day_trips_only_when_that_day_runs(self):
+        store = _build_store(NIGHT_BUSES)
+
+        assert RaptorAlgorithm(store=store).plan("A", "B", time(0, 30), SUNDAY) == []
+
+    def test_transfer_to_a_trip_of_the_query_date(self):
+        trips = NIGHT_BUSES + [("S1", "S1", [("B", HOUR + 1800), ("C", HOUR + 3000)], "SAT")]
+        store = _build_store(trips)
+
+        journey = RaptorAlgorithm(store=store).plan("A", "C", time(0, 30), SATURDAY)[0]
+
+        assert [(leg.trip_id, leg.departure_time) for leg in journey.legs if leg.type == "transit"] == [
+            ("N1", HOUR), ("S1", HOUR + 1800)
+        ]
+        assert journey.arrival_time == HOUR + 3000
+
+    def test_mc_raptor_boards_previous_day_trip(self):
+        store = _build_store(NIGHT_BUSES)
+
+        journeys = McRaptorAlgorithm(store=store).plan("A", "B", time(0, 30), SATURDAY)
+
+        assert _ride(journeys) == ("N1", HOUR, HOUR + 1200)
+
+    def test_frequency_runs_past_midnight(self):
+        # Saturday night metro: every 10 min from 23:00 until 24:30
+        frequencies = [("M1", "saturday", time(23, 0), "24:30:00", 600)]
+        sequences = [("M1", "A", 1), ("M1", "B", 2), ("M1", "C", 3)]
+        store = _build_store([], frequencies, sequences)
+
+        journeys = RaptorAlgorithm(store=store).plan("A", "C", time(0, 5), SUNDAY)
+
+        assert _ride(journeys) == ("M1_FREQ_0", 600, 600 + 270)
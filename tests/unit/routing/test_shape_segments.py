@@ -0,0 +1,128 @@
+"""Unit tests for the precomputed shape segments of transit legs."""
+
+from datetime import date, time
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+STOPS = {
+    "A": (37.000, -6.0),
+    "B": (37.010, -6.0),
+    "C": (37.020, -6.0),
+}
+
+# Zigzag through A, B and C (about 45 m off the stops between them)
+ZIGZAG = [
+    (37.000, -6.0), (37.003, -6.0005), (37.006, -6.0005), (37.010, -6.0),
+    (37.013, -6.0005), (37.017, -6.0005), (37.020, -6.0),
+]
+
+
+def _trip(trip_id, shape_id="S1", stops=("A", "B", "C"), start=EIGHT):
+    return (trip_id, "R1", [(stop_id, start + i * 300) for i, stop_id in enumerate(stops)], "WK", shape_id)
+
+
+def _rounded(points):
+    return [(round(lat, 6), round(lon, 6)) for lat, lon in points]
+
+
+class TestShapeIndex:
+    """Tests for the load-time shape columns and stop positions."""
+
+    def test_pattern_takes_the_shape_of_its_first_trip(self):
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": ZIGZAG})
+        pattern_idx = store.trip_pattern[store.trip_index["T1"]]
+
+        assert store.shape_ids[store.pattern_shape[pattern_idx]] == "S1"
+        assert list(store.get_pattern_stop_indexes(pattern_idx)) == [0, 1, 2]
+        assert list(store.pattern_stop_shape_pos) == [0, 2, 5]
+
+    def test_unused_shapes_are_not_kept(self):
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": ZIGZAG, "OTHER": ZIGZAG})
+
+        assert store.shape_ids == ["S1"]
+        assert len(store.shape_lat) == len(ZIGZAG)
+
+    def test_shape_away_from_the_stops_is_dropped(self):
+        far = [(lat, lon + 0.01) for lat, lon in ZIGZAG]
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": far})
+
+        assert list(store.pattern_stop_shape_pos) == [-1, -1, -1]
+        assert store.stats['shape_patterns'] == 0
+
+    def test_patterns_without_shape(self):
+        frequencies = [("M1", "weekday", time(7, 0), "10:00:00", 600)]
+        sequences = [("M1", "A", 1), ("M1", "B", 2)]
+        store = build_store([_trip("T1", shape_id=None)], stops=STOPS, frequencies=frequencies, sequences=sequences)
+
+        assert list(store.pattern_shape) == [-1, -1, -1]
+        assert store.get_shape_segment("T1", 0, 2) == []
+        assert store.get_shape_segment("M1_FREQ_0", 0, 1) == []
+
+    def test_split_patterns_share_the_positions(self):
+        # T2 overtakes T1: two FIFO patterns with the same stops and shape
+        trips = [
+            ("T1", "R1", [("A", EIGHT), ("B", EIGHT + 900), ("C", EIGHT + 1800)], "WK", "S1"),
+            ("T2", "R1", [("A", EIGHT + 60), ("B", EIGHT + 300), ("C", EIGHT + 600)], "WK", "S1"),
+        ]
+        store = build_store(trips, stops=STOPS, shapes={"S1": ZIGZAG})
+
+        assert len(store.pattern_ids) == 2
+        assert store.stats['shape_patterns'] == 2
+        assert list(store.pattern_stop_shape_pos) == [0, 2, 5, 0, 2, 5]
+
+
+class TestShapeSegment:
+    """Tests for GTFSStore.get_shape_segment."""
+
+    def test_points_between_the_stops(self):
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": ZIGZAG})
+
+        assert _rounded(store.get_shape_segment("T1", 0, 1)) == ZIGZAG[1:3]
+        assert _rounded(store.get_shape_segment("T1", 0, 2)) == ZIGZAG[1:6]
+
+    def test_out_and_back_line_uses_the_return_pass(self):
+        # A -> C -> A on the same street, the way back 9 m to the west
+        out_and_back = [(37.000, -6.0), (37.010, -6.0), (37.020, -6.0), (37.010, -6.0001), (37.000, -6.0001)]
+        store = build_store([_trip("T1", stops=("A", "C", "A"))], stops=STOPS, shapes={"S1": out_and_back})
+
+        assert list(store.pattern_stop_shape_pos) == [0, 1, 3]
+        assert _rounded(store.get_shape_segment("T1", 1, 2)) == out_and_back[2:4]
+
+    def test_loop_line_uses_the_boarded_pass(self):
+        # Circular line A - B - C - A - B, the second pass A -> B 9 m to the west
+        stops = dict(STOPS, C=(37.010, -6.010))
+        loop = [
+            (37.000, -6.0), (37.005, -6.0), (37.010, -6.0), (37.010, -6.005), (37.010, -6.010),
+            (37.005, -6.005), (37.000, -6.0001), (37.005, -6.0001), (37.010, -6.0001),
+        ]
+        trips = [_trip(f"T{i}", stops=("A", "B", "C", "A", "B"), start=EIGHT + i * 1200) for i in range(2)]
+        store = build_store(trips, stops=stops, shapes={"S1": loop})
+
+        # At 08:03 the next departure from A is the 08:00 trip on its second pass (08:15)
+        leg = RaptorAlgorithm(store=store).plan("A", "B", time(8, 3), MONDAY)[0].legs[0]
+
+        assert (leg.trip_id, leg.board_pos, leg.alight_pos) == ("T0", 3, 4)
+        assert _rounded(store.get_shape_segment(leg.trip_id, leg.board_pos, leg.alight_pos)) == loop[6:8]
+
+    def test_positions_out_of_order_or_unknown(self):
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": ZIGZAG})
+
+        assert store.get_shape_segment("T1", 2, 0) == []
+        assert store.get_shape_segment("T1", -1, 1) == []
+        assert store.get_shape_segment("T1", 1, 3) == []
+        assert store.get_shape_segment("UNKNOWN", 0, 1) == []
+
+    def test_survives_a_snapshot(self, tmp_path):
+        store = build_store([_trip("T1")], stops=STOPS, shapes={"S1": ZIGZAG})
+        path = str(tmp_path / "store.snap")
+        assert store.save_snapshot(path, {"test": 1})
+
+        attached = GTFSStore()
+        assert attached.attach_snapshot(path)
+
+        assert attached.get_shape_segment("T1", 0, 2) == store.get_shape_segment("T1", 0, 2)
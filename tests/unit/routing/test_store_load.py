@@ -0,0 +1,147 @@
+"""Unit tests for the GTFSStore load from SQL (serial and parallel)."""
+
+from datetime import time
+
+import pytest
+from sqlalchemy import text
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore, _ParallelFetch, _stream_rows
+from tests.unit.routing.gtfs_db import create_gtfs_db, gtfs_session
+
+EIGHT = 8 * 3600
+
+STOPS = {stop_id: (37.0 + i * 0.005, -6.0) for i, stop_id in enumerate("ABCDEFG")}
+
+
+def _trips():
+    """Three lines every 10 minutes, one of them with an overtaking express."""
+    trips = []
+    for line, stops in (("R1", "ABCD"), ("R2", "DEFG"), ("R3", "GCA")):
+        for n in range(5):
+            start = EIGHT + n * 600
+            trips.append((f"{line}_T{n}", line, [(s, start + i * 240) for i, s in enumerate(stops)], "WK", f"S_{line}"))
+    trips.append(("R1_EXPRESS", "R1", [(s, EIGHT + 700 + i * 60) for i, s in enumerate("ABCD")], "WK", "S_R1"))
+    return trips
+
+
+DATA = dict(
+    trips=_trips(),
+    transfers=[("D", "E", 120), ("E", "D", 120), ("A", "G", 600)],
+    frequencies=[("M1", "weekday", time(7, 0), time(10, 0), 300)],
+    sequences=[("M1", "B", 1), ("M1", "F", 2)],
+    stops=STOPS,
+    shapes={f"S_{line}": [STOPS[s] for s in stops] for line, stops in (("R1", "ABCD"), ("R2", "DEFG"), ("R3", "GCA"))},
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_gtfs_db(str(tmp_path / "gtfs.db"), **DATA)
+    yield engine
+    engine.dispose()
+
+
+def _load(engine):
+    store = GTFSStore()
+    with gtfs_session(engine) as db:
+        store._do_load(db)
+    return store
+
+
+class TestStreamRows:
+    """Tests for the chunked reads of large tables."""
+
+    def test_rows_cross_chunk_boundaries(self, engine):
+        record = {'query_seconds': 0.0}
+        with gtfs_session(engine) as db:
+            rows = list(_stream_rows(db, "SELECT id FROM gtfs_trips ORDER BY id", {}, 4, record))
+
+        assert [row[0] for row in rows] == sorted(trip[0] for trip in DATA["trips"])
+        assert record['query_seconds'] > 0
+
+
+class TestParallelFetch:
+    """Tests for the per-connection parallel reads."""
+
+    def test_results_and_errors_by_name(self, engine):
+        def count(session, table):
+            return session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+        def broken(session):
+            raise RuntimeError("query failed")
+
+        with gtfs_session(engine) as db, _ParallelFetch(db, workers=2) as fetch:
+            fetch.submit("trips", count, "gtfs_trips")
+            fetch.submit("broken", broken)
+
+            assert fetch.result("trips") == len(DATA["trips"])
+            with pytest.raises(RuntimeError):
+                fetch.result("broken")
+        assert set(fetch.task_seconds) == {"trips", "broken"}
+
+
+class TestParallelLoad:
+    """The partitioned parallel load must build the same store as the serial one."""
+
+    def test_same_store_as_the_serial_load(self, engine, monkeypatch):
+        monkeypatch.setattr(GTFSStore, "LOAD_CHUNK_ROWS", 4)
+        serial = _load(engine)
+
+        monkeypatch.setattr(GTFSStore, "LOAD_WORKERS", 3)
+        monkeypatch.setattr(GTFSStore, "STOP_TIMES_PARTITIONS", 3)
+        parallel = _load(engine)
+        assert (serial.load_profile['mode'], parallel.load_profile['mode']) == ('sql', 'sql-parallel')
+
+        for name in GTFSStore.SNAPSHOT_COLUMNS:
+            assert list(getattr(parallel, name)) == list(getattr(serial, name)), name
+        for name in ("stop_ids", "route_ids", "service_ids", "pattern_ids", "trip_ids", "trip_headsigns",
+                     "shape_ids", "patterns_at_stop", "stops_info", "transfers", "stop_grid"):
+            assert getattr(parallel, name) == getattr(serial, name), name
+        assert serial.stats['non_fifo_splits'] == 1
+        assert serial.stats['frequency_patterns'] == 2
+        assert parallel.load_profile['phases'].keys() == serial.load_profile['phases'].keys()
+
+    def test_more_partitions_than_trips(self, engine, monkeypatch):
+        serial = _load(engine)
+
+        monkeypatch.setattr(GTFSStore, "LOAD_WORKERS", 2)
+        monkeypatch.setattr(GTFSStore, "STOP_TIMES_PARTITIONS", 64)
+        parallel = _load(engine)
+
+        assert list(parallel.st_stop) == list(serial.st_stop)
+        assert parallel.trip_ids == serial.trip_ids
+
+
+class TestLoadProfile:
+    """Tests for the per-phase load profile and the memory estimate."""
+
+    def test_rows_per_phase(self, engine):
+        phases = _load(engine).load_profile['phases']
+
+        rows = {name: phases[name]['rows'] for name in
+                ('stops', 'routes', 'calendars', 'trips', 'stop_times', 'frequencies', 'transfers')}
+        assert rows == {
+            'stops': 7, 'routes': 4, 'calendars': 1, 'trips': 16,
+            'stop_times': 59, 'frequencies': 1, 'transfers': 3,
+        }
+        assert all(p['query_seconds'] >= 0 and p['build_seconds'] >= 0 for p in phases.values())
+
+    def test_memory_estimate_of_a_small_store(self, engine):
+        store = _load(engine)
+
+        report = store.memory_report()
+
+        for category in ('stop_times', 'trips', 'patterns', 'frequencies', 'shapes', 'transfers', 'stops',
+                         'routes', 'calendar'):
+            assert report['structures_bytes'][category] > 0, category
+        assert report['strings_bytes'] > 0
+        assert report['mapped_bytes'] == 0
+        assert store.memory_report() is report
+
+    def test_memory_estimate_counts_the_snapshot_as_mapped(self, engine, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _load(engine).save_snapshot(path, {})
+        store = GTFSStore()
+        assert store.attach_snapshot(path)
+
+        assert store.memory_report()['mapped_bytes'] > 0
@@ -0,0 +1,146 @@
+"""Unit tests for refreshing one operator of a loaded GTFSStore."""
+
+from datetime import date, time
+
+import pytest
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.gtfs_db import create_gtfs_db, gtfs_session
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+STOPS = {
+    "METRO_1": (37.000, -6.000), "METRO_2": (37.010, -6.000), "METRO_3": (37.020, -6.000),
+    "BUS_A": (37.010, -6.001), "BUS_B": (37.030, -6.001),
+}
+BUS_TRIPS = [
+    ("BUS_T1", "BUS_R1", [("BUS_A", EIGHT), ("BUS_B", EIGHT + 1200)]),
+    ("BUS_T2", "BUS_R1", [("BUS_A", EIGHT + 1800), ("BUS_B", EIGHT + 3000)]),
+]
+BUS_TRANSFERS = [("BUS_A", "BUS_B", 900)]
+
+# Before the reimport of METRO_: line L1 to METRO_3 and a frequency line L9
+BEFORE = dict(
+    trips=[
+        ("METRO_T1", "METRO_L1", [("METRO_1", EIGHT), ("METRO_2", EIGHT + 300), ("METRO_3", EIGHT + 600)]),
+        ("METRO_T2", "METRO_L1", [("METRO_1", EIGHT + 600), ("METRO_2", EIGHT + 900), ("METRO_3", EIGHT + 1200)]),
+    ] + BUS_TRIPS,
+    transfers=[("METRO_2", "BUS_A", 120), ("BUS_A", "METRO_2", 120), ("METRO_3", "BUS_B", 60)] + BUS_TRANSFERS,
+    frequencies=[("METRO_L9", "weekday", time(7, 0), time(10, 0), 600),
+                 ("BUS_F", "weekday", time(7, 0), time(9, 0), 900)],
+    sequences=[("METRO_L9", "METRO_1", 1), ("METRO_L9", "METRO_2", 2),
+               ("BUS_F", "BUS_A", 1), ("BUS_F", "BUS_B", 2)],
+    stops=STOPS,
+)
+
+# After: METRO_3 is replaced by METRO_4, trips retimed and L9 every 5 minutes
+AFTER = dict(
+    trips=[
+        ("METRO_T1", "METRO_L1", [("METRO_1", EIGHT + 60), ("METRO_2", EIGHT + 360), ("METRO_4", EIGHT + 720)]),
+        ("METRO_T3", "METRO_L1", [("METRO_1", EIGHT + 1200), ("METRO_2", EIGHT + 1500), ("METRO_4", EIGHT + 1860)]),
+    ] + BUS_TRIPS,
+    transfers=[("METRO_2", "BUS_A", 120), ("BUS_A", "METRO_2", 120), ("METRO_4", "BUS_B", 90)] + BUS_TRANSFERS,
+    frequencies=[("METRO_L9", "weekday", time(7, 0), time(10, 0), 300),
+                 ("BUS_F", "weekday", time(7, 0), time(9, 0), 900)],
+    sequences=BEFORE["sequences"],
+    stops={**{s: c for s, c in STOPS.items() if s != "METRO_3"}, "METRO_4": (37.025, -6.000)},
+)
+
+
+def _trips(store):
+    return {
+        store.trip_ids[t]: (store.route_ids[store.trip_route[t]], store.service_ids[store.trip_service[t]],
+                            store.get_stop_times(store.trip_ids[t]))
+        for t in range(len(store.trip_ids))
+    }
+
+
+def _patterns(store):
+    """(route, stops, trips, headway windows) of every pattern, independent of the indexes."""
+    return sorted(
+        (
+            store.route_ids[store.pattern_route[p]],
+            tuple(store.stop_ids[s] for s in store.get_pattern_stop_indexes(p)),
+            tuple(store.trip_ids[t] for t in range(store.pattern_trip_offsets[p], store.pattern_trip_offsets[p + 1])),
+            tuple(
+                (store.headway_start[h], store.headway_end[h], store.headway_secs[h], store.headway_days[h])
+                for h in range(store.pattern_headway_offsets[p], store.pattern_headway_offsets[p + 1])
+            ),
+        )
+        for p in range(len(store.pattern_ids))
+    )
+
+
+def _footpaths(store):
+    return sorted(
+        (store.stop_ids[from_idx], store.stop_ids[to_idx], seconds)
+        for from_idx in range(len(store.stop_ids))
+        for to_idx, seconds in store.get_footpaths(from_idx)
+    )
+
+
+def _transfers(store):
+    return {stop_id: sorted(edges) for stop_id, edges in store.transfers.items()}
+
+
+def _load(path, rows):
+    engine = create_gtfs_db(path, **rows)
+    store = GTFSStore()
+    with gtfs_session(engine) as db:
+        store._do_load(db)
+    return store, engine
+
+
+class TestRefreshPrefix:
+    """A refresh of METRO_ must leave the store a full load of the new data would build."""
+
+    @pytest.fixture
+    def stores(self, tmp_path):
+        base, before = _load(str(tmp_path / "before.db"), BEFORE)
+        full, after = _load(str(tmp_path / "after.db"), AFTER)
+        refreshed = GTFSStore()
+        with gtfs_session(after) as db:
+            refreshed._do_refresh(base, db, "METRO_")
+        yield base, refreshed, full
+        before.dispose()
+        after.dispose()
+
+    def test_matches_a_full_load(self, stores):
+        _, refreshed, full = stores
+
+        assert _trips(refreshed) == _trips(full)
+        assert _patterns(refreshed) == _patterns(full)
+        assert _transfers(refreshed) == _transfers(full)
+        assert _footpaths(refreshed) == _footpaths(full)
+        assert refreshed.stops_info == full.stops_info
+        assert set(refreshed.stop_index) == set(full.stop_index)
+        for name in ('trips', 'stop_times', 'patterns', 'frequency_patterns', 'stops', 'routes', 'transfers'):
+            assert refreshed.stats[name] == full.stats[name], name
+
+    def test_other_operators_keep_their_indexes(self, stores):
+        base, refreshed, _ = stores
+
+        for stop_id in ("BUS_A", "BUS_B", "METRO_1"):
+            assert refreshed.stop_index[stop_id] == base.stop_index[stop_id]
+        assert refreshed.route_index["BUS_R1"] == base.route_index["BUS_R1"]
+
+    def test_deleted_stop_is_not_a_valid_stop(self, stores):
+        base, refreshed, full = stores
+
+        assert "METRO_3" in base.stop_index
+        assert "METRO_3" not in refreshed.stop_index
+        assert refreshed.stop_ids[base.stop_index["METRO_3"]] == ''
+        with pytest.raises(ValueError, match="No valid origin"):
+            RaptorAlgorithm(store=refreshed).plan("METRO_3", "BUS_B", time(8, 0), MONDAY)
+
+    def test_deleted_stop_stays_out_after_a_snapshot(self, stores, tmp_path):
+        _, refreshed, _ = stores
+        path = str(tmp_path / "gtfs.snapshot")
+        assert refreshed.save_snapshot(path, {})
+
+        attached = GTFSStore()
+        assert attached.attach_snapshot(path)
+
+        assert attached.stop_index == refreshed.stop_index
@@ -0,0 +1,215 @@
+"""Unit tests for the binary GTFSStore snapshot."""
+
+import gc
+import weakref
+from datetime import time
+
+import pytest
+
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.raptor import RaptorAlgorithm
+from tests.unit.routing.gtfs_db import create_gtfs_db, gtfs_session
+from tests.unit.routing.store_builder import MONDAY, build_store
+
+EIGHT = 8 * 3600
+FINGERPRINT = {"gtfs_trips": 3, "feed_imports": [1, 1, "2026-01-05 03:00:00"]}
+
+STOPS = {"A": (37.000, -6.0), "B": (37.010, -6.0), "C": (37.020, -6.0)}
+LINE = [
+    ("T1", "R1", [("A", EIGHT), ("B", EIGHT + 300), ("C", EIGHT + 600)]),
+    ("T2", "R1", [("A", EIGHT + 900), ("B", EIGHT + 1200), ("C", EIGHT + 1500)]),
+]
+
+
+def _line_store():
+    store = build_store([
+        ("T1", "R1", [("A", EIGHT), ("B", EIGHT + 300), ("C", EIGHT + 600)], "WK", "S1"),
+        ("T2", "R1", [("A", EIGHT + 900), ("B", EIGHT + 1200), ("C", EIGHT + 1500)], "WK", "S1"),
+        ("T3", "R2", [("C", EIGHT + 60), ("A", EIGHT + 700)]),
+    ], transfers=[("A", "B", 240)], stops=STOPS, shapes={"S1": [(37.000, -6.0), (37.010, -6.0), (37.020, -6.0)]})
+    store.trip_headsigns[store.trip_index["T1"]] = "Estación Central"
+    return store
+
+
+class TestSnapshotRoundTrip:
+    """Tests for save_snapshot followed by attach_snapshot."""
+
+    def test_columns_and_strings_survive(self, tmp_path):
+        store = _line_store()
+        path = str(tmp_path / "gtfs.snapshot")
+        assert store.save_snapshot(path, FINGERPRINT)
+
+        attached = GTFSStore()
+        assert attached.attach_snapshot(path, FINGERPRINT)
+
+        for name in GTFSStore.SNAPSHOT_COLUMNS:
+            assert list(getattr(attached, name)) == list(getattr(store, name)), name
+        assert list(attached.trip_ids) == ["T1", "T2", "T3"]
+        assert list(attached.trip_headsigns) == ["Estación Central", None, None]
+        for trip_id in store.trip_ids:
+            assert attached.trip_index[trip_id] == store.trip_index[trip_id]
+        assert "T4" not in attached.trip_index
+        for name in ("stop_ids", "route_ids", "pattern_ids", "transfers", "stops_info", "shape_ids"):
+            assert getattr(attached, name) == getattr(store, name), name
+        assert attached.stop_index == store.stop_index
+        assert attached.snapshot_info["path"] == path
+
+    def test_columns_are_mapped_not_copied(self, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _line_store().save_snapshot(path, FINGERPRINT)
+
+        attached = GTFSStore()
+        assert attached.attach_snapshot(path)
+
+        assert isinstance(attached.st_arrival, memoryview)
+        assert attached.is_loaded
+
+
+class TestSnapshotValidation:
+    """Tests for the snapshots attach_snapshot refuses."""
+
+    def test_fingerprint_mismatch_is_rejected(self, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _line_store().save_snapshot(path, FINGERPRINT)
+
+        attached = GTFSStore()
+        assert not attached.attach_snapshot(path, dict(FINGERPRINT, gtfs_trips=4))
+
+        assert not attached.is_loaded
+        assert attached.snapshot_info is None
+        assert attached.trip_ids == []
+
+    def test_missing_or_corrupt_file(self, tmp_path):
+        path = tmp_path / "gtfs.snapshot"
+        assert not GTFSStore().attach_snapshot(str(path))
+
+        path.write_bytes(b"not a snapshot")
+        assert not GTFSStore().attach_snapshot(str(path))
+
+    def test_truncated_body_is_rejected(self, tmp_path):
+        path = tmp_path / "gtfs.snapshot"
+        assert _line_store().save_snapshot(str(path), FINGERPRINT)
+        path.write_bytes(path.read_bytes()[:-40])
+
+        attached = GTFSStore()
+        assert not attached.attach_snapshot(str(path))
+
+        assert not attached.is_loaded
+        assert attached.snapshot_info is None
+
+
+class TestSharedSnapshotSync:
+    """Tests for GTFSStore.sync_shared_snapshot (workers adopting a rewritten snapshot)."""
+
+    @pytest.fixture(autouse=True)
+    def _restore_singleton(self):
+        yield
+        GTFSStore.reset_instance()
+
+    def test_rewritten_file_is_published(self, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _line_store().save_snapshot(path, FINGERPRINT)
+        current = GTFSStore()
+        assert current.attach_snapshot(path)
+        GTFSStore._publish(current)
+        assert not GTFSStore.sync_shared_snapshot(path)
+
+        # Another worker reloads and rewrites the snapshot
+        reloaded = build_store([("T4", "R1", [("A", EIGHT), ("C", EIGHT + 600)])], stops=STOPS)
+        assert reloaded.save_snapshot(path, FINGERPRINT)
+
+        assert GTFSStore.sync_shared_snapshot(path)
+        published = GTFSStore.get_instance()
+        assert published is not current
+        assert published.generation == current.generation + 1
+        assert list(published.trip_ids) == ["T4"]
+        # Queries still holding the previous generation keep its mapping
+        assert list(current.trip_ids) == ["T1", "T2", "T3"]
+
+        assert not GTFSStore.sync_shared_snapshot(path)
+
+    def test_store_without_snapshot_is_left_alone(self, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _line_store().save_snapshot(path, FINGERPRINT)
+        GTFSStore._publish(_line_store())
+
+        assert not GTFSStore.sync_shared_snapshot(path)
+
+
+class TestReload:
+    """Tests for publishing and reloading the singleton store."""
+
+    @pytest.fixture(autouse=True)
+    def _restore_singleton(self):
+        yield
+        GTFSStore.reset_instance()
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_gtfs_db(str(tmp_path / "gtfs.db"), LINE, stops=STOPS)
+        yield engine
+        engine.dispose()
+
+    def test_publish_bumps_the_generation(self):
+        first, second = _line_store(), _line_store()
+
+        GTFSStore._publish(first)
+        GTFSStore._publish(second)
+
+        assert second.generation == first.generation + 1
+        assert GTFSStore.get_instance() is second
+        assert GTFSStore.current_generation() == second.generation
+
+    def test_load_and_reload_attach_the_snapshot(self, engine, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        store = GTFSStore.get_instance()
+        with gtfs_session(engine) as db:
+            store.load_data(db, snapshot_path=path)
+            assert store.snapshot_info["path"] == path
+
+            reloaded = store.reload_data(db, snapshot_path=path)
+
+        assert GTFSStore.get_instance() is reloaded
+        assert reloaded.generation == store.generation + 1
+        assert reloaded.snapshot_info["path"] == path
+        assert isinstance(reloaded.st_arrival, memoryview)
+        assert list(reloaded.trip_ids) == ["T1", "T2"]
+
+    def test_failed_reload_keeps_the_published_store(self, engine, monkeypatch):
+        published = _line_store()
+        GTFSStore._publish(published)
+
+        def broken_load(self, db_session):
+            raise RuntimeError("connection lost")
+
+        monkeypatch.setattr(GTFSStore, "_do_load", broken_load)
+        with gtfs_session(engine) as db, pytest.raises(RuntimeError):
+            published.reload_data(db)
+
+        assert GTFSStore.get_instance() is published
+        assert GTFSStore.current_generation() == published.generation
+
+    def test_retired_generation_is_freed_after_a_query(self):
+        store = _line_store()
+        GTFSStore._publish(store)
+        assert RaptorAlgorithm(store=store).plan("A", "C", time(8, 0), MONDAY)
+        assert store._day_views
+        retired = weakref.ref(store)
+
+        GTFSStore._publish(_line_store())
+        del store
+
+        # Freed by reference counting: no cycle through the cached day views
+        assert retired() is None
+
+    def test_gc_freeze_only_on_the_first_load(self, engine, monkeypatch):
+        freezes = []
+        monkeypatch.setattr(gc, "freeze", lambda: freezes.append(1))
+        monkeypatch.setattr(GTFSStore, "_gc_frozen", False)
+
+        store = GTFSStore.get_instance()
+        with gtfs_session(engine) as db:
+            store.load_data(db)
+            store.reload_data(db)
+
+        assert freezes == [1]
@@ -0,0 +1,125 @@
+"""Unit tests for many-to-many travel-time matrices."""
+
+from datetime import date, time
+
+import pytest
+
+from src.gtfs_bc.routing import travel_matrix
+from src.gtfs_bc.routing.gtfs_store import GTFSStore
+from src.gtfs_bc.routing.travel_matrix import (
+    MatrixBusyError, MatrixQuery, TravelMatrixPool, format_csv, iter_travel_matrix,
+)
+from tests.unit.routing.store_builder import build_store
+
+MONDAY = date(2026, 1, 5)
+EIGHT = 8 * 3600
+
+
+def _line_store():
+    return build_store([
+        ("L1", "R1", [("A", EIGHT + 300), ("B", EIGHT + 900), ("C", EIGHT + 2700)]),
+        ("L2", "R2", [("B", EIGHT + 600), ("A", EIGHT + 1200)]),
+    ])
+
+
+@pytest.fixture
+def published_store():
+    """Line A -> B -> C published as the current store (workers use the singleton)."""
+    store = _line_store()
+    GTFSStore._instance = store
+    yield store
+    GTFSStore.reset_instance()
+
+
+QUERY = MatrixQuery(
+    origins=["A", "B"], destinations=["A", "B", "C"],
+    departure_time=time(8, 0), travel_date=MONDAY, max_minutes=30
+)
+
+
+class TestTravelMatrix:
+    """Tests for iter_travel_matrix and its output formats."""
+
+    def test_rows_in_origin_order(self, published_store):
+        """Minutes from the departure and transfers; None past the budget."""
+        rows = list(iter_travel_matrix(QUERY))
+
+        assert rows == [
+            ("A", [(0, 0), (15, 0), None]),  # C is 45 min away
+            ("B", [(20, 0), (0, 0), None]),
+        ]
+        assert list(format_csv(iter(rows), QUERY.destinations)) == [
+            "origin_id,destination_id,travel_minutes,transfers\n",
+            "A,A,0,0\nA,B,15,0\nA,C,,\n",
+            "B,A,20,0\nB,B,0,0\nB,C,,\n",
+        ]
+
+    def test_process_pool_matches_in_process(self, published_store):
+        """Forked workers inherit the store and return the same rows."""
+        assert list(iter_travel_matrix(QUERY, workers=2)) == list(iter_travel_matrix(QUERY))
+
+    def test_closing_the_stream_cancels_pending_rows(self, published_store, monkeypatch):
+        """A client that goes away must not leave the pool computing the rest."""
+        shutdowns = []
+
+        class RecordingExecutor(travel_matrix.ProcessPoolExecutor):
+            def shutdown(self, wait=True, *, cancel_futures=False):
+                shutdowns.append((wait, cancel_futures))
+                super().shutdown(wait=wait, cancel_futures=cancel_futures)
+
+        monkeypatch.setattr(travel_matrix, "ProcessPoolExecutor", RecordingExecutor)
+        query = MatrixQuery(
+            origins=["A", "B", "C"] * 4, destinations=["A", "B", "C"],
+            departure_time=time(8, 0), travel_date=MONDAY, max_minutes=30
+        )
+        rows = iter_travel_matrix(query, workers=2)
+
+        assert next(rows)[0] == "A"
+        rows.close()
+
+        assert shutdowns == [(False, True)]
+
+
+class TestTravelMatrixPool:
+    """Tests for the long-lived matrix pool of the API."""
+
+    @pytest.fixture
+    def attached_store(self, tmp_path):
+        path = str(tmp_path / "gtfs.snapshot")
+        assert _line_store().save_snapshot(path, {})
+        store = GTFSStore()
+        assert store.attach_snapshot(path)
+        GTFSStore._instance = store
+        yield store
+        GTFSStore.reset_instance()
+
+    @pytest.fixture
+    def pool(self, attached_store):
+        pool = TravelMatrixPool()
+        pool.start(attached_store.snapshot_info["path"], workers=1, max_matrices=1)
+        yield pool
+        pool.shutdown()
+
+    def test_rows_match_in_process(self, attached_store, pool):
+        assert pool.accepts(attached_store)
+
+        assert list(pool.rows(attached_store, QUERY)) == list(iter_travel_matrix(QUERY))
+        assert pool.completed == 1 and pool.in_flight == 0
+
+    def test_busy_pool_rejects_until_the_stream_is_closed(self, attached_store, pool):
+        query = MatrixQuery(
+            origins=["A", "B", "C"] * 4, destinations=["A", "B", "C"],
+            departure_time=time(8, 0), travel_date=MONDAY, max_minutes=30
+        )
+        rows = pool.rows(attached_store, query)
+        assert next(rows)[0] == "A"
+
+        with pytest.raises(MatrixBusyError):
+            pool.rows(attached_store, QUERY)
+        rows.close()
+
+        assert pool.in_flight == 0 and pool.rejected == 1
+        assert len(list(pool.rows(attached_store, QUERY))) == 2
+
+    def test_store_without_snapshot_is_not_accepted(self, pool):
+        assert not pool.accepts(_line_store())